@@ -5,6 +5,7 @@ Celery 配置和实例
 """
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown, task_postrun
 from kombu import Queue
 import os
 from dotenv import load_dotenv
@@ -59,6 +60,14 @@ celery_app.conf.update(
         "tasks.task_extract_tasks.*": {"queue": "email_translate"},
     },
 
+    # 消息优先级（Redis broker 按优先级拆分子队列，0 最高；翻译通道优先级见 shared.translation_scheduler）
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    task_default_priority=5,
+
     # 重试配置
     task_acks_late=True,  # 任务完成后才确认
     task_reject_on_worker_lost=True,  # worker 丢失时拒绝任务
@@ -81,16 +90,31 @@ celery_app.conf.update(
             "task": "tasks.maintenance_tasks.warm_translation_cache",
             "schedule": 3600.0,
         },
-        # 清理过期翻译缓存 - 每天凌晨2点
+        # 翻译缓存超出容量时淘汰 - 每小时（未超限时只做一次 SUM）
         "cleanup-old-translations": {
             "task": "tasks.maintenance_tasks.cleanup_old_translations",
-            "schedule": crontab(hour=2, minute=0),
+            "schedule": crontab(minute=30),
+        },
+        # 翻译缓存命中次数写回 MySQL - 每分钟
+        "flush-translation-cache-hits": {
+            "task": "tasks.maintenance_tasks.flush_translation_cache_hits",
+            "schedule": 60.0,
+        },
+        # 补齐邮件全文索引 - 每5分钟
+        "sync-search-index": {
+            "task": "tasks.maintenance_tasks.sync_search_index",
+            "schedule": 300.0,
         },
         # 清理临时文件 - 每天凌晨3点
         "cleanup-temp-files": {
             "task": "tasks.maintenance_tasks.cleanup_temp_files",
             "schedule": crontab(hour=3, minute=0),
         },
+        # 校正账户邮件计数 - 每天凌晨4点半（计数由触发器实时维护，这里只修正偏差）
+        "reconcile-email-counters": {
+            "task": "tasks.maintenance_tasks.reconcile_email_counters",
+            "schedule": crontab(hour=4, minute=30),
+        },
         # 重建联系人索引 - 每天凌晨4点
         "rebuild-contacts-index": {
             "task": "tasks.maintenance_tasks.rebuild_contacts_index",
@@ -111,18 +135,23 @@ celery_app.conf.update(
             "task": "tasks.maintenance_tasks.reset_monthly_quota",
             "schedule": crontab(day_of_month=1, hour=0, minute=0),
         },
-        # 收集未翻译邮件并翻译（vLLM）- 每1分钟
+        # 收集未翻译邮件放入 backfill 通道（vLLM）- 每1分钟
         "collect-and-translate-pending": {
             "task": "tasks.translate_tasks.collect_and_translate_pending",
             "schedule": 60.0,  # 1分钟
             "kwargs": {"limit": 500},
         },
+        # 按空闲名额投递排队中的翻译（兜底，任务结束时会立即补投）- 每10秒
+        "dispatch-pending-translations": {
+            "task": "tasks.translate_tasks.dispatch_pending_translations",
+            "schedule": 10.0,
+        },
         # 检查并发送定时邮件 - 每分钟
         "check-scheduled-emails": {
             "task": "tasks.email_tasks.check_scheduled_emails",
             "schedule": 60.0,  # 每分钟
         },
-        # 自动拉取新邮件 - 每1分钟
+        # 自动拉取新邮件 - 每1分钟（有 IDLE 监听的账户只做低频兜底拉取，见 imap_watcher.py）
         "auto-fetch-new-emails": {
             "task": "tasks.email_tasks.auto_fetch_all_emails",
             "schedule": 60.0,  # 1分钟
@@ -161,3 +190,60 @@ class BaseTask(celery_app.Task):
 
 
 celery_app.Task = BaseTask
+
+
+# ========== Worker 进程级数据库连接池 ==========
+def _worker_pool_name(worker) -> str:
+    """获取 worker 池类型名称（prefork/threads/gevent/eventlet/solo）"""
+    pool_cls = getattr(worker, "pool_cls", None) or celery_app.conf.worker_pool or "prefork"
+    name = pool_cls if isinstance(pool_cls, str) else pool_cls.__module__
+    return name.rsplit(".", 1)[-1].split(":")[-1].lower()
+
+
+_worker_pool_config = {"concurrency": celery_app.conf.worker_concurrency, "pool": "prefork"}
+
+
+@worker_init.connect
+def on_worker_init(sender=None, **kwargs):
+    """主进程启动：记录并发配置；线程类池在主进程内执行任务，直接初始化连接池"""
+    from database.sync_database import THREADED_POOLS, compute_pool_size, init_sync_engine
+
+    pool_name = _worker_pool_name(sender)
+    concurrency = getattr(sender, "concurrency", None) or celery_app.conf.worker_concurrency or 1
+    _worker_pool_config.update(concurrency=concurrency, pool=pool_name)
+
+    if pool_name in THREADED_POOLS or pool_name == "solo":
+        pool_size, max_overflow = compute_pool_size(concurrency, pool_name)
+        init_sync_engine(pool_size, max_overflow)
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    """prefork 子进程启动：每个子进程创建自己的连接池（连接不能跨 fork 共享）"""
+    from database.sync_database import compute_pool_size, init_sync_engine
+
+    pool_size, max_overflow = compute_pool_size(_worker_pool_config["concurrency"] or 1, "prefork")
+    init_sync_engine(pool_size, max_overflow)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    """进程退出：推送翻译缓存命中计数，释放数据库连接池和 IMAP 会话"""
+    from database.sync_database import dispose_sync_engine
+    from services.imap_pool import get_imap_session_pool
+    from services.translation_cache_policy import push_hits_sync
+    push_hits_sync()
+    dispose_sync_engine()
+    get_imap_session_pool().close_all()
+
+
+@task_postrun.connect
+def on_task_postrun(sender=None, **kwargs):
+    """任务结束后上报连接池指标（节流）"""
+    try:
+        from database.sync_database import publish_pool_stats
+        hostname = getattr(getattr(sender, "request", None), "hostname", None) or "unknown"
+        publish_pool_stats(hostname)
+    except Exception as e:
+        print(f"[Celery] Failed to publish db pool stats: {e}")
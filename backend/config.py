@@ -21,6 +21,11 @@ def get_database_url() -> str:
     return f"mysql+aiomysql://{user}:{password}@{host}:{port}/{database}?charset=utf8mb4"
 
 
+def get_sync_database_url() -> str:
+    """获取 MySQL 同步连接URL（Celery worker 使用 pymysql 驱动）"""
+    return get_database_url().replace("mysql+aiomysql://", "mysql+pymysql://", 1)
+
+
 class Settings(BaseSettings):
     # Application
     app_name: str = "供应商邮件翻译系统"
@@ -40,6 +45,12 @@ class Settings(BaseSettings):
     vllm_base_url: str = "http://localhost:5081"
     vllm_model: str = "/home/aaa/models/Qwen3-VL-8B-Instruct"
     vllm_api_key: str = ""  # Gateway API Key
+    # vLLM 连接池（进程内共享 keep-alive 连接）
+    vllm_max_connections: int = 20
+    vllm_max_keepalive_connections: int = 10
+    vllm_http2: bool = True  # 需要安装 h2，仅对 https 网关生效
+    # 单个 API 进程内同时进行的异步 vLLM 请求上限（超出的请求排队等待）
+    vllm_async_concurrency: int = 8
 
     # JWT Auth
     secret_key: str = "email-translate-secret-key-change-in-production"
@@ -1,5 +1,8 @@
 from .models import Base, EmailAccount, Supplier, Email, Attachment, Draft, ApprovalRule, Approval, Glossary, EmailReadStatus, TranslationBatch
 from .database import get_db, engine, async_session
+from . import search_index  # noqa: F401  注册邮件全文索引同步事件
+from . import email_list  # noqa: F401  注册邮件列表预览生成事件
+from . import email_domains  # noqa: F401  注册邮件域名同步事件
 
 __all__ = [
     "Base",
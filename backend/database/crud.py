@@ -2,14 +2,16 @@ from sqlalchemy import select, update, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable, Set
 from passlib.context import CryptContext
 
 from .models import (
     EmailAccount, Supplier, Email, Attachment,
     Draft, ApprovalRule, Approval, Glossary, EmailReadStatus,
-    TranslationBatch
+    TranslationBatch, SharedEmailTranslation, SentEmailMapping, TranslationCache
 )
+from . import search_index
+from .email_list import make_snippet
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -66,6 +68,71 @@ async def get_email_by_message_id(db: AsyncSession, message_id: str) -> Optional
     return result.scalar_one_or_none()
 
 
+# ============ 批量查询（单次 IN 查询替代逐条查询） ============
+# 单条 IN 查询的最大参数个数，超出时分批
+IN_QUERY_CHUNK = 500
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(v for v in values if v))
+
+
+async def get_existing_message_ids(db: AsyncSession, message_ids: Iterable[str]) -> Set[str]:
+    """返回已入库的 message_id 集合"""
+    ids = _unique(message_ids)
+    found = set()
+    for i in range(0, len(ids), IN_QUERY_CHUNK):
+        result = await db.execute(
+            select(Email.message_id).where(Email.message_id.in_(ids[i:i + IN_QUERY_CHUNK]))
+        )
+        found.update(row[0] for row in result.fetchall())
+    return found
+
+
+async def get_shared_translations(db: AsyncSession, message_ids: Iterable[str]) -> Dict[str, SharedEmailTranslation]:
+    """按 message_id 批量获取共享翻译：{message_id: SharedEmailTranslation}"""
+    ids = _unique(message_ids)
+    found = {}
+    for i in range(0, len(ids), IN_QUERY_CHUNK):
+        result = await db.execute(
+            select(SharedEmailTranslation).where(
+                SharedEmailTranslation.message_id.in_(ids[i:i + IN_QUERY_CHUNK])
+            )
+        )
+        for row in result.scalars().all():
+            found[row.message_id] = row
+    return found
+
+
+async def get_sent_email_mappings(db: AsyncSession, message_ids: Iterable[str]) -> Dict[str, SentEmailMapping]:
+    """按 message_id 批量获取发送记录：{message_id: SentEmailMapping}"""
+    ids = _unique(message_ids)
+    found = {}
+    for i in range(0, len(ids), IN_QUERY_CHUNK):
+        result = await db.execute(
+            select(SentEmailMapping).where(
+                SentEmailMapping.message_id.in_(ids[i:i + IN_QUERY_CHUNK])
+            )
+        )
+        for row in result.scalars().all():
+            found[row.message_id] = row
+    return found
+
+
+async def get_translation_cache_entries(db: AsyncSession, text_hashes: Iterable[str]) -> Dict[str, str]:
+    """按 text_hash 批量获取缓存译文：{text_hash: translated_text}"""
+    hashes = _unique(text_hashes)
+    found = {}
+    for i in range(0, len(hashes), IN_QUERY_CHUNK):
+        result = await db.execute(
+            select(TranslationCache.text_hash, TranslationCache.translated_text).where(
+                TranslationCache.text_hash.in_(hashes[i:i + IN_QUERY_CHUNK])
+            )
+        )
+        found.update({row[0]: row[1] for row in result.fetchall()})
+    return found
+
+
 async def get_emails(db: AsyncSession, supplier_id: int = None, user_id: int = None,
                      direction: str = None, limit: int = 50, offset: int = 0) -> List[Email]:
     query = select(Email).options(
@@ -104,9 +171,12 @@ async def update_email_translation(db: AsyncSession, email_id: int,
         .values(
             subject_translated=subject_translated,
             body_translated=body_translated,
+            snippet_translated=make_snippet(body_translated),
             is_translated=True
         )
     )
+    # Core UPDATE 不触发 ORM 事件，手动同步全文索引
+    await search_index.reindex_emails(db, [email_id])
 
 
 # ============ Draft CRUD ============
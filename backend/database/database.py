@@ -44,6 +44,22 @@ async def get_db():
 
 
 async def init_db():
+    from sqlalchemy import text
     from .models import Base
     async with engine.begin() as conn:
+        if conn.dialect.name == "mysql":
+            # 全文索引在创建时绑定停用词表；ngram 分词下包含停用词（a、i 等）的二元组都不入索引，建表前关闭
+            await conn.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
         await conn.run_sync(Base.metadata.create_all)
+
+    if engine.dialect.name == "mysql":
+        from .email_counters import install_triggers
+        try:
+            async with engine.begin() as conn:
+                created = await conn.run_sync(install_triggers)
+            if created:
+                print(f"[DB] 已创建邮件计数触发器: {', '.join(created)}")
+        except Exception as e:
+            # 无 TRIGGER 权限（或开启 binlog 时未设置 log_bin_trust_function_creators）不影响启动，
+            # 计数改由定时校正维护
+            print(f"[DB] 创建邮件计数触发器失败，计数仅由定时校正更新: {e}")
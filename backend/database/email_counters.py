@@ -0,0 +1,263 @@
+"""
+账户邮件计数
+
+统计概览、仪表盘和邮件统计摘要读取预先维护的计数，不再对 emails 表做多次 COUNT：
+
+- account_email_counters: 每账户一行（总数、未读、星标、已翻译、外文邮件翻译状态等）
+- account_email_daily_counts: 每账户每天（received_at 的 UTC 日期）的邮件数
+- account_supplier_counts: 每账户每个供应商的邮件数
+
+计数由 emails 表上的触发器在写入邮件的同一事务内增减。写入邮件已读/星标/翻译状态的路径很多
+（ORM、批量 Core UPDATE、Celery 同步会话），触发器能覆盖全部路径，不会因为漏掉某个 UPDATE 而漂移。
+触发器先更新账户计数行，再更新每日/供应商计数，校正任务按同样的顺序加锁，二者不会死锁。
+
+reconcile_account_sync() 锁住账户计数行后按实际数据重算，修复触发器缺失（如数据库账号无
+TRIGGER 权限）或手工改数据造成的偏差，由定时任务 reconcile_email_counters 执行；
+账户还没有计数行、或计数行从未校正过时（触发器在安装后首次写入邮件时创建的行只有增量），
+首次读取会同步校正一次。
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+
+from .models import AccountEmailCounter, AccountEmailDailyCount, AccountSupplierCount, Email
+
+# 触发器版本：修改计数定义后加一，启动/迁移时会替换旧版本触发器
+TRIGGER_VERSION = 1
+TRIGGER_PREFIX = "trg_emails_counters"
+
+_FOREIGN = "{r}.language_detected IS NOT NULL AND {r}.language_detected <> 'zh'"
+
+# 计数列 → 行 {r} 计入该列的条件（MySQL 表达式，NULL 视为不满足）
+COUNTER_PREDICATES = {
+    "total": "TRUE",
+    "inbound": "{r}.direction = 'inbound'",
+    "unread": "{r}.is_read = 0",
+    "unread_inbound": "{r}.is_read = 0 AND {r}.direction = 'inbound'",
+    "flagged": "{r}.is_flagged = 1",
+    "translated": "{r}.is_translated = 1",
+    "untranslated_inbound": "{r}.is_translated = 0 AND {r}.direction = 'inbound'",
+    "foreign_total": _FOREIGN,
+    "foreign_translated": _FOREIGN + " AND {r}.is_translated = 1",
+    "foreign_untranslated": _FOREIGN + " AND {r}.is_translated = 0",
+    "foreign_idle": _FOREIGN + " AND {r}.is_translated = 0 AND {r}.translation_status NOT IN ('translating', 'failed')",
+    "foreign_translating": _FOREIGN + " AND {r}.translation_status = 'translating'",
+    "foreign_failed": _FOREIGN + " AND {r}.translation_status = 'failed'",
+}
+COUNTER_COLUMNS = list(COUNTER_PREDICATES)
+
+# 影响 COUNTER_PREDICATES 的列
+_TRACKED_COLUMNS = ("direction", "is_read", "is_flagged", "is_translated", "language_detected", "translation_status")
+
+
+# ============ 触发器 ============
+
+def _flag(column: str, row: str) -> str:
+    return f"IFNULL(({COUNTER_PREDICATES[column].format(r=row)}), 0)"
+
+
+def _upsert_counters(account: str, values: Dict[str, str]) -> str:
+    columns = ", ".join(values)
+    assignments = ", ".join(f"{c} = {c} + VALUES({c})" for c in values)
+    return (
+        f"INSERT INTO account_email_counters (account_id, {columns}, updated_at) "
+        f"VALUES ({account}, {', '.join(values.values())}, UTC_TIMESTAMP()) "
+        f"ON DUPLICATE KEY UPDATE {assignments}, updated_at = VALUES(updated_at);"
+    )
+
+
+def _add_row(row: str, sign: int) -> str:
+    """把一行邮件计入（sign=1）或移出（sign=-1）所有计数"""
+    sign_prefix = "" if sign > 0 else "-"
+    counters = _upsert_counters(f"{row}.account_id", {c: f"{sign_prefix}{_flag(c, row)}" for c in COUNTER_COLUMNS})
+    return f"""
+        {counters}
+        {_bump_daily(row, sign)}
+        {_bump_supplier(row, sign)}"""
+
+
+def _bump_daily(row: str, sign: int) -> str:
+    return f"""
+        IF {row}.received_at IS NOT NULL THEN
+            INSERT INTO account_email_daily_counts (account_id, day, email_count)
+            VALUES ({row}.account_id, DATE({row}.received_at), {sign})
+            ON DUPLICATE KEY UPDATE email_count = email_count + VALUES(email_count);
+        END IF;"""
+
+
+def _bump_supplier(row: str, sign: int) -> str:
+    return f"""
+        IF {row}.supplier_id IS NOT NULL THEN
+            INSERT INTO account_supplier_counts (account_id, supplier_id, email_count)
+            VALUES ({row}.account_id, {row}.supplier_id, {sign})
+            ON DUPLICATE KEY UPDATE email_count = email_count + VALUES(email_count);
+        END IF;"""
+
+
+def trigger_statements() -> List[Tuple[str, str]]:
+    """当前版本的触发器 [(名称, CREATE TRIGGER 语句)]"""
+    suffix = f"v{TRIGGER_VERSION}"
+    unchanged = " AND ".join(
+        [f"OLD.{c} <=> NEW.{c}" for c in _TRACKED_COLUMNS]
+        + ["DATE(OLD.received_at) <=> DATE(NEW.received_at)", "OLD.supplier_id <=> NEW.supplier_id"]
+    )
+    deltas = {c: f"{_flag(c, 'NEW')} - {_flag(c, 'OLD')}" for c in COUNTER_COLUMNS}
+
+    insert_name = f"{TRIGGER_PREFIX}_ai_{suffix}"
+    update_name = f"{TRIGGER_PREFIX}_au_{suffix}"
+    delete_name = f"{TRIGGER_PREFIX}_ad_{suffix}"
+    return [
+        (insert_name, f"""
+CREATE TRIGGER {insert_name} AFTER INSERT ON emails FOR EACH ROW
+BEGIN
+    IF NEW.account_id IS NOT NULL THEN{_add_row('NEW', 1)}
+    END IF;
+END"""),
+        (update_name, f"""
+CREATE TRIGGER {update_name} AFTER UPDATE ON emails FOR EACH ROW
+BEGIN
+    IF NOT (OLD.account_id <=> NEW.account_id) THEN
+        IF OLD.account_id IS NOT NULL THEN{_add_row('OLD', -1)}
+        END IF;
+        IF NEW.account_id IS NOT NULL THEN{_add_row('NEW', 1)}
+        END IF;
+    ELSEIF NEW.account_id IS NOT NULL AND NOT ({unchanged}) THEN
+        {_upsert_counters('NEW.account_id', deltas)}
+        IF NOT (DATE(OLD.received_at) <=> DATE(NEW.received_at)) THEN{_bump_daily('OLD', -1)}{_bump_daily('NEW', 1)}
+        END IF;
+        IF NOT (OLD.supplier_id <=> NEW.supplier_id) THEN{_bump_supplier('OLD', -1)}{_bump_supplier('NEW', 1)}
+        END IF;
+    END IF;
+END"""),
+        (delete_name, f"""
+CREATE TRIGGER {delete_name} AFTER DELETE ON emails FOR EACH ROW
+BEGIN
+    IF OLD.account_id IS NOT NULL THEN{_add_row('OLD', -1)}
+    END IF;
+END"""),
+    ]
+
+
+def install_triggers(connection) -> List[str]:
+    """创建当前版本的触发器并删除旧版本（已存在的跳过）
+
+    Args:
+        connection: 同步 Connection（异步引擎中通过 run_sync 调用）
+
+    Returns:
+        新创建的触发器名称
+    """
+    existing = set(connection.execute(text(
+        "SELECT TRIGGER_NAME FROM INFORMATION_SCHEMA.TRIGGERS "
+        "WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'emails' "
+        "AND TRIGGER_NAME LIKE :prefix"
+    ), {"prefix": f"{TRIGGER_PREFIX}%"}).scalars())
+
+    statements = trigger_statements()
+    current = {name for name, _ in statements}
+    for name in existing - current:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    created = []
+    for name, sql in statements:
+        if name not in existing:
+            connection.execute(text(sql))
+            created.append(name)
+    return created
+
+
+# ============ 校正 ============
+
+def _count_statement():
+    sums = ", ".join(f"COALESCE(SUM({_flag(c, 'e')}), 0) AS {c}" for c in COUNTER_COLUMNS)
+    return text(f"SELECT {sums} FROM emails e WHERE e.account_id = :account_id")
+
+
+def reconcile_account_sync(db, account_id: int) -> Dict[str, int]:
+    """按 emails 表实际数据重算账户计数（调用方负责提交，提交前账户的邮件写入会等待）
+
+    Args:
+        db: 同步数据库会话
+        account_id: 账户 ID
+
+    Returns:
+        {计数列: 偏差}（实际值 - 原计数），无偏差时为空
+    """
+    # 先锁住账户计数行：触发器更新计数前都要拿这行锁，此后读到的快照与计数一致
+    db.execute(text("INSERT IGNORE INTO account_email_counters (account_id) VALUES (:account_id)"),
+               {"account_id": account_id})
+    before = db.execute(
+        text(f"SELECT {', '.join(COUNTER_COLUMNS)} FROM account_email_counters "
+             f"WHERE account_id = :account_id FOR UPDATE"),
+        {"account_id": account_id}
+    ).mappings().one()
+    actual = db.execute(_count_statement(), {"account_id": account_id}).mappings().one()
+
+    assignments = ", ".join(f"{c} = :{c}" for c in COUNTER_COLUMNS)
+    db.execute(
+        text(f"UPDATE account_email_counters SET {assignments}, "
+             f"updated_at = UTC_TIMESTAMP(), reconciled_at = UTC_TIMESTAMP() WHERE account_id = :account_id"),
+        {**{c: int(actual[c]) for c in COUNTER_COLUMNS}, "account_id": account_id}
+    )
+
+    day = func.date(Email.received_at)
+    daily = db.execute(
+        select(day, func.count(Email.id))
+        .where(Email.account_id == account_id, Email.received_at.isnot(None))
+        .group_by(day)
+    ).all()
+    db.execute(delete(AccountEmailDailyCount).where(AccountEmailDailyCount.account_id == account_id))
+    if daily:
+        db.execute(insert(AccountEmailDailyCount), [
+            {"account_id": account_id, "day": d, "email_count": n} for d, n in daily
+        ])
+
+    suppliers = db.execute(
+        select(Email.supplier_id, func.count(Email.id))
+        .where(Email.account_id == account_id, Email.supplier_id.isnot(None))
+        .group_by(Email.supplier_id)
+    ).all()
+    db.execute(delete(AccountSupplierCount).where(AccountSupplierCount.account_id == account_id))
+    if suppliers:
+        db.execute(insert(AccountSupplierCount), [
+            {"account_id": account_id, "supplier_id": s, "email_count": n} for s, n in suppliers
+        ])
+
+    return {c: int(actual[c]) - int(before[c]) for c in COUNTER_COLUMNS if int(actual[c]) != int(before[c])}
+
+
+# ============ 读取 ============
+
+async def get_counters(db, account_id: int) -> AccountEmailCounter:
+    """读取账户计数（还没有计数行或从未校正过时先校正一次）"""
+    counters = await db.get(AccountEmailCounter, account_id)
+    if counters is None or counters.reconciled_at is None:
+        await db.run_sync(reconcile_account_sync, account_id)
+        await db.commit()
+        # 会话 expire_on_commit=False，已加载的计数行需强制重新读取
+        counters = await db.get(AccountEmailCounter, account_id, populate_existing=True)
+    return counters
+
+
+async def get_daily_counts(db, account_id: int, start_day: date, end_day: Optional[date] = None) -> Dict[date, int]:
+    """读取 [start_day, end_day] 的每日邮件数（没有邮件的日期不出现）"""
+    conditions = [AccountEmailDailyCount.account_id == account_id, AccountEmailDailyCount.day >= start_day]
+    if end_day is not None:
+        conditions.append(AccountEmailDailyCount.day <= end_day)
+    rows = await db.execute(
+        select(AccountEmailDailyCount.day, AccountEmailDailyCount.email_count).where(*conditions)
+    )
+    return {day if isinstance(day, date) else datetime.fromisoformat(str(day)).date(): count
+            for day, count in rows.all()}
+
+
+async def count_suppliers(db, account_id: int) -> int:
+    """有往来邮件的供应商数"""
+    result = await db.execute(
+        select(func.count()).select_from(AccountSupplierCount).where(
+            AccountSupplierCount.account_id == account_id,
+            AccountSupplierCount.email_count > 0
+        )
+    )
+    return result.scalar() or 0
@@ -0,0 +1,116 @@
+"""
+邮件域名
+
+供应商统计按域名聚合邮件，不再对每个供应商做 LIKE '%@域名%' 扫描：
+
+- emails.sender_domain: 发件人域名（小写），与 account_id 建联合索引
+- email_recipient_domains: 收件人/抄送/密送中出现的域名，每封邮件每个域名一行
+
+两者都由 ORM 事件在邮件写入、发件人/收件人变化时同步；migrations.add_email_domains 回填历史邮件。
+"""
+
+from email.utils import getaddresses, parseaddr
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import delete, event, insert, inspect, select
+
+from .models import Email, EmailRecipientDomain
+
+# 与 emails.sender_domain / email_recipient_domains.domain 列长度一致
+DOMAIN_MAX_CHARS = 255
+
+_RECIPIENT_FIELDS = ("to_email", "cc_email", "bcc_email")
+
+
+def normalize_domain(domain: Optional[str]) -> Optional[str]:
+    """规范化域名：去掉前导 @ 和首尾空白/尖括号/点，转小写（供应商 email_domain 可能存为 "@example.com"）"""
+    if not domain:
+        return None
+    domain = domain.strip().strip("<>").lstrip("@").rstrip(".").lower()
+    return domain[:DOMAIN_MAX_CHARS] or None
+
+
+def extract_domain(address: Optional[str]) -> Optional[str]:
+    """提取邮箱地址的域名（支持 "名称 <a@b.com>" 格式）"""
+    if not address:
+        return None
+    _, addr = parseaddr(address)
+    addr = addr or address
+    if "@" not in addr:
+        return None
+    return normalize_domain(addr.rsplit("@", 1)[1])
+
+
+def recipient_domains(*fields: Optional[str]) -> Set[str]:
+    """收件人列表（RFC 5322，可多个字段）中出现的所有域名"""
+    domains = set()
+    for _, addr in getaddresses([field for field in fields if field]):
+        domain = extract_domain(addr)
+        if domain:
+            domains.add(domain)
+    return domains
+
+
+def _recipient_rows(email_id: int, account_id: int, values: dict) -> list:
+    domains = recipient_domains(*(values.get(name) for name in _RECIPIENT_FIELDS))
+    return [{"email_id": email_id, "account_id": account_id, "domain": domain} for domain in sorted(domains)]
+
+
+# ============ 同步 ============
+
+@event.listens_for(Email, "before_insert")
+def _sender_domain_on_insert(mapper, connection, target):
+    target.sender_domain = extract_domain(target.from_email)
+
+
+@event.listens_for(Email, "before_update")
+def _sender_domain_on_update(mapper, connection, target):
+    if inspect(target).attrs.from_email.history.has_changes():
+        target.sender_domain = extract_domain(target.from_email)
+
+
+@event.listens_for(Email, "after_insert")
+def _recipient_domains_on_insert(mapper, connection, target):
+    state = inspect(target)
+    account_id = state.dict.get("account_id")
+    if account_id is None:
+        return
+    rows = _recipient_rows(target.id, account_id, state.dict)
+    if rows:
+        connection.execute(insert(EmailRecipientDomain), rows)
+
+
+@event.listens_for(Email, "after_update")
+def _recipient_domains_on_update(mapper, connection, target):
+    state = inspect(target)
+    watched = _RECIPIENT_FIELDS + ("account_id",)
+    if not any(state.attrs[name].history.has_changes() for name in watched):
+        return
+
+    values = {name: state.dict[name] for name in watched if name in state.dict}
+    if len(values) < len(watched):
+        # 部分字段未加载，其余从刚写入的行读取，不触发 ORM 懒加载
+        table = Email.__table__
+        row = connection.execute(
+            select(*(table.c[name] for name in watched)).where(table.c.id == target.id)
+        ).mappings().first()
+        if row is None:
+            return
+        values = {**dict(row), **values}
+
+    connection.execute(delete(EmailRecipientDomain).where(EmailRecipientDomain.email_id == target.id))
+    if values.get("account_id") is not None:
+        rows = _recipient_rows(target.id, values["account_id"], values)
+        if rows:
+            connection.execute(insert(EmailRecipientDomain), rows)
+
+
+def build_recipient_rows(emails: Iterable) -> list:
+    """由 (id, account_id, to_email, cc_email, bcc_email) 行生成 email_recipient_domains 行（回填用）"""
+    rows = []
+    for email_id, account_id, to_email, cc_email, bcc_email in emails:
+        if account_id is not None:
+            rows.extend(_recipient_rows(email_id, account_id, {
+                "to_email": to_email, "cc_email": cc_email, "bcc_email": bcc_email
+            }))
+    return rows
@@ -0,0 +1,66 @@
+"""
+邮件列表投影
+
+列表页（收件箱、文件夹、归档、线程）只需要主题、发件人、状态和一行预览，
+不应加载正文原文 / 译文 / HTML、引用头和收件人列表这些大字段：
+
+- LIST_COLUMNS / list_load_options(): 列表查询只加载的列（load_only），其余列在访问时才懒加载
+- emails.snippet_original / snippet_translated: 正文开头的预览文本，由 ORM 事件在正文写入时生成，
+  列表查询不再需要读取（并解压）正文；绕过 ORM 的 Core UPDATE 需要自行写入 make_snippet() 的结果
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import load_only, selectinload
+
+from .models import Email
+
+# 预览文本最大字符数（与 emails.snippet_* 列长度一致）
+SNIPPET_CHARS = 200
+
+# 列表视图需要的列
+LIST_COLUMNS = (
+    Email.id, Email.message_id, Email.thread_id, Email.account_id, Email.supplier_id,
+    Email.from_email, Email.from_name,
+    Email.subject_original, Email.subject_translated,
+    Email.snippet_original, Email.snippet_translated,
+    Email.language_detected, Email.direction,
+    Email.is_translated, Email.is_read, Email.is_flagged, Email.translation_status,
+    Email.received_at, Email.archived_at, Email.archive_folder_id,
+)
+
+_SNIPPET_SOURCES = {
+    "body_original": "snippet_original",
+    "body_translated": "snippet_translated",
+}
+
+
+def make_snippet(text: Optional[str]) -> Optional[str]:
+    """由正文生成预览文本：合并空白后取开头 SNIPPET_CHARS 个字符"""
+    if not text:
+        return None
+    return re.sub(r"\s+", " ", text[:SNIPPET_CHARS * 4]).strip()[:SNIPPET_CHARS] or None
+
+
+def list_load_options(with_labels: bool = True) -> list:
+    """列表查询的加载选项"""
+    options = [load_only(*LIST_COLUMNS)]
+    if with_labels:
+        options.append(selectinload(Email.labels))
+    return options
+
+
+@event.listens_for(Email, "before_insert")
+def _snippets_on_insert(mapper, connection, target):
+    for source, snippet in _SNIPPET_SOURCES.items():
+        setattr(target, snippet, make_snippet(getattr(target, source)))
+
+
+@event.listens_for(Email, "before_update")
+def _snippets_on_update(mapper, connection, target):
+    state = inspect(target)
+    for source, snippet in _SNIPPET_SOURCES.items():
+        if state.attrs[source].history.has_changes():
+            setattr(target, snippet, make_snippet(getattr(target, source)))
@@ -1,8 +1,9 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Float, Table, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, Date, DateTime, ForeignKey, JSON, Float, Table, Index, UniqueConstraint
 from sqlalchemy.dialects.mysql import MEDIUMTEXT
 from sqlalchemy.orm import relationship
 from .database import Base
+from .types import CompressedText
 
 
 # 邮件-标签 多对多关联表
@@ -83,6 +84,7 @@ class Email(Base):
 
     from_email = Column(String(255))
     from_name = Column(String(255))
+    sender_domain = Column(String(255))  # 发件人域名（小写，由 database.email_domains 在写入时生成）
     to_email = Column(Text)        # 完整收件人列表 (RFC 5322)
     cc_email = Column(Text)        # 抄送列表
     bcc_email = Column(Text)       # 密送列表
@@ -91,9 +93,14 @@ class Email(Base):
     subject_original = Column(Text)
     subject_translated = Column(Text)
 
+    # 正文原文保持明文（搜索走 email_search_index 全文索引）
     body_original = Column(MEDIUMTEXT)
-    body_translated = Column(MEDIUMTEXT)
-    body_html = Column(MEDIUMTEXT)
+    # 译文和 HTML 压缩存储（zstd + 训练字典，见 database.types.CompressedText）
+    body_translated = Column(CompressedText("email_text"))
+    body_html = Column(CompressedText("email_html"))
+    # 列表预览：正文开头（由 database.email_list 在正文写入时生成，列表查询不读正文）
+    snippet_original = Column(String(200))
+    snippet_translated = Column(String(200))
 
     language_detected = Column(String(10))
     direction = Column(String(20))  # inbound, outbound
@@ -138,9 +145,97 @@ class Email(Base):
         Index('idx_email_account_flagged', 'account_id', 'is_flagged'),
         # 归档查询
         Index('idx_email_archived', 'archived_at', 'archive_folder_id'),
+        # 按发件人域名统计（供应商统计）
+        Index('idx_email_account_sender_domain', 'account_id', 'sender_domain'),
+    )
+
+
+class EmailSearchIndex(Base):
+    """邮件全文搜索索引 - 原文/译文的主题、正文明文（ngram 全文索引，支持中日韩）
+
+    由 database.search_index 在邮件写入/翻译完成时同步，邮件删除时级联删除
+    """
+    __tablename__ = "email_search_index"
+
+    email_id = Column(Integer, ForeignKey("emails.id", ondelete="CASCADE"), primary_key=True)
+    account_id = Column(Integer, nullable=False, index=True)
+    sender = Column(String(512))  # 发件人名称 + 地址
+    subject_original = Column(Text)
+    subject_translated = Column(Text)
+    body_original = Column(MEDIUMTEXT)  # 截断到 SEARCH_BODY_MAX_CHARS
+    body_translated = Column(MEDIUMTEXT)
+    has_translation = Column(Boolean, default=False)  # 译文是否已写入（对账任务据此补漏）
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ft_email_search_all', 'subject_original', 'subject_translated', 'body_original',
+              'body_translated', 'sender', mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        Index('ft_email_search_subject', 'subject_original', 'subject_translated',
+              mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
     )
 
 
+class EmailRecipientDomain(Base):
+    """邮件收件人域名 - 收件人/抄送/密送中出现的每个域名一行
+
+    由 database.email_domains 在邮件写入、收件人变化时同步，邮件删除时级联删除
+    """
+    __tablename__ = "email_recipient_domains"
+
+    email_id = Column(Integer, ForeignKey("emails.id", ondelete="CASCADE"), primary_key=True)
+    domain = Column(String(255), primary_key=True)
+    account_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('idx_recipient_domain_account', 'account_id', 'domain'),
+    )
+
+
+class AccountEmailCounter(Base):
+    """账户邮件计数 - 统计/仪表盘直接读取，不再扫描 emails 表
+
+    由 emails 表上的触发器在同一事务内增减（见 database.email_counters），
+    定时任务 reconcile_email_counters 按实际数据校正偏差
+    """
+    __tablename__ = "account_email_counters"
+
+    account_id = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    inbound = Column(Integer, nullable=False, default=0, server_default="0")
+    unread = Column(Integer, nullable=False, default=0, server_default="0")
+    unread_inbound = Column(Integer, nullable=False, default=0, server_default="0")
+    flagged = Column(Integer, nullable=False, default=0, server_default="0")
+    translated = Column(Integer, nullable=False, default=0, server_default="0")
+    untranslated_inbound = Column(Integer, nullable=False, default=0, server_default="0")
+    # 外文邮件（已检测语言且非中文）的翻译状态
+    foreign_total = Column(Integer, nullable=False, default=0, server_default="0")
+    foreign_translated = Column(Integer, nullable=False, default=0, server_default="0")
+    foreign_untranslated = Column(Integer, nullable=False, default=0, server_default="0")
+    foreign_idle = Column(Integer, nullable=False, default=0, server_default="0")  # 未翻译且不在翻译中/失败
+    foreign_translating = Column(Integer, nullable=False, default=0, server_default="0")
+    foreign_failed = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime)
+    reconciled_at = Column(DateTime)  # 最近一次校正时间
+
+
+class AccountEmailDailyCount(Base):
+    """账户每日邮件数（按 received_at 的 UTC 日期），用于趋势和今日/本周/本月统计"""
+    __tablename__ = "account_email_daily_counts"
+
+    account_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    email_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class AccountSupplierCount(Base):
+    """账户各供应商邮件数"""
+    __tablename__ = "account_supplier_counts"
+
+    account_id = Column(Integer, primary_key=True)
+    supplier_id = Column(Integer, primary_key=True)
+    email_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+
 class Attachment(Base):
     __tablename__ = "attachments"
 
@@ -343,16 +438,22 @@ class TranslationBatchItem(Base):
 
 
 class TranslationCache(Base):
-    """翻译缓存表 - 相同文本只翻译一次"""
+    """翻译缓存表 - 相同文本只翻译一次
+
+    原文/译文压缩存储；总容量按 size_bytes 限额，超出时按频率、最近命中时间和大小淘汰
+    （见 services.translation_cache_policy）
+    """
     __tablename__ = "translation_cache"
 
     id = Column(Integer, primary_key=True, index=True)
     text_hash = Column(String(64), unique=True, index=True)  # SHA256 of source_text + langs
-    source_text = Column(Text, nullable=False)
-    translated_text = Column(Text, nullable=False)
+    source_text = Column(CompressedText, nullable=False)
+    translated_text = Column(CompressedText, nullable=False)
     source_lang = Column(String(10))
     target_lang = Column(String(10), nullable=False)
-    hit_count = Column(Integer, default=1)  # 缓存命中次数
+    hit_count = Column(Integer, default=1)  # 缓存命中次数（批量累加，见 flush_translation_cache_hits）
+    size_bytes = Column(Integer, default=0)  # 压缩后的原文+译文字节数
+    last_hit_at = Column(DateTime, default=datetime.utcnow)  # 最近命中时间
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -368,7 +469,7 @@ class SharedEmailTranslation(Base):
     id = Column(Integer, primary_key=True, index=True)
     message_id = Column(String(255), unique=True, index=True)  # 邮件的 RFC Message-ID
     subject_translated = Column(Text)
-    body_translated = Column(Text)
+    body_translated = Column(CompressedText("email_text"))
     source_lang = Column(String(10))
     target_lang = Column(String(10), default="zh")
     translated_by = Column(Integer, ForeignKey("email_accounts.id"))  # 谁触发的翻译
@@ -813,6 +914,32 @@ class SentEmailMapping(Base):
     )
 
 
+class ImapSyncState(Base):
+    """IMAP 增量同步检查点 - 按账户+文件夹记录已同步到的 UID
+
+    UIDVALIDITY 不变时，下次只需 UID FETCH last_uid+1:*；
+    UIDVALIDITY 变化（文件夹被重建）时 UID 全部失效，需按日期重新同步。
+    服务器支持 CONDSTORE 时记录 HIGHESTMODSEQ（仅在文件夹全部处理完后更新），未变化即可跳过整个文件夹。
+    """
+    __tablename__ = "imap_sync_states"
+
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("email_accounts.id", ondelete="CASCADE"), nullable=False)
+    folder = Column(String(255), nullable=False)        # IMAP 文件夹名（原始名称，可能是 UTF-7）
+
+    uidvalidity = Column(BigInteger, nullable=False)
+    last_uid = Column(BigInteger, nullable=False, default=0)
+    highest_modseq = Column(BigInteger)                 # 仅 CONDSTORE 服务器
+
+    last_synced_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('account_id', 'folder', name='uq_imap_sync_account_folder'),
+        {'mysql_engine': 'InnoDB'},
+    )
+
+
 class Notification(Base):
     """通知表 - 集中管理新邮件、翻译完成、审批等通知"""
     __tablename__ = "notifications"
@@ -0,0 +1,227 @@
+"""
+邮件全文搜索索引
+
+emails 表的译文正文是压缩存储（见 database.types.CompressedText），不能直接建全文索引，
+搜索用的明文副本放在 email_search_index 表（ngram 分词的 FULLTEXT 索引，支持中日韩）。
+
+- 同步：Email 插入、发件人/主题/正文/译文变化时，由 ORM 事件在同一事务内写入索引行；
+  绕过 ORM 的 Core UPDATE 需要调用 reindex_emails / reindex_emails_sync，
+  遗漏的由定时任务 sync_search_index 补齐
+- 查询：把搜索框输入转换为 BOOLEAN MODE 查询串
+- 高亮：生成带 <mark> 的主题和正文摘要（已做 HTML 转义，前端可直接 v-html）
+"""
+
+import html
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from .models import Email, EmailSearchIndex
+
+# 索引中每个正文最多保留的字符数（长邮件尾部多为引用历史和签名，截断控制索引体积）
+SEARCH_BODY_MAX_CHARS = int(os.getenv("SEARCH_BODY_MAX_CHARS", "20000"))
+# 与 MySQL ngram_token_size 一致（默认 2），短于它的词无法通过全文索引命中
+NGRAM_TOKEN_SIZE = int(os.getenv("SEARCH_NGRAM_TOKEN_SIZE", "2"))
+# 搜索词数量上限
+MAX_TERMS = 8
+# 摘要中命中位置前后保留的字符数
+SNIPPET_RADIUS = 40
+
+# 索引内容来源字段
+_SOURCE_FIELDS = (
+    "account_id", "from_name", "from_email",
+    "subject_original", "subject_translated", "body_original", "body_translated",
+)
+# BOOLEAN MODE 的运算符，作为普通字符搜索时会改变查询语义
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+
+# ============ 索引同步 ============
+
+def _truncate(text: Optional[str], limit: int) -> Optional[str]:
+    if text and len(text) > limit:
+        return text[:limit]
+    return text
+
+
+def build_document(email_id: int, values: Dict) -> Dict:
+    """由邮件字段构建索引行
+
+    Args:
+        email_id: 邮件 ID
+        values: 包含 _SOURCE_FIELDS 各字段的字典（body_translated 为解压后的明文）
+
+    Returns:
+        email_search_index 的一行
+    """
+    sender = " ".join(part for part in (values.get("from_name"), values.get("from_email")) if part)
+    return {
+        "email_id": email_id,
+        "account_id": values.get("account_id"),
+        "sender": sender[:512] or None,
+        "subject_original": values.get("subject_original"),
+        "subject_translated": values.get("subject_translated"),
+        "body_original": _truncate(values.get("body_original"), SEARCH_BODY_MAX_CHARS),
+        "body_translated": _truncate(values.get("body_translated"), SEARCH_BODY_MAX_CHARS),
+        "has_translation": bool(values.get("body_translated") or values.get("subject_translated")),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _upsert_statement(rows: List[Dict]):
+    stmt = mysql_insert(EmailSearchIndex).values(rows)
+    return stmt.on_duplicate_key_update(
+        **{key: stmt.inserted[key] for key in rows[0] if key != "email_id"}
+    )
+
+
+def _select_sources(email_ids: Iterable[int]):
+    columns = [Email.__table__.c[name] for name in _SOURCE_FIELDS]
+    return select(Email.__table__.c.id, *columns).where(Email.__table__.c.id.in_(list(email_ids)))
+
+
+@event.listens_for(Email, "after_insert")
+def _index_inserted_email(mapper, connection, target):
+    state = inspect(target)
+    values = {name: state.dict.get(name) for name in _SOURCE_FIELDS}
+    if values["account_id"] is None:
+        return
+    connection.execute(_upsert_statement([build_document(target.id, values)]))
+
+
+@event.listens_for(Email, "after_update")
+def _index_updated_email(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in _SOURCE_FIELDS):
+        return  # 已读/星标/状态等字段变化不影响索引
+
+    values = {name: state.dict[name] for name in _SOURCE_FIELDS if name in state.dict}
+    if len(values) < len(_SOURCE_FIELDS):
+        # 部分字段未加载（如 load_only 查询），其余从刚写入的行读取，不触发 ORM 懒加载
+        row = connection.execute(_select_sources([target.id])).mappings().first()
+        if row is None:
+            return
+        values = {**dict(row), **values}
+    if values.get("account_id") is None:
+        return
+    connection.execute(_upsert_statement([build_document(target.id, values)]))
+
+
+async def reindex_emails(db, email_ids: Iterable[int]) -> int:
+    """按当前邮件内容重建索引行（用于绕过 ORM 事件的批量 UPDATE）
+
+    Args:
+        db: 异步数据库会话（调用方负责提交）
+        email_ids: 邮件 ID 列表
+
+    Returns:
+        写入的索引行数
+    """
+    email_ids = list(email_ids)
+    if not email_ids:
+        return 0
+    rows = (await db.execute(_select_sources(email_ids))).mappings().all()
+    documents = [build_document(row["id"], row) for row in rows if row["account_id"] is not None]
+    if documents:
+        await db.execute(_upsert_statement(documents))
+    return len(documents)
+
+
+def reindex_emails_sync(db, email_ids: Iterable[int]) -> int:
+    """reindex_emails 的同步版本（Celery 任务使用）"""
+    email_ids = list(email_ids)
+    if not email_ids:
+        return 0
+    rows = db.execute(_select_sources(email_ids)).mappings().all()
+    documents = [build_document(row["id"], row) for row in rows if row["account_id"] is not None]
+    if documents:
+        db.execute(_upsert_statement(documents))
+    return len(documents)
+
+
+# ============ 查询 ============
+
+def parse_terms(search: str) -> List[str]:
+    """把搜索框输入拆成搜索词（去掉 BOOLEAN MODE 运算符）"""
+    return _BOOLEAN_OPERATORS.sub(" ", search or "").split()[:MAX_TERMS]
+
+
+def build_boolean_query(terms: List[str]) -> Optional[str]:
+    """构建 MATCH ... AGAINST 的 BOOLEAN MODE 查询串：每个词都必须出现
+
+    Returns:
+        查询串；有词短于 ngram_token_size（如单个汉字）时返回 None，由调用方回退到 LIKE
+    """
+    if not terms or any(len(term) < NGRAM_TOKEN_SIZE for term in terms):
+        return None
+    return " ".join(f'+"{term}"' for term in terms)
+
+
+# ============ 高亮 ============
+
+def _term_pattern(terms: List[str]) -> Optional[re.Pattern]:
+    if not terms:
+        return None
+    # 长词优先，避免短词抢先匹配长词的一部分
+    ordered = sorted(set(terms), key=len, reverse=True)
+    return re.compile("|".join(re.escape(term) for term in ordered), re.IGNORECASE)
+
+
+def _mark(text: str, pattern: re.Pattern) -> str:
+    parts, last = [], 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+    return "".join(parts)
+
+
+def highlight_text(text: Optional[str], pattern: Optional[re.Pattern]) -> Optional[str]:
+    """整段高亮（用于主题），未命中返回 None"""
+    if not text or pattern is None or not pattern.search(text):
+        return None
+    return _mark(text, pattern)
+
+
+def snippet(text: Optional[str], pattern: Optional[re.Pattern], radius: int = SNIPPET_RADIUS) -> Optional[str]:
+    """截取第一个命中位置附近的片段并高亮，未命中返回 None"""
+    if not text or pattern is None:
+        return None
+    match = pattern.search(text)
+    if not match:
+        return None
+    start = max(0, match.start() - radius)
+    end = min(len(text), match.end() + radius * 2)
+    fragment = re.sub(r"\s+", " ", text[start:end]).strip()
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + _mark(fragment, pattern) + suffix
+
+
+def build_highlights(terms: List[str], subject_original: Optional[str], subject_translated: Optional[str],
+                     body_original: Optional[str], body_translated: Optional[str]) -> Optional[Dict[str, Optional[str]]]:
+    """生成邮件列表的搜索高亮
+
+    Args:
+        terms: parse_terms 的结果
+        subject_original / subject_translated: 主题原文 / 译文
+        body_original / body_translated: 正文原文 / 译文（可直接用索引行中的明文）
+
+    Returns:
+        {subject_original, subject_translated, snippet_original, snippet_translated}，
+        均为已转义的 HTML；无搜索词时返回 None
+    """
+    pattern = _term_pattern(terms)
+    if pattern is None:
+        return None
+    return {
+        "subject_original": highlight_text(subject_original, pattern),
+        "subject_translated": highlight_text(subject_translated, pattern),
+        "snippet_original": snippet(body_original, pattern),
+        "snippet_translated": snippet(body_translated, pattern),
+    }
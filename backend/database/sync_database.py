@@ -0,0 +1,192 @@
+"""
+Celery worker 同步数据库连接池
+
+每个 worker 进程只创建一个 engine 和 sessionmaker：
+- worker_process_init 时初始化（prefork 子进程各自持有连接池，不能跨 fork 共享）
+- worker_process_shutdown / worker_shutdown 时释放
+- 非 worker 环境（脚本、测试）首次调用 get_sync_session() 时懒加载
+
+连接池大小与 worker_concurrency 绑定：
+- prefork 子进程同一时刻只执行一个任务，常驻 1 个连接 + 少量溢出即可
+- threads/gevent/eventlet 池在单进程内并发执行，常驻连接数 = 并发数
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, Session
+
+from config import get_sync_database_url
+
+# 单进程内并发执行任务的 worker 池类型
+THREADED_POOLS = {"threads", "thread", "gevent", "eventlet"}
+
+# 指标上报到 Redis 的最小间隔（秒）
+STATS_PUBLISH_INTERVAL = 30
+
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_init_lock = threading.Lock()
+_last_published_at = 0.0
+
+# 连接池指标（进程内累计）
+_pool_metrics = {
+    "connects": 0,          # 新建物理连接次数
+    "checkouts": 0,         # 从池中取出连接次数
+    "checkins": 0,          # 归还连接次数
+    "invalidated": 0,       # 失效连接次数
+    "overflow_peak": 0,     # 溢出连接峰值
+}
+
+
+def compute_pool_size(concurrency: int, pool_cls: str = "prefork") -> tuple:
+    """
+    根据 worker 并发数计算连接池参数
+
+    Args:
+        concurrency: worker_concurrency
+        pool_cls: worker 池类型（prefork/threads/gevent/eventlet/solo）
+
+    Returns:
+        (pool_size, max_overflow)
+    """
+    env_size = os.getenv("CELERY_DB_POOL_SIZE")
+    env_overflow = os.getenv("CELERY_DB_MAX_OVERFLOW")
+
+    if pool_cls in THREADED_POOLS:
+        pool_size = max(1, concurrency)
+        max_overflow = max(2, concurrency // 2)
+    else:
+        # prefork/solo：每个进程同一时刻只跑一个任务
+        pool_size = 1
+        max_overflow = 2
+
+    if env_size:
+        pool_size = int(env_size)
+    if env_overflow:
+        max_overflow = int(env_overflow)
+
+    return pool_size, max_overflow
+
+
+def _register_pool_events(engine: Engine):
+    """注册连接池事件，用于统计 checkout/overflow 指标"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        _pool_metrics["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        _pool_metrics["checkouts"] += 1
+        overflow = engine.pool.overflow()
+        if overflow > _pool_metrics["overflow_peak"]:
+            _pool_metrics["overflow_peak"] = overflow
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        _pool_metrics["checkins"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, conn_record, exception):
+        _pool_metrics["invalidated"] += 1
+
+
+def init_sync_engine(pool_size: int = 1, max_overflow: int = 2) -> Engine:
+    """
+    初始化进程级同步 engine（重复调用时复用已有 engine）
+
+    Args:
+        pool_size: 常驻连接数
+        max_overflow: 峰值时允许额外创建的连接数
+    """
+    global _engine, _session_factory
+
+    with _init_lock:
+        if _engine is not None:
+            return _engine
+
+        _engine = create_engine(
+            get_sync_database_url(),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,    # 使用前检查连接有效性
+            pool_recycle=1800,     # 30分钟回收连接（避免MySQL wait_timeout）
+            pool_timeout=30,       # 获取连接超时时间（秒）
+        )
+        _register_pool_events(_engine)
+        _session_factory = sessionmaker(bind=_engine)
+        print(f"[SyncDB] Engine initialized in pid={os.getpid()} (pool_size={pool_size}, max_overflow={max_overflow})")
+        return _engine
+
+
+def dispose_sync_engine():
+    """释放进程级 engine 及其所有连接"""
+    global _engine, _session_factory
+
+    with _init_lock:
+        if _engine is None:
+            return
+        stats = get_pool_stats()
+        _engine.dispose()
+        _engine = None
+        _session_factory = None
+        print(f"[SyncDB] Engine disposed in pid={os.getpid()}: {stats}")
+
+
+def get_sync_session() -> Session:
+    """
+    获取同步数据库会话（复用进程级连接池）
+
+    调用方负责 close()，close 后连接归还连接池而不是断开。
+    """
+    if _session_factory is None:
+        init_sync_engine()
+    return _session_factory()
+
+
+def get_pool_stats() -> dict:
+    """
+    获取当前进程的连接池指标
+
+    Returns:
+        {pid, initialized, pool_size, checked_out, overflow, checked_in, connects, checkouts, ...}
+    """
+    stats = {"pid": os.getpid(), "initialized": _engine is not None}
+    if _engine is not None:
+        pool = _engine.pool
+        stats.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    stats.update(_pool_metrics)
+    return stats
+
+
+def publish_pool_stats(hostname: str, force: bool = False) -> bool:
+    """
+    将当前进程的连接池指标写入 Redis，供 API 进程汇总展示
+
+    按 STATS_PUBLISH_INTERVAL 节流，Redis 不可用时静默跳过。
+
+    Args:
+        hostname: worker 节点名（如 celery@host）
+        force: 忽略节流立即上报
+    """
+    global _last_published_at
+
+    now = time.time()
+    if not force and now - _last_published_at < STATS_PUBLISH_INTERVAL:
+        return False
+    _last_published_at = now
+
+    from shared.cache_config import cache_set
+    stats = get_pool_stats()
+    stats["hostname"] = hostname
+    stats["reported_at"] = now
+    return cache_set(f"celery:db_pool:{hostname}:{stats['pid']}", stats, ttl=STATS_PUBLISH_INTERVAL * 4)
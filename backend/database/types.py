@@ -0,0 +1,40 @@
+"""
+自定义列类型
+"""
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from sqlalchemy.types import TypeDecorator
+
+from utils.compression import compress_text, decompress_text
+
+
+class CompressedText(TypeDecorator):
+    """
+    压缩存储的文本列（MySQL 为 MEDIUMBLOB）
+
+    Python 侧读写 str；写入时压缩（见 utils.compression），读取时解压。
+    也接受已压缩的 bytes（调用方需要事先知道存储大小时可先压缩再写入）。
+
+    Args:
+        dictionary: zstd 训练字典名（内容相似的列共用一个字典，如 HTML 正文）
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dictionary: str = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dictionary = dictionary
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "mysql":
+            return dialect.type_descriptor(MEDIUMBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, (bytes, bytearray)):
+            return value
+        return compress_text(value, self.dictionary)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
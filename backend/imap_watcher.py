@@ -0,0 +1,36 @@
+"""
+IMAP IDLE 监听进程
+
+为每个启用的邮箱账户保持一条 IMAP 长连接，收到新邮件时触发 fetch_emails_task。
+与 Celery worker/beat 并列部署，只运行一个实例。
+
+用法：python imap_watcher.py
+"""
+import signal
+import sys
+sys.path.insert(0, '.')
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.imap_pool import ImapWatcherService
+
+
+def main():
+    service = ImapWatcherService()
+
+    def handle_signal(signum, frame):
+        print(f"[IMAPWatch] Received signal {signum}, stopping...")
+        service.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    print("[IMAPWatch] Starting IMAP IDLE watcher")
+    service.run_forever()
+    print("[IMAPWatch] Stopped")
+
+
+if __name__ == "__main__":
+    main()
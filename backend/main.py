@@ -121,12 +121,25 @@ async def lifespan(app: FastAPI):
         await session.execute(text("SELECT 1"))
     print("Connection pool ready")
 
+    # 订阅 Redis 通知频道，接收 Celery worker 及其他 API 进程发布的 WebSocket 通知
+    from services.notification_bridge import notification_bridge
+    await notification_bridge.start()
+
     print("Ready. Translation: vLLM local model (free, data local)")
 
     yield
 
     # Shutdown
     print("Shutting down...")
+    await notification_bridge.stop()
+
+    # 推送进程内尚未写入 Redis 的翻译缓存命中计数
+    from services.translation_cache_policy import push_hits
+    await push_hits()
+
+    # 关闭邮件拉取流水线的解析进程池
+    from services.ingest_pipeline import shutdown_parse_executor
+    shutdown_parse_executor()
 
 
 app = FastAPI(
@@ -371,6 +384,80 @@ async def health_check_db():
         }
 
 
+@app.get("/api/health/db-pool")
+def health_check_db_pool():
+    """数据库连接池指标（API 进程 + 各 Celery worker 进程上报）
+
+    使用同步 Redis 客户端，定义为普通函数由 FastAPI 放到线程池执行，不阻塞事件循环
+    """
+    from database.database import engine
+    from shared.cache_config import cache_config, cache_get_many, get_cache_key
+
+    pool = engine.sync_engine.pool
+    results = {
+        "api": {
+            "pid": os.getpid(),
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+        },
+        "workers": []
+    }
+
+    if cache_config.is_available():
+        prefix = get_cache_key("")
+        try:
+            keys = [
+                full_key[len(prefix):]
+                for full_key in cache_config.client.scan_iter(match=get_cache_key("celery:db_pool:*"), count=100)
+            ]
+            results["workers"] = [stats for stats in cache_get_many(keys).values() if stats]
+        except Exception as e:
+            results["workers_error"] = str(e)
+
+    return results
+
+
+@app.get("/api/health/notify-bridge")
+async def health_check_notify_bridge():
+    """WebSocket 通知桥接状态（本 API 进程）"""
+    from services.notification_bridge import notification_bridge
+    from websocket import manager as ws_manager
+
+    return {
+        "pid": os.getpid(),
+        "running": notification_bridge.running,
+        "local_accounts": len(ws_manager.get_all_account_ids()),
+        "stats": notification_bridge.stats,
+    }
+
+
+@app.get("/api/health/translation-cache")
+async def health_check_translation_cache():
+    """翻译缓存各层命中率、耗时及 Redis 熔断状态（本 API 进程）"""
+    from shared.tiered_cache import translation_cache
+
+    return {
+        "pid": os.getpid(),
+        **translation_cache.stats(),
+    }
+
+
+@app.get("/api/health/translation-queue")
+def health_check_translation_queue():
+    """翻译调度各通道排队长度、在途数和排队等待时间（秒）
+
+    lane_stats() 使用同步 Redis pipeline，定义为普通函数由 FastAPI 放到线程池执行
+    """
+    from shared.translation_scheduler import lane_stats
+
+    try:
+        return lane_stats()
+    except Exception as e:
+        return {"available": False, "error": str(e)}
+
+
 @app.get("/api/health/redis")
 async def health_check_redis():
     """Redis 健康检查"""
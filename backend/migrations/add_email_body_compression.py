@@ -0,0 +1,153 @@
+"""
+数据库迁移脚本：邮件译文 / HTML 正文压缩存储
+
+- emails.body_translated、emails.body_html、shared_email_translations.body_translated
+  改为 MEDIUMBLOB，存储 zstd 压缩数据（见 utils.compression / database.types.CompressedText）
+- 按 id 分批压缩已有数据，每批单独提交，可在业务运行时执行、中断后重跑
+
+1. 列类型变更需要重建表（ALGORITHM=COPY），期间只允许读；emails 表很大时
+   可先用 gh-ost / pt-online-schema-change 执行打印出的 ALTER 语句，再运行本脚本完成数据压缩
+2. 类型变更后未压缩的历史数据（UTF-8 字节）仍可直接读取，数据压缩不必一次完成
+3. 压缩完成后执行 OPTIMIZE TABLE emails 回收磁盘空间
+4. 训练新字典后（scripts/train_compression_dict.py）可加 --recompress 用新字典重写全部数据
+
+使用方法：
+cd backend
+python -m migrations.add_email_body_compression [--recompress]
+"""
+
+import argparse
+import time
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+from utils.compression import compress_text, decompress_text, is_compressed
+
+load_dotenv()
+
+# 表 → [(列, 字典名)]
+COMPRESSED_COLUMNS = {
+    "emails": [("body_translated", "email_text"), ("body_html", "email_html")],
+    "shared_email_translations": [("body_translated", "email_text")],
+}
+
+BATCH_SIZE = 500
+# 批次间隔（秒），降低对线上写入的影响
+BATCH_SLEEP = 0.05
+
+
+def convert_columns(conn, database: str, table: str, columns: list):
+    """把文本列改为 MEDIUMBLOB（已是 BLOB 的列跳过）"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COLUMN_NAME, DATA_TYPE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = %s
+        AND TABLE_NAME = %s
+    """, (database, table))
+    types = dict(cursor.fetchall())
+    pending = [name for name, _ in columns if types.get(name) and types[name] != "mediumblob"]
+    if not pending:
+        print(f"- {table}: {', '.join(name for name, _ in columns)} 已是 MEDIUMBLOB，跳过")
+        return
+
+    modify = ", ".join(f"MODIFY COLUMN {name} MEDIUMBLOB NULL" for name in pending)
+    sql = f"ALTER TABLE {table} {modify}, ALGORITHM=COPY, LOCK=SHARED"
+    print(f"  {sql}")
+    started = time.time()
+    cursor.execute(sql)
+    conn.commit()
+    print(f"✓ {table}: 已将 {', '.join(pending)} 改为 MEDIUMBLOB（{time.time() - started:.1f}s）")
+
+
+def compress_rows(conn, table: str, columns: list, recompress: bool):
+    """分批压缩已有数据"""
+    cursor = conn.cursor()
+    names = [name for name, _ in columns]
+    last_id = 0
+    scanned = updated = raw_bytes = packed_bytes = 0
+
+    while True:
+        cursor.execute(
+            f"SELECT id, {', '.join(names)} FROM {table} WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            row_id, values = row[0], row[1:]
+            assignments, originals = {}, {}
+            for (name, dictionary), value in zip(columns, values):
+                if value is None or (is_compressed(value) and not recompress):
+                    continue
+                text = decompress_text(value)
+                packed = compress_text(text, dictionary)
+                if packed != bytes(value):
+                    assignments[name] = packed
+                    originals[name] = value
+                    raw_bytes += len(text.encode("utf-8"))
+                    packed_bytes += len(packed)
+            if assignments:
+                # 只在值未被并发修改（如翻译完成写入新译文）时覆盖
+                sets = ", ".join(f"{name} = %s" for name in assignments)
+                guards = " AND ".join(f"{name} = %s" for name in originals)
+                updated += cursor.execute(
+                    f"UPDATE {table} SET {sets} WHERE id = %s AND {guards}",
+                    (*assignments.values(), row_id, *originals.values())
+                )
+
+        conn.commit()
+        last_id = rows[-1][0]
+        scanned += len(rows)
+        if scanned % (BATCH_SIZE * 20) == 0:
+            print(f"  {table}: 已扫描 {scanned} 行，压缩 {updated} 行...")
+        time.sleep(BATCH_SLEEP)
+
+    ratio = raw_bytes / packed_bytes if packed_bytes else 0
+    print(f"✓ {table}: 扫描 {scanned} 行，压缩 {updated} 行，"
+          f"{raw_bytes / 1024 / 1024:.1f} MB → {packed_bytes / 1024 / 1024:.1f} MB（{ratio:.1f}x）")
+
+
+def migrate(recompress: bool = False):
+    """邮件正文改为压缩存储"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+
+        for table, columns in COMPRESSED_COLUMNS.items():
+            convert_columns(conn, database, table, columns)
+        for table, columns in COMPRESSED_COLUMNS.items():
+            compress_rows(conn, table, columns, recompress)
+
+        conn.close()
+        print("\n迁移完成！可执行 OPTIMIZE TABLE emails, shared_email_translations 回收磁盘空间")
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="邮件正文压缩存储迁移")
+    parser.add_argument("--recompress", action="store_true", help="已压缩的数据也用当前字典重写")
+    migrate(parser.parse_args().recompress)
@@ -0,0 +1,141 @@
+"""
+数据库迁移脚本：账户邮件计数
+
+- 创建 account_email_counters / account_email_daily_counts / account_supplier_counts 表
+- 在 emails 表上创建维护计数的触发器（见 database.email_counters）
+- 逐个账户按实际数据回填计数
+
+1. 创建触发器需要 TRIGGER 权限；开启 binlog 时还需 SUPER 权限或
+   SET GLOBAL log_bin_trust_function_creators = 1
+2. 先建触发器再回填：回填时锁住账户计数行后重算，期间新写入的邮件由触发器计入，不会重复或遗漏
+3. 可重复执行（已存在的表和触发器跳过，回填按实际数据覆盖）
+
+使用方法：
+cd backend
+python -m migrations.add_email_counters
+"""
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+from database.email_counters import COUNTER_COLUMNS, TRIGGER_PREFIX, reconcile_account_sync, trigger_statements
+
+load_dotenv()
+
+_COUNTER_COLUMNS_SQL = ",\n".join(f"            {c} INT NOT NULL DEFAULT 0" for c in COUNTER_COLUMNS)
+
+CREATE_TABLES = {
+    "account_email_counters": f"""
+        CREATE TABLE account_email_counters (
+            account_id INT NOT NULL PRIMARY KEY,
+{_COUNTER_COLUMNS_SQL},
+            updated_at DATETIME NULL,
+            reconciled_at DATETIME NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "account_email_daily_counts": """
+        CREATE TABLE account_email_daily_counts (
+            account_id INT NOT NULL,
+            day DATE NOT NULL,
+            email_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, day)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "account_supplier_counts": """
+        CREATE TABLE account_supplier_counts (
+            account_id INT NOT NULL,
+            supplier_id INT NOT NULL,
+            email_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, supplier_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+}
+
+
+def migrate():
+    """创建账户邮件计数表和触发器并回填"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+
+        # 1. 建表
+        for table, sql in CREATE_TABLES.items():
+            cursor.execute("""
+                SELECT TABLE_NAME
+                FROM INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = %s
+            """, (database, table))
+            if cursor.fetchone():
+                print(f"- {table} 表已存在，跳过")
+            else:
+                cursor.execute(sql)
+                conn.commit()
+                print(f"✓ 已创建 {table} 表")
+
+        # 2. 触发器（删除旧版本，创建当前版本）
+        cursor.execute("""
+            SELECT TRIGGER_NAME
+            FROM INFORMATION_SCHEMA.TRIGGERS
+            WHERE TRIGGER_SCHEMA = %s
+            AND EVENT_OBJECT_TABLE = 'emails'
+            AND TRIGGER_NAME LIKE %s
+        """, (database, f"{TRIGGER_PREFIX}%"))
+        existing = {row[0] for row in cursor.fetchall()}
+        statements = trigger_statements()
+        for name in existing - {name for name, _ in statements}:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            print(f"✓ 已删除旧触发器 {name}")
+        for name, sql in statements:
+            if name in existing:
+                print(f"- 触发器 {name} 已存在，跳过")
+            else:
+                cursor.execute(sql)
+                print(f"✓ 已创建触发器 {name}")
+        conn.commit()
+
+        cursor.execute("SELECT id FROM email_accounts ORDER BY id")
+        account_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+    # 3. 回填（与定时校正相同的逻辑，每个账户单独提交）
+    from database.sync_database import get_sync_session
+
+    db = get_sync_session()
+    try:
+        for account_id in account_ids:
+            drift = reconcile_account_sync(db, account_id)
+            db.commit()
+            print(f"  账户 {account_id}: {'已校正 ' + str(drift) if drift else '计数一致'}")
+    finally:
+        db.close()
+
+    print(f"✓ 已回填 {len(account_ids)} 个账户的计数")
+    print("\n迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,157 @@
+"""
+数据库迁移脚本：邮件发件人/收件人域名
+
+- 添加 emails.sender_domain 列和 (account_id, sender_domain) 索引
+- 创建 email_recipient_domains 表（收件人/抄送/密送中出现的域名）
+- 按 id 分批回填已有邮件（域名解析与 database.email_domains 一致）
+
+供应商统计按这两处的域名 GROUP BY，回填完成前历史邮件不计入统计。
+回填可中断后重跑（sender_domain 按当前发件人重写，收件人域名用 INSERT IGNORE）。
+
+使用方法：
+cd backend
+python -m migrations.add_email_domains
+"""
+
+import time
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+from database.email_domains import build_recipient_rows, extract_domain
+
+load_dotenv()
+
+BATCH_SIZE = 1000
+# 批次间隔（秒），降低对线上写入的影响
+BATCH_SLEEP = 0.05
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE email_recipient_domains (
+        email_id INT NOT NULL,
+        domain VARCHAR(255) NOT NULL,
+        account_id INT NOT NULL,
+        PRIMARY KEY (email_id, domain),
+        INDEX idx_recipient_domain_account (account_id, domain),
+        CONSTRAINT fk_email_recipient_domains_email FOREIGN KEY (email_id)
+            REFERENCES emails (id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+
+def migrate():
+    """添加邮件域名列和收件人域名表并回填"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+
+        # 1. 添加 sender_domain 列和索引
+        cursor.execute("""
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'emails'
+            AND COLUMN_NAME = 'sender_domain'
+        """, (database,))
+        if cursor.fetchone():
+            print("- sender_domain 列已存在，跳过")
+        else:
+            cursor.execute("ALTER TABLE emails ADD COLUMN sender_domain VARCHAR(255) NULL AFTER from_name")
+            conn.commit()
+            print("✓ 已添加 sender_domain 列")
+
+        cursor.execute("""
+            SELECT INDEX_NAME
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'emails'
+            AND INDEX_NAME = 'idx_email_account_sender_domain'
+        """, (database,))
+        if cursor.fetchone():
+            print("- idx_email_account_sender_domain 索引已存在，跳过")
+        else:
+            cursor.execute("CREATE INDEX idx_email_account_sender_domain ON emails (account_id, sender_domain)")
+            conn.commit()
+            print("✓ 已创建 idx_email_account_sender_domain 索引")
+
+        # 2. 创建收件人域名表
+        cursor.execute("""
+            SELECT TABLE_NAME
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'email_recipient_domains'
+        """, (database,))
+        if cursor.fetchone():
+            print("- email_recipient_domains 表已存在，跳过")
+        else:
+            cursor.execute(CREATE_TABLE_SQL)
+            conn.commit()
+            print("✓ 已创建 email_recipient_domains 表")
+
+        # 3. 回填
+        last_id = 0
+        scanned = recipient_count = 0
+        while True:
+            cursor.execute("""
+                SELECT id, account_id, from_email, to_email, cc_email, bcc_email
+                FROM emails
+                WHERE id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, BATCH_SIZE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            cursor.executemany(
+                "UPDATE emails SET sender_domain = %s WHERE id = %s",
+                [(extract_domain(from_email), row_id) for row_id, _, from_email, _, _, _ in rows]
+            )
+            recipient_rows = build_recipient_rows(
+                (row_id, account_id, to_email, cc_email, bcc_email)
+                for row_id, account_id, _, to_email, cc_email, bcc_email in rows
+            )
+            if recipient_rows:
+                recipient_count += cursor.executemany(
+                    "INSERT IGNORE INTO email_recipient_domains (email_id, domain, account_id) VALUES (%s, %s, %s)",
+                    [(r["email_id"], r["domain"], r["account_id"]) for r in recipient_rows]
+                )
+            conn.commit()
+
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            if scanned % (BATCH_SIZE * 20) == 0:
+                print(f"  已处理 {scanned} 封邮件...")
+            time.sleep(BATCH_SLEEP)
+
+        print(f"✓ 已回填 {scanned} 封邮件的发件人域名，{recipient_count} 条收件人域名")
+
+        cursor.close()
+        conn.close()
+        print("\n迁移完成！")
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
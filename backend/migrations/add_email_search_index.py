@@ -0,0 +1,182 @@
+"""
+数据库迁移脚本：邮件全文搜索索引
+
+- 创建 email_search_index 表（原文/译文主题、正文、发件人的明文副本）
+- 创建 ngram 分词的 FULLTEXT 索引（支持中日韩），建索引前关闭停用词表
+- 按 id 分批回填已有邮件（译文正文在 Python 中解压后写入）
+
+1. ngram_token_size 为服务器启动参数（默认 2），修改后需重建索引；
+   短于它的搜索词（如单个汉字）会退回 LIKE
+2. 先建索引再回填：回填期间新邮件已由应用写入索引，回填用 INSERT IGNORE 不覆盖
+3. 回填可中断后重跑（只处理还没有索引行的邮件）
+4. 需在部署新版本应用前执行：应用写入邮件时会同步写入该表
+
+使用方法：
+cd backend
+python -m migrations.add_email_search_index
+"""
+
+import time
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+from utils.compression import decompress_text
+
+load_dotenv()
+
+BATCH_SIZE = 500
+# 批次间隔（秒），降低对线上写入的影响
+BATCH_SLEEP = 0.05
+# 与 database.search_index.SEARCH_BODY_MAX_CHARS 一致
+SEARCH_BODY_MAX_CHARS = int(os.getenv("SEARCH_BODY_MAX_CHARS", "20000"))
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE email_search_index (
+        email_id INT NOT NULL PRIMARY KEY,
+        account_id INT NOT NULL,
+        sender VARCHAR(512) NULL,
+        subject_original TEXT NULL,
+        subject_translated TEXT NULL,
+        body_original MEDIUMTEXT NULL,
+        body_translated MEDIUMTEXT NULL,
+        has_translation TINYINT(1) DEFAULT 0,
+        updated_at DATETIME NULL,
+        INDEX ix_email_search_index_account_id (account_id),
+        CONSTRAINT fk_email_search_index_email FOREIGN KEY (email_id)
+            REFERENCES emails (id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+FULLTEXT_INDEXES = {
+    "ft_email_search_all": "subject_original, subject_translated, body_original, body_translated, sender",
+    "ft_email_search_subject": "subject_original, subject_translated",
+}
+
+
+def _truncate(text, limit):
+    if text and len(text) > limit:
+        return text[:limit]
+    return text
+
+
+def backfill(conn):
+    """分批为还没有索引行的邮件建索引"""
+    cursor = conn.cursor()
+    last_id = 0
+    scanned = inserted = 0
+
+    while True:
+        cursor.execute("""
+            SELECT e.id, e.account_id, e.from_name, e.from_email,
+                   e.subject_original, e.subject_translated, e.body_original, e.body_translated
+            FROM emails e
+            LEFT JOIN email_search_index s ON s.email_id = e.id
+            WHERE e.id > %s AND s.email_id IS NULL AND e.account_id IS NOT NULL
+            ORDER BY e.id
+            LIMIT %s
+        """, (last_id, BATCH_SIZE))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        values = []
+        for (email_id, account_id, from_name, from_email,
+             subject_original, subject_translated, body_original, body_translated) in rows:
+            body_translated = decompress_text(body_translated)
+            sender = " ".join(part for part in (from_name, from_email) if part)[:512] or None
+            values.append((
+                email_id, account_id, sender, subject_original, subject_translated,
+                _truncate(body_original, SEARCH_BODY_MAX_CHARS),
+                _truncate(body_translated, SEARCH_BODY_MAX_CHARS),
+                bool(body_translated or subject_translated),
+            ))
+        inserted += cursor.executemany("""
+            INSERT IGNORE INTO email_search_index
+                (email_id, account_id, sender, subject_original, subject_translated,
+                 body_original, body_translated, has_translation, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, UTC_TIMESTAMP())
+        """, values)
+        conn.commit()
+
+        last_id = rows[-1][0]
+        scanned += len(rows)
+        if scanned % (BATCH_SIZE * 20) == 0:
+            print(f"  已处理 {scanned} 封邮件...")
+        time.sleep(BATCH_SLEEP)
+
+    print(f"✓ 已为 {inserted} 封邮件建立搜索索引")
+
+
+def migrate():
+    """创建邮件全文搜索索引"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+
+        # 1. 创建表
+        cursor.execute("""
+            SELECT TABLE_NAME
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'email_search_index'
+        """, (database,))
+        if cursor.fetchone():
+            print("- email_search_index 表已存在，跳过")
+        else:
+            cursor.execute(CREATE_TABLE_SQL)
+            conn.commit()
+            print("✓ 已创建 email_search_index 表")
+
+        # 2. 全文索引（停用词表在建索引时绑定；ngram 下含停用词的二元组都会被丢弃，必须关闭）
+        cursor.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+        for index_name, columns in FULLTEXT_INDEXES.items():
+            cursor.execute("""
+                SELECT INDEX_NAME
+                FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = 'email_search_index'
+                AND INDEX_NAME = %s
+            """, (database, index_name))
+            if cursor.fetchone():
+                print(f"- {index_name} 已存在，跳过")
+                continue
+            started = time.time()
+            cursor.execute(
+                f"ALTER TABLE email_search_index ADD FULLTEXT INDEX {index_name} ({columns}) WITH PARSER ngram"
+            )
+            conn.commit()
+            print(f"✓ 已创建全文索引 {index_name}（{time.time() - started:.1f}s）")
+
+        # 3. 回填已有邮件
+        backfill(conn)
+
+        cursor.close()
+        conn.close()
+        print("\n迁移完成！")
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
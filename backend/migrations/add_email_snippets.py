@@ -0,0 +1,125 @@
+"""
+数据库迁移脚本：邮件列表预览列
+
+- 添加 emails.snippet_original / snippet_translated（正文开头的预览文本，见 database.email_list）
+- 按 id 分批回填已有邮件（译文正文在 Python 中解压）
+
+列表接口只读取预览列，不再加载正文；回填完成前未回填的邮件列表预览为空。
+回填可中断后重跑（只处理预览列为空且有正文的邮件）。
+
+使用方法：
+cd backend
+python -m migrations.add_email_snippets
+"""
+
+import re
+import time
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+from utils.compression import decompress_text
+
+load_dotenv()
+
+BATCH_SIZE = 500
+# 批次间隔（秒），降低对线上写入的影响
+BATCH_SLEEP = 0.05
+# 与 database.email_list.SNIPPET_CHARS 一致
+SNIPPET_CHARS = 200
+
+
+def make_snippet(text):
+    if not text:
+        return None
+    return re.sub(r"\s+", " ", text[:SNIPPET_CHARS * 4]).strip()[:SNIPPET_CHARS] or None
+
+
+def migrate():
+    """添加邮件列表预览列并回填"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+
+        # 1. 添加列
+        for column in ("snippet_original", "snippet_translated"):
+            cursor.execute("""
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = 'emails'
+                AND COLUMN_NAME = %s
+            """, (database, column))
+            if cursor.fetchone():
+                print(f"- {column} 列已存在，跳过")
+            else:
+                cursor.execute(f"ALTER TABLE emails ADD COLUMN {column} VARCHAR({SNIPPET_CHARS}) NULL")
+                conn.commit()
+                print(f"✓ 已添加 {column} 列")
+
+        # 2. 回填（正文原文只取开头，译文需整段读出解压）
+        last_id = 0
+        scanned = updated = 0
+        while True:
+            cursor.execute("""
+                SELECT id, LEFT(body_original, %s), body_translated
+                FROM emails
+                WHERE id > %s
+                AND ((snippet_original IS NULL AND body_original IS NOT NULL)
+                     OR (snippet_translated IS NULL AND body_translated IS NOT NULL))
+                ORDER BY id
+                LIMIT %s
+            """, (SNIPPET_CHARS * 4, last_id, BATCH_SIZE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            updates = [
+                (make_snippet(body_original), make_snippet(decompress_text(body_translated)), row_id)
+                for row_id, body_original, body_translated in rows
+            ]
+            updated += cursor.executemany("""
+                UPDATE emails
+                SET snippet_original = COALESCE(snippet_original, %s),
+                    snippet_translated = COALESCE(snippet_translated, %s)
+                WHERE id = %s
+            """, updates)
+            conn.commit()
+
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            if scanned % (BATCH_SIZE * 20) == 0:
+                print(f"  已处理 {scanned} 封邮件...")
+            time.sleep(BATCH_SLEEP)
+
+        print(f"✓ 已回填 {updated} 封邮件的预览")
+
+        cursor.close()
+        conn.close()
+        print("\n迁移完成！")
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,79 @@
+"""
+数据库迁移脚本：添加 IMAP 增量同步检查点表
+
+按账户+文件夹记录 UIDVALIDITY / 最后同步的 UID / HIGHESTMODSEQ，
+拉取邮件时只获取 UID 大于检查点的新邮件。
+
+使用方法：
+cd backend
+python -m migrations.add_imap_sync_state
+"""
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def migrate():
+    """添加 imap_sync_states 表"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT TABLE_NAME
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'imap_sync_states'
+        """, (database,))
+
+        if cursor.fetchone():
+            print("- imap_sync_states 表已存在，跳过")
+        else:
+            cursor.execute("""
+                CREATE TABLE imap_sync_states (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    account_id INT NOT NULL,
+                    folder VARCHAR(255) NOT NULL,
+                    uidvalidity BIGINT NOT NULL,
+                    last_uid BIGINT NOT NULL DEFAULT 0,
+                    highest_modseq BIGINT NULL,
+                    last_synced_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_imap_sync_account_folder (account_id, folder),
+                    FOREIGN KEY (account_id) REFERENCES email_accounts(id) ON DELETE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+            conn.commit()
+            print("✓ 已创建 imap_sync_states 表")
+
+        cursor.close()
+        conn.close()
+        print("\n迁移完成！")
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
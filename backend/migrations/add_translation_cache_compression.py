@@ -0,0 +1,145 @@
+"""
+数据库迁移脚本：翻译缓存压缩存储与容量淘汰
+
+- source_text / translated_text 改为 MEDIUMBLOB，存储 zstd 压缩数据（见 utils.compression）
+- 添加 size_bytes（压缩后大小，容量淘汰按此累计）和 last_hit_at（最近命中时间）
+- 删除与 UNIQUE 索引重复的 idx_translation_cache_hash
+- 按批压缩已有数据并回填 size_bytes / last_hit_at
+
+列类型改为 BLOB 后，未压缩的历史数据（UTF-8 字节）仍可直接读取，回填可以中断后重跑。
+
+使用方法：
+cd backend
+python -m migrations.add_translation_cache_compression
+"""
+
+import pymysql
+import os
+from dotenv import load_dotenv
+
+from utils.compression import compress_text, decompress_text
+
+load_dotenv()
+
+BATCH_SIZE = 500
+
+
+def migrate():
+    """翻译缓存表改为压缩存储"""
+
+    # 获取数据库配置
+    host = os.environ.get("MYSQL_HOST", "localhost")
+    port = int(os.environ.get("MYSQL_PORT", "3306"))
+    user = os.environ.get("MYSQL_USER", "root")
+    password = os.environ.get("MYSQL_PASSWORD", "")
+    database = os.environ.get("MYSQL_DATABASE", "email_translate")
+
+    print(f"连接数据库: {host}:{port}/{database}")
+
+    try:
+        conn = pymysql.connect(
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+
+        # 1. 添加列
+        for column, definition in (
+            ("size_bytes", "INT NOT NULL DEFAULT 0"),
+            ("last_hit_at", "DATETIME NULL"),
+        ):
+            cursor.execute("""
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = 'translation_cache'
+                AND COLUMN_NAME = %s
+            """, (database, column))
+            if cursor.fetchone():
+                print(f"- {column} 列已存在，跳过")
+            else:
+                cursor.execute(f"ALTER TABLE translation_cache ADD COLUMN {column} {definition}")
+                conn.commit()
+                print(f"✓ 已添加 {column} 列")
+
+        # 2. 文本列改为二进制
+        cursor.execute("""
+            SELECT COLUMN_NAME, DATA_TYPE
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'translation_cache'
+            AND COLUMN_NAME IN ('source_text', 'translated_text')
+        """, (database,))
+        text_columns = [name for name, data_type in cursor.fetchall() if data_type != "mediumblob"]
+        if text_columns:
+            modify = ", ".join(f"MODIFY COLUMN {name} MEDIUMBLOB NOT NULL" for name in text_columns)
+            cursor.execute(f"ALTER TABLE translation_cache {modify}")
+            conn.commit()
+            print(f"✓ 已将 {', '.join(text_columns)} 改为 MEDIUMBLOB")
+        else:
+            print("- 原文/译文列已是 MEDIUMBLOB，跳过")
+
+        # 3. 删除重复索引（text_hash 已有 UNIQUE 索引）
+        cursor.execute("""
+            SELECT INDEX_NAME
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s
+            AND TABLE_NAME = 'translation_cache'
+            AND INDEX_NAME = 'idx_translation_cache_hash'
+        """, (database,))
+        if cursor.fetchone():
+            cursor.execute("ALTER TABLE translation_cache DROP INDEX idx_translation_cache_hash")
+            conn.commit()
+            print("✓ 已删除重复索引 idx_translation_cache_hash")
+        else:
+            print("- idx_translation_cache_hash 不存在，跳过")
+
+        # 4. 压缩已有数据（size_bytes = 0 的行尚未处理）
+        last_id = 0
+        converted = 0
+        while True:
+            cursor.execute("""
+                SELECT id, source_text, translated_text, COALESCE(updated_at, created_at)
+                FROM translation_cache
+                WHERE size_bytes = 0 AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, BATCH_SIZE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for row_id, source_blob, translated_blob, last_used in rows:
+                source = compress_text(decompress_text(source_blob) or "")
+                translated = compress_text(decompress_text(translated_blob) or "")
+                updates.append((source, translated, len(source) + len(translated), last_used, row_id))
+            cursor.executemany("""
+                UPDATE translation_cache
+                SET source_text = %s, translated_text = %s, size_bytes = %s,
+                    last_hit_at = COALESCE(last_hit_at, %s)
+                WHERE id = %s
+            """, updates)
+            conn.commit()
+
+            last_id = rows[-1][0]
+            converted += len(rows)
+            print(f"  已压缩 {converted} 条...")
+
+        print(f"✓ 已压缩 {converted} 条翻译缓存")
+
+        cursor.close()
+        conn.close()
+        print("\n迁移完成！")
+
+    except pymysql.Error as e:
+        print(f"数据库错误: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    migrate()
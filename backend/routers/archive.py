@@ -16,6 +16,7 @@ from sqlalchemy.orm import selectinload
 
 from database.database import get_db
 from database.models import Email, ArchiveFolder, EmailAccount
+from database.email_list import list_load_options
 from routers.users import get_current_account
 
 
@@ -74,6 +75,8 @@ class ArchivedEmailResponse(BaseModel):
     archive_folder_id: Optional[int]
     is_read: bool
     is_flagged: bool
+    snippet_original: Optional[str] = None     # 正文原文开头
+    snippet_translated: Optional[str] = None   # 正文译文开头
 
     class Config:
         from_attributes = True
@@ -417,7 +420,7 @@ async def get_archived_emails(
     query = select(Email).where(
         Email.account_id == current_account.id,
         Email.archived_at.isnot(None)
-    )
+    ).options(*list_load_options(with_labels=False))
 
     if folder_id:
         query = query.where(Email.archive_folder_id == folder_id)
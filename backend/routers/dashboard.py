@@ -5,12 +5,14 @@
 """
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, case
+from sqlalchemy import select, func, and_
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 
+from database import email_counters
 from database.database import get_db
+from database.email_list import list_load_options
 from database.models import Email, Draft, CalendarEvent
 from routers.users import get_current_account
 
@@ -80,41 +82,9 @@ async def get_dashboard_stats(
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     week_ago = today - timedelta(days=6)
 
-    # 1. 统计卡片数据
-    # 今日新邮件
-    today_count_result = await db.execute(
-        select(func.count(Email.id)).where(
-            and_(
-                Email.account_id == account_id,
-                Email.received_at >= today
-            )
-        )
-    )
-    today_count = today_count_result.scalar() or 0
-
-    # 未读邮件
-    unread_count_result = await db.execute(
-        select(func.count(Email.id)).where(
-            and_(
-                Email.account_id == account_id,
-                Email.is_read == False
-            )
-        )
-    )
-    unread_count = unread_count_result.scalar() or 0
-
-    # 待翻译邮件（非中文且未翻译）
-    pending_translation_result = await db.execute(
-        select(func.count(Email.id)).where(
-            and_(
-                Email.account_id == account_id,
-                Email.is_translated == False,
-                Email.language_detected != 'zh',
-                Email.language_detected.isnot(None)
-            )
-        )
-    )
-    pending_translation = pending_translation_result.scalar() or 0
+    # 1. 统计卡片数据（邮件计数读取预先维护的计数，见 database.email_counters）
+    counters = await email_counters.get_counters(db, account_id)
+    daily_counts = await email_counters.get_daily_counts(db, account_id, week_ago.date(), today.date())
 
     # 待审批草稿
     pending_approval_result = await db.execute(
@@ -128,66 +98,34 @@ async def get_dashboard_stats(
     pending_approval = pending_approval_result.scalar() or 0
 
     stats = StatCardData(
-        today_count=today_count,
-        unread_count=unread_count,
-        pending_translation=pending_translation,
+        today_count=daily_counts.get(today.date(), 0),
+        unread_count=counters.unread,
+        pending_translation=counters.foreign_untranslated,
         pending_approval=pending_approval
     )
 
-    # 2. 翻译统计
-    translation_stats_result = await db.execute(
-        select(
-            func.sum(case((Email.is_translated == True, 1), else_=0)).label('translated'),
-            func.sum(case(
-                (and_(
-                    Email.is_translated == False,
-                    Email.translation_status.notin_(['translating', 'failed'])
-                ), 1),
-                else_=0
-            )).label('untranslated'),
-            func.sum(case((Email.translation_status == 'translating', 1), else_=0)).label('translating'),
-            func.sum(case((Email.translation_status == 'failed', 1), else_=0)).label('failed')
-        ).where(
-            and_(
-                Email.account_id == account_id,
-                Email.language_detected != 'zh',
-                Email.language_detected.isnot(None)
-            )
-        )
-    )
-    row = translation_stats_result.first()
+    # 2. 翻译统计（非中文邮件）
     translation_stats = TranslationStats(
-        translated=row.translated or 0,
-        untranslated=row.untranslated or 0,
-        translating=row.translating or 0,
-        failed=row.failed or 0
+        translated=counters.foreign_translated,
+        untranslated=counters.foreign_idle,
+        translating=counters.foreign_translating,
+        failed=counters.foreign_failed
     )
 
     # 3. 近7天邮件趋势
     weekly_trend = []
     for i in range(7):
         day = today - timedelta(days=6-i)
-        next_day = day + timedelta(days=1)
-        count_result = await db.execute(
-            select(func.count(Email.id)).where(
-                and_(
-                    Email.account_id == account_id,
-                    Email.received_at >= day,
-                    Email.received_at < next_day
-                )
-            )
-        )
-        count = count_result.scalar() or 0
         weekly_trend.append(DailyTrend(
             date=day.strftime('%m-%d'),
-            count=count
+            count=daily_counts.get(day.date(), 0)
         ))
 
     # 4. 最近5封邮件
     recent_emails_result = await db.execute(
         select(Email).where(
             Email.account_id == account_id
-        ).order_by(Email.received_at.desc()).limit(5)
+        ).options(*list_load_options(with_labels=False)).order_by(Email.received_at.desc()).limit(5)
     )
     recent_emails = [
         RecentEmail(
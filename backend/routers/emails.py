@@ -6,25 +6,30 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, update, and_
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.mysql import match as mysql_match
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timedelta
 import os
 
-from database.database import get_db
-from database import crud
-from database.models import Email, EmailAccount, Attachment, EmailLabel, SentEmailMapping
+from database.database import get_db, async_session
+from database import crud, search_index, email_list, email_counters
+from database.models import Email, EmailAccount, Attachment, EmailLabel, SentEmailMapping, SharedEmailTranslation, EmailSearchIndex, ImapSyncState
 from services.email_service import EmailService
 from services.notification_service import notification_manager
 from routers.users import get_current_account
 from config import get_settings
 from utils.crypto import decrypt_password, mask_email
 from utils.rate_limit import fetch_limiter, send_limiter, batch_limiter
-from shared.cache_config import cache_get, cache_set
+from utils import pagination
+from utils.supplier_stats import invalidate_domain_stats
 import re
 
 router = APIRouter(prefix="/api/emails", tags=["emails"])
 
+# 手动同步时每个文件夹单次拉取的邮件数上限（收件箱增量积压会分多次拉完）
+FETCH_BATCH_LIMIT = 200
+
 
 def html_to_text_with_format(html: str) -> str:
     """从 HTML 提取文本，保留段落格式"""
@@ -123,6 +128,35 @@ class EmailResponse(BaseModel):
         from_attributes = True
 
 
+class EmailListItemResponse(BaseModel):
+    """邮件列表项（只含列表视图需要的字段，正文以预览文本代替，完整内容见详情接口）"""
+    id: int
+    message_id: str
+    from_email: str
+    from_name: Optional[str]
+    subject_original: str
+    subject_translated: Optional[str]
+    snippet_original: Optional[str]     # 正文原文开头
+    snippet_translated: Optional[str]   # 正文译文开头
+    language_detected: Optional[str]
+    direction: str                      # inbound/outbound
+    is_translated: bool
+    is_read: bool = False
+    is_flagged: bool = False
+    translation_status: Optional[str] = "none"
+    received_at: datetime
+    supplier_id: Optional[int]
+    thread_id: Optional[str]
+    labels: List[LabelBriefResponse] = []
+
+    # 搜索高亮（仅搜索结果）：subject_original / subject_translated / snippet_original / snippet_translated，
+    # 值为已转义、命中词包裹 <mark> 的 HTML，未命中为 None
+    search_highlight: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
+
 class AttachmentResponse(BaseModel):
     id: int
     filename: str
@@ -134,8 +168,12 @@ class AttachmentResponse(BaseModel):
 
 
 class EmailListResponse(BaseModel):
-    emails: List[EmailResponse]
+    emails: List[EmailListItemResponse]
     total: int
+    # 下一页游标（按日期排序且可能还有下一页时返回），传回 cursor 参数获取下一页
+    next_cursor: Optional[str] = None
+    # total 来自缓存（可能略有滞后，后台刷新中）
+    total_is_estimate: bool = False
 
 
 class QuotePartResponse(BaseModel):
@@ -161,12 +199,14 @@ class FetchEmailsRequest(BaseModel):
 # ============ Routes ============
 @router.get("", response_model=EmailListResponse)
 async def get_emails(
+    background_tasks: BackgroundTasks,
     supplier_id: Optional[int] = None,
     direction: Optional[str] = None,
     search: Optional[str] = None,
-    sort_by: Optional[str] = "date_desc",  # date_desc, date_asc, from, subject
+    sort_by: Optional[str] = None,  # relevance（有搜索词时默认）, date_desc（默认）, date_asc, from, subject
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,  # 上一页返回的 next_cursor（按日期排序时可用，传入后忽略 offset）
     # Advanced search filters
     from_email: Optional[str] = None,
     to_email: Optional[str] = None,
@@ -183,7 +223,7 @@ async def get_emails(
     account: EmailAccount = Depends(get_current_account),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取当前账户的邮件列表（支持高级搜索）"""
+    """获取当前账户的邮件列表（支持高级搜索、游标分页）"""
     from sqlalchemy import or_, exists
     from datetime import datetime
 
@@ -195,18 +235,38 @@ async def get_emails(
     if direction:
         base_conditions.append(Email.direction == direction)
 
-    # 搜索功能：搜索主题、正文、发件人
+    # 搜索功能：在全文索引表中搜索原文/译文的主题、正文和发件人
+    search_terms = []
+    search_score = None
     if search:
         # 限制搜索字符串长度，防止性能问题（200字符足够常规搜索）
         if len(search) > 200:
             search = search[:200]
-        search_pattern = f"%{search}%"
-        base_conditions.append(or_(
-            Email.subject_original.ilike(search_pattern),
-            Email.body_original.ilike(search_pattern),
-            Email.from_email.ilike(search_pattern),
-            Email.from_name.ilike(search_pattern)
-        ))
+        search_terms = search_index.parse_terms(search)
+        boolean_query = search_index.build_boolean_query(search_terms)
+        index = EmailSearchIndex
+        if boolean_query:
+            match_all = mysql_match(
+                index.subject_original, index.subject_translated, index.body_original,
+                index.body_translated, index.sender, against=boolean_query
+            ).in_boolean_mode()
+            match_subject = mysql_match(
+                index.subject_original, index.subject_translated, against=boolean_query
+            ).in_boolean_mode()
+            base_conditions.append(match_all)
+            # 主题命中权重加倍
+            search_score = match_subject * 2 + match_all
+        elif search_terms:
+            # 有词短于 ngram 长度（如单个汉字）时无法走全文索引，退回 LIKE（限定在本账户的索引行内）
+            for term in search_terms:
+                pattern = f"%{term}%"
+                base_conditions.append(or_(
+                    index.subject_original.ilike(pattern),
+                    index.subject_translated.ilike(pattern),
+                    index.body_original.ilike(pattern),
+                    index.body_translated.ilike(pattern),
+                    index.sender.ilike(pattern)
+                ))
 
     # Advanced filters
     if from_email:
@@ -284,32 +344,90 @@ async def get_emails(
             )
         )
 
-    # 先计算总数
     count_query = select(func.count(Email.id)).where(*base_conditions)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar()
-
-    # 构建数据查询（包含标签和文件夹）
-    query = select(Email).where(*base_conditions).options(
-        selectinload(Email.labels),
-        selectinload(Email.folders)
-    )
+    # 构建数据查询（列表投影 + 标签，不加载正文等大字段）
+    query = select(Email).where(*base_conditions).options(*email_list.list_load_options())
+    if search_terms:
+        count_query = count_query.join(EmailSearchIndex, EmailSearchIndex.email_id == Email.id)
+        # 搜索结果的高亮摘要取自索引行中的明文正文
+        query = query.join(EmailSearchIndex, EmailSearchIndex.email_id == Email.id).add_columns(
+            EmailSearchIndex.body_original, EmailSearchIndex.body_translated
+        )
 
-    # 排序
-    if sort_by == "date_asc":
-        query = query.order_by(Email.received_at.asc())
+    # 总数：按筛选条件缓存，过期后先返回旧值并在后台刷新
+    count_key = pagination.count_cache_key(account.id, {
+        "supplier_id": supplier_id, "direction": direction, "search": search,
+        "from_email": from_email, "to_email": to_email, "date_start": date_start, "date_end": date_end,
+        "has_attachment": has_attachment, "label_ids": label_ids, "language": language,
+        "translation_status": translation_status, "is_read": is_read, "is_translated": is_translated,
+        "is_flagged": is_flagged, "folder_id": folder_id,
+    })
+    total, needs_refresh = await pagination.get_cached_count(count_key)
+    total_is_estimate = total is not None
+    if total is None:
+        total = (await db.execute(count_query)).scalar()
+        await pagination.set_cached_count(count_key, total)
+    elif needs_refresh and await pagination.claim_refresh(count_key):
+        background_tasks.add_task(_refresh_email_count, count_key, count_query)
+
+    # 排序（有搜索词时默认按相关度）
+    if sort_by is None or (sort_by == "relevance" and search_score is None):
+        sort_by = "relevance" if search_score is not None else "date_desc"
+    if sort_by == "relevance":
+        query = query.order_by(search_score.desc(), Email.received_at.desc(), Email.id.desc())
+    elif sort_by == "date_asc":
+        query = query.order_by(Email.received_at.asc(), Email.id.asc())
     elif sort_by == "from":
         query = query.order_by(Email.from_name.asc(), Email.received_at.desc())
     elif sort_by == "subject":
         query = query.order_by(Email.subject_original.asc(), Email.received_at.desc())
     else:  # date_desc 默认
-        query = query.order_by(Email.received_at.desc())
+        sort_by = "date_desc"
+        query = query.order_by(Email.received_at.desc(), Email.id.desc())
 
-    query = query.limit(limit).offset(offset)
+    # 分页：按日期排序时用游标（keyset），其余排序方式沿用 offset
+    keyset = sort_by in pagination.CURSOR_SORTS
+    if cursor and keyset:
+        try:
+            after_received, after_id = pagination.decode_cursor(cursor, sort_by)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(pagination.keyset_condition(
+            Email.received_at, Email.id, after_received, after_id,
+            descending=pagination.CURSOR_SORTS[sort_by]
+        ))
+    else:
+        query = query.offset(offset)
+
+    query = query.limit(limit)
     result = await db.execute(query)
-    emails = result.scalars().all()
+    rows = result.all()
+    emails = [row[0] for row in rows]
+
+    next_cursor = None
+    if keyset and emails and len(emails) == limit:
+        next_cursor = pagination.encode_cursor(sort_by, emails[-1].received_at, emails[-1].id)
+
+    items = [EmailListItemResponse.model_validate(email) for email in emails]
+    if search_terms:
+        for item, (_, body_original, body_translated) in zip(items, rows):
+            item.search_highlight = search_index.build_highlights(
+                search_terms, item.subject_original, item.subject_translated, body_original, body_translated
+            )
+
+    return EmailListResponse(
+        emails=items, total=total, next_cursor=next_cursor, total_is_estimate=total_is_estimate
+    )
 
-    return EmailListResponse(emails=emails, total=total)
+
+async def _refresh_email_count(count_key: str, count_query):
+    """后台刷新邮件列表总数缓存"""
+    try:
+        async with async_session() as db:
+            total = (await db.execute(count_query)).scalar()
+        await pagination.set_cached_count(count_key, total)
+    except Exception as e:
+        print(f"[EmailCount] Refresh failed for {count_key}: {e}")
 
 
 @router.get("/contacts")
@@ -509,44 +627,48 @@ async def get_email_thread(
     account: EmailAccount = Depends(get_current_account),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取邮件线程"""
+    """获取邮件线程（列表投影，完整内容见详情接口）"""
     result = await db.execute(
         select(Email)
         .where(Email.thread_id == thread_id, Email.account_id == account.id)
+        .options(*email_list.list_load_options())
         .order_by(Email.received_at.asc())
     )
     emails = result.scalars().all()
 
-    # 翻译回填：检查线程中每封邮件是否需要从共享表回填翻译
-    from database.models import SharedEmailTranslation
-    need_commit = False
-    for email in emails:
-        if (not email.body_translated and
+    # 翻译回填：线程中需要回填的邮件一次 IN 查询共享表（有译文预览即有译文，无需读取译文正文）
+    need_backfill = [
+        email for email in emails
+        if (not email.snippet_translated and
             email.language_detected and
             email.language_detected != 'zh' and
-            email.message_id):
-            try:
-                shared_result = await db.execute(
-                    select(SharedEmailTranslation).where(
-                        SharedEmailTranslation.message_id == email.message_id
-                    )
-                )
-                shared = shared_result.scalar_one_or_none()
-                if shared and shared.body_translated:
-                    email.body_translated = shared.body_translated
-                    if shared.subject_translated and not email.subject_translated:
-                        email.subject_translated = shared.subject_translated
-                    email.is_translated = True
-                    email.translation_status = "completed"
-                    need_commit = True
-                    logger.info(f"[翻译回填] 线程邮件 {email.id} 从共享表回填翻译成功")
-            except Exception as e:
-                logger.warning(f"[翻译回填] 线程邮件 {email.id} 回填失败: {e}")
+            email.message_id)
+    ]
+    need_commit = False
+    if need_backfill:
+        try:
+            shared_map = await crud.get_shared_translations(db, [e.message_id for e in need_backfill])
+        except Exception as e:
+            logger.warning(f"[翻译回填] 线程 {thread_id} 查询共享表失败: {e}")
+            shared_map = {}
+        for email in need_backfill:
+            shared = shared_map.get(email.message_id)
+            if shared and shared.body_translated:
+                email.body_translated = shared.body_translated
+                if shared.subject_translated and not email.subject_translated:
+                    email.subject_translated = shared.subject_translated
+                email.is_translated = True
+                email.translation_status = "completed"
+                need_commit = True
+                logger.info(f"[翻译回填] 线程邮件 {email.id} 从共享表回填翻译成功")
 
     if need_commit:
         await db.commit()
 
-    return {"emails": emails, "count": len(emails)}
+    return {
+        "emails": [EmailListItemResponse.model_validate(email) for email in emails],
+        "count": len(emails)
+    }
 
 
 @router.post("/fetch")
@@ -566,26 +688,30 @@ async def fetch_emails(
 
 
 async def fetch_emails_background(account: EmailAccount, since_days: int, force_full_sync: bool = False):
-    """后台任务：拉取邮件并自动翻译（增量拉取优化）
+    """后台任务：拉取邮件并自动翻译（增量拉取 + 流水线入库）
+
+    拉取、解析、入库、翻译入队由 IngestPipeline 串联并发执行：
+    每批邮件提交后立即推送 fetch_progress，界面无需等待全部拉取完成；
+    翻译投递到 Celery（translate_email_task），不在拉取流程中同步执行。
+
+    收件箱从 UID 检查点增量拉取，已发送文件夹按日期拉取；两者都只对候选邮件的
+    Message-ID 查询是否已入库，不加载账户全部历史 message_id。
 
     Args:
         account: 邮箱账户
         since_days: 同步最近多少天的邮件
-        force_full_sync: 强制完整同步，忽略增量优化
+        force_full_sync: 强制完整同步，忽略增量优化和收件箱检查点
     """
     import asyncio
     import traceback
-    import hashlib
     from database.database import async_session
-    from database.models import TranslationCache, SharedEmailTranslation
-    from services.translate_service import TranslateService
-    from config import get_settings
+    from services.ingest_pipeline import IngestPipeline, PipelineAborted
 
     settings = get_settings()
 
     print(f"[Background] Starting email fetch for {mask_email(account.email)}")
 
-    # 增量拉取优化：查询数据库中最新邮件的时间
+    # 按日期拉取的起始时间（已发送文件夹，以及收件箱无检查点时的重新同步）：查询数据库中最新邮件的时间
     async with async_session() as db:
         latest_result = await db.execute(
             select(Email.received_at)
@@ -608,18 +734,65 @@ async def fetch_emails_background(account: EmailAccount, since_days: int, force_
         since_date = datetime.utcnow() - timedelta(days=since_days)
         print(f"[Background] First sync, fetching emails from last {since_days} days")
 
-    try:
-        # 先获取数据库中已存在的 message_ids（用于快速过滤）
-        existing_message_ids = set()
+    loop = asyncio.get_running_loop()
+    service = None
+    counters = {"fetched": 0, "saved": 0, "skipped": 0, "translated": 0}
+
+    # 收件箱按 UID 检查点（imap_sync_states，与 fetch_emails_task 共用）增量拉取
+    inbox = {"folder": None, "state": {}, "ok": False}
+
+    def run_on_loop(coro):
+        """在拉取线程中执行异步数据库查询（提交到事件循环并等待结果）"""
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    async def _known_message_ids(message_ids: List[str]) -> set:
         async with async_session() as db:
-            result = await db.execute(
-                select(Email.message_id)
-                .where(Email.account_id == account.id)
-            )
-            existing_message_ids = {row[0] for row in result.fetchall() if row[0]}
+            return await crud.get_existing_message_ids(db, message_ids)
 
-        print(f"[Background] Found {len(existing_message_ids)} existing emails in database")
+    def known_message_ids(message_ids: List[str]) -> set:
+        """只查询本批候选邮件中已入库的 message_id（不加载账户全部历史）"""
+        return run_on_loop(_known_message_ids(message_ids))
 
+    async def load_checkpoint(folder: str) -> dict:
+        async with async_session() as db:
+            sync_state = (await db.execute(
+                select(ImapSyncState).where(
+                    ImapSyncState.account_id == account.id, ImapSyncState.folder == folder
+                )
+            )).scalar_one_or_none()
+        if sync_state is None or force_full_sync:
+            # 无检查点或强制完整同步：按 since_date 重新同步
+            return {"uidvalidity": None, "last_uid": 0, "highest_modseq": None}
+        return {
+            "uidvalidity": sync_state.uidvalidity,
+            "last_uid": sync_state.last_uid,
+            "highest_modseq": sync_state.highest_modseq,
+        }
+
+    async def save_checkpoint(folder: str, state: dict):
+        """流水线全部入库后推进检查点（不回退并发的 fetch_emails_task 已推进的检查点）"""
+        async with async_session() as db:
+            sync_state = (await db.execute(
+                select(ImapSyncState).where(
+                    ImapSyncState.account_id == account.id, ImapSyncState.folder == folder
+                )
+            )).scalar_one_or_none()
+            if sync_state is None:
+                sync_state = ImapSyncState(account_id=account.id, folder=folder)
+                db.add(sync_state)
+            elif sync_state.uidvalidity == state["uidvalidity"] and (sync_state.last_uid or 0) > state["last_uid"]:
+                return
+            sync_state.uidvalidity = state["uidvalidity"]
+            sync_state.last_uid = state["last_uid"]
+            sync_state.highest_modseq = state["highest_modseq"]
+            sync_state.last_synced_at = datetime.utcnow()
+            try:
+                await db.commit()
+            except IntegrityError:
+                # fetch_emails_task 同时创建了检查点，以其为准
+                await db.rollback()
+
+    try:
         service = EmailService(
             imap_server=account.imap_server,
             smtp_server=account.smtp_server,
@@ -629,395 +802,374 @@ async def fetch_emails_background(account: EmailAccount, since_days: int, force_
             smtp_port=account.smtp_port
         )
 
-        # 在线程池中运行同步的IMAP操作，避免阻塞事件循环
-        # 使用 fetch_emails_multi_folder 同时拉取收件箱和已发送文件夹
-        loop = asyncio.get_event_loop()
-        folder_results = await loop.run_in_executor(
-            None,
-            lambda: service.fetch_emails_multi_folder(
-                folders=["inbox", "sent"],
+        def fetch_inbox(imap_folder: str, emit) -> int:
+            """收件箱：从检查点增量拉取，积压超过单次上限时继续拉取直到追平"""
+            checkpoint = run_on_loop(load_checkpoint(imap_folder))
+            inbox["folder"] = imap_folder
+            count = 0
+            while True:
+                state = {}
+                for uid, raw in service.iter_raw_emails_incremental(
+                    folder=imap_folder,
+                    since_date=since_date,
+                    limit=FETCH_BATCH_LIMIT,
+                    known_message_ids=known_message_ids,
+                    state=state,
+                    **checkpoint
+                ):
+                    emit({"uid": uid, "direction": "inbound"}, raw)
+                    count += 1
+                inbox["state"] = state
+                if not state.get("truncated"):
+                    return count
+                checkpoint = {
+                    "uidvalidity": state["uidvalidity"],
+                    "last_uid": state["last_uid"],
+                    "highest_modseq": state["highest_modseq"],
+                }
+
+        def fetch_sent(imap_folder: str, emit) -> int:
+            """已发送：按日期拉取，只对候选邮件查询是否已入库"""
+            count = 0
+            for uid, raw in service.iter_raw_emails(
+                folder=imap_folder,
                 since_date=since_date,
-                existing_message_ids=existing_message_ids
+                limit=FETCH_BATCH_LIMIT,
+                known_message_ids=known_message_ids
+            ):
+                emit({"uid": uid, "direction": "outbound"}, raw)
+                count += 1
+            return count
+
+        def produce(emit):
+            """拉取线程：依次拉取收件箱和已发送文件夹的原始邮件"""
+            for folder_key, fetch in (("inbox", fetch_inbox), ("sent", fetch_sent)):
+                imap_folder = service.get_imap_folder(folder_key)
+                print(f"[EmailService] Fetching from folder: {folder_key} ({imap_folder})")
+                count = 0
+                try:
+                    count = fetch(imap_folder, emit)
+                    if folder_key == "inbox":
+                        inbox["ok"] = True
+                except PipelineAborted:
+                    raise
+                except Exception as e:
+                    print(f"[EmailService] Error fetching from {folder_key}: {e}")
+                counters["fetched"] += count
+                print(f"[EmailService] Fetched {count} emails from {folder_key}")
+
+        async def persist(batch: List[dict]) -> List[tuple]:
+            """入库阶段：一批邮件一次去重查询、一次提交，返回新插入邮件的 (email_id, 是否需要翻译, 是否需要 AI 提取)"""
+            created = []
+            async with async_session() as db:
+                # 批量去重（替代逐封 get_email_by_message_id）
+                batch_ids = [e["message_id"] for e in batch if e.get("message_id")]
+                existing_in_db = await crud.get_existing_message_ids(db, batch_ids)
+
+                # 批量预取共享翻译和发送记录（本封 + 被回复邮件），替代逐封查询
+                lookup_ids = batch_ids + [e["in_reply_to"] for e in batch if e.get("in_reply_to")]
+                shared_map = await crud.get_shared_translations(db, lookup_ids)
+                sent_map = await crud.get_sent_email_mappings(db, lookup_ids)
+
+                for email_data in batch:
+                    if email_data["message_id"] in existing_in_db:
+                        counters["skipped"] += 1
+                        continue
+                    # 同一批次内重复（收件箱与已发送中的同一封邮件）
+                    existing_in_db.add(email_data["message_id"])
+
+                    entry = await _persist_fetched_email(
+                        db, account, email_data, settings,
+                        shared_map=shared_map, sent_map=sent_map
+                    )
+                    if entry is not None:
+                        counters["saved"] += 1
+                        created.append(entry)
+
+                # 提交（带重试）
+                for retry in range(3):
+                    try:
+                        await db.commit()
+                        break
+                    except Exception as commit_err:
+                        if retry < 2:
+                            print(f"[EmailSync] Batch commit retry {retry + 1}/3: {commit_err}")
+                            await asyncio.sleep(2 ** retry)
+                        else:
+                            print(f"[EmailSync] Batch commit failed after 3 retries: {commit_err}")
+                            raise
+
+            print(f"[EmailSync] Batch commit: {counters['saved']} emails saved")
+            if created:
+                # 任何新邮件（含已发送、中文、被规则跳过的）都会改变供应商收发统计
+                await invalidate_domain_stats(account.id)
+            # 每批提交后推送进度，界面可立即刷新出新邮件
+            await notification_manager.notify_fetch_progress(
+                account.id, counters["saved"] + counters["skipped"], counters["fetched"], counters["saved"]
             )
-        )
+            return created
 
-        # 合并所有文件夹的邮件到一个列表
-        emails = []
-        for folder_name, folder_emails in folder_results.items():
-            print(f"[Background] Fetched {len(folder_emails)} emails from {folder_name}")
-            emails.extend(folder_emails)
+        async def enqueue(entries: List[tuple]):
+            """翻译入队阶段：新邮件进入 new_mail 通道（按账户公平调度），投递 AI 提取任务"""
+            from shared.translation_scheduler import LANE_NEW_MAIL, enqueue as enqueue_translations
+            from tasks.ai_tasks import extract_email_info_task
 
-        print(f"[Background] Total fetched {len(emails)} new emails from IMAP")
+            to_translate = [(email_id, account.id) for email_id, need_translate, _ in entries if need_translate]
+            if to_translate:
+                try:
+                    enqueue_translations(to_translate, LANE_NEW_MAIL)
+                    counters["translated"] += len(to_translate)
+                except Exception as ex:
+                    # 邮件保持 pending 状态，由 collect_and_translate_pending 补充入队或在界面手动翻译
+                    print(f"[AutoTranslate] Failed to queue {len(to_translate)} emails: {ex}")
+
+            for email_id, _, need_extract in entries:
+                if not need_extract:
+                    continue
+                try:
+                    extract_email_info_task.delay(email_id, account.id)
+                    print(f"[AutoExtract] Task queued for email_id={email_id}")
+                except Exception as ex:
+                    # 记录失败但不阻塞，推送警告通知
+                    print(f"[AutoExtract] Failed to queue task: {ex}")
+                    try:
+                        from services.notification_service import send_notification
+                        await send_notification(
+                            account.id,
+                            "task_warning",
+                            {"message": "AI 提取任务队列失败，请检查 Celery 服务", "email_id": email_id}
+                        )
+                    except Exception:
+                        pass  # 通知失败不阻塞
+
+        pipeline = IngestPipeline(persist, enqueue, label=f"[{mask_email(account.email)}]")
+        pipeline_stats = await pipeline.run(produce)
+
+        # 拉取到的邮件已全部入库，检查点才前进（有批次入库失败时下次从原检查点重拉，按 Message-ID 去重）
+        if inbox["ok"] and not pipeline_stats["persist"]["errors"] and inbox["state"].get("uidvalidity") is not None:
+            await save_checkpoint(inbox["folder"], inbox["state"])
 
-        # 创建翻译服务（使用本地 vLLM）
-        translate_service = TranslateService(
-            vllm_base_url=settings.vllm_base_url,
-            vllm_model=settings.vllm_model,
-            vllm_api_key=settings.vllm_api_key,
+        print(f"[Background] Fetched {counters['fetched']} from IMAP, saved {counters['saved']} new, "
+              f"skipped {counters['skipped']} existing, queued {counters['translated']} translations "
+              f"for {mask_email(account.email)}")
+        await notification_manager.notify_fetch_complete(
+            account.id, counters["saved"], counters["fetched"]
         )
 
-        saved_count = 0
-        translated_count = 0
+    except Exception as e:
+        print(f"[Background] Error fetching emails for {mask_email(account.email)}: {e}")
+        traceback.print_exc()
+    finally:
+        # 确保 IMAP 连接被关闭（防止连接泄漏）
+        if service is not None:
+            try:
+                await loop.run_in_executor(None, service.disconnect_imap)
+            except Exception:
+                pass  # 忽略断开连接时的错误
 
-        skipped_count = 0
-        async with async_session() as db:
-            for email_data in emails:
-                # 检查是否已存在
-                existing = await crud.get_email_by_message_id(db, email_data["message_id"])
-                if existing:
-                    skipped_count += 1
-                    continue
 
-                # 获取或创建供应商
-                supplier = await crud.get_or_create_supplier_by_email(db, email_data["from_email"])
+async def _persist_fetched_email(db: AsyncSession, account: EmailAccount, email_data: dict,
+                                 settings, shared_map: dict = None,
+                                 sent_map: dict = None) -> Optional[tuple]:
+    """
+    保存单封拉取到的邮件（附件、规则、已发送还原、共享翻译复用）
 
-                # 创建邮件记录
-                email_data["account_id"] = account.id
-                email_data["supplier_id"] = supplier.id
-                attachments = email_data.pop("attachments", [])
+    每封邮件在独立的 SAVEPOINT 中写入，并发导致的重复插入只回滚这一封，
+    不影响同一批次中的其他邮件。
 
-                try:
-                    new_email = await crud.create_email(db, email_data)
-                    saved_count += 1
-
-                    # 保存附件到数据库（带内容去重）
-                    if attachments:
-                        saved_att_count = 0
-                        reused_att_count = 0
-                        for att in attachments:
-                            content_hash = att.get("content_hash")
-
-                            # 内容去重：检查是否已有相同内容的附件
-                            existing_path = None
-                            if content_hash:
-                                existing_result = await db.execute(
-                                    select(Attachment.file_path).where(
-                                        Attachment.content_hash == content_hash
-                                    ).limit(1)
-                                )
-                                existing_row = existing_result.first()
-                                if existing_row:
-                                    existing_path = existing_row[0]
-                                    # 检查文件是否真实存在
-                                    import os
-                                    if existing_path and os.path.exists(existing_path):
-                                        # 复用现有文件，删除新保存的重复文件
-                                        new_path = att.get("file_path")
-                                        if new_path and os.path.exists(new_path) and new_path != existing_path:
-                                            try:
-                                                os.remove(new_path)
-                                                print(f"[Attachment] Removed duplicate file: {new_path}")
-                                            except OSError:
-                                                pass
-                                        reused_att_count += 1
-                                    else:
-                                        existing_path = None  # 文件不存在，使用新文件
-
-                            attachment = Attachment(
-                                email_id=new_email.id,
-                                filename=att.get("filename"),
-                                file_path=existing_path or att.get("file_path"),
-                                file_size=att.get("file_size"),
-                                mime_type=att.get("mime_type"),
-                                content_hash=content_hash
-                            )
-                            db.add(attachment)
-                            saved_att_count += 1
+    Args:
+        shared_map: 批次预取的共享翻译 {message_id: SharedEmailTranslation}，None 时逐条查询
+        sent_map: 批次预取的发送记录 {message_id: SentEmailMapping}，None 时逐条查询
 
-                        if reused_att_count > 0:
-                            print(f"[EmailSync] Saved {saved_att_count} attachments ({reused_att_count} reused existing files) for email {new_email.id}")
-                        else:
-                            print(f"[EmailSync] Saved {saved_att_count} attachments for email {new_email.id}")
+    Returns:
+        (email_id, 是否需要投递翻译任务, 是否需要 AI 提取)；每封新插入的邮件都有返回值，重复邮件返回 None
+    """
+    # 获取或创建供应商
+    supplier = await crud.get_or_create_supplier_by_email(db, email_data["from_email"])
 
-                except IntegrityError:
-                    # 处理并发请求导致的重复插入
-                    await db.rollback()
-                    print(f"[EmailSync] Skipped duplicate: {email_data.get('message_id', 'unknown')[:50]}")
-                    continue
+    # 创建邮件记录
+    email_data["account_id"] = account.id
+    email_data["supplier_id"] = supplier.id
+    attachments = email_data.pop("attachments", [])
 
-                # 分批提交：每 5 封邮件提交一次，避免长事务导致锁超时
-                if saved_count > 0 and saved_count % 5 == 0:
-                    try:
-                        await db.commit()
-                        print(f"[EmailSync] Batch commit: {saved_count} emails saved")
-                    except Exception as commit_err:
-                        print(f"[EmailSync] Batch commit error (will retry): {commit_err}")
-                        await asyncio.sleep(1)
-                        await db.commit()
+    try:
+        async with db.begin_nested():
+            new_email = await crud.create_email(db, email_data)
+    except IntegrityError:
+        # 处理并发请求导致的重复插入
+        print(f"[EmailSync] Skipped duplicate: {email_data.get('message_id', 'unknown')[:50]}")
+        return None
+
+    # 保存附件到数据库（带内容去重）
+    if attachments:
+        saved_att_count = 0
+        reused_att_count = 0
+        for att in attachments:
+            content_hash = att.get("content_hash")
+
+            # 内容去重：检查是否已有相同内容的附件
+            existing_path = None
+            if content_hash:
+                existing_result = await db.execute(
+                    select(Attachment.file_path).where(
+                        Attachment.content_hash == content_hash
+                    ).limit(1)
+                )
+                existing_row = existing_result.first()
+                if existing_row:
+                    existing_path = existing_row[0]
+                    # 检查文件是否真实存在
+                    if existing_path and os.path.exists(existing_path):
+                        # 复用现有文件，删除新保存的重复文件
+                        new_path = att.get("file_path")
+                        if new_path and os.path.exists(new_path) and new_path != existing_path:
+                            try:
+                                os.remove(new_path)
+                                print(f"[Attachment] Removed duplicate file: {new_path}")
+                            except OSError:
+                                pass
+                        reused_att_count += 1
+                    else:
+                        existing_path = None  # 文件不存在，使用新文件
+
+            attachment = Attachment(
+                email_id=new_email.id,
+                filename=att.get("filename"),
+                file_path=existing_path or att.get("file_path"),
+                file_size=att.get("file_size"),
+                mime_type=att.get("mime_type"),
+                content_hash=content_hash
+            )
+            db.add(attachment)
+            saved_att_count += 1
 
-                # 应用邮件规则
-                skip_translate = False
-                try:
-                    from services.rule_engine import RuleEngine
-                    rule_engine = RuleEngine(db, account.id)
-                    await rule_engine.load_rules()
-
-                    if rule_engine.rules:
-                        rule_result = await rule_engine.process_email(email_data, new_email.id)
-                        skip_translate = rule_result.get("skip_translate", False)
-                        if rule_result.get("applied_rules"):
-                            print(f"[RuleEngine] Applied rules to email {new_email.id}: {rule_result['applied_rules']}")
-                except Exception as rule_error:
-                    print(f"[RuleEngine] Error processing rules: {rule_error}")
-
-                # ========= 已发送邮件特殊处理 =========
-                # 从已发送文件夹拉取的邮件，尝试还原用户的中文原文
-                if email_data.get("direction") == "outbound":
-                    try:
-                        from database.models import SentEmailMapping
-                        # 查找发送记录
-                        sent_mapping_result = await db.execute(
-                            select(SentEmailMapping).where(
-                                SentEmailMapping.message_id == email_data["message_id"]
-                            )
-                        )
-                        sent_mapping = sent_mapping_result.scalar_one_or_none()
-
-                        if sent_mapping:
-                            # 找到发送记录，还原用户原文
-                            if sent_mapping.was_translated:
-                                # 用户写的中文，翻译后发送
-                                # 把用户的中文原文作为"翻译"显示
-                                new_email.subject_translated = sent_mapping.subject_original
-                                new_email.body_translated = sent_mapping.body_original
-                                new_email.is_translated = True
-                                new_email.translation_status = "completed"
-                                print(f"[OutboundEmail] Restored user's Chinese original for {email_data['message_id'][:30]}")
-                            else:
-                                # 用户直接用英文写的，无需翻译
-                                new_email.is_translated = False
-                                new_email.translation_status = "not_needed"
-                                print(f"[OutboundEmail] User wrote in English directly for {email_data['message_id'][:30]}")
-                            # 跳过后续翻译流程
-                            skip_translate = True
-                        else:
-                            # 通过其他软件发送，无发送记录
-                            # 标记为用户发送，跳过翻译
-                            new_email.is_translated = False
-                            new_email.translation_status = "user_sent"
-                            skip_translate = True
-                            print(f"[OutboundEmail] Sent via other software, skipping translation for {email_data['message_id'][:30]}")
-                    except Exception as outbound_err:
-                        print(f"[OutboundEmail] Error processing outbound email: {outbound_err}")
-                        # 出错时也跳过翻译，防止把用户发送的邮件再翻译
-                        skip_translate = True
-
-                # 自动翻译非中文邮件（如果没有被规则跳过）
-                lang = email_data.get("language_detected", "")
-                if lang and lang != "zh" and settings.translate_enabled and not skip_translate:
-                    try:
-                        # 先检查共享翻译表
-                        shared_result = await db.execute(
-                            select(SharedEmailTranslation).where(
-                                SharedEmailTranslation.message_id == email_data["message_id"]
-                            )
-                        )
-                        shared = shared_result.scalar_one_or_none()
+        if reused_att_count > 0:
+            print(f"[EmailSync] Saved {saved_att_count} attachments ({reused_att_count} reused existing files) for email {new_email.id}")
+        else:
+            print(f"[EmailSync] Saved {saved_att_count} attachments for email {new_email.id}")
 
-                        if shared:
-                            # 使用共享翻译（存储的是纯翻译，需要动态组合引用）
-                            new_email.subject_translated = shared.subject_translated
+    # 应用邮件规则
+    skip_translate = False
+    try:
+        from services.rule_engine import RuleEngine
+        rule_engine = RuleEngine(db, account.id)
+        await rule_engine.load_rules()
+
+        if rule_engine.rules:
+            rule_result = await rule_engine.process_email(email_data, new_email.id)
+            skip_translate = rule_result.get("skip_translate", False)
+            if rule_result.get("applied_rules"):
+                print(f"[RuleEngine] Applied rules to email {new_email.id}: {rule_result['applied_rules']}")
+    except Exception as rule_error:
+        print(f"[RuleEngine] Error processing rules: {rule_error}")
+
+    # ========= 已发送邮件特殊处理 =========
+    # 从已发送文件夹拉取的邮件，尝试还原用户的中文原文
+    if email_data.get("direction") == "outbound":
+        try:
+            # 查找发送记录
+            if sent_map is not None:
+                sent_mapping = sent_map.get(email_data["message_id"])
+            else:
+                sent_mapping_result = await db.execute(
+                    select(SentEmailMapping).where(
+                        SentEmailMapping.message_id == email_data["message_id"]
+                    )
+                )
+                sent_mapping = sent_mapping_result.scalar_one_or_none()
+
+            if sent_mapping:
+                # 找到发送记录，还原用户原文
+                if sent_mapping.was_translated:
+                    # 用户写的中文，翻译后发送
+                    # 把用户的中文原文作为"翻译"显示
+                    new_email.subject_translated = sent_mapping.subject_original
+                    new_email.body_translated = sent_mapping.body_original
+                    new_email.is_translated = True
+                    new_email.translation_status = "completed"
+                    print(f"[OutboundEmail] Restored user's Chinese original for {email_data['message_id'][:30]}")
+                else:
+                    # 用户直接用英文写的，无需翻译
+                    new_email.is_translated = False
+                    new_email.translation_status = "not_needed"
+                    print(f"[OutboundEmail] User wrote in English directly for {email_data['message_id'][:30]}")
+            else:
+                # 通过其他软件发送，无发送记录
+                # 标记为用户发送，跳过翻译
+                new_email.is_translated = False
+                new_email.translation_status = "user_sent"
+                print(f"[OutboundEmail] Sent via other software, skipping translation for {email_data['message_id'][:30]}")
+        except Exception as outbound_err:
+            print(f"[OutboundEmail] Error processing outbound email: {outbound_err}")
+        # 已发送邮件不再翻译（出错时也跳过，防止把用户发送的邮件再翻译）
+        return (new_email.id, False, False)
+
+    # 非中文邮件自动翻译（如果没有被规则跳过）
+    lang = email_data.get("language_detected", "")
+    if not (lang and lang != "zh" and settings.translate_enabled and not skip_translate):
+        return (new_email.id, False, False)
 
-                            # 动态组合引用翻译
-                            display_translated = shared.body_translated or ""
-                            in_reply_to = email_data.get("in_reply_to")
-                            body_original = email_data.get("body_original", "")
+    try:
+        # 先检查共享翻译表，命中则直接复用，无需投递翻译任务
+        if shared_map is not None:
+            shared = shared_map.get(email_data["message_id"])
+        else:
+            shared_result = await db.execute(
+                select(SharedEmailTranslation).where(
+                    SharedEmailTranslation.message_id == email_data["message_id"]
+                )
+            )
+            shared = shared_result.scalar_one_or_none()
 
-                            if body_original and in_reply_to:
-                                # 检测引用内容
-                                _, quoted_content, user_original, was_translated = await restore_user_original_in_quotes(
-                                    body_original, in_reply_to, db
-                                )
-                                if quoted_content:
-                                    if user_original:
-                                        # 引用的是用户自己发送的邮件
-                                        if was_translated:
-                                            display_translated += f"\n\n--- 以下为引用内容（您的原文）---\n{user_original}"
-                                        else:
-                                            display_translated += f"\n\n--- 以下为引用内容（您发送的原文）---\n{user_original}"
-                                    else:
-                                        # 查找引用邮件的翻译
-                                        quoted_shared_result = await db.execute(
-                                            select(SharedEmailTranslation).where(
-                                                SharedEmailTranslation.message_id == in_reply_to
-                                            )
-                                        )
-                                        quoted_shared = quoted_shared_result.scalar_one_or_none()
-                                        if quoted_shared and quoted_shared.body_translated:
-                                            display_translated += f"\n\n--- 以下为引用内容（已翻译）---\n{quoted_shared.body_translated}"
-                                        else:
-                                            truncated = quoted_content[:500] + ('...' if len(quoted_content) > 500 else '')
-                                            display_translated += f"\n\n--- 以下为引用内容（原文）---\n{truncated}"
-
-                            new_email.body_translated = display_translated
-                            new_email.is_translated = True
-                            new_email.translation_status = "completed"
-                            print(f"[AutoTranslate] Used shared translation (with dynamic quote assembly) for {email_data['message_id'][:30]}")
-                        else:
-                            # 智能翻译正文（检测引用 + 智能路由 + 历史翻译复用）
-                            # 标题与正文一起翻译，提高上下文理解深度
-                            subject_translated = ""
-                            body_translated = ""
-                            provider_used = "vllm"
-                            complexity_info = None
-
-                            if email_data.get("body_original"):
-                                in_reply_to = email_data.get("in_reply_to")
-                                body_original = email_data["body_original"]
-
-                                # 1. 先检查引用内容是否是用户自己发送的邮件
-                                new_content, quoted_content, user_original, was_translated = await restore_user_original_in_quotes(
-                                    body_original, in_reply_to, db
-                                )
-                                has_quote = bool(quoted_content)
-
-                                # 2. 如果找到用户发送的原文，特殊处理
-                                user_quote_display = None
-                                if user_original:
-                                    if was_translated:
-                                        # 场景A：用户写的是中文，翻译后发送，显示中文原文
-                                        user_quote_display = f"\n\n--- 以下为引用内容（您的原文）---\n{user_original}"
-                                        print(f"[RestoreUserOriginal] Will show user's Chinese original")
-                                    else:
-                                        # 场景B：用户直接写的英文，标记为原文不翻译
-                                        user_quote_display = f"\n\n--- 以下为引用内容（您发送的原文）---\n{user_original}"
-                                        print(f"[RestoreUserOriginal] Will show user's English original")
-
-                                # 3. 查找历史翻译（如果有引用且不是用户发送的）
-                                quoted_translation = None
-                                if has_quote and in_reply_to and not user_original:
-                                    shared_result = await db.execute(
-                                        select(SharedEmailTranslation).where(
-                                            SharedEmailTranslation.message_id == in_reply_to
-                                        )
-                                    )
-                                    shared_reply = shared_result.scalar_one_or_none()
-                                    if shared_reply and shared_reply.body_translated:
-                                        quoted_translation = shared_reply.body_translated
-                                        print(f"[SmartTranslate] Found history translation for {in_reply_to[:30]}")
-
-                                # 3. 确定要翻译的内容
-                                text_to_translate = new_content if has_quote else body_original
-
-                                # 使用 vLLM 智能路由翻译（标题+正文一起翻译，提高上下文理解深度）
-                                result = translate_service.translate_with_smart_routing(
-                                    text=text_to_translate,
-                                    subject=email_data.get("subject_original", ""),
-                                    target_lang="zh",
-                                    source_lang=lang,
-                                    translate_subject=True  # 标题与正文一起翻译
-                                )
-                                body_translated = result["translated_text"]
-                                provider_used = result["provider_used"]
-                                complexity_info = result["complexity"]
-
-                                # 使用智能路由返回的标题翻译（如果有）
-                                if result.get("subject_translated"):
-                                    subject_translated = result["subject_translated"]
-                                    print(f"[SmartRouting] Email {email_data['message_id'][:20]}... "
-                                          f"→ {provider_used} (complexity: {complexity_info['level']}, "
-                                          f"score: {complexity_info['score']}, subject+body combined)")
-                                else:
-                                    print(f"[SmartRouting] Email {email_data['message_id'][:20]}... "
-                                          f"→ {provider_used} (complexity: {complexity_info['level']}, "
-                                          f"score: {complexity_info['score']})")
-                                # 4. 如果标题翻译为空但有原始标题，单独翻译标题
-                                if not subject_translated and email_data.get("subject_original"):
-                                    subject_translated = await translate_with_cache_async(
-                                        db, translate_service,
-                                        email_data["subject_original"], lang, "zh"
-                                    )
-
-                                # 5. 保存纯翻译结果（不含历史引用，避免递归叠加）
-                                pure_body_translated = body_translated  # 仅新内容的翻译
-
-                                # 6. 组合历史翻译（仅用于显示）
-                                display_body_translated = body_translated
-                                if has_quote:
-                                    if user_quote_display:
-                                        # 引用的是用户自己发送的邮件，显示用户原文
-                                        display_body_translated += user_quote_display
-                                    elif quoted_translation:
-                                        display_body_translated += f"\n\n--- 以下为引用内容（已翻译）---\n{quoted_translation}"
-                                    else:
-                                        # 没有找到历史翻译，显示原文摘要
-                                        truncated = quoted_content[:500] + ('...' if len(quoted_content) > 500 else '')
-                                        display_body_translated += f"\n\n--- 以下为引用内容（原文）---\n{truncated}"
-
-                            new_email.subject_translated = subject_translated
-                            new_email.body_translated = display_body_translated  # 显示用（含历史引用）
-                            # 只有当翻译结果非空时才标记为已翻译
-                            new_email.is_translated = bool(subject_translated or pure_body_translated)
-
-                            # 保存到共享翻译表（使用 upsert 防止并发插入冲突）
-                            # 重要：只存储 pure_body_translated（纯翻译，不含引用标记）
-                            # 其他用户复用时会动态组合引用翻译，避免 display 版本的时间点问题
-                            if subject_translated or pure_body_translated:
-                                from sqlalchemy.dialects.mysql import insert as mysql_insert
-                                stmt = mysql_insert(SharedEmailTranslation).values(
-                                    message_id=email_data["message_id"],
-                                    subject_translated=subject_translated,
-                                    body_translated=pure_body_translated,  # 存储纯翻译，不含引用
-                                    source_lang=lang,
-                                    target_lang="zh",
-                                    translated_by=account.id
-                                ).on_duplicate_key_update(
-                                    subject_translated=subject_translated,
-                                    body_translated=pure_body_translated,  # 存储纯翻译，不含引用
-                                    translated_by=account.id
-                                )
-                                await db.execute(stmt)
-                                print(f"[AutoTranslate] Translated ({provider_used}) and saved pure translation: {email_data['message_id'][:30]}")
-                            else:
-                                print(f"[AutoTranslate] Skip saving (empty translation): {email_data['message_id'][:30]}")
-
-                        translated_count += 1
-
-                        # 6. 触发后台 AI 提取任务（异步，不阻塞）
-                        try:
-                            from tasks.ai_tasks import extract_email_info_task
-                            extract_email_info_task.delay(new_email.id, account.id)
-                            print(f"[AutoExtract] Task queued for email_id={new_email.id}")
-                        except Exception as ex:
-                            # 记录失败但不阻塞，推送警告通知
-                            print(f"[AutoExtract] Failed to queue task: {ex}")
-                            try:
-                                from services.notification_service import send_notification
-                                await send_notification(
-                                    account.id,
-                                    "task_warning",
-                                    {"message": "AI 提取任务队列失败，请检查 Celery 服务", "email_id": new_email.id}
-                                )
-                            except Exception:
-                                pass  # 通知失败不阻塞
+        if shared:
+            # 使用共享翻译（存储的是纯翻译，需要动态组合引用）
+            new_email.subject_translated = shared.subject_translated
 
-                    except Exception as te:
-                        print(f"[AutoTranslate] Failed for {email_data['message_id'][:30]}: {te}")
+            # 动态组合引用翻译
+            display_translated = shared.body_translated or ""
+            in_reply_to = email_data.get("in_reply_to")
+            body_original = email_data.get("body_original", "")
 
-            # 最终提交（带重试）
-            for retry in range(3):
-                try:
-                    await db.commit()
-                    break
-                except Exception as commit_err:
-                    if retry < 2:
-                        print(f"[EmailSync] Final commit retry {retry + 1}/3: {commit_err}")
-                        await asyncio.sleep(2 ** retry)
+            if body_original and in_reply_to:
+                # 检测引用内容
+                _, quoted_content, user_original, was_translated = await restore_user_original_in_quotes(
+                    body_original, in_reply_to, db, sent_mappings=sent_map
+                )
+                if quoted_content:
+                    if user_original:
+                        # 引用的是用户自己发送的邮件
+                        if was_translated:
+                            display_translated += f"\n\n--- 以下为引用内容（您的原文）---\n{user_original}"
+                        else:
+                            display_translated += f"\n\n--- 以下为引用内容（您发送的原文）---\n{user_original}"
                     else:
-                        print(f"[EmailSync] Final commit failed after 3 retries: {commit_err}")
-                        raise
+                        # 查找引用邮件的翻译
+                        if shared_map is not None:
+                            quoted_shared = shared_map.get(in_reply_to)
+                        else:
+                            quoted_shared_result = await db.execute(
+                                select(SharedEmailTranslation).where(
+                                    SharedEmailTranslation.message_id == in_reply_to
+                                )
+                            )
+                            quoted_shared = quoted_shared_result.scalar_one_or_none()
+                        if quoted_shared and quoted_shared.body_translated:
+                            display_translated += f"\n\n--- 以下为引用内容（已翻译）---\n{quoted_shared.body_translated}"
+                        else:
+                            truncated = quoted_content[:500] + ('...' if len(quoted_content) > 500 else '')
+                            display_translated += f"\n\n--- 以下为引用内容（原文）---\n{truncated}"
 
-        print(f"[Background] Fetched {len(emails)} from IMAP, saved {saved_count} new, skipped {skipped_count} existing, auto-translated {translated_count} for {mask_email(account.email)}")
+            new_email.body_translated = display_translated
+            new_email.is_translated = True
+            new_email.translation_status = "completed"
+            print(f"[AutoTranslate] Used shared translation (with dynamic quote assembly) for {email_data['message_id'][:30]}")
+            return (new_email.id, False, True)
+    except Exception as te:
+        print(f"[AutoTranslate] Shared translation lookup failed for {email_data['message_id'][:30]}: {te}")
 
-    except Exception as e:
-        print(f"[Background] Error fetching emails for {mask_email(account.email)}: {e}")
-        traceback.print_exc()
-    finally:
-        # 确保 IMAP 连接被关闭（防止连接泄漏）
-        try:
-            await loop.run_in_executor(None, service.disconnect_imap)
-        except Exception:
-            pass  # 忽略断开连接时的错误
+    # 未命中共享翻译：标记为待翻译，由翻译入队阶段投递 Celery 任务
+    new_email.translation_status = "pending"
+    return (new_email.id, True, True)
 
 
 def extract_new_content_from_reply(body: str) -> tuple[str, str, int]:
@@ -1092,7 +1244,7 @@ def extract_new_content_from_reply(body: str) -> tuple[str, str, int]:
 
 
 async def restore_user_original_in_quotes(
-    body: str, in_reply_to: str, db
+    body: str, in_reply_to: str, db, sent_mappings: dict = None
 ) -> tuple[str, str, str, bool]:
     """
     检查引用内容是否是用户自己发送的邮件，如果是则返回用户的原文
@@ -1101,6 +1253,7 @@ async def restore_user_original_in_quotes(
         body: 邮件正文
         in_reply_to: In-Reply-To 头（回复的邮件 Message-ID）
         db: 数据库会话
+        sent_mappings: 批量预取的发送记录 {message_id: SentEmailMapping}，提供时不再查询数据库
 
     Returns:
         (new_content, quoted_content, user_original, was_translated)
@@ -1116,12 +1269,15 @@ async def restore_user_original_in_quotes(
         return new_content, quoted_content, None, False
 
     # 查找发送邮件映射
-    result = await db.execute(
-        select(SentEmailMapping).where(
-            SentEmailMapping.message_id == in_reply_to
+    if sent_mappings is not None:
+        mapping = sent_mappings.get(in_reply_to)
+    else:
+        result = await db.execute(
+            select(SentEmailMapping).where(
+                SentEmailMapping.message_id == in_reply_to
+            )
         )
-    )
-    mapping = result.scalar_one_or_none()
+        mapping = result.scalar_one_or_none()
 
     if mapping and mapping.body_original:
         print(f"[RestoreUserOriginal] Found mapping for {in_reply_to[:30]}..., was_translated={mapping.was_translated}")
@@ -1131,54 +1287,23 @@ async def restore_user_original_in_quotes(
 
 
 async def translate_with_cache_async(db, translate_service, text: str, source_lang: str, target_lang: str) -> str:
-    """带缓存的翻译（异步版本，L1 Redis → L2 MySQL）"""
-    import hashlib
-    from database.models import TranslationCache
+    """带缓存的翻译（异步版本，分段翻译记忆：Redis → MySQL → vLLM 只翻译未命中的段）
+
+    translate_service 需为 AsyncTranslateService
+    """
+    from services.translation_memory import translate_segments_async
 
     if not text:
         return ""
 
-    # 计算缓存键
-    cache_key = hashlib.sha256(f"{text}|{source_lang or 'auto'}|{target_lang}".encode()).hexdigest()
-    redis_key = f"trans:{cache_key}"
-
-    # L1: 先查 Redis（毫秒级）
-    redis_result = cache_get(redis_key)
-    if redis_result:
-        print(f"[Redis HIT] text={text[:30]}...")
-        return redis_result
+    async def translate_run(run_text: str, context: str = None) -> str:
+        return await translate_service.translate_text(
+            text=run_text, target_lang=target_lang, source_lang=source_lang, context=context
+        )
 
-    # L2: Redis 未命中，查 MySQL
-    cache_result = await db.execute(
-        select(TranslationCache).where(TranslationCache.text_hash == cache_key)
-    )
-    cached = cache_result.scalar_one_or_none()
-
-    if cached:
-        cached.hit_count += 1
-        # 写回 Redis（预热 L1 缓存）
-        cache_set(redis_key, cached.translated_text, ttl=3600)
-        print(f"[MySQL HIT] hit_count={cached.hit_count}")
-        return cached.translated_text
-
-    # 调用翻译 API
-    translated = translate_service.translate_text(text=text, target_lang=target_lang)
-
-    # L1: 写入 Redis
-    cache_set(redis_key, translated, ttl=3600)
-
-    # L2: 保存到 MySQL（持久化）
-    new_cache = TranslationCache(
-        text_hash=cache_key,
-        source_text=text,
-        translated_text=translated,
-        source_lang=source_lang,
-        target_lang=target_lang
+    return await translate_segments_async(
+        db, text, target_lang, translate_run, source_lang=source_lang
     )
-    db.add(new_cache)
-    print(f"[Cache SAVE] Redis + MySQL, text={text[:30]}...")
-
-    return translated
 
 
 async def smart_translate_email_body(
@@ -1264,48 +1389,15 @@ async def get_email_stats(
     account: EmailAccount = Depends(get_current_account),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取邮件统计"""
-    # 总数
-    total_result = await db.execute(
-        select(func.count(Email.id)).where(Email.account_id == account.id)
-    )
-    total = total_result.scalar()
-
-    # 收件
-    inbound_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            Email.direction == "inbound"
-        )
-    )
-    inbound = inbound_result.scalar()
-
-    # 未翻译
-    untranslated_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            Email.is_translated == False,
-            Email.direction == "inbound"
-        )
-    )
-    untranslated = untranslated_result.scalar()
-
-    # 未读邮件数
-    unread_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            Email.is_read == False,
-            Email.direction == "inbound"
-        )
-    )
-    unread = unread_result.scalar()
+    """获取邮件统计（读取预先维护的计数，见 database.email_counters）"""
+    counters = await email_counters.get_counters(db, account.id)
 
     return {
-        "total": total,
-        "inbound": inbound,
-        "outbound": total - inbound,
-        "untranslated": untranslated,
-        "unread": unread
+        "total": counters.total,
+        "inbound": counters.inbound,
+        "outbound": counters.total - counters.inbound,
+        "untranslated": counters.untranslated_inbound,
+        "unread": counters.unread_inbound
     }
 
 
@@ -1933,11 +2025,10 @@ async def translate_email(
     Args:
         force: 强制重新翻译，清除已有缓存和共享翻译
     """
-    from database.models import SharedEmailTranslation, TranslationCache
-    from services.translate_service import TranslateService
+    from database.models import SharedEmailTranslation
+    from services.translate_service import AsyncTranslateService
     from config import get_settings
     from sqlalchemy import and_, delete
-    import hashlib
 
     settings = get_settings()
 
@@ -2052,57 +2143,14 @@ async def translate_email(
                 print(f"[SharedTranslation] Used with dynamic quote assembly for {email.message_id}")
                 return email
 
-        # 2. 翻译辅助函数（带缓存，L1 Redis → L2 MySQL）
+        # 2. 翻译辅助函数（分段翻译记忆）
         async def translate_with_cache(text: str, source_lang: str, target_lang: str) -> str:
-            if not text:
-                return ""
-
-            # 计算缓存键
-            cache_key = hashlib.sha256(f"{text}|{source_lang or 'auto'}|{target_lang}".encode()).hexdigest()
-            redis_key = f"trans:{cache_key}"
-
-            # L1: 先查 Redis（毫秒级）
-            redis_result = cache_get(redis_key)
-            if redis_result:
-                print(f"[Redis HIT] text={text[:30]}...")
-                return redis_result
-
-            # L2: Redis 未命中，查 MySQL
-            cache_result = await db.execute(
-                select(TranslationCache).where(TranslationCache.text_hash == cache_key)
-            )
-            cached = cache_result.scalar_one_or_none()
-            if cached:
-                cached.hit_count += 1
-                # 写回 Redis（预热 L1 缓存）
-                cache_set(redis_key, cached.translated_text, ttl=3600)
-                print(f"[MySQL HIT] hit_count={cached.hit_count}")
-                return cached.translated_text
-
-            # 调用翻译 API（使用本地 vLLM）
-            service = TranslateService(
+            service = AsyncTranslateService(
                 vllm_base_url=settings.vllm_base_url,
                 vllm_model=settings.vllm_model,
                 vllm_api_key=settings.vllm_api_key,
             )
-
-            translated = service.translate_text(text=text, target_lang=target_lang)
-
-            # L1: 写入 Redis
-            cache_set(redis_key, translated, ttl=3600)
-
-            # L2: 保存到 MySQL（持久化）
-            new_cache = TranslationCache(
-                text_hash=cache_key,
-                source_text=text,
-                translated_text=translated,
-                source_lang=source_lang,
-                target_lang=target_lang
-            )
-            db.add(new_cache)
-            print(f"[Cache SAVE] Redis + MySQL, text={text[:30]}...")
-
-            return translated
+            return await translate_with_cache_async(db, service, text, source_lang, target_lang)
 
         # 3. 执行翻译
         source_lang = email.language_detected or "auto"
@@ -2122,8 +2170,8 @@ async def translate_email(
         display_body_translated = "" # 显示翻译，用于 Email.body_translated
         provider_used = "unknown"
         if body_to_translate:
-            # 创建翻译服务（使用本地 vLLM）
-            service = TranslateService(
+            # 创建翻译服务（使用本地 vLLM，异步版本）
+            service = AsyncTranslateService(
                 vllm_base_url=settings.vllm_base_url,
                 vllm_model=settings.vllm_model,
                 vllm_api_key=settings.vllm_api_key,
@@ -2148,13 +2196,27 @@ async def translate_email(
 
                 content_to_translate = new_content if has_quote else body_to_translate
 
-                result = service.translate_with_smart_routing(
-                    text=content_to_translate,
-                    subject=email.subject_original or "",
-                    target_lang="zh",
-                    source_lang=source_lang,
-                    translate_subject=True  # 标题与正文一起翻译，提高上下文理解
-                )
+                if await notification_manager.has_listeners(account.id):
+                    # 客户端在线：流式翻译，边生成边通过 WebSocket 推送 translation_delta
+                    from services.notification_service import TranslationDeltaNotifier
+                    delta_notifier = TranslationDeltaNotifier(account.id, email.id)
+                    result = await service.translate_with_smart_routing_stream(
+                        text=content_to_translate,
+                        subject=email.subject_original or "",
+                        target_lang="zh",
+                        source_lang=source_lang,
+                        translate_subject=True,
+                        on_delta=delta_notifier.push
+                    )
+                    await delta_notifier.flush(done=True)
+                else:
+                    result = await service.translate_with_smart_routing(
+                        text=content_to_translate,
+                        subject=email.subject_original or "",
+                        target_lang="zh",
+                        source_lang=source_lang,
+                        translate_subject=True  # 标题与正文一起翻译，提高上下文理解
+                    )
                 pure_body_translated = result["translated_text"]
                 provider_used = result["provider_used"]
                 complexity_info = result["complexity"]
@@ -9,7 +9,9 @@ import re
 
 from database.database import get_db
 from database.models import EmailFolder, Email, EmailAccount, email_folder_mappings
+from database.email_list import list_load_options
 from routers.users import get_current_account
+from routers.emails import EmailListItemResponse
 
 router = APIRouter(prefix="/api/folders", tags=["folders"])
 
@@ -106,6 +108,12 @@ class FolderStatsResponse(BaseModel):
     max_depth: int = 0
 
 
+class FolderEmailsResponse(BaseModel):
+    """文件夹邮件列表响应"""
+    emails: List[EmailListItemResponse]
+    total: int
+
+
 # ============ Routes ============
 @router.get("", response_model=List[FolderResponse])
 async def get_folders(
@@ -470,7 +478,7 @@ async def remove_email_from_folder(
         return {"message": "邮件不在此文件夹中"}
 
 
-@router.get("/{folder_id}/emails")
+@router.get("/{folder_id}/emails", response_model=FolderEmailsResponse)
 async def get_folder_emails(
     folder_id: int,
     limit: int = 50,
@@ -488,11 +496,12 @@ async def get_folder_emails(
     if not folder:
         raise HTTPException(status_code=404, detail="文件夹不存在")
 
-    # 查询文件夹中的邮件
+    # 查询文件夹中的邮件（列表投影，不加载正文）
     email_result = await db.execute(
         select(Email)
         .join(email_folder_mappings, Email.id == email_folder_mappings.c.email_id)
         .where(email_folder_mappings.c.folder_id == folder_id)
+        .options(*list_load_options())
         .order_by(Email.received_at.desc())
         .limit(limit)
         .offset(offset)
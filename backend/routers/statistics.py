@@ -15,6 +15,7 @@ from pydantic import BaseModel
 from sqlalchemy import select, func, case, and_, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database import email_counters
 from database.database import get_db
 from database.models import (
     Email, EmailAccount, Supplier, TranslationUsage,
@@ -78,47 +79,9 @@ async def get_overview_stats(
     week_start = today_start - timedelta(days=now.weekday())
     month_start = today_start.replace(day=1)
 
-    # 总邮件数
-    total_result = await db.execute(
-        select(func.count(Email.id)).where(Email.account_id == current_account.id)
-    )
-    total_emails = total_result.scalar() or 0
-
-    # 未读邮件
-    unread_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == current_account.id,
-            Email.is_read == False
-        )
-    )
-    unread_emails = unread_result.scalar() or 0
-
-    # 已翻译邮件
-    translated_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == current_account.id,
-            Email.is_translated == True
-        )
-    )
-    translated_emails = translated_result.scalar() or 0
-
-    # 星标邮件
-    flagged_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == current_account.id,
-            Email.is_flagged == True
-        )
-    )
-    flagged_emails = flagged_result.scalar() or 0
-
-    # 供应商数
-    suppliers_result = await db.execute(
-        select(func.count(func.distinct(Email.supplier_id))).where(
-            Email.account_id == current_account.id,
-            Email.supplier_id.isnot(None)
-        )
-    )
-    total_suppliers = suppliers_result.scalar() or 0
+    # 总数/未读/已翻译/星标/供应商数读取预先维护的计数（database.email_counters）
+    counters = await email_counters.get_counters(db, current_account.id)
+    total_suppliers = await email_counters.count_suppliers(db, current_account.id)
 
     # 草稿数
     drafts_result = await db.execute(
@@ -129,38 +92,17 @@ async def get_overview_stats(
     )
     total_drafts = drafts_result.scalar() or 0
 
-    # 今日邮件
-    today_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == current_account.id,
-            Email.received_at >= today_start
-        )
-    )
-    emails_today = today_result.scalar() or 0
-
-    # 本周邮件
-    week_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == current_account.id,
-            Email.received_at >= week_start
-        )
-    )
-    emails_this_week = week_result.scalar() or 0
-
-    # 本月邮件
-    month_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == current_account.id,
-            Email.received_at >= month_start
-        )
-    )
-    emails_this_month = month_result.scalar() or 0
+    # 今日/本周/本月邮件：按日计数求和
+    daily = await email_counters.get_daily_counts(db, current_account.id, min(week_start, month_start).date())
+    emails_today = daily.get(today_start.date(), 0)
+    emails_this_week = sum(count for day, count in daily.items() if day >= week_start.date())
+    emails_this_month = sum(count for day, count in daily.items() if day >= month_start.date())
 
     return OverviewStats(
-        total_emails=total_emails,
-        unread_emails=unread_emails,
-        translated_emails=translated_emails,
-        flagged_emails=flagged_emails,
+        total_emails=counters.total,
+        unread_emails=counters.unread,
+        translated_emails=counters.translated,
+        flagged_emails=counters.flagged,
         total_suppliers=total_suppliers,
         total_drafts=total_drafts,
         emails_today=emails_today,
@@ -4,14 +4,16 @@ from sqlalchemy import select, func, delete, and_, insert
 from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from database.database import get_db
+from database.email_domains import normalize_domain
 from database.models import (
-    EmailAccount, Supplier, Glossary, Email,
+    EmailAccount, Supplier, Glossary,
     SupplierDomain, SupplierContact, SupplierTag, supplier_tag_mappings
 )
 from routers.users import get_current_account
+from utils.supplier_stats import EMPTY_DOMAIN_STATS, get_domain_stats
 
 router = APIRouter(prefix="/api/suppliers", tags=["suppliers"])
 
@@ -499,22 +501,45 @@ async def delete_supplier(
 
 
 # ============ 供应商统计 API ============
+def _build_supplier_stats(supplier: Supplier, stats: Optional[dict], glossary_count: int) -> SupplierStatsResponse:
+    """由域名统计（utils.supplier_stats）生成供应商统计"""
+    stats = stats or EMPTY_DOMAIN_STATS
+    return SupplierStatsResponse(
+        supplier_id=supplier.id,
+        supplier_name=supplier.name,
+        email_domain=supplier.email_domain,
+        total_emails=stats["received"] + stats["sent"],
+        received_emails=stats["received"],
+        sent_emails=stats["sent"],
+        unread_emails=stats["unread"],
+        translated_emails=stats["translated"],
+        last_email_date=stats["last_email_date"],
+        emails_last_7_days=stats["last_7_days"],
+        emails_last_30_days=stats["last_30_days"],
+        glossary_count=glossary_count
+    )
+
+
 @router.get("/stats/all", response_model=AllSuppliersStatsResponse)
 async def get_all_suppliers_stats(
     account: EmailAccount = Depends(get_current_account),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取所有供应商的邮件统计汇总"""
-    now = datetime.utcnow()
-    seven_days_ago = now - timedelta(days=7)
-    thirty_days_ago = now - timedelta(days=30)
-
+    """获取所有供应商的邮件统计汇总（按域名聚合，见 utils.supplier_stats）"""
     # 获取所有供应商
     supplier_result = await db.execute(
         select(Supplier).order_by(Supplier.name)
     )
     suppliers = supplier_result.scalars().all()
 
+    domain_stats = await get_domain_stats(db, account.id)
+
+    # 术语表数量
+    glossary_result = await db.execute(
+        select(Glossary.supplier_id, func.count(Glossary.id)).group_by(Glossary.supplier_id)
+    )
+    glossary_counts = dict(glossary_result.all())
+
     suppliers_with_stats = []
     total_emails_from_suppliers = 0
     most_active_supplier = None
@@ -522,7 +547,8 @@ async def get_all_suppliers_stats(
     suppliers_without_emails = []
 
     for supplier in suppliers:
-        if not supplier.email_domain:
+        domain = normalize_domain(supplier.email_domain)
+        if not domain:
             suppliers_without_emails.append({
                 "id": supplier.id,
                 "name": supplier.name,
@@ -530,30 +556,8 @@ async def get_all_suppliers_stats(
             })
             continue
 
-        domain = supplier.email_domain.lower()
-
-        # 统计该供应商的邮件
-        # 收到的邮件（发件人域名匹配）
-        received_result = await db.execute(
-            select(func.count(Email.id)).where(
-                Email.account_id == account.id,
-                func.lower(Email.sender).like(f"%@{domain}%")
-            )
-        )
-        received_count = received_result.scalar() or 0
-
-        # 发送的邮件（收件人域名匹配）
-        sent_result = await db.execute(
-            select(func.count(Email.id)).where(
-                Email.account_id == account.id,
-                func.lower(Email.recipients).like(f"%@{domain}%")
-            )
-        )
-        sent_count = sent_result.scalar() or 0
-
-        total_emails = received_count + sent_count
-
-        if total_emails == 0:
+        stats = _build_supplier_stats(supplier, domain_stats.get(domain), glossary_counts.get(supplier.id, 0))
+        if stats.total_emails == 0:
             suppliers_without_emails.append({
                 "id": supplier.id,
                 "name": supplier.name,
@@ -562,84 +566,15 @@ async def get_all_suppliers_stats(
             })
             continue
 
-        # 未读邮件
-        unread_result = await db.execute(
-            select(func.count(Email.id)).where(
-                Email.account_id == account.id,
-                func.lower(Email.sender).like(f"%@{domain}%"),
-                Email.is_read == False
-            )
-        )
-        unread_count = unread_result.scalar() or 0
-
-        # 已翻译邮件
-        translated_result = await db.execute(
-            select(func.count(Email.id)).where(
-                Email.account_id == account.id,
-                func.lower(Email.sender).like(f"%@{domain}%"),
-                Email.body_translated.isnot(None)
-            )
-        )
-        translated_count = translated_result.scalar() or 0
-
-        # 最近邮件日期
-        last_email_result = await db.execute(
-            select(func.max(Email.received_at)).where(
-                Email.account_id == account.id,
-                func.lower(Email.sender).like(f"%@{domain}%")
-            )
-        )
-        last_email_date = last_email_result.scalar()
-
-        # 最近7天邮件
-        recent_7_result = await db.execute(
-            select(func.count(Email.id)).where(
-                Email.account_id == account.id,
-                func.lower(Email.sender).like(f"%@{domain}%"),
-                Email.received_at >= seven_days_ago
-            )
-        )
-        recent_7_count = recent_7_result.scalar() or 0
-
-        # 最近30天邮件
-        recent_30_result = await db.execute(
-            select(func.count(Email.id)).where(
-                Email.account_id == account.id,
-                func.lower(Email.sender).like(f"%@{domain}%"),
-                Email.received_at >= thirty_days_ago
-            )
-        )
-        recent_30_count = recent_30_result.scalar() or 0
-
-        # 术语表数量
-        glossary_result = await db.execute(
-            select(func.count(Glossary.id)).where(Glossary.supplier_id == supplier.id)
-        )
-        glossary_count = glossary_result.scalar() or 0
-
-        stats = SupplierStatsResponse(
-            supplier_id=supplier.id,
-            supplier_name=supplier.name,
-            email_domain=supplier.email_domain,
-            total_emails=total_emails,
-            received_emails=received_count,
-            sent_emails=sent_count,
-            unread_emails=unread_count,
-            translated_emails=translated_count,
-            last_email_date=last_email_date,
-            emails_last_7_days=recent_7_count,
-            emails_last_30_days=recent_30_count,
-            glossary_count=glossary_count
-        )
         suppliers_with_stats.append(stats)
-        total_emails_from_suppliers += total_emails
+        total_emails_from_suppliers += stats.total_emails
 
-        if total_emails > max_emails:
-            max_emails = total_emails
+        if stats.total_emails > max_emails:
+            max_emails = stats.total_emails
             most_active_supplier = {
                 "id": supplier.id,
                 "name": supplier.name,
-                "total_emails": total_emails
+                "total_emails": stats.total_emails
             }
 
     return AllSuppliersStatsResponse(
@@ -666,80 +601,11 @@ async def get_supplier_stats(
     if not supplier:
         raise HTTPException(status_code=404, detail="供应商不存在")
 
-    if not supplier.email_domain:
+    domain = normalize_domain(supplier.email_domain)
+    if not domain:
         raise HTTPException(status_code=400, detail="该供应商未设置邮箱域名，无法统计邮件")
 
-    now = datetime.utcnow()
-    seven_days_ago = now - timedelta(days=7)
-    thirty_days_ago = now - timedelta(days=30)
-    domain = supplier.email_domain.lower()
-
-    # 收到的邮件
-    received_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            func.lower(Email.sender).like(f"%@{domain}%")
-        )
-    )
-    received_count = received_result.scalar() or 0
-
-    # 发送的邮件
-    sent_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            func.lower(Email.recipients).like(f"%@{domain}%")
-        )
-    )
-    sent_count = sent_result.scalar() or 0
-
-    # 未读邮件
-    unread_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            func.lower(Email.sender).like(f"%@{domain}%"),
-            Email.is_read == False
-        )
-    )
-    unread_count = unread_result.scalar() or 0
-
-    # 已翻译邮件
-    translated_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            func.lower(Email.sender).like(f"%@{domain}%"),
-            Email.body_translated.isnot(None)
-        )
-    )
-    translated_count = translated_result.scalar() or 0
-
-    # 最近邮件日期
-    last_email_result = await db.execute(
-        select(func.max(Email.received_at)).where(
-            Email.account_id == account.id,
-            func.lower(Email.sender).like(f"%@{domain}%")
-        )
-    )
-    last_email_date = last_email_result.scalar()
-
-    # 最近7天邮件
-    recent_7_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            func.lower(Email.sender).like(f"%@{domain}%"),
-            Email.received_at >= seven_days_ago
-        )
-    )
-    recent_7_count = recent_7_result.scalar() or 0
-
-    # 最近30天邮件
-    recent_30_result = await db.execute(
-        select(func.count(Email.id)).where(
-            Email.account_id == account.id,
-            func.lower(Email.sender).like(f"%@{domain}%"),
-            Email.received_at >= thirty_days_ago
-        )
-    )
-    recent_30_count = recent_30_result.scalar() or 0
+    domain_stats = await get_domain_stats(db, account.id)
 
     # 术语表数量
     glossary_result = await db.execute(
@@ -747,20 +613,7 @@ async def get_supplier_stats(
     )
     glossary_count = glossary_result.scalar() or 0
 
-    return SupplierStatsResponse(
-        supplier_id=supplier.id,
-        supplier_name=supplier.name,
-        email_domain=supplier.email_domain,
-        total_emails=received_count + sent_count,
-        received_emails=received_count,
-        sent_emails=sent_count,
-        unread_emails=unread_count,
-        translated_emails=translated_count,
-        last_email_date=last_email_date,
-        emails_last_7_days=recent_7_count,
-        emails_last_30_days=recent_30_count,
-        glossary_count=glossary_count
-    )
+    return _build_supplier_stats(supplier, domain_stats.get(domain), glossary_count)
 
 
 # ============ 新增 Schemas ============
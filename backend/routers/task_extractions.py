@@ -17,6 +17,8 @@ from datetime import datetime
 from pydantic import BaseModel
 
 from database.database import get_db
+from database import search_index
+from database.email_list import make_snippet
 from database.models import TaskExtraction, Email
 from routers.users import get_current_account
 from services.portal_integration import portal_integration_service
@@ -592,7 +594,7 @@ async def portal_translate_email(
     用于翻译失败的邮件，在导入任务时现场翻译
     检测语言，如果不是中文则翻译
     """
-    from services.translate_service import TranslateService
+    from services.translate_service import AsyncTranslateService
     from config import get_settings
     from sqlalchemy import update
 
@@ -630,14 +632,14 @@ async def portal_translate_email(
     else:
         # 非中文，调用翻译服务
         try:
-            service = TranslateService(
+            service = AsyncTranslateService(
                 vllm_base_url=settings.vllm_base_url,
                 vllm_model=settings.vllm_model,
                 vllm_api_key=settings.vllm_api_key,
             )
 
             # 使用智能路由翻译（标题和正文一起翻译提高上下文理解）
-            result = service.translate_with_smart_routing(
+            result = await service.translate_with_smart_routing(
                 text=email.body_original or "",
                 subject=email.subject_original or "",
                 target_lang="zh",
@@ -663,11 +665,13 @@ async def portal_translate_email(
         .values(
             subject_translated=subject_translated,
             body_translated=body_translated,
+            snippet_translated=make_snippet(body_translated),
             language_detected=language_detected,
             is_translated=True,  # 修复：同时更新 is_translated 标志
             translation_status="completed"
         )
     )
+    await search_index.reindex_emails(db, [email_id])
     await db.commit()
 
     return {
@@ -103,9 +103,10 @@ async def submit_translate_task(
     Returns:
         任务提交信息
     """
-    from tasks.translate_tasks import translate_email_task
+    from shared.translation_scheduler import submit_interactive
 
-    task = translate_email_task.delay(email_id, account.id, force)
+    # 交互通道：最高优先级，不排在批量翻译之后
+    task = submit_interactive(email_id, account.id, force)
 
     return TaskSubmitResponse(
         task_id=task.id,
@@ -9,10 +9,12 @@ import hashlib
 from database.database import get_db
 from database import crud
 from database.models import EmailAccount, Glossary, TranslationCache
-from services.translate_service import TranslateService
+from services.translate_service import AsyncTranslateService
+from services.translation_memory import translate_segments_async
+from services import translation_cache_policy
 from routers.users import get_current_account
 from config import get_settings
-from shared.cache_config import cache_get, cache_set
+from shared.tiered_cache import translation_cache
 from utils.rate_limit import translate_limiter, batch_limiter
 
 router = APIRouter(prefix="/api/translate", tags=["translate"])
@@ -55,76 +57,94 @@ def compute_cache_key(text: str, source_lang: str, target_lang: str,
 
 async def get_cached_translation(db: AsyncSession, text: str, source_lang: str, target_lang: str,
                                   glossary_hash: str = None) -> Optional[str]:
-    """从缓存获取翻译结果（L1 Redis → L2 MySQL）"""
+    """从缓存获取翻译结果（L0 进程内 → L1 Redis → L2 MySQL）"""
     cache_key = compute_cache_key(text, source_lang, target_lang, glossary_hash)
     redis_key = f"trans:{cache_key}"
 
-    # L1: 先查 Redis（毫秒级）
-    redis_result = cache_get(redis_key)
-    if redis_result:
-        print(f"[Redis HIT] text={text[:30]}...")
-        return redis_result
+    # L0/L1: 进程内 LRU → Redis（异步，Redis 故障时熔断跳过）
+    cached_text = await translation_cache.get(redis_key)
+    if cached_text:
+        # 命中次数只在 Redis 累加，由定时任务批量写回 MySQL
+        await translation_cache_policy.record_hits([cache_key])
+        print(f"[Cache HIT] text={text[:30]}...")
+        return cached_text
 
     # L2: Redis 未命中，查 MySQL
     result = await db.execute(
-        select(TranslationCache).where(TranslationCache.text_hash == cache_key)
+        select(TranslationCache.translated_text).where(TranslationCache.text_hash == cache_key)
     )
-    cached = result.scalar_one_or_none()
+    cached_text = result.scalar_one_or_none()
 
-    if cached:
-        # 更新命中次数
-        cached.hit_count += 1
-        await db.commit()
-        # 写回 Redis（预热 L1 缓存）
-        cache_set(redis_key, cached.translated_text, ttl=3600)
-        print(f"[MySQL HIT] hit_count={cached.hit_count}, text={text[:30]}...")
-        return cached.translated_text
+    if cached_text:
+        await translation_cache_policy.record_hits([cache_key])
+        # 写回 L0/L1（预热缓存）
+        await translation_cache.set(redis_key, cached_text, ttl=3600)
+        print(f"[MySQL HIT] text={text[:30]}...")
+        return cached_text
 
     return None
 
 
 async def save_to_cache(db: AsyncSession, text: str, translated: str, source_lang: str, target_lang: str,
                         glossary_hash: str = None):
-    """保存翻译结果到缓存（L1 Redis + L2 MySQL）"""
+    """保存翻译结果到缓存（L0/L1 + L2 MySQL）"""
     cache_key = compute_cache_key(text, source_lang, target_lang, glossary_hash)
     redis_key = f"trans:{cache_key}"
 
-    # L1: 写入 Redis（热点缓存，1小时过期）
-    cache_set(redis_key, translated, ttl=3600)
+    # L0/L1: 写入进程内 LRU 和 Redis（热点缓存，Redis 1小时过期）
+    await translation_cache.set(redis_key, translated, ttl=3600)
 
     # L2: 写入 MySQL（持久化）
     # 检查是否已存在（避免重复插入）
     result = await db.execute(
-        select(TranslationCache).where(TranslationCache.text_hash == cache_key)
+        select(TranslationCache.id).where(TranslationCache.text_hash == cache_key)
     )
     if result.scalar_one_or_none():
         print(f"[Cache SAVE] Redis only (MySQL exists), text={text[:30]}...")
         return
 
-    cache_entry = TranslationCache(
-        text_hash=cache_key,
-        source_text=text,
-        translated_text=translated,
-        source_lang=source_lang,
-        target_lang=target_lang
-    )
-    db.add(cache_entry)
+    # 大条目第一次出现只留在 Redis，再次出现才持久化
+    rows = await translation_cache_policy.admit([
+        translation_cache_policy.build_row(cache_key, text, translated, source_lang, target_lang)
+    ])
+    if not rows:
+        print(f"[Cache SAVE] Redis only (not admitted), text={text[:30]}...")
+        return
+
+    db.add(TranslationCache(**rows[0]))
     await db.commit()
     print(f"[Cache SAVE] Redis + MySQL, text={text[:30]}...")
 
 
-def get_translate_service() -> TranslateService:
+def get_translate_service() -> AsyncTranslateService:
     """Get configured translation service instance
 
     使用本地 vLLM 大模型进行翻译（免费，数据本地化）
+    返回异步版本，路由中 await 调用，不阻塞事件循环
     """
-    return TranslateService(
+    return AsyncTranslateService(
         vllm_base_url=settings.vllm_base_url,
         vllm_model=settings.vllm_model,
         vllm_api_key=settings.vllm_api_key,
     )
 
 
+async def translate_with_memory(db: AsyncSession, text: str, target_lang: str,
+                                source_lang: str = None, glossary: List[dict] = None) -> str:
+    """按段查翻译记忆，未命中的段调用 vLLM 翻译（新译文写入记忆，随请求提交）"""
+    service = get_translate_service()
+
+    async def translate_run(run_text: str, context: str = None) -> str:
+        return await service.translate_text(
+            text=run_text, target_lang=target_lang, glossary=glossary,
+            context=context, source_lang=source_lang
+        )
+
+    return await translate_segments_async(
+        db, text, target_lang, translate_run, source_lang=source_lang, glossary=glossary
+    )
+
+
 # ============ Schemas ============
 class TranslateRequest(BaseModel):
     text: str
@@ -190,16 +210,9 @@ async def translate_text(
         glossary = [{"source": t.term_source, "target": t.term_target} for t in terms]
 
     try:
-        service = get_translate_service()
-
-        # 使用 vLLM 本地模型翻译
-        result = service.translate_with_smart_routing(
-            text=request.text,
-            target_lang=request.target_lang,
-            glossary=glossary
-        )
-        translated = result["translated_text"]
-        source_lang = result.get("provider_used", "vllm")
+        # 分段翻译记忆：只有未命中的段落/句子交给 vLLM
+        translated = await translate_with_memory(db, request.text, request.target_lang, glossary=glossary)
+        source_lang = "vllm"
 
         # 保存到缓存
         await save_to_cache(db, request.text, translated, None, request.target_lang)
@@ -233,17 +246,10 @@ async def translate_reply(
         glossary = [{"source": t.term_target, "target": t.term_source} for t in terms]
 
     try:
-        service = get_translate_service()
-
-        # 使用 vLLM 本地模型翻译
-        result = service.translate_with_smart_routing(
-            text=request.text,
-            target_lang=request.target_lang,
-            glossary=glossary,
-            source_lang="zh"
-        )
-        translated = result["translated_text"]
-        source_lang = result.get("provider_used", "vllm")
+        # 分段翻译记忆：只有未命中的段落/句子交给 vLLM
+        translated = await translate_with_memory(db, request.text, request.target_lang,
+                                                 source_lang="zh", glossary=glossary)
+        source_lang = "vllm"
 
         # 保存到缓存
         await save_to_cache(db, request.text, translated, "zh", request.target_lang)
@@ -291,47 +297,59 @@ async def create_batch_translation(
     if not batch_data:
         return {"message": "没有需要翻译的邮件"}
 
+    import asyncio
+
     try:
         service = get_translate_service()
         results = []
         success_count = 0
 
-        for item in batch_data:
-            try:
-                # 翻译主题
-                subject_translated = item.get("subject", "")
-                if subject_translated:
-                    result = service.translate_with_smart_routing(
-                        text=subject_translated,
-                        target_lang=item.get("target_lang", "zh"),
-                        source_lang=item.get("source_lang")
-                    )
-                    subject_translated = result.get("translated_text", subject_translated)
-
-                # 翻译正文
-                body_translated = item.get("body", "")
-                if body_translated:
-                    result = service.translate_with_smart_routing(
-                        text=body_translated,
-                        target_lang=item.get("target_lang", "zh"),
-                        source_lang=item.get("source_lang")
-                    )
-                    body_translated = result.get("translated_text", body_translated)
-
-                # 更新数据库
-                await crud.update_email_translation(
-                    db,
-                    item["id"],
-                    subject_translated,
-                    body_translated
+        async def translate_item(item):
+            # 翻译主题
+            subject_translated = item.get("subject", "")
+            if subject_translated:
+                result = await service.translate_with_smart_routing(
+                    text=subject_translated,
+                    target_lang=item.get("target_lang", "zh"),
+                    source_lang=item.get("source_lang")
+                )
+                subject_translated = result.get("translated_text", subject_translated)
+
+            # 翻译正文
+            body_translated = item.get("body", "")
+            if body_translated:
+                result = await service.translate_with_smart_routing(
+                    text=body_translated,
+                    target_lang=item.get("target_lang", "zh"),
+                    source_lang=item.get("source_lang")
                 )
+                body_translated = result.get("translated_text", body_translated)
 
-                results.append({"email_id": item["id"], "success": True})
-                success_count += 1
+            return subject_translated, body_translated
+
+        # 多封邮件并发翻译（并发数由 vLLM 客户端的进程级限流控制），数据库按顺序更新
+        translations = await asyncio.gather(
+            *(translate_item(item) for item in batch_data),
+            return_exceptions=True
+        )
 
-            except Exception as e:
-                print(f"[Batch] Failed to translate email {item['id']}: {e}")
-                results.append({"email_id": item["id"], "success": False, "error": str(e)})
+        for item, translated in zip(batch_data, translations):
+            if isinstance(translated, Exception):
+                print(f"[Batch] Failed to translate email {item['id']}: {translated}")
+                results.append({"email_id": item["id"], "success": False, "error": str(translated)})
+                continue
+
+            subject_translated, body_translated = translated
+            # 更新数据库
+            await crud.update_email_translation(
+                db,
+                item["id"],
+                subject_translated,
+                body_translated
+            )
+
+            results.append({"email_id": item["id"], "success": True})
+            success_count += 1
 
         await db.commit()
 
@@ -878,6 +896,10 @@ async def get_cache_stats(
     hits_result = await db.execute(select(func.sum(TranslationCache.hit_count)))
     total_hits = hits_result.scalar() or 0
 
+    # 压缩后占用的存储空间
+    size_result = await db.execute(select(func.sum(TranslationCache.size_bytes)))
+    total_bytes = size_result.scalar() or 0
+
     # 节省的 API 调用次数 = 总命中 - 总条目（因为第一次不算命中）
     api_calls_saved = max(0, total_hits - total_entries)
 
@@ -893,6 +915,8 @@ async def get_cache_stats(
         "total_entries": total_entries,
         "total_hits": total_hits,
         "api_calls_saved": api_calls_saved,
+        "total_bytes": int(total_bytes),
+        "max_bytes": translation_cache_policy.MAX_BYTES,
         "top_cached": [
             {
                 "text": entry.source_text[:50] + "..." if len(entry.source_text) > 50 else entry.source_text,
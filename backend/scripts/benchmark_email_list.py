@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+邮件列表投影基准测试
+
+对比邮件列表接口两种查询方式的查询耗时和响应体大小：
+- full: 旧方式，加载完整 Email 行（正文原文/译文/HTML、收件人列表等），按 EmailResponse 序列化
+- slim: 列表投影（database.email_list），只加载列表列和预览，按 EmailListItemResponse 序列化
+
+耗时包含查询、标签加载、译文解压（full）和 JSON 序列化，取多轮中位数。
+需先执行 python -m migrations.add_email_snippets，否则 slim 的预览为空。
+
+用法:
+    cd backend
+    python -m scripts.benchmark_email_list --account-id 1 [--limit 50] [--rounds 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from database.database import async_session, engine
+from database.email_list import list_load_options
+from database.models import Email
+from routers.emails import EmailResponse, EmailListItemResponse
+
+
+def _full_query(account_id: int, limit: int):
+    return (
+        select(Email)
+        .where(Email.account_id == account_id)
+        .options(selectinload(Email.labels), selectinload(Email.folders))
+        .order_by(Email.received_at.desc(), Email.id.desc())
+        .limit(limit)
+    )
+
+
+def _slim_query(account_id: int, limit: int):
+    return (
+        select(Email)
+        .where(Email.account_id == account_id)
+        .options(*list_load_options())
+        .order_by(Email.received_at.desc(), Email.id.desc())
+        .limit(limit)
+    )
+
+
+async def run_once(query, schema) -> tuple:
+    """返回 (耗时毫秒, 响应体字节数)"""
+    started = time.perf_counter()
+    async with async_session() as db:
+        emails = (await db.execute(query)).scalars().all()
+        payload = "[" + ",".join(schema.model_validate(e).model_dump_json() for e in emails) + "]"
+    return (time.perf_counter() - started) * 1000, len(payload.encode("utf-8"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="邮件列表投影基准测试")
+    parser.add_argument("--account-id", type=int, required=True, help="测试账户 ID")
+    parser.add_argument("--limit", type=int, default=50, help="每页邮件数")
+    parser.add_argument("--rounds", type=int, default=5, help="每种方式的测试轮数")
+    args = parser.parse_args()
+
+    cases = [
+        ("full", _full_query(args.account_id, args.limit), EmailResponse),
+        ("slim", _slim_query(args.account_id, args.limit), EmailListItemResponse),
+    ]
+
+    results = {}
+    for name, query, schema in cases:
+        await run_once(query, schema)  # 预热连接池和缓冲池
+        timings, size = [], 0
+        for _ in range(args.rounds):
+            elapsed, size = await run_once(query, schema)
+            timings.append(elapsed)
+        results[name] = (statistics.median(timings), size)
+
+    print("=" * 60)
+    print(f"账户 {args.account_id}，每页 {args.limit} 封，{args.rounds} 轮中位数")
+    print("=" * 60)
+    for name, (elapsed, size) in results.items():
+        print(f"{name:5s}  {elapsed:8.1f} ms  {size / 1024:10.1f} KB")
+    full_ms, full_size = results["full"]
+    slim_ms, slim_size = results["slim"]
+    print("-" * 60)
+    print(f"耗时 {full_ms / max(slim_ms, 0.001):.1f}x，响应体 {full_size / max(slim_size, 1):.1f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+翻译 prompt 前缀缓存基准测试
+
+对比两种 prompt 布局在 vLLM 自动前缀缓存（APC）下需要实际 prefill 的 token 数：
+- legacy: 旧布局，单条 user 消息，语言/术语表穿插在固定说明和示例之间
+- split:  新布局，固定 system 消息 + 可变 user 消息（TranslateService 当前实现）
+
+默认启动一个本地 mock OpenAI 兼容服务：按 ChatML 模板渲染消息、近似分词，
+以 16 token 为一块做链式哈希，模拟 vLLM APC 的块级前缀命中，在 usage 中返回
+prompt_tokens / cached_tokens。也可用 --url 指向真实 vLLM
+（需开启 --enable-prefix-caching --enable-prompt-tokens-details，两种布局之间需重启以清空缓存）。
+
+用法:
+    cd backend
+    python -m scripts.benchmark_prompt_prefix [--rounds 5] [--url http://localhost:5081]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.translate_service import TranslateService
+
+BLOCK_SIZE = 16
+
+# 近似分词：英文单词、单个数字、单个其他非空白字符、连续空白各算一个 token
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]|\s+")
+
+SAMPLE_EMAILS = [
+    ("en", "Dear Mr. Wang,\n\nPlease find attached the NCR for 2J1041 shaft.\n"
+           "Dirt on Shaft was found during incoming inspection.\n\n"
+           "Please confirm the treatment and the new ETD.\n\nBest regards,\nKaren"),
+    ("en", "Hi,\n\nThe shipment of PO 4500123 has been confirmed.\n"
+           "AWB and P/L will be sent tomorrow.\nN.W. 120kg, G.W. 135kg\n\nThanks,\nNoel"),
+    ("ja", "お世話になっております。\n\n納期の件、ご確認ください。\n"
+           "見積書を添付いたしましたので、ご検討ください。\n\nよろしくお願いします。"),
+    ("ko", "안녕하세요.\n\n견적 및 납기 확인 부탁드립니다.\n수량: 500개, 단가: USD 3.20\n\n감사합니다."),
+    ("en", "Hello team,\n\nPlease check the CPK report for the Anodizing process.\n"
+           "Run-out is out of tolerance on 3 samples.\n\nRegards,\nJohn"),
+]
+
+SUPPLIER_GLOSSARY = [
+    {"source": "Blue Ring", "target": "蓝环"},
+    {"source": "incoming inspection", "target": "来料检验"},
+]
+
+
+def approx_tokens(text: str) -> list:
+    return _TOKEN_PATTERN.findall(text)
+
+
+def render_chatml(messages: list) -> str:
+    """Qwen 系列的 ChatML 聊天模板"""
+    parts = [f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages]
+    parts.append("<|im_start|>assistant\n")
+    return "".join(parts)
+
+
+class PrefixCacheSimulator:
+    """块级链式哈希前缀缓存（只缓存完整的块，与 vLLM APC 一致）"""
+
+    def __init__(self):
+        self._blocks = set()
+        self._lock = threading.Lock()
+
+    def process(self, tokens: list) -> int:
+        """登记本次请求的块，返回命中的前缀 token 数"""
+        cached = 0
+        prefix_hash = ""
+        still_hitting = True
+        with self._lock:
+            for start in range(0, len(tokens) - BLOCK_SIZE + 1, BLOCK_SIZE):
+                block = "\x1f".join(tokens[start:start + BLOCK_SIZE])
+                prefix_hash = hashlib.sha256(f"{prefix_hash}|{block}".encode("utf-8")).hexdigest()
+                if still_hitting and prefix_hash in self._blocks:
+                    cached += BLOCK_SIZE
+                else:
+                    still_hitting = False
+                    self._blocks.add(prefix_hash)
+        return cached
+
+
+def start_mock_server():
+    """启动 mock /v1/chat/completions 服务，返回 (server, base_url)"""
+    simulator = PrefixCacheSimulator()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            tokens = approx_tokens(render_chatml(payload["messages"]))
+            cached = simulator.process(tokens)
+            body = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": "译文"}}],
+                "usage": {
+                    "prompt_tokens": len(tokens),
+                    "completion_tokens": 1,
+                    "total_tokens": len(tokens) + 1,
+                    "prompt_tokens_details": {"cached_tokens": cached},
+                },
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def to_legacy_messages(messages: list) -> list:
+    """把新布局还原为旧布局：角色说明 → 任务 → 规则 → 术语表 → 示例 → 正文，合并为单条 user 消息"""
+    if len(messages) != 2:
+        return messages
+
+    system, user = messages[0]["content"], messages[1]["content"]
+    role, rules = system.split("\n\n", 1)
+    task_end = user.index("\n\n", user.index("## 任务")) + 2
+    task, remainder = user[:task_end], user[task_end:]
+
+    glossary_section = ""
+    if remainder.startswith("## 术语表"):
+        glossary_end = remainder.index("\n\n") + 2
+        glossary_section, remainder = remainder[:glossary_end], remainder[glossary_end:]
+    examples_at = rules.index("## 翻译示例")
+    rules = rules[:examples_at] + glossary_section + rules[examples_at:]
+
+    return [{"role": "user", "content": f"{role}\n\n{task}{rules}\n\n{remainder}"}]
+
+
+def run_layout(base_url: str, layout: str, rounds: int) -> dict:
+    """按指定布局发送全部样本，统计 prompt / cached / prefill token"""
+    service = TranslateService(vllm_base_url=base_url)
+    totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+    with httpx.Client(timeout=600.0) as client:
+        for _ in range(rounds):
+            for source_lang, text in SAMPLE_EMAILS:
+                payload = service._build_vllm_payload(text, "zh", source_lang, SUPPLIER_GLOSSARY)
+                if layout == "legacy":
+                    payload["messages"] = to_legacy_messages(payload["messages"])
+                response = client.post(f"{base_url}/v1/chat/completions",
+                                       headers=service.vllm_headers, json=payload)
+                response.raise_for_status()
+                usage = response.json().get("usage") or {}
+                totals["requests"] += 1
+                totals["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                totals["cached_tokens"] += (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+
+    totals["prefill_tokens"] = totals["prompt_tokens"] - totals["cached_tokens"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译 prompt 前缀缓存基准测试")
+    parser.add_argument("--rounds", type=int, default=5, help="样本邮件重复发送轮数")
+    parser.add_argument("--url", default=None, help="真实 vLLM 地址（默认使用本地 mock 服务）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("翻译 prompt 前缀缓存基准测试")
+    print("=" * 60)
+    print(f"Prompt 版本: {TranslateService.PROMPT_VERSION}")
+    print(f"样本: {len(SAMPLE_EMAILS)} 封 x {args.rounds} 轮")
+    print()
+
+    results = {}
+    for layout in ("legacy", "split"):
+        if args.url:
+            base_url, server = args.url, None
+            input(f"请重启 vLLM 清空前缀缓存后按回车开始 {layout} 布局测试...")
+        else:
+            server, base_url = start_mock_server()
+        try:
+            results[layout] = run_layout(base_url, layout, args.rounds)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+        r = results[layout]
+        print(f"[{layout:>6}] 请求 {r['requests']}, prompt {r['prompt_tokens']}, "
+              f"命中缓存 {r['cached_tokens']}, 实际 prefill {r['prefill_tokens']}")
+
+    legacy, split = results["legacy"]["prefill_tokens"], results["split"]["prefill_tokens"]
+    saved = legacy - split
+    ratio = saved / legacy * 100 if legacy else 0
+    print()
+    print(f"节省 prefill token: {saved}（{ratio:.1f}%），"
+          f"平均每请求 {saved / max(results['split']['requests'], 1):.0f}")
+
+
+if __name__ == "__main__":
+    main()
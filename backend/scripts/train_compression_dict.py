@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+训练邮件正文的 zstd 压缩字典
+
+同一供应商的邮件 HTML 模板、签名、免责声明高度重复，用最近的邮件训练字典后，
+单封邮件压缩时可以引用字典中的公共片段，压缩比明显高于无字典压缩。
+
+生成的字典写入 COMPRESSION_DICT_DIR（默认 data/compression_dicts），
+API 和所有 Celery worker 都需要能读到同一份字典文件；旧字典文件不要删除，
+用它压缩的历史数据仍需要它解压。
+
+用法:
+    cd backend
+    python -m scripts.train_compression_dict [--samples 5000] [--dict-kb 112] [--dry-run]
+
+训练后执行 python -m migrations.add_email_body_compression 可用新字典重新压缩已有数据。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql
+from dotenv import load_dotenv
+
+from utils import compression
+from utils.compression import compress_text, decompress_text, save_dictionary
+
+load_dotenv()
+
+# 字典名 → 训练样本来源列
+DICTIONARIES = {
+    "email_html": [("emails", "body_html")],
+    "email_text": [("emails", "body_translated"), ("shared_email_translations", "body_translated")],
+}
+
+# 留出做评估的样本比例
+HOLDOUT_RATIO = 0.1
+
+
+def load_samples(conn, sources, limit: int) -> list:
+    """取最近的样本（新邮件更能代表之后写入的内容）"""
+    samples = []
+    per_source = max(1, limit // len(sources))
+    with conn.cursor() as cursor:
+        for table, column in sources:
+            cursor.execute(
+                f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY id DESC LIMIT %s",
+                (per_source,)
+            )
+            for (value,) in cursor.fetchall():
+                text = decompress_text(value)
+                if text:
+                    samples.append(text.encode("utf-8"))
+    return samples
+
+
+def evaluate(samples: list, zdict=None) -> tuple:
+    """返回 (原始字节数, 压缩后字节数, 耗时毫秒)"""
+    import zstandard
+    compressor = zstandard.ZstdCompressor(level=compression.ZSTD_LEVEL, dict_data=zdict)
+    started = time.perf_counter()
+    raw = packed = 0
+    for sample in samples:
+        raw += len(sample)
+        packed += len(compressor.compress(sample))
+    return raw, packed, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练邮件正文 zstd 压缩字典")
+    parser.add_argument("--samples", type=int, default=5000, help="每个字典的训练样本数")
+    parser.add_argument("--dict-kb", type=int, default=112, help="字典大小（KB）")
+    parser.add_argument("--dry-run", action="store_true", help="只评估，不保存字典")
+    args = parser.parse_args()
+
+    if not compression.ZSTD_AVAILABLE:
+        print("未安装 zstandard，无法训练字典: pip install zstandard")
+        sys.exit(1)
+    import zstandard
+
+    conn = pymysql.connect(
+        host=os.environ.get("MYSQL_HOST", "localhost"),
+        port=int(os.environ.get("MYSQL_PORT", "3306")),
+        user=os.environ.get("MYSQL_USER", "root"),
+        password=os.environ.get("MYSQL_PASSWORD", ""),
+        database=os.environ.get("MYSQL_DATABASE", "email_translate"),
+        charset='utf8mb4'
+    )
+
+    try:
+        for name, sources in DICTIONARIES.items():
+            print("=" * 60)
+            samples = load_samples(conn, sources, args.samples)
+            if len(samples) < 100:
+                print(f"[{name}] 样本不足（{len(samples)}），跳过")
+                continue
+
+            holdout_count = max(10, int(len(samples) * HOLDOUT_RATIO))
+            train, holdout = samples[holdout_count:], samples[:holdout_count]
+            print(f"[{name}] 训练样本 {len(train)}，评估样本 {len(holdout)}")
+
+            zdict = zstandard.train_dictionary(args.dict_kb * 1024, train, level=compression.ZSTD_LEVEL)
+            raw, plain, plain_ms = evaluate(holdout)
+            _, with_dict, dict_ms = evaluate(holdout, zdict)
+            print(f"[{name}] 原始 {raw / 1024:.0f} KB")
+            print(f"[{name}] 无字典 {plain / 1024:.0f} KB（{raw / max(plain, 1):.1f}x，{plain_ms:.0f} ms）")
+            print(f"[{name}] 有字典 {with_dict / 1024:.0f} KB（{raw / max(with_dict, 1):.1f}x，{dict_ms:.0f} ms）")
+
+            if args.dry_run:
+                continue
+            path = save_dictionary(name, zdict.as_bytes())
+            print(f"[{name}] 已保存字典: {path}")
+
+            # 自检：用新字典压缩后能还原
+            sample_text = holdout[0].decode("utf-8")
+            assert decompress_text(compress_text(sample_text, name)) == sample_text
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
 from .email_service import EmailService
-from .translate_service import TranslateService
+from .translate_service import TranslateService, AsyncTranslateService
 
-__all__ = ["EmailService", "TranslateService"]
+__all__ = ["EmailService", "TranslateService", "AsyncTranslateService"]
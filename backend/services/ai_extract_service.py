@@ -160,39 +160,40 @@ async def extract_email_info(
         if settings.vllm_api_key:
             headers["Authorization"] = f"Bearer {settings.vllm_api_key}"
 
-        # 调用 vLLM API（增加超时时间）
-        async with httpx.AsyncClient(timeout=90.0) as client:
-            response = await client.post(
-                f"{settings.vllm_base_url}/v1/chat/completions",
-                headers=headers,
-                json={
-                    "model": settings.vllm_model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.1,
-                    "max_tokens": 2500
-                }
-            )
-
-            if response.status_code != 200:
-                error_msg = f"vLLM API 返回错误 (HTTP {response.status_code})"
-                print(f"[AIExtract] {error_msg}")
-                result = get_empty_extraction()
-                result["status"] = EXTRACTION_STATUS_ERROR
-                result["error_message"] = error_msg
-                return result
-
-            result = response.json()
-            response_text = result["choices"][0]["message"]["content"].strip()
-
-            # 尝试解析 JSON
-            extraction = parse_extraction_response(response_text)
-            extraction["status"] = EXTRACTION_STATUS_SUCCESS
-            extraction["error_message"] = None
-
-            # 标准化金额格式
-            extraction["amounts"] = normalize_amounts(extraction.get("amounts", []))
-
-            return extraction
+        # 调用 vLLM API（复用进程级 keep-alive 连接池，增加超时时间）
+        from services.vllm_client import get_vllm_client
+        response = await get_vllm_client().async_client.post(
+            f"{settings.vllm_base_url}/v1/chat/completions",
+            headers=headers,
+            json={
+                "model": settings.vllm_model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": 0.1,
+                "max_tokens": 2500
+            },
+            timeout=90.0
+        )
+
+        if response.status_code != 200:
+            error_msg = f"vLLM API 返回错误 (HTTP {response.status_code})"
+            print(f"[AIExtract] {error_msg}")
+            result = get_empty_extraction()
+            result["status"] = EXTRACTION_STATUS_ERROR
+            result["error_message"] = error_msg
+            return result
+
+        result = response.json()
+        response_text = result["choices"][0]["message"]["content"].strip()
+
+        # 尝试解析 JSON
+        extraction = parse_extraction_response(response_text)
+        extraction["status"] = EXTRACTION_STATUS_SUCCESS
+        extraction["error_message"] = None
+
+        # 标准化金额格式
+        extraction["amounts"] = normalize_amounts(extraction.get("amounts", []))
+
+        return extraction
 
     except httpx.TimeoutException:
         error_msg = "AI 提取超时，邮件内容可能过长，请稍后重试"
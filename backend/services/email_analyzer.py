@@ -50,10 +50,16 @@ class EmailAnalyzer:
         self.vllm_base_url = vllm_base_url
         self.vllm_model = vllm_model
         # 构建认证 headers
-        headers = {}
+        self.headers = {}
         if vllm_api_key:
-            headers["Authorization"] = f"Bearer {vllm_api_key}"
-        self.http_client = httpx.Client(timeout=60.0, headers=headers)
+            self.headers["Authorization"] = f"Bearer {vllm_api_key}"
+        self.timeout = 60.0
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """进程级共享的 vLLM keep-alive 连接池"""
+        from services.vllm_client import get_vllm_client
+        return get_vllm_client().sync_client
 
     def analyze_email(self, text: str, subject: str = "") -> AnalysisResult:
         """
@@ -232,6 +238,8 @@ should_split: 只有 complex 级别且正文>500字符时才为 true"""
         try:
             response = self.http_client.post(
                 f"{self.vllm_base_url}/v1/chat/completions",
+                headers=self.headers,
+                timeout=self.timeout,
                 json={
                     "model": self.vllm_model,
                     "messages": [{"role": "user", "content": prompt}],
@@ -302,6 +310,8 @@ should_split: 只有 complex 级别且正文>500字符时才为 true"""
         try:
             response = self.http_client.post(
                 f"{self.vllm_base_url}/v1/chat/completions",
+                headers=self.headers,
+                timeout=self.timeout,
                 json={
                     "model": self.vllm_model,
                     "messages": [{"role": "user", "content": prompt}],
@@ -7,7 +7,7 @@ from email.mime.base import MIMEBase
 from email import encoders
 from email.header import decode_header
 from email.utils import parsedate_to_datetime, getaddresses
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable, Iterator
 import os
 import re
 import logging
@@ -169,16 +169,46 @@ class EmailService:
             limit: Maximum number of emails to fetch
             existing_message_ids: Set of message IDs already in database (for dedup)
         """
+        return list(self.iter_emails(folder, since_date, limit, existing_message_ids))
+
+    def iter_emails(self, folder: str = "INBOX", since_date: datetime = None,
+                    limit: int = 500, existing_message_ids: set = None) -> Iterator[Dict]:
+        """
+        按日期拉取邮件（生成器，逐封产出解析结果，最新的在前）
+
+        参数同 iter_raw_emails。
+        """
+        for uid, raw in self.iter_raw_emails(folder, since_date, limit, existing_message_ids):
+            try:
+                parsed_email = self._parse_email(raw)
+            except Exception as e:
+                print(f"Error parsing email UID {uid}: {e}")
+                continue
+            if parsed_email:
+                yield parsed_email
+
+    def iter_raw_emails(self, folder: str = "INBOX", since_date: datetime = None,
+                        limit: int = 500,
+                        known_message_ids: Callable[[List[str]], set] = None) -> Iterator[Tuple[int, bytes]]:
+        """
+        按日期拉取原始邮件（生成器，逐封产出 (uid, 原始字节)，最新的在前）
+
+        Message-ID 预过滤和正文下载都按 UID 集合批量 FETCH，而不是每封一次往返。
+        解析交给调用方，便于放到进程池中执行。
+
+        Args:
+            folder: IMAP 文件夹
+            since_date: 起始日期
+            limit: 最多拉取的邮件数
+            known_message_ids: 回调，传入归一化后的 Message-ID 列表，返回其中已入库的集合
+                （只查询候选邮件，不加载账户全部历史 message_id）
+        """
         # 确保连接有效（必要时自动重连）
         if not self._ensure_connection():
-            return []
-
-        emails = []
-        if existing_message_ids is None:
-            existing_message_ids = set()
+            return
 
         try:
-            self.imap_conn.select(folder)
+            self.imap_conn.select(self._quote_mailbox(folder))
 
             # Build search criteria
             search_criteria = "ALL"
@@ -186,71 +216,29 @@ class EmailService:
                 date_str = since_date.strftime("%d-%b-%Y")
                 search_criteria = f'(SINCE {date_str})'
 
-            _, message_numbers = self.imap_conn.search(None, search_criteria)
-            message_list = message_numbers[0].split()
+            _, data = self.imap_conn.uid("SEARCH", None, search_criteria)
+            uids = sorted(int(u) for u in (data[0] or b"").split())
 
             # Get latest emails first
-            message_list = message_list[-limit:] if len(message_list) > limit else message_list
-            message_list.reverse()
-
-            print(f"[IMAP] Found {len(message_list)} emails matching criteria")
+            uids = uids[-limit:] if len(uids) > limit else uids
+            uids.reverse()
 
-            # 优化：先获取所有邮件的 MESSAGE-ID，过滤掉已存在的
-            new_emails_uids = []
-            if existing_message_ids:
-                # 归一化已存在的 message_ids（使用统一函数）
-                normalized_existing = set(
-                    normalize_message_id(mid) for mid in existing_message_ids if mid
-                )
+            print(f"[IMAP] Found {len(uids)} emails matching criteria")
 
-                print(f"[IMAP] Pre-filtering against {len(normalized_existing)} existing emails...")
-                # 调试：检查最新几封邮件（message_list[0] 是最新的，因为已 reverse）
-                print(f"[IMAP DEBUG] First 3 UIDs (newest): {message_list[:3]}, Last 3 UIDs (oldest): {message_list[-3:]}")
-                for num in message_list[:3]:  # 前3个是最新的
-                    try:
-                        _, header_data = self.imap_conn.fetch(num, "(BODY[HEADER.FIELDS (MESSAGE-ID DATE SUBJECT)])")
-                        if header_data[0]:
-                            header_text = header_data[0][1].decode('utf-8', errors='ignore')
-                            print(f"[IMAP DEBUG] Newest email {num}: {header_text[:300]}")
-                    except Exception as e:
-                        print(f"[IMAP DEBUG] Error: {e}")
-
-                for num in message_list:
-                    try:
-                        # 只获取 MESSAGE-ID 头，非常快
-                        _, header_data = self.imap_conn.fetch(num, "(BODY[HEADER.FIELDS (MESSAGE-ID)])")
-                        if header_data[0]:
-                            header_text = header_data[0][1].decode('utf-8', errors='ignore')
-                            # 提取 MESSAGE-ID
-                            match = re.search(r'Message-ID:\s*(<[^>]+>|[^\s]+)', header_text, re.IGNORECASE)
-                            if match:
-                                raw_msg_id = match.group(1)
-                                # 使用统一的归一化函数
-                                normalized_msg_id = normalize_message_id(raw_msg_id)
-                                if normalized_msg_id not in normalized_existing:
-                                    new_emails_uids.append(num)
-                            else:
-                                # 没有 MESSAGE-ID，需要获取
-                                new_emails_uids.append(num)
-                    except Exception as e:
-                        # 出错则保留该邮件进行完整获取
-                        new_emails_uids.append(num)
-
-                print(f"[IMAP] After pre-filter: {len(new_emails_uids)} new emails to fetch")
-            else:
-                new_emails_uids = message_list
+            # 批量获取大小和 Message-ID，过滤掉已存在的
+            meta = self._fetch_message_meta(uids, with_message_id=known_message_ids is not None)
+            if known_message_ids is not None and meta:
+                candidate_ids = list({m["message_id"] for m in meta.values() if m.get("message_id")})
+                known = known_message_ids(candidate_ids) if candidate_ids else set()
+                # 没有 MESSAGE-ID 或获取失败的邮件保留，进行完整获取
+                uids = [uid for uid in uids if meta.get(uid, {}).get("message_id") not in known]
+                print(f"[IMAP] After pre-filter: {len(uids)} new emails to fetch")
 
             # 只获取新邮件的完整内容
-            for num in new_emails_uids:
-                try:
-                    _, msg_data = self.imap_conn.fetch(num, "(RFC822)")
-                    email_body = msg_data[0][1]
-                    parsed_email = self._parse_email(email_body)
-                    if parsed_email:
-                        emails.append(parsed_email)
-                except Exception as e:
-                    print(f"Error parsing email {num}: {e}")
-                    continue
+            sizes = {uid: m.get("size") or 0 for uid, m in meta.items()}
+            for uid, raw in self._iter_message_bodies(uids, sizes):
+                if raw is not None:
+                    yield uid, raw
 
         except Exception as e:
             logger.error(f"Error fetching emails: {e}")
@@ -265,7 +253,336 @@ class EmailService:
             if "BYE" in str(e) or "socket" in str(e).lower():
                 self.imap_conn = None
 
-        return emails
+    # ============ 批量 FETCH ============
+    # 单条 FETCH 命令包含的最大 UID 数
+    FETCH_BATCH_SIZE = 200
+    # 单批正文的最大累计大小（按 RFC822.SIZE），避免大附件邮件一次性占满内存
+    FETCH_BODY_BATCH_BYTES = 20 * 1024 * 1024
+
+    @staticmethod
+    def _uid_set(uids: List[int]) -> str:
+        """将 UID 列表压缩为 IMAP sequence-set，如 [1,2,3,7] -> "1:3,7" """
+        ranges = []
+        start = prev = None
+        for uid in sorted(set(uids)):
+            if start is None:
+                start = prev = uid
+            elif uid == prev + 1:
+                prev = uid
+            else:
+                ranges.append((start, prev))
+                start = prev = uid
+        if start is not None:
+            ranges.append((start, prev))
+        return ",".join(f"{a}:{b}" if a != b else str(a) for a, b in ranges)
+
+    @staticmethod
+    def _parse_fetch_response(data: list) -> List[Dict]:
+        """
+        解析 imaplib 的 FETCH 响应
+
+        每封邮件可能是 bytes（无 literal），也可能是 (头部, literal) 元组后跟 b')'，
+        部分服务器把 UID 放在 literal 之后，因此按邮件累积元数据再解析。
+
+        Returns:
+            [{"uid": int, "size": int, "literal": bytes}, ...]
+        """
+        messages = []
+        current = None
+        for item in data or []:
+            if item is None:
+                continue
+            head = item[0] if isinstance(item, tuple) else item
+            if not isinstance(head, bytes):
+                continue
+            if re.match(rb'^\d+ \(', head):
+                current = {"meta": b"", "literal": None}
+                messages.append(current)
+            if current is None:
+                continue
+            current["meta"] += head
+            if isinstance(item, tuple):
+                current["literal"] = item[1]
+
+        results = []
+        for msg in messages:
+            uid_match = re.search(rb'UID (\d+)', msg["meta"])
+            if not uid_match:
+                continue
+            size_match = re.search(rb'RFC822\.SIZE (\d+)', msg["meta"])
+            results.append({
+                "uid": int(uid_match.group(1)),
+                "size": int(size_match.group(1)) if size_match else None,
+                "literal": msg["literal"],
+            })
+        return results
+
+    def _fetch_message_meta(self, uids: List[int], with_message_id: bool = False) -> Dict[int, Dict]:
+        """
+        批量获取邮件大小（及 Message-ID），每 FETCH_BATCH_SIZE 个 UID 一次往返
+
+        Returns:
+            {uid: {"size": int, "message_id": str}}
+        """
+        items = "(UID RFC822.SIZE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])" if with_message_id else "(UID RFC822.SIZE)"
+        meta = {}
+        for i in range(0, len(uids), self.FETCH_BATCH_SIZE):
+            batch = uids[i:i + self.FETCH_BATCH_SIZE]
+            try:
+                typ, data = self.imap_conn.uid("FETCH", self._uid_set(batch), items)
+            except imaplib.IMAP4.abort:
+                raise
+            except Exception as e:
+                # 元数据获取失败不影响正文下载（只是失去预过滤和按大小分批）
+                logger.debug(f"[IMAP] Meta fetch failed for {len(batch)} UIDs: {e}")
+                continue
+            if typ != "OK":
+                continue
+            for msg in self._parse_fetch_response(data):
+                entry = {"size": msg["size"]}
+                if with_message_id and msg["literal"]:
+                    header_text = msg["literal"].decode('utf-8', errors='ignore')
+                    match = re.search(r'Message-ID:\s*(<[^>]+>|[^\s]+)', header_text, re.IGNORECASE)
+                    if match:
+                        entry["message_id"] = normalize_message_id(match.group(1))
+                meta[msg["uid"]] = entry
+        return meta
+
+    def _iter_message_bodies(self, uids: List[int], sizes: Dict[int, int] = None) -> Iterator[Tuple[int, Optional[bytes]]]:
+        """
+        批量下载完整邮件（BODY.PEEK[] 不会设置 \\Seen 标记），按传入顺序逐封产出
+
+        每批最多 FETCH_BATCH_SIZE 封且累计大小不超过 FETCH_BODY_BATCH_BYTES。
+
+        Yields:
+            (uid, 原始邮件字节)；服务器未返回的邮件为 (uid, None)
+        """
+        sizes = sizes or {}
+        batch = []
+        batch_bytes = 0
+        for uid in uids:
+            size = sizes.get(uid) or 0
+            if batch and (len(batch) >= self.FETCH_BATCH_SIZE or batch_bytes + size > self.FETCH_BODY_BATCH_BYTES):
+                yield from self._fetch_body_batch(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(uid)
+            batch_bytes += size
+        if batch:
+            yield from self._fetch_body_batch(batch)
+
+    def _fetch_body_batch(self, batch: List[int]) -> Iterator[Tuple[int, Optional[bytes]]]:
+        typ, data = self.imap_conn.uid("FETCH", self._uid_set(batch), "(UID BODY.PEEK[])")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"UID FETCH failed: {data}")
+        fetched = {msg["uid"]: msg["literal"] for msg in self._parse_fetch_response(data)}
+        # 释放原始响应，只保留按 UID 索引的正文
+        del data
+        for uid in batch:
+            yield uid, fetched.pop(uid, None)
+
+    # ============ UID 增量同步 ============
+    def _get_capabilities(self) -> set:
+        """获取服务器能力列表（按连接缓存，登录后部分服务器会追加能力）"""
+        conn = self.imap_conn
+        if getattr(self, "_capabilities_conn", None) is not conn:
+            caps = set()
+            try:
+                typ, data = conn.capability()
+                if typ == "OK" and data and data[0]:
+                    caps = set(data[0].decode("utf-8", errors="ignore").upper().split())
+            except Exception as e:
+                logger.debug(f"[IMAP] CAPABILITY failed: {e}")
+            self._capabilities = caps
+            self._capabilities_conn = conn
+        return self._capabilities
+
+    @staticmethod
+    def _quote_mailbox(folder: str) -> str:
+        """含空格等特殊字符的文件夹名需要加引号"""
+        if folder.startswith('"') or not re.search(r'[\s()"\\]', folder):
+            return folder
+        return '"' + folder.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    def folder_status(self, folder: str = "INBOX") -> Dict[str, int]:
+        """
+        STATUS 查询文件夹状态（无需 SELECT）
+
+        Returns:
+            {"UIDNEXT": int, "UIDVALIDITY": int, "MESSAGES": int, "HIGHESTMODSEQ": int(仅 CONDSTORE)}
+        """
+        items = ["MESSAGES", "UIDNEXT", "UIDVALIDITY"]
+        if "CONDSTORE" in self._get_capabilities():
+            items.append("HIGHESTMODSEQ")
+
+        typ, data = self.imap_conn.status(self._quote_mailbox(folder), f"({' '.join(items)})")
+        if typ != "OK" or not data or not data[0]:
+            raise imaplib.IMAP4.error(f"STATUS {folder} failed: {data}")
+
+        text = data[0].decode("utf-8", errors="ignore") if isinstance(data[0], bytes) else str(data[0])
+        inner = text[text.rfind("(") + 1:]
+        return {name.upper(): int(value) for name, value in re.findall(r'([A-Za-z]+)\s+(\d+)', inner)}
+
+    def fetch_emails_incremental(self, folder: str = "INBOX", uidvalidity: int = None,
+                                 last_uid: int = 0, highest_modseq: int = None,
+                                 since_date: datetime = None, limit: int = 500,
+                                 known_message_ids: Callable[[List[str]], set] = None) -> Dict:
+        """
+        基于 UID 检查点的增量拉取（一次性返回列表，参数同 iter_emails_incremental）
+
+        Returns:
+            {"emails": [...], "uidvalidity", "last_uid", "highest_modseq", "reset", "total", "truncated"}
+        """
+        state = {}
+        emails = list(self.iter_emails_incremental(
+            folder, uidvalidity, last_uid, highest_modseq,
+            since_date=since_date, limit=limit,
+            known_message_ids=known_message_ids, state=state
+        ))
+        return {"emails": emails, **state}
+
+    def iter_raw_emails_incremental(self, folder: str = "INBOX", uidvalidity: int = None,
+                                    last_uid: int = 0, highest_modseq: int = None,
+                                    since_date: datetime = None, limit: int = 500,
+                                    known_message_ids: Callable[[List[str]], set] = None,
+                                    state: Dict = None) -> Iterator[Tuple[int, bytes]]:
+        """
+        基于 UID 检查点的增量拉取（生成器，逐封产出 (uid, 原始字节)，解析交给调用方）
+
+        - 检查点有效（UIDVALIDITY 未变）：先 STATUS 比较 HIGHESTMODSEQ（CONDSTORE 服务器）和 UIDNEXT，
+          文件夹未变化或无新邮件时连 SELECT 都不做；有新邮件时只 UID SEARCH/FETCH last_uid+1:*
+        - 无检查点或 UIDVALIDITY 变化：按 since_date 重新同步，仅对候选邮件的 Message-ID
+          调用 known_message_ids 去重（不再加载账户全部历史 message_id）
+        - 大小和 Message-ID、正文均按 UID 集合批量 FETCH，正文使用 BODY.PEEK[]
+
+        邮件按 UID 升序产出。state["last_uid"] 只在调用方取走一封邮件后才前进，
+        调用方中途停止或出错时检查点停在最后一封已交付的邮件，下次从断点继续。
+
+        Args:
+            folder: IMAP 文件夹
+            uidvalidity: 检查点中的 UIDVALIDITY（None 表示无检查点）
+            last_uid: 检查点中已同步的最大 UID
+            highest_modseq: 检查点中的 HIGHESTMODSEQ
+            since_date: 重新同步时的起始日期
+            limit: 单次最多拉取的邮件数（增量模式下剩余部分留到下次）
+            known_message_ids: 回调，传入归一化后的 Message-ID 列表，返回其中已入库的集合
+            state: 输出参数，迭代过程中更新
+                {"uidvalidity", "last_uid", "highest_modseq", "reset", "total", "truncated"}
+                truncated 为 True 表示增量积压超过 limit，剩余部分需要调用方再次拉取
+        """
+        if state is None:
+            state = {}
+        state.update(
+            uidvalidity=uidvalidity,
+            last_uid=last_uid or 0,
+            highest_modseq=highest_modseq,
+            reset=False,
+            total=0,
+            truncated=False,
+        )
+        last_uid = last_uid or 0
+
+        if not self._ensure_connection():
+            return
+
+        conn = self.imap_conn
+        status = self.folder_status(folder)
+        server_validity = status.get("UIDVALIDITY")
+        uidnext = status.get("UIDNEXT")
+        modseq = status.get("HIGHESTMODSEQ")
+
+        reset = uidvalidity is None or server_validity != uidvalidity
+        if reset:
+            if uidvalidity is not None:
+                print(f"[IMAP] UIDVALIDITY changed for {folder}: {uidvalidity} -> {server_validity}, resyncing")
+            last_uid = 0
+            state.update(uidvalidity=server_validity, last_uid=0, highest_modseq=None, reset=True)
+        elif modseq is not None and highest_modseq is not None and modseq == highest_modseq:
+            # CONDSTORE：HIGHESTMODSEQ 未变化说明文件夹没有任何新增或变更，无需 SELECT
+            print(f"[IMAP] {folder}: unchanged (HIGHESTMODSEQ={modseq})")
+            return
+        elif uidnext is not None and uidnext <= last_uid + 1:
+            # 没有新 UID，无需 SELECT
+            state["highest_modseq"] = modseq
+            print(f"[IMAP] {folder}: no new messages (UIDNEXT={uidnext})")
+            return
+
+        typ, _ = conn.select(self._quote_mailbox(folder))
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"SELECT {folder} failed")
+
+        if reset:
+            criteria = f"(SINCE {since_date.strftime('%d-%b-%Y')})" if since_date else "ALL"
+        else:
+            criteria = f"UID {last_uid + 1}:*"
+        typ, data = conn.uid("SEARCH", None, criteria)
+        # "n:*" 在没有更大 UID 时也会返回当前最大 UID，需要再过滤一次
+        uids = sorted(int(u) for u in (data[0] or b"").split() if int(u) > last_uid)
+
+        truncated = len(uids) > limit
+        if truncated:
+            # 重新同步只取时间窗口内最新的 limit 封；增量同步按顺序取最早的 limit 封，其余下次继续
+            uids = uids[-limit:] if reset else uids[:limit]
+
+        print(f"[IMAP] {folder}: {len(uids)} new UIDs to process (mode={'resync' if reset else 'incremental'})")
+
+        # 批量获取大小（用于正文分批）；重新同步时同时获取 Message-ID 去重（只查询候选邮件）
+        with_message_id = reset and known_message_ids is not None
+        meta = self._fetch_message_meta(uids, with_message_id=with_message_id)
+        fetch_uids = uids
+        if with_message_id and meta:
+            candidate_ids = list({m["message_id"] for m in meta.values() if m.get("message_id")})
+            known = known_message_ids(candidate_ids) if candidate_ids else set()
+            fetch_uids = [uid for uid in uids if meta.get(uid, {}).get("message_id") not in known]
+            print(f"[IMAP] Pre-filter: {len(uids) - len(fetch_uids)} already stored, {len(fetch_uids)} to fetch")
+        state["total"] = len(fetch_uids)
+
+        sizes = {uid: m.get("size") or 0 for uid, m in meta.items()}
+        try:
+            for uid, raw in self._iter_message_bodies(fetch_uids, sizes):
+                if raw is not None:
+                    yield uid, raw
+                state["last_uid"] = uid
+        except Exception as e:
+            logger.error(f"Error fetching emails by UID: {e}")
+            if "BYE" in str(e) or "socket" in str(e).lower():
+                self.imap_conn = None
+            return
+
+        if not truncated:
+            # 全部处理完：检查点推进到 UIDNEXT-1（跳过已去重和已被删除的 UID）
+            candidates = [state["last_uid"]] + uids
+            if uidnext:
+                candidates.append(uidnext - 1)
+            state["last_uid"] = max(candidates)
+            state["highest_modseq"] = modseq
+        elif uids:
+            state["last_uid"] = max(uids)
+            # 全部处理完才标记：出错中断时不让调用方立即重试
+            state["truncated"] = not reset
+
+    def iter_emails_incremental(self, folder: str = "INBOX", uidvalidity: int = None,
+                                last_uid: int = 0, highest_modseq: int = None,
+                                since_date: datetime = None, limit: int = 500,
+                                known_message_ids: Callable[[List[str]], set] = None,
+                                state: Dict = None) -> Iterator[Dict]:
+        """
+        基于 UID 检查点的增量拉取（生成器，逐封产出解析结果，参数同 iter_raw_emails_incremental）
+
+        解析失败的邮件跳过，不阻塞检查点前进。
+        """
+        for uid, raw in self.iter_raw_emails_incremental(
+            folder, uidvalidity, last_uid, highest_modseq,
+            since_date=since_date, limit=limit,
+            known_message_ids=known_message_ids, state=state
+        ):
+            try:
+                parsed_email = self._parse_email(raw)
+            except Exception as e:
+                print(f"Error parsing email UID {uid}: {e}")
+                continue
+            if parsed_email:
+                yield parsed_email
 
     # IMAP文件夹映射（支持多种邮件服务商）
     # 格式：{标准名: [可能的IMAP名称列表]}
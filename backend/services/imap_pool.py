@@ -0,0 +1,516 @@
+"""
+IMAP 长连接池与 IDLE 推送监听
+
+两部分：
+1. ImapSessionPool：进程级、按账户复用已登录的 IMAP 会话
+   - fetch_emails_task 通过 lease() 借用会话，用完不 LOGOUT，下次直接复用
+   - 借用时由 EmailService._ensure_connection() 发 NOOP 探活，断开才重新 LOGIN
+   - 空闲超过 MAX_IDLE_SECONDS 的会话主动关闭（服务器一般 30 分钟踢掉空闲连接）
+   - fork 后（Celery prefork 子进程）自动丢弃父进程的会话
+
+2. ImapIdleWatcher / ImapWatcherService：独立进程中为每个账户保持一条 IDLE 连接
+   - 服务器支持 IDLE 时阻塞等待 "* n EXISTS"，不支持时退化为 NOOP 轮询
+   - 只有收件箱确实有新邮件的账户才触发 fetch_emails_task
+   - 断线按指数退避重连，重连成功后补一次拉取（覆盖断线期间的新邮件）
+   - 同一账户的通知按 FETCH_DEBOUNCE_SECONDS 去抖：窗口内的后续通知不丢弃，
+     在窗口结束时再补一次拉取（尾沿触发）
+   - 每个账户在 Redis 写心跳 imap:watch:{account_id}，auto_fetch_all_emails
+     对有心跳的账户只做低频兜底拉取（WATCHED_FALLBACK_SECONDS），其余账户保留定时轮询
+
+运行监听进程：python imap_watcher.py
+本地联调可将账户指向不带 SSL 的 IMAP 测试服务器（use_ssl=False + 端口）。
+"""
+import imaplib
+import os
+import select
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from services.email_service import EmailService
+
+# 会话空闲超过该时间后关闭（秒）
+MAX_IDLE_SECONDS = int(os.getenv("IMAP_SESSION_MAX_IDLE", 600))
+
+# IDLE 单次持续时间（秒），RFC 2177 建议 29 分钟内重新发起
+IDLE_RENEW_SECONDS = int(os.getenv("IMAP_IDLE_RENEW", 540))
+
+# 等待 IDLE 通知时的检查间隔（秒），用于刷新心跳和响应停止信号
+IDLE_CHECK_SECONDS = 30
+
+# 不支持 IDLE 时的 NOOP 轮询间隔（秒）
+NOOP_POLL_SECONDS = int(os.getenv("IMAP_NOOP_POLL", 30))
+
+# 重连退避（秒）
+RECONNECT_BASE_DELAY = 2
+RECONNECT_MAX_DELAY = 300
+
+# 同一账户两次触发拉取的最小间隔（秒），合并短时间内的多次通知
+FETCH_DEBOUNCE_SECONDS = 5
+
+# 有 IDLE 监听的账户的兜底拉取间隔（秒），防止通知丢失时新邮件一直不入库
+WATCHED_FALLBACK_SECONDS = int(os.getenv("IMAP_WATCHED_FALLBACK", 900))
+
+# 监听心跳（Redis）
+WATCH_HEARTBEAT_KEY = "imap:watch:{account_id}"
+WATCH_HEARTBEAT_TTL = IDLE_CHECK_SECONDS * 4
+
+
+def is_account_watched(account_id: int) -> bool:
+    """账户是否有存活的 IDLE 监听（心跳未过期）"""
+    from shared.cache_config import cache_exists
+    return cache_exists(WATCH_HEARTBEAT_KEY.format(account_id=account_id))
+
+
+# ============ 会话池 ============
+class ImapSessionPool:
+    """进程级 IMAP 会话池（按账户复用已登录连接）"""
+
+    def __init__(self, max_idle_seconds: int = MAX_IDLE_SECONDS):
+        self.max_idle_seconds = max_idle_seconds
+        self._sessions: Dict[int, dict] = {}
+        self._account_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.stats = {"leases": 0, "reused": 0, "created": 0, "expired": 0}
+
+    def _check_fork(self):
+        # fork 出的子进程不能使用父进程的 socket，直接丢弃（不 LOGOUT，避免影响父进程）
+        if self._pid != os.getpid():
+            self._sessions = {}
+            self._account_locks = {}
+            self._pid = os.getpid()
+
+    def _account_lock(self, account_id: int) -> threading.Lock:
+        with self._lock:
+            self._check_fork()
+            lock = self._account_locks.get(account_id)
+            if lock is None:
+                lock = self._account_locks[account_id] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _fingerprint(imap_server: str, imap_port: int, email_address: str, password: str, use_ssl: bool) -> tuple:
+        # 账户配置变更（服务器/密码）后不能复用旧会话
+        return (imap_server, imap_port, email_address, hash(password), use_ssl)
+
+    def _sweep(self, exclude: Optional[int] = None):
+        """关闭空闲过久的会话"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                account_id for account_id, entry in self._sessions.items()
+                if account_id != exclude and now - entry["last_used"] > self.max_idle_seconds
+            ]
+        for account_id in expired:
+            lock = self._account_lock(account_id)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                entry = self._sessions.pop(account_id, None)
+                if entry:
+                    entry["service"].disconnect_imap()
+                    self.stats["expired"] += 1
+            finally:
+                lock.release()
+
+    @contextmanager
+    def lease(self, account_id: int, imap_server: str, smtp_server: str, email_address: str,
+              password: str, imap_port: int = 993, smtp_port: int = 465, use_ssl: bool = True):
+        """
+        借用账户的 IMAP 会话（同一账户同一时刻只借给一个调用方）
+
+        Args:
+            account_id: 账户ID
+            其余参数同 EmailService
+
+        Yields:
+            EmailService（imap_conn 可能已登录，调用方无需 connect/disconnect）
+        """
+        self._sweep(exclude=account_id)
+        fingerprint = self._fingerprint(imap_server, imap_port, email_address, password, use_ssl)
+
+        with self._account_lock(account_id):
+            self.stats["leases"] += 1
+            entry = self._sessions.pop(account_id, None)
+            if entry and (entry["fingerprint"] != fingerprint
+                          or time.time() - entry["last_used"] > self.max_idle_seconds):
+                entry["service"].disconnect_imap()
+                entry = None
+
+            if entry:
+                service = entry["service"]
+                self.stats["reused"] += 1
+            else:
+                service = EmailService(
+                    imap_server=imap_server,
+                    smtp_server=smtp_server,
+                    email_address=email_address,
+                    password=password,
+                    imap_port=imap_port,
+                    smtp_port=smtp_port,
+                    use_ssl=use_ssl
+                )
+                self.stats["created"] += 1
+
+            try:
+                yield service
+            except BaseException:
+                # 异常可能发生在响应读到一半时（任务超时、协议错误、解析异常），
+                # 连接上残留的数据会被下一次租用读到，不放回池中；直接关闭套接字，不再发送 LOGOUT
+                _discard_connection(service)
+                raise
+            if service.imap_conn is not None:
+                self._sessions[account_id] = {
+                    "service": service,
+                    "fingerprint": fingerprint,
+                    "last_used": time.time(),
+                }
+
+    def close_all(self):
+        """关闭所有会话（进程退出时调用）"""
+        with self._lock:
+            self._check_fork()
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for entry in sessions:
+            entry["service"].disconnect_imap()
+
+
+def _has_buffered_input(conn) -> bool:
+    """连接上是否已有可读数据（imaplib 读缓冲、SSL 缓冲或套接字中），不阻塞
+
+    临时切到非阻塞模式后 peek：读缓冲有数据时直接返回，否则只做一次非阻塞读。
+    """
+    sock = conn.sock
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return bool(conn.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def _discard_connection(service: EmailService):
+    """丢弃状态不可信的连接（不做 LOGOUT 往返，避免读到残留响应或再次阻塞）"""
+    conn, service.imap_conn = service.imap_conn, None
+    if conn is not None:
+        try:
+            conn.shutdown()
+        except Exception:
+            pass
+
+
+_session_pool: Optional[ImapSessionPool] = None
+
+
+def get_imap_session_pool() -> ImapSessionPool:
+    """获取进程级 IMAP 会话池"""
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = ImapSessionPool()
+    return _session_pool
+
+
+# ============ IDLE 监听 ============
+class ImapIdleWatcher(threading.Thread):
+    """
+    单账户 IDLE 监听线程
+
+    每个账户独占一条 IMAP 连接（IDLE 期间连接不能执行其他命令）。
+    """
+
+    def __init__(self, account_id: int, service_factory: Callable[[], EmailService],
+                 on_new_mail: Callable[[int], None], folder: str = "INBOX"):
+        super().__init__(name=f"imap-idle-{account_id}", daemon=True)
+        self.account_id = account_id
+        self.service_factory = service_factory
+        self.on_new_mail = on_new_mail
+        self.folder = folder
+        self._stop_event = threading.Event()
+        self._service: Optional[EmailService] = None
+        self._exists = 0
+        self.mode = None  # "idle" / "noop"
+
+    def stop(self):
+        """请求停止（IDLE 等待最多 IDLE_CHECK_SECONDS 后退出，连接由线程自身关闭）"""
+        self._stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop_event.is_set()
+
+    def _heartbeat(self):
+        from shared.cache_config import cache_set
+        cache_set(
+            WATCH_HEARTBEAT_KEY.format(account_id=self.account_id),
+            {"pid": os.getpid(), "mode": self.mode, "at": time.time()},
+            ttl=WATCH_HEARTBEAT_TTL
+        )
+
+    def _clear_heartbeat(self):
+        from shared.cache_config import cache_delete
+        cache_delete(WATCH_HEARTBEAT_KEY.format(account_id=self.account_id))
+
+    def run(self):
+        failures = 0
+        while not self.stopped:
+            try:
+                self._connect()
+                failures = 0
+                # 连接（或重连）成功后补一次拉取，覆盖断线期间到达的邮件
+                self.on_new_mail(self.account_id)
+                self._watch()
+            except Exception as e:
+                if self.stopped:
+                    break
+                failures += 1
+                delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * (2 ** min(failures, 8)))
+                print(f"[IMAPWatch] Account {self.account_id} disconnected ({type(e).__name__}: {e}), "
+                      f"reconnecting in {delay}s")
+                self._clear_heartbeat()
+                self._stop_event.wait(delay)
+            finally:
+                if self._service is not None:
+                    self._service.disconnect_imap()
+                    self._service = None
+        self._clear_heartbeat()
+
+    def _connect(self):
+        service = self.service_factory()
+        if not service.connect_imap():
+            raise ConnectionError("IMAP login failed")
+        self._service = service
+        conn = service.imap_conn
+
+        typ, data = conn.select(self.folder, readonly=True)
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"SELECT {self.folder} failed: {data}")
+        self._exists = int(data[0] or 0)
+
+        typ, caps = conn.capability()
+        capabilities = caps[0].decode(errors="ignore").upper().split() if caps and caps[0] else []
+        self.mode = "idle" if "IDLE" in capabilities else "noop"
+        print(f"[IMAPWatch] Account {self.account_id} watching {self.folder} "
+              f"(mode={self.mode}, exists={self._exists})")
+
+    def _watch(self):
+        while not self.stopped:
+            self._heartbeat()
+            if self.mode == "idle":
+                changed = self._idle_once(IDLE_RENEW_SECONDS)
+            else:
+                changed = self._noop_once()
+            if changed:
+                self.on_new_mail(self.account_id)
+
+    def _update_exists(self, count: int) -> bool:
+        """更新邮件数，数量增加视为有新邮件（EXPUNGE 导致的减少不触发拉取）"""
+        changed = count > self._exists
+        self._exists = count
+        return changed
+
+    def _noop_once(self) -> bool:
+        """NOOP 轮询：服务器在 NOOP 响应中附带 EXISTS 更新"""
+        self._stop_event.wait(NOOP_POLL_SECONDS)
+        if self.stopped:
+            return False
+        conn = self._service.imap_conn
+        conn.noop()
+        exists = conn.untagged_responses.pop("EXISTS", None)
+        if exists:
+            return self._update_exists(int(exists[-1]))
+        return False
+
+    def _idle_once(self, duration: int) -> bool:
+        """
+        发起一次 IDLE，等待新邮件通知或到期
+
+        imaplib 在 Python 3.14 之前没有 IDLE 支持，这里直接收发原始命令。
+
+        Returns:
+            是否有新邮件
+        """
+        conn = self._service.imap_conn
+        tag = conn._new_tag()
+        conn.send(tag + b" IDLE\r\n")
+        line = conn.readline()
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+
+        changed = False
+        sock = conn.sock
+        deadline = time.monotonic() + duration
+        try:
+            while not self.stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # imaplib 的读缓冲 / SSL 缓冲中可能已有数据（如随 "+ idling" 一起到达的 EXISTS），select 感知不到
+                if not _has_buffered_input(conn):
+                    readable, _, _ = select.select([sock], [], [], min(IDLE_CHECK_SECONDS, remaining))
+                    if not readable:
+                        self._heartbeat()
+                        continue
+                line = conn.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during IDLE")
+                changed = self._parse_untagged(line) or changed
+                if changed:
+                    break
+        finally:
+            if not self.stopped:
+                conn.send(b"DONE\r\n")
+                # 读取到 IDLE 的 tagged 响应为止，期间的 EXISTS 同样计入
+                while True:
+                    line = conn.readline()
+                    if not line:
+                        raise imaplib.IMAP4.abort("connection closed after IDLE")
+                    if line.startswith(tag):
+                        break
+                    changed = self._parse_untagged(line) or changed
+        return changed
+
+    def _parse_untagged(self, line: bytes) -> bool:
+        parts = line.split()
+        if len(parts) >= 3 and parts[0] == b"*" and parts[2].upper() == b"EXISTS" and parts[1].isdigit():
+            return self._update_exists(int(parts[1]))
+        return False
+
+
+class ImapWatcherService:
+    """
+    管理所有启用账户的 IDLE 监听线程
+
+    定期刷新账户列表：新增账户启动监听，停用/删除账户停止监听，
+    账户 IMAP 配置变更时重建监听。
+    """
+
+    REFRESH_SECONDS = 300
+
+    def __init__(self, trigger: Callable[[int], None] = None):
+        self.trigger = trigger or self._enqueue_fetch
+        self._watchers: Dict[int, ImapIdleWatcher] = {}
+        self._fingerprints: Dict[int, tuple] = {}
+        self._last_triggered: Dict[int, float] = {}
+        # 去抖窗口内收到通知、等待窗口结束时补发的账户
+        self._pending: Dict[int, threading.Timer] = {}
+        self._trigger_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _enqueue_fetch(account_id: int):
+        from tasks.email_tasks import fetch_emails_task
+        fetch_emails_task.delay(account_id, 1)
+
+    def on_new_mail(self, account_id: int):
+        """
+        收到新邮件通知：去抖后触发拉取任务
+
+        距上次触发不足 FETCH_DEBOUNCE_SECONDS 时不立即拉取，而是在窗口结束时补发一次，
+        避免上一次拉取先于后续邮件完成、后续邮件一直等到下一封新邮件才入库
+        """
+        now = time.time()
+        with self._trigger_lock:
+            wait = FETCH_DEBOUNCE_SECONDS - (now - self._last_triggered.get(account_id, 0))
+            if wait > 0:
+                if account_id not in self._pending:
+                    timer = threading.Timer(wait, self._fire_pending, args=(account_id,))
+                    timer.daemon = True
+                    self._pending[account_id] = timer
+                    timer.start()
+                return
+            self._last_triggered[account_id] = now
+        self._fire(account_id)
+
+    def _fire_pending(self, account_id: int):
+        with self._trigger_lock:
+            if self._pending.pop(account_id, None) is None:
+                return
+            self._last_triggered[account_id] = time.time()
+        self._fire(account_id)
+
+    def _fire(self, account_id: int):
+        try:
+            self.trigger(account_id)
+            print(f"[IMAPWatch] New mail for account {account_id}, fetch triggered")
+        except Exception as e:
+            print(f"[IMAPWatch] Failed to trigger fetch for account {account_id}: {e}")
+
+    def _load_accounts(self) -> Dict[int, dict]:
+        from database.models import EmailAccount
+        from database.sync_database import get_sync_session
+        from utils.crypto import decrypt_password
+
+        db = get_sync_session()
+        try:
+            accounts = db.query(EmailAccount).filter(EmailAccount.is_active == True).all()
+            return {
+                account.id: {
+                    "imap_server": account.imap_server,
+                    "smtp_server": account.smtp_server,
+                    "email_address": account.email,
+                    "password": decrypt_password(account.password),
+                    "imap_port": account.imap_port,
+                    "smtp_port": account.smtp_port,
+                }
+                for account in accounts
+            }
+        finally:
+            db.close()
+
+    def refresh(self):
+        """同步监听线程与启用账户列表"""
+        accounts = self._load_accounts()
+
+        for account_id in list(self._watchers):
+            config = accounts.get(account_id)
+            watcher = self._watchers[account_id]
+            fingerprint = tuple(sorted(config.items())) if config else None
+            if config is None or fingerprint != self._fingerprints.get(account_id) or not watcher.is_alive():
+                watcher.stop()
+                del self._watchers[account_id]
+                self._fingerprints.pop(account_id, None)
+
+        for account_id, config in accounts.items():
+            if account_id in self._watchers:
+                continue
+            watcher = ImapIdleWatcher(
+                account_id,
+                service_factory=lambda config=config: EmailService(**config),
+                on_new_mail=self.on_new_mail
+            )
+            self._watchers[account_id] = watcher
+            self._fingerprints[account_id] = tuple(sorted(config.items()))
+            watcher.start()
+
+        print(f"[IMAPWatch] Watching {len(self._watchers)} accounts")
+
+    def run_forever(self):
+        """主循环：定期刷新账户列表，直到 stop()"""
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[IMAPWatch] Refresh failed: {e}")
+            self._stop_event.wait(self.REFRESH_SECONDS)
+        self.stop_all()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stop_all(self):
+        with self._trigger_lock:
+            for timer in self._pending.values():
+                timer.cancel()
+            self._pending = {}
+        for watcher in self._watchers.values():
+            watcher.stop()
+        for watcher in self._watchers.values():
+            watcher.join(timeout=5)
+        self._watchers = {}
+        self._fingerprints = {}
@@ -0,0 +1,405 @@
+"""
+邮件拉取流水线
+
+原先的手动拉取是"先全部下载并解析到内存，再逐封入库、逐封同步翻译"，
+邮件多时内存随邮件数线性增长，第一封邮件要等全部拉完才能在界面出现。
+
+这里拆成四个通过有界队列串联的阶段，各阶段并发推进：
+
+    IMAP 拉取（线程） → MIME 解析（进程池） → 批量入库 → 翻译入队
+
+- 背压：队列有界，下游变慢时上游在 put 处阻塞，IMAP 拉取随之暂停
+- 内存上限：原始邮件进入流水线前先向 ByteBudget 申请字节额度，入库后归还，
+  在途邮件的原始字节总量不超过 INGEST_MAX_INFLIGHT_MB
+- 统计：每个阶段记录处理条数、字节数、耗时和吞吐，结束时打印并返回
+
+解析默认放在 spawn 进程池（MIME 解码、附件落盘、HTML 清洗是 CPU 密集的），
+打包环境（PyInstaller）或 INGEST_PARSE_MODE=thread 时使用线程池。
+"""
+import asyncio
+import os
+import sys
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# 队列容量（每个阶段之间）
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "50"))
+# 解析并发数
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 在途原始邮件字节上限
+MAX_INFLIGHT_BYTES = int(os.getenv("INGEST_MAX_INFLIGHT_MB", "64")) * 1024 * 1024
+# 单次入库事务最多包含的邮件数
+DB_BATCH_SIZE = int(os.getenv("INGEST_DB_BATCH", "20"))
+# 解析执行方式：process / thread
+PARSE_MODE = os.getenv("INGEST_PARSE_MODE", "thread" if getattr(sys, "frozen", False) else "process")
+
+# 拉取线程等待入队时检查流水线是否已中止的间隔（秒）
+_EMIT_POLL_SECONDS = 1.0
+
+# 阶段结束标记
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    """流水线已中止，拉取线程应停止产出"""
+
+
+# ============ 解析（进程池中执行） ============
+
+_parse_service = None
+
+
+def parse_raw_email(raw: bytes) -> Optional[Dict]:
+    """
+    解析单封原始邮件（模块级函数，可被进程池 pickle）
+
+    每个解析进程持有一个不带凭据的 EmailService，只用它的解析逻辑。
+    """
+    global _parse_service
+    if _parse_service is None:
+        from services.email_service import EmailService
+        _parse_service = EmailService("", "", "", "")
+    return _parse_service._parse_email(raw)
+
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_parse_executor() -> Executor:
+    """获取解析执行器（进程内共享，首次使用时创建）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if PARSE_MODE == "process":
+                    _executor = ProcessPoolExecutor(
+                        max_workers=PARSE_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=PARSE_WORKERS,
+                        thread_name_prefix="ingest-parse"
+                    )
+                print(f"[Ingest] Parse executor: {PARSE_MODE} x{PARSE_WORKERS}")
+    return _executor
+
+
+def _fallback_to_threads():
+    """进程池不可用（子进程崩溃/无法启动）时退回线程池"""
+    global _executor, PARSE_MODE
+    with _executor_lock:
+        broken = _executor
+        PARSE_MODE = "thread"
+        _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="ingest-parse")
+    if broken is not None:
+        broken.shutdown(wait=False)
+    print("[Ingest] Process pool broken, falling back to thread pool")
+
+
+def shutdown_parse_executor():
+    """关闭解析执行器（应用退出时调用）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# ============ 内存额度 ============
+
+class ByteBudget:
+    """
+    在途字节额度
+
+    超过单封上限的大邮件按上限计，保证总能拿到额度；
+    额度用尽时 acquire 阻塞，直到下游归还。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.used = 0
+        self.peak = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, size: int) -> int:
+        size = min(max(size, 1), self.limit)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+        return size
+
+    async def release(self, size: int):
+        async with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+# ============ 阶段统计 ============
+
+class StageStats:
+    """单个阶段的计数器"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.monotonic()) - (self.started or time.monotonic())
+        return {
+            "items": self.items,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "items_per_second": round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+# ============ 流水线 ============
+
+Producer = Callable[[Callable[[Dict, bytes], None]], None]
+
+
+class IngestPipeline:
+    """
+    拉取 → 解析 → 入库 → 翻译入队 流水线
+
+    Args:
+        persist: 异步回调，接收一批解析结果（已合并拉取阶段的元数据），
+                 在一个事务中入库，返回需要进入翻译阶段的条目列表
+        enqueue: 异步回调，接收一批入库阶段返回的条目，投递翻译等后续任务
+        label: 日志标签
+    """
+
+    def __init__(
+        self,
+        persist: Callable[[List[Dict]], Awaitable[List[Any]]],
+        enqueue: Callable[[List[Any]], Awaitable[None]],
+        label: str = ""
+    ):
+        self.persist = persist
+        self.enqueue = enqueue
+        self.label = label
+        self.stats = {name: StageStats(name) for name in ("fetch", "parse", "persist", "translate")}
+        self.budget: Optional[ByteBudget] = None
+        self._aborted = False
+
+    async def run(self, producer: Producer) -> Dict[str, Any]:
+        """
+        运行流水线直到全部阶段结束
+
+        Args:
+            producer: 同步拉取函数，在线程中执行，对每封邮件调用 emit(meta, raw)；
+                      emit 在队列满或额度用尽时阻塞
+
+        Returns:
+            各阶段统计及内存峰值
+        """
+        loop = asyncio.get_running_loop()
+        self.budget = ByteBudget(MAX_INFLIGHT_BYTES)
+        raw_q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        parsed_q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        translate_q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        started = time.monotonic()
+        for stage in self.stats.values():
+            stage.started = started
+
+        parse_tasks = [
+            asyncio.create_task(self._parse_stage(raw_q, parsed_q))
+            for _ in range(PARSE_WORKERS)
+        ]
+        persist_task = asyncio.create_task(self._persist_stage(parsed_q, translate_q))
+        translate_task = asyncio.create_task(self._translate_stage(translate_q))
+
+        try:
+            await self._fetch_stage(loop, producer, raw_q)
+            await asyncio.gather(*parse_tasks)
+            await parsed_q.put(_DONE)
+            await persist_task
+            await translate_task
+        except BaseException:
+            self._aborted = True
+            for task in (*parse_tasks, persist_task, translate_task):
+                task.cancel()
+            # 下游已取消，没有消费者了：清空队列并归还额度，阻塞在 put_raw 的拉取线程随之返回
+            await self._release_pending(raw_q, parsed_q)
+            raise
+
+        result = {name: stage.to_dict() for name, stage in self.stats.items()}
+        result["peak_inflight_bytes"] = self.budget.peak
+        result["elapsed_seconds"] = round(time.monotonic() - started, 2)
+        print(f"[Ingest]{self.label} Done in {result['elapsed_seconds']}s, "
+              f"peak in-flight {self.budget.peak / 1024 / 1024:.1f}MB, "
+              + ", ".join(
+                  f"{name}={s['items']} ({s['items_per_second']}/s, err {s['errors']})"
+                  for name, s in result.items() if isinstance(s, dict)
+              ))
+        return result
+
+    async def _fetch_stage(self, loop, producer: Producer, raw_q: asyncio.Queue):
+        stats = self.stats["fetch"]
+
+        async def put_raw(meta: Dict, raw: bytes):
+            size = await self.budget.acquire(len(raw))
+            await raw_q.put((meta, raw, size))
+
+        def emit(meta: Dict, raw: bytes):
+            if self._aborted:
+                raise PipelineAborted()
+            stats.items += 1
+            stats.bytes += len(raw)
+            future = asyncio.run_coroutine_threadsafe(put_raw(meta, raw), loop)
+            # 分段等待：流水线中止后不再有人消费队列，拉取线程不能一直阻塞（它占着 IMAP 连接）
+            while True:
+                try:
+                    future.result(timeout=_EMIT_POLL_SECONDS)
+                    return
+                except FutureTimeoutError:
+                    if self._aborted:
+                        future.cancel()
+                        raise PipelineAborted()
+
+        t0 = time.monotonic()
+        try:
+            await loop.run_in_executor(None, producer, emit)
+        except PipelineAborted:
+            pass
+        except asyncio.CancelledError:
+            # 线程仍在运行，下一次 emit 时看到中止标记后退出
+            self._aborted = True
+            raise
+        except Exception as e:
+            stats.errors += 1
+            print(f"[Ingest]{self.label} Fetch stage error: {e}")
+        finally:
+            stats.busy += time.monotonic() - t0
+            stats.finished = time.monotonic()
+            if not self._aborted:
+                for _ in range(PARSE_WORKERS):
+                    await raw_q.put(_DONE)
+
+    async def _release_pending(self, *queues: asyncio.Queue):
+        """流水线中止后清空队列中的邮件并归还它们占用的额度"""
+        released = 0
+        for queue in queues:
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is not _DONE:
+                    released += item[-1]
+        if released:
+            await self.budget.release(released)
+
+    async def _parse_stage(self, raw_q: asyncio.Queue, parsed_q: asyncio.Queue):
+        stats = self.stats["parse"]
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await raw_q.get()
+            if item is _DONE:
+                break
+            meta, raw, size = item
+            t0 = time.monotonic()
+            parsed = None
+            try:
+                try:
+                    parsed = await loop.run_in_executor(get_parse_executor(), parse_raw_email, raw)
+                except BrokenProcessPool:
+                    _fallback_to_threads()
+                    parsed = await loop.run_in_executor(get_parse_executor(), parse_raw_email, raw)
+            except Exception as e:
+                stats.errors += 1
+                print(f"[Ingest]{self.label} Parse error (uid={meta.get('uid')}): {e}")
+            finally:
+                stats.busy += time.monotonic() - t0
+            del raw
+
+            if not parsed:
+                await self.budget.release(size)
+                continue
+            stats.items += 1
+            stats.bytes += size
+            parsed.update({k: v for k, v in meta.items() if k != "uid"})
+            await parsed_q.put((parsed, size))
+        stats.finished = time.monotonic()
+
+    async def _persist_stage(self, parsed_q: asyncio.Queue, translate_q: asyncio.Queue):
+        stats = self.stats["persist"]
+        done = False
+        while not done:
+            item = await parsed_q.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            # 取出已就绪的后续邮件，凑成一批在一个事务中入库
+            while len(batch) < DB_BATCH_SIZE:
+                try:
+                    nxt = parsed_q.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if nxt is _DONE:
+                    done = True
+                    break
+                batch.append(nxt)
+
+            t0 = time.monotonic()
+            results = []
+            try:
+                results = await self.persist([parsed for parsed, _ in batch])
+                stats.items += len(batch)
+            except Exception as e:
+                # 未提交的邮件下次同步会重新拉取
+                stats.errors += len(batch)
+                print(f"[Ingest]{self.label} Persist batch of {len(batch)} failed: {e}")
+            finally:
+                stats.busy += time.monotonic() - t0
+                await self.budget.release(sum(size for _, size in batch))
+            del batch
+
+            for entry in results or []:
+                await translate_q.put(entry)
+        stats.finished = time.monotonic()
+        await translate_q.put(_DONE)
+
+    async def _translate_stage(self, translate_q: asyncio.Queue):
+        stats = self.stats["translate"]
+        done = False
+        while not done:
+            item = await translate_q.get()
+            if item is _DONE:
+                break
+            batch = [item]
+            while True:
+                try:
+                    nxt = translate_q.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if nxt is _DONE:
+                    done = True
+                    break
+                batch.append(nxt)
+
+            t0 = time.monotonic()
+            try:
+                await self.enqueue(batch)
+                stats.items += len(batch)
+            except Exception as e:
+                stats.errors += len(batch)
+                print(f"[Ingest]{self.label} Translate enqueue failed: {e}")
+            finally:
+                stats.busy += time.monotonic() - t0
+        stats.finished = time.monotonic()
@@ -37,11 +37,17 @@ class LanguageService:
         self.vllm_base_url = settings.vllm_base_url
         self.vllm_model = settings.vllm_model
         # 构建认证 headers
-        headers = {}
+        self.headers = {}
         if settings.vllm_api_key:
-            headers["Authorization"] = f"Bearer {settings.vllm_api_key}"
+            self.headers["Authorization"] = f"Bearer {settings.vllm_api_key}"
         # 使用较短超时，避免长时间阻塞
-        self.http_client = httpx.Client(timeout=15.0, headers=headers)
+        self.timeout = 15.0
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """进程级共享的 vLLM keep-alive 连接池"""
+        from services.vllm_client import get_vllm_client
+        return get_vllm_client().sync_client
 
     def detect_language(self, text: str) -> str:
         """
@@ -183,12 +189,14 @@ class LanguageService:
         try:
             response = self.http_client.post(
                 f"{self.vllm_base_url}/v1/chat/completions",
+                headers=self.headers,
                 json={
                     "model": self.vllm_model,
                     "messages": [{"role": "user", "content": prompt}],
                     "temperature": 0.1,
                     "max_tokens": 16
-                }
+                },
+                timeout=self.timeout
             )
             response.raise_for_status()
             result = response.json()
@@ -259,5 +267,5 @@ class LanguageService:
         return "unknown"
 
     def close(self):
-        """关闭 HTTP 客户端"""
-        self.http_client.close()
+        """连接池由 VLLMClient 进程级共享，这里不关闭（保留接口兼容）"""
+        pass
@@ -0,0 +1,402 @@
+"""
+WebSocket 通知 Redis 桥接
+
+WebSocket 连接只存在于 uvicorn 进程的 ConnectionManager 中，Celery worker
+进程里直接 broadcast 找不到任何连接。这里用 Redis pub/sub 做扇出：
+- 发布端（worker / API）：publish_notification() 按账户发布到 {prefix}:ws:notify:account:{id}
+- 订阅端（每个 API 进程）：NotificationBridge 订阅 {prefix}:ws:notify:*，
+  收到消息后只投递给本进程持有的连接，多个 uvicorn worker 各自投递、互不重复
+
+订阅端批量投递：
+- 一次取出当前已到达的全部消息（最多 BATCH_MAX 条），按账户分组
+- 本进程没有该账户连接时直接丢弃
+- 同一批次内的进度类事件只保留最后一条，减少 WebSocket 帧数
+- 不同账户并发发送，同一账户内保持发布顺序
+
+在线状态：每个 API 进程把持有连接的账户登记到 {prefix}:ws:online:{id} 有序集合
+（成员为进程标识，score 为过期时间），每 PRESENCE_REFRESH 秒续期，进程退出或崩溃后
+最多 PRESENCE_TTL 秒失效；is_online() 据此判断账户在任一进程是否在线。
+
+Redis 不可用时 API 进程回退为本进程内直接广播。
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Optional, List, Tuple, Dict
+
+from shared.cache_config import cache_config
+
+# redis.asyncio 需要 redis-py >= 4.2
+try:
+    import redis.asyncio as aioredis
+    AIOREDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    AIOREDIS_AVAILABLE = False
+
+CHANNEL_PREFIX = f"{cache_config.prefix}:ws:notify"
+GLOBAL_CHANNEL = f"{CHANNEL_PREFIX}:global"
+
+# 单批次最多合并的消息数
+BATCH_MAX = 200
+
+# 同一批次内只需保留最新一条的进度类事件
+COALESCE_EVENTS = {
+    "fetch_progress",
+    "export_progress",
+    "batch_translation_progress",
+}
+
+# 订阅断开后的重连间隔（秒）
+RECONNECT_DELAY = 5
+
+# 在线状态的有效期和续期间隔（秒）
+PRESENCE_TTL = 60
+PRESENCE_REFRESH = 20
+# 查询在线状态的超时（秒），超时按在线处理
+PRESENCE_TIMEOUT = 0.5
+
+
+def account_channel(account_id: int) -> str:
+    """账户通知频道名"""
+    return f"{CHANNEL_PREFIX}:account:{account_id}"
+
+
+def presence_key(account_id: int) -> str:
+    """账户在线状态键名"""
+    return f"{cache_config.prefix}:ws:online:{account_id}"
+
+
+def _encode(account_id: Optional[int], event_type: str, data: dict) -> str:
+    return json.dumps({
+        "account_id": account_id,
+        "type": event_type,
+        "data": data,
+        "pid": os.getpid(),
+    }, ensure_ascii=False, default=str)
+
+
+def publish_notification(account_id: int, event_type: str, data: dict) -> bool:
+    """
+    同步发布账户通知（Celery 任务中使用）
+
+    Args:
+        account_id: 目标账户ID
+        event_type: 事件类型
+        data: 事件数据
+
+    Returns:
+        是否发布成功（Redis 不可用时返回 False）
+    """
+    client = cache_config.client
+    if client is None:
+        print(f"[NotifyBridge] Redis unavailable, dropped {event_type} for account {account_id}")
+        return False
+    try:
+        client.publish(account_channel(account_id), _encode(account_id, event_type, data))
+        return True
+    except Exception as e:
+        print(f"[NotifyBridge] Publish failed: {e}")
+        return False
+
+
+def publish_notifications(events: List[Tuple[int, str, dict]]) -> int:
+    """
+    批量发布账户通知（单次 pipeline 往返）
+
+    Args:
+        events: [(account_id, event_type, data), ...]
+
+    Returns:
+        成功发布的条数
+    """
+    if not events:
+        return 0
+    client = cache_config.client
+    if client is None:
+        print(f"[NotifyBridge] Redis unavailable, dropped {len(events)} notifications")
+        return 0
+    try:
+        pipe = client.pipeline(transaction=False)
+        for account_id, event_type, data in events:
+            pipe.publish(account_channel(account_id), _encode(account_id, event_type, data))
+        pipe.execute()
+        return len(events)
+    except Exception as e:
+        print(f"[NotifyBridge] Batch publish failed: {e}")
+        return 0
+
+
+def _coalesce(messages: List[dict]) -> List[dict]:
+    """同一账户同一进度事件只保留最后一条，其余消息保持原顺序"""
+    seen = set()
+    kept = []
+    for msg in reversed(messages):
+        if msg.get("type") in COALESCE_EVENTS:
+            key = (msg.get("account_id"), msg.get("type"))
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(msg)
+    kept.reverse()
+    return kept
+
+
+class NotificationBridge:
+    """
+    API 进程内的 Redis 订阅端
+
+    在 FastAPI lifespan 中 start()/stop()，运行期间 NotificationManager 的广播
+    统一经 Redis 发布，由各 API 进程的订阅端投递到本地连接。
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+        self._presence_task: Optional[asyncio.Task] = None
+        self._running = False
+        self._instance = f"{socket.gethostname()}:{os.getpid()}"
+        # 本进程已登记在线的账户
+        self._online = set()
+        self.stats = {"received": 0, "delivered": 0, "dropped": 0, "coalesced": 0, "batches": 0}
+
+    @property
+    def running(self) -> bool:
+        """订阅端是否在运行（运行中才走 Redis 发布）"""
+        return self._running
+
+    @property
+    def websocket_manager(self):
+        from websocket import manager
+        return manager
+
+    async def start(self) -> bool:
+        """
+        启动订阅（Redis 不可用时返回 False，通知回退为进程内广播）
+        """
+        if self._running:
+            return True
+        if not AIOREDIS_AVAILABLE:
+            print("[NotifyBridge] redis.asyncio not available, using in-process broadcast")
+            return False
+        try:
+            self._redis = aioredis.from_url(
+                cache_config.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=5
+            )
+            await self._redis.ping()
+            await self._subscribe()
+        except Exception as e:
+            print(f"[NotifyBridge] Redis unavailable ({e}), using in-process broadcast")
+            await self._close_redis()
+            return False
+
+        self._running = True
+        self._task = asyncio.create_task(self._listen())
+        self._presence_task = asyncio.create_task(self._refresh_presence())
+        print(f"[NotifyBridge] Subscribed to {CHANNEL_PREFIX}:* in pid={os.getpid()}")
+        return True
+
+    async def stop(self):
+        """停止订阅并释放连接"""
+        self._running = False
+        for task in (self._task, self._presence_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = self._presence_task = None
+        if self._online and self._redis is not None:
+            try:
+                await self._unregister(set(self._online))
+            except Exception as e:
+                print(f"[NotifyBridge] Presence cleanup failed: {e}")
+        await self._close_redis()
+        print(f"[NotifyBridge] Stopped: {self.stats}")
+
+    async def _subscribe(self):
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(f"{CHANNEL_PREFIX}:*")
+
+    @staticmethod
+    async def _aclose(obj):
+        # redis-py 5.0.1 起提供 aclose()，5.0.0 只有 close()
+        closer = getattr(obj, "aclose", None) or obj.close
+        try:
+            await closer()
+        except Exception:
+            pass
+
+    async def _close_redis(self):
+        if self._pubsub is not None:
+            await self._aclose(self._pubsub)
+            self._pubsub = None
+        if self._redis is not None:
+            await self._aclose(self._redis)
+            self._redis = None
+
+    async def publish(self, account_id: Optional[int], event_type: str, data: dict) -> bool:
+        """
+        异步发布通知（API 进程使用）
+
+        Args:
+            account_id: 目标账户ID，None 表示全局广播
+            event_type: 事件类型
+            data: 事件数据
+
+        Returns:
+            是否发布成功
+        """
+        if not self._running or self._redis is None:
+            return False
+        channel = GLOBAL_CHANNEL if account_id is None else account_channel(account_id)
+        try:
+            await self._redis.publish(channel, _encode(account_id, event_type, data))
+            return True
+        except Exception as e:
+            print(f"[NotifyBridge] Async publish failed: {e}")
+            return False
+
+    # ============ 在线状态 ============
+
+    async def _register(self, account_ids):
+        now = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        for account_id in account_ids:
+            key = presence_key(account_id)
+            pipe.zadd(key, {self._instance: now + PRESENCE_TTL})
+            # 顺带清理已退出进程的过期登记
+            pipe.zremrangebyscore(key, "-inf", now)
+            pipe.expire(key, PRESENCE_TTL)
+        await pipe.execute()
+        self._online.update(account_ids)
+
+    async def _unregister(self, account_ids):
+        pipe = self._redis.pipeline(transaction=False)
+        for account_id in account_ids:
+            pipe.zrem(presence_key(account_id), self._instance)
+        await pipe.execute()
+        self._online.difference_update(account_ids)
+
+    async def mark_online(self, account_id: int):
+        """本进程新增账户连接后立即登记在线（断开由定时续期清理）"""
+        if not self._running or self._redis is None:
+            return
+        try:
+            await self._register([account_id])
+        except Exception as e:
+            print(f"[NotifyBridge] Presence register failed: {e}")
+
+    async def is_online(self, account_id: int) -> bool:
+        """
+        账户在任一 API 进程中是否有 WebSocket 连接
+
+        Redis 出错或超时时按在线处理
+        """
+        if not self._running or self._redis is None:
+            return self.websocket_manager.get_connection_count(account_id) > 0
+        try:
+            count = await asyncio.wait_for(
+                self._redis.zcount(presence_key(account_id), time.time(), "+inf"),
+                timeout=PRESENCE_TIMEOUT
+            )
+        except Exception as e:
+            print(f"[NotifyBridge] Presence lookup failed: {e}")
+            return True
+        return count > 0
+
+    async def _refresh_presence(self):
+        """定时续期本进程在线账户，撤销已无连接的账户"""
+        while self._running:
+            await asyncio.sleep(PRESENCE_REFRESH)
+            try:
+                current = set(self.websocket_manager.active_connections)
+                gone = self._online - current
+                if current:
+                    await self._register(current)
+                if gone:
+                    await self._unregister(gone)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[NotifyBridge] Presence refresh failed: {e}")
+
+    async def _listen(self):
+        """订阅循环：阻塞等待首条消息，再非阻塞取出已到达的后续消息批量投递"""
+        while self._running:
+            try:
+                msg = await self._pubsub.get_message(timeout=1.0)
+                if msg is None:
+                    continue
+                batch = [msg]
+                while len(batch) < BATCH_MAX:
+                    more = await self._pubsub.get_message(timeout=0)
+                    if more is None:
+                        break
+                    batch.append(more)
+                await self._deliver(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[NotifyBridge] Subscription error: {e}, reconnecting in {RECONNECT_DELAY}s")
+                await asyncio.sleep(RECONNECT_DELAY)
+                try:
+                    if self._pubsub is not None:
+                        await self._aclose(self._pubsub)
+                    await self._subscribe()
+                except Exception as re_err:
+                    print(f"[NotifyBridge] Resubscribe failed: {re_err}")
+
+    async def _deliver(self, raw_messages: List[dict]):
+        """解析一批消息，按账户分组后投递到本进程连接"""
+        ws = self.websocket_manager
+        messages = []
+        for raw in raw_messages:
+            if raw.get("type") not in ("message", "pmessage"):
+                continue
+            try:
+                messages.append(json.loads(raw["data"]))
+            except (ValueError, TypeError, KeyError):
+                continue
+
+        self.stats["received"] += len(messages)
+        self.stats["batches"] += 1
+
+        kept = _coalesce(messages)
+        self.stats["coalesced"] += len(messages) - len(kept)
+
+        by_account: Dict[Optional[int], List[dict]] = {}
+        for msg in kept:
+            account_id = msg.get("account_id")
+            # 本进程没有该账户的连接，直接丢弃
+            if account_id is not None and ws.get_connection_count(account_id) == 0:
+                self.stats["dropped"] += 1
+                continue
+            by_account.setdefault(account_id, []).append(msg)
+
+        if by_account:
+            await asyncio.gather(
+                *(self._deliver_account(account_id, msgs) for account_id, msgs in by_account.items()),
+                return_exceptions=True
+            )
+
+    async def _deliver_account(self, account_id: Optional[int], msgs: List[dict]):
+        """按发布顺序投递单个账户的消息"""
+        ws = self.websocket_manager
+        for msg in msgs:
+            if account_id is None:
+                await ws.broadcast_global(msg["type"], msg.get("data") or {})
+            else:
+                await ws.broadcast(account_id, msg["type"], msg.get("data") or {})
+            self.stats["delivered"] += 1
+
+
+# 全局桥接实例（每个 API 进程一个）
+notification_bridge = NotificationBridge()
@@ -39,6 +39,10 @@ class NotificationManager:
             data: 事件数据
         """
         try:
+            # 桥接运行时经 Redis 发布，由所有 API 进程投递到各自持有的连接
+            from services.notification_bridge import notification_bridge
+            if notification_bridge.running and await notification_bridge.publish(account_id, event_type, data):
+                return
             await self.websocket_manager.broadcast(account_id, event_type, data)
         except Exception as e:
             print(f"[Notification] Failed to broadcast: {e}")
@@ -52,10 +56,26 @@ class NotificationManager:
             data: 事件数据
         """
         try:
+            from services.notification_bridge import notification_bridge
+            if notification_bridge.running and await notification_bridge.publish(None, event_type, data):
+                return
             await self.websocket_manager.broadcast_global(event_type, data)
         except Exception as e:
             print(f"[Notification] Failed to broadcast global: {e}")
 
+    async def has_listeners(self, account_id: int) -> bool:
+        """
+        账户是否有在线连接
+
+        本进程没有连接时，桥接运行中再查 Redis 在线状态（连接可能在其他 uvicorn 进程中）。
+        """
+        if self.websocket_manager.get_connection_count(account_id) > 0:
+            return True
+        from services.notification_bridge import notification_bridge
+        if notification_bridge.running:
+            return await notification_bridge.is_online(account_id)
+        return False
+
     async def notify_translation_complete(
         self,
         account_id: int,
@@ -282,6 +302,78 @@ class NotificationManager:
         })
 
 
+class TranslationDeltaNotifier:
+    """
+    流式翻译增量推送器
+
+    vLLM 每个 token 都会产生一段增量，逐条推送会放大 WebSocket 帧数量，
+    这里按时间/长度合并后再以 translation_delta 事件推送。
+    每个字段（body/subject）的 seq 从 0 开始递增，前端收到 seq=0 时清空旧译文。
+    """
+
+    FLUSH_INTERVAL = 0.1   # 最长缓冲时间（秒）
+    FLUSH_CHARS = 200      # 缓冲字符数阈值
+
+    def __init__(self, account_id: int, email_id: int, manager: "NotificationManager" = None):
+        self.account_id = account_id
+        self.email_id = email_id
+        self.manager = manager or notification_manager
+        self._buffer: List[str] = []
+        self._buffer_len = 0
+        self._field = "body"
+        self._seq: Dict[str, int] = {}
+        self._last_flush = asyncio.get_event_loop().time()
+
+    async def push(self, delta: str, field: str = "body"):
+        """
+        追加增量文本，达到阈值时推送
+
+        Args:
+            delta: 增量文本
+            field: 字段（body/subject）
+        """
+        if field != self._field:
+            # 切换字段前先把上一个字段的缓冲推送完
+            await self.flush(done=True)
+            self._field = field
+
+        self._buffer.append(delta)
+        self._buffer_len += len(delta)
+
+        now = asyncio.get_event_loop().time()
+        if self._buffer_len >= self.FLUSH_CHARS or now - self._last_flush >= self.FLUSH_INTERVAL:
+            await self.flush()
+
+    async def flush(self, done: bool = False):
+        """
+        推送缓冲区内容
+
+        Args:
+            done: 当前字段是否已结束
+        """
+        if not self._buffer and not done:
+            return
+        if not self._buffer and self._field not in self._seq:
+            # 该字段从未推送过内容，无需发送结束标记
+            return
+
+        seq = self._seq.get(self._field, 0)
+        self._seq[self._field] = seq + 1
+
+        delta = "".join(self._buffer)
+        self._buffer = []
+        self._buffer_len = 0
+        self._last_flush = asyncio.get_event_loop().time()
+
+        await self.manager.broadcast(self.account_id, "translation_delta", {
+            "email_id": self.email_id,
+            "field": self._field,
+            "delta": delta,
+            "seq": seq,
+            "done": done
+        })
+
+
 # 全局通知管理器实例
 notification_manager = NotificationManager()
 
@@ -303,11 +395,17 @@ def notify_sync(account_id: int, event_type: str, data: dict):
     """
     同步发送通知（用于 Celery 任务中）
 
+    优先经 Redis 发布给 API 进程；Redis 不可用时回退为进程内广播。
+
     Args:
         account_id: 账户ID
         event_type: 事件类型
         data: 事件数据
     """
+    from services.notification_bridge import publish_notification
+    if publish_notification(account_id, event_type, data):
+        return
+
     try:
         loop = asyncio.get_event_loop()
         if loop.is_running():
@@ -17,7 +17,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from database.models import EmailTemplate, EmailTemplateTranslation, EmailAccount
-from services.translate_service import TranslateService
+from services.translate_service import AsyncTranslateService
+from config import get_settings
 
 
 logger = logging.getLogger(__name__)
@@ -72,7 +73,12 @@ class TemplateService:
 
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.translate_service = TranslateService()
+        settings = get_settings()
+        self.translate_service = AsyncTranslateService(
+            vllm_base_url=settings.vllm_base_url,
+            vllm_model=settings.vllm_model,
+            vllm_api_key=settings.vllm_api_key,
+        )
 
     async def get_categories(self) -> List[Dict[str, Any]]:
         """获取模板分类列表"""
@@ -413,20 +419,18 @@ class TemplateService:
         # 翻译主题
         subject_translated = None
         if template.subject_cn:
-            subject_result = await self.translate_service.translate_text(
+            subject_translated = await self.translate_service.translate_text(
                 text=template.subject_cn,
                 target_lang=target_lang,
                 source_lang="zh"
-            )
-            subject_translated = subject_result.get("translated_text", template.subject_cn)
+            ) or template.subject_cn
 
         # 翻译正文
-        body_result = await self.translate_service.translate_text(
+        body_translated = await self.translate_service.translate_text(
             text=template.body_cn,
             target_lang=target_lang,
             source_lang="zh"
-        )
-        body_translated = body_result.get("translated_text", template.body_cn)
+        ) or template.body_cn
 
         # 保存或更新翻译
         if existing_translation:
@@ -1,7 +1,23 @@
 import httpx
-from typing import List, Dict, Tuple
+import hashlib
+import json
+from typing import List, Dict, Tuple, Callable, Awaitable, Optional
 import re
 import os
+from functools import lru_cache
+
+from utils.glossary_matcher import GlossaryMatcher
+
+# 标题+正文合并为一次请求（JSON 输出）的正文长度上限，超过则分别翻译
+COMBINED_MAX_CHARS = int(os.getenv("TRANSLATE_COMBINED_MAX_CHARS", "6000"))
+# 合并请求是否附带 response_format=json_object（vLLM 约束解码，旧版本不支持时可关闭）
+COMBINED_JSON_MODE = os.getenv("TRANSLATE_COMBINED_JSON_MODE", "true").lower() == "true"
+
+
+@lru_cache(maxsize=128)
+def _get_supplier_glossary_matcher(rows: Tuple[Tuple[str, str], ...], match_targets: bool) -> GlossaryMatcher:
+    """供应商术语表自动机（按术语内容缓存，Glossary 行变化后内容不同才会重建）"""
+    return GlossaryMatcher(dict(rows), match_targets=match_targets)
 
 
 class TranslateService:
@@ -281,6 +297,137 @@ class TranslateService:
         "단가": "单价",
     }
 
+    # 完整版翻译提示词（采购行业深度优化）
+    # system 消息逐字节固定（说明、规则、示例），vLLM 自动前缀缓存可在所有请求间复用其 KV；
+    # 语言、术语、上文、正文等每封邮件不同的内容全部放在其后的 user 消息中。
+    # 修改这两段文本会改变 PROMPT_VERSION，日志中可据此区分不同版本 prompt 的翻译结果。
+    TRANSLATION_SYSTEM_PROMPT = """你是精密机械行业的资深商务翻译专家，专门翻译采购部门与海外供应商的往来邮件。你精通英语、日语、韩语与中文的互译，熟悉精密机械、汽车零部件、品质管理等领域的专业术语。
+
+## 格式要求（最重要！）
+1. **逐行翻译**：原文每一行对应译文的一行，保持原文的换行结构
+2. **保持空行**：原文有空行的地方，译文也要有空行；原文没有空行，译文也不要加空行
+3. **不要合并段落**：即使原文是短句，也不要把多行合并成一行
+4. **不要添加内容**：不要添加原文没有的空行、分隔线、编号、标点等
+5. **保持列表格式**：如果原文有编号列表（1. 2. 3.）或符号列表（- * •），保持相同格式
+6. **表格保持对齐**：如果原文是表格数据，保持列对齐格式
+
+## 保持原样不翻译的内容（非常重要！）
+- 人名（如 John Smith, Karen, Noel, 田中太郎）
+- 公司名（如 Toyota, Bosch, ACP, Jingzhicheng）
+- **产品型号和零件编号**（如 2J1041, 2J1030, Blue Ring, MM, ABC-12345）— 这些是型号代码，不是普通单词！
+- 单号/编号（如 ACP-NCV25-011, Part No. 678, Invoice No.）
+- 邮箱地址（如 xxx@company.com）
+- 电话号码和传真号码
+- 物理地址和邮编
+- 日期格式保持原样（如 2024/12/08, Dec 8, 2024）
+- 金额和货币符号保持原格式（如 USD37,098.34, $100, ¥5000）
+- 网址和链接
+
+## 翻译风格要求
+- 使用正式的商务语言，保持专业性
+- 避免过度意译，保持原文的信息完整性
+- 技术术语使用行业通用译法
+- 日语敬语翻译时保持礼貌程度
+
+## 常见邮件结构处理
+- 问候语：保持原文的礼貌程度（Dear Mr. → 尊敬的...先生）
+- 签名块：保持原格式，人名公司名不翻译
+- 附件说明：如"Please find attached"翻译为"请查收附件"
+- 邮件引用：带 > 的引用内容也需翻译
+
+## 采购邮件易错翻译（字面意思≠行业含义）
+- "treatment" = "处理方式"（不是"治疗"！）
+- "shaft" = "轴类零件"（机械行业术语）
+- "For Schedule" = "待排期/待安排"（不是"对于时间表"）
+- "Pick up" = "提货/取货"
+- "Defect" = "缺陷"
+- "Remarks" = "备注"
+- "Plating peel-off" = "电镀脱落"
+- "Collapsed boxes" = "箱体塌陷"
+- "Detached strap" = "捆扎带脱落"
+
+## NCR 缺陷术语翻译（非常重要！常见于品质不良邮件主题）
+- "Dirt on Shaft" = "轴污/轴脏污"（不是"轴上的泥土"！）
+- "Scratch on Shaft" = "轴划痕"
+- "Rust on Shaft" = "轴锈蚀"
+- "Dent on Shaft" = "轴凹痕"
+- "Dirt on Surface" = "表面脏污"
+- "Scratch on Surface" = "表面划痕"
+- "Plating Defect" = "电镀缺陷"
+- "Surface Defect" = "表面缺陷"
+- "Dimension Out of Spec" = "尺寸超差"
+- "Out of Tolerance" = "超差"
+
+## 日语特殊处理
+- 「お世話になっております」→「承蒙关照」（商务标准译法）
+- 「よろしくお願いします」→「请多关照」
+- 「ご確認ください」→「请确认」
+- 「ご検討ください」→「请评估/请考虑」
+- 敬语保持相应的礼貌程度
+
+## 翻译示例
+
+### 示例1：简单确认邮件
+原文：
+Thank you for your email.
+The shipment has been confirmed.
+
+译文：
+谢谢您的邮件。
+发货已确认。
+
+### 示例2：带产品型号的邮件
+原文：
+Please check the treatment for 2J1041 shaft.
+Container: 40ft Blue Ring
+
+译文：
+请确认 2J1041 轴类零件的处理方式。
+集装箱：40尺柜 Blue Ring
+
+### 示例3：日语邮件
+原文：
+お世話になっております。
+納期の件、ご確認ください。
+
+译文：
+承蒙关照。
+关于交期事宜，请确认。"""
+
+    TRANSLATION_USER_TEMPLATE = """{think_prefix}## 任务
+将以下{source_name}邮件翻译为{target_name}。**只输出译文，不要输出任何解释、思考过程或额外说明。**
+
+{glossary_section}{context_section}## 待翻译邮件
+
+{text}
+
+## 输出要求
+只输出上述邮件的{target_name}翻译，不要包含原文，不要添加任何前缀或标签："""
+
+    # 标题+正文合并翻译（一次请求，JSON 输出），system 消息与单独翻译共用
+    TRANSLATION_PAIR_TEMPLATE = """{think_prefix}## 任务
+将以下{source_name}邮件的标题（subject）和正文（body）翻译为{target_name}。**只输出 JSON，不要输出任何解释、思考过程或额外说明。**
+
+{glossary_section}## 待翻译邮件（JSON）
+
+{payload}
+
+## 输出要求
+输出一个 JSON 对象，格式为 {{"subject": "标题译文", "body": "正文译文"}}：
+- 正文逐行翻译，换行结构与原文一致（JSON 字符串中用 \\n 表示换行）
+- 不要包含原文，不要使用代码块标记"""
+
+    PROMPT_VERSION = hashlib.sha256(
+        f"{TRANSLATION_SYSTEM_PROMPT}\x00{TRANSLATION_USER_TEMPLATE}\x00{TRANSLATION_PAIR_TEMPLATE}".encode("utf-8")
+    ).hexdigest()[:12]
+
+    LANG_NAMES = {
+        "zh": "中文",
+        "en": "英文",
+        "ja": "日文",
+        "ko": "韩文"
+    }
+
     def __init__(self, vllm_base_url: str = None, vllm_model: str = None,
                  vllm_api_key: str = None, **kwargs):
         """
@@ -300,9 +447,17 @@ class TranslateService:
         if self.vllm_api_key:
             self.vllm_headers["Authorization"] = f"Bearer {self.vllm_api_key}"
 
-        # vLLM 本地模型需要较长的超时时间（600秒）
-        self.http_client = httpx.Client(timeout=600.0, headers=self.vllm_headers)
-        self.vllm_client = httpx.Client(timeout=600.0, headers=self.vllm_headers)
+        # vLLM 本地模型需要较长的超时时间（600秒），按请求指定
+        self.vllm_timeout = 600.0
+
+    @property
+    def vllm_client(self) -> httpx.Client:
+        """进程级共享的 vLLM keep-alive 连接池（见 services.vllm_client）"""
+        from services.vllm_client import get_vllm_client
+        return get_vllm_client().sync_client
+
+    # 兼容旧属性名
+    http_client = vllm_client
 
     def _detect_language_type(self, text: str) -> str:
         """
@@ -375,21 +530,52 @@ class TranslateService:
         return body, ""
 
     # ============ 翻译 Prompt 模板 ============
-    def _format_glossary_table(self, glossary: List[Dict] = None) -> str:
-        """格式化术语表为 Markdown 表格"""
-        # 合并核心术语表和供应商特定术语表
-        all_terms = dict(self.CORE_GLOSSARY)
-        if glossary:
-            for g in glossary:
-                # 兼容字典和其他格式
-                if isinstance(g, dict):
-                    all_terms[g.get('source', '')] = g.get('target', '')
-                # 跳过非字典类型（如字符串）
+    # 核心术语表自动机（进程内只构建一次，按是否匹配译文分两份）
+    _core_glossary_matchers: Dict[bool, GlossaryMatcher] = {}
+
+    @classmethod
+    def _get_core_glossary_matcher(cls, match_targets: bool) -> GlossaryMatcher:
+        matcher = cls._core_glossary_matchers.get(match_targets)
+        if matcher is None:
+            matcher = GlossaryMatcher(cls.CORE_GLOSSARY, match_targets=match_targets)
+            cls._core_glossary_matchers[match_targets] = matcher
+        return matcher
+
+    def _format_glossary_table(self, glossary: List[Dict] = None, text: str = None,
+                               source_lang: str = None) -> str:
+        """格式化术语表为 Markdown 表格
+
+        Args:
+            glossary: 供应商特定术语表（覆盖同名核心术语）
+            text: 待翻译正文；传入时只输出正文中出现的术语，None 时输出完整术语表
+            source_lang: 源语言；中文原文（回复翻译）按译文列匹配
+
+        Returns:
+            Markdown 表格；没有命中的术语时返回空字符串
+        """
+        # 供应商特定术语表（兼容字典和其他格式，跳过非字典类型如字符串）
+        supplier_rows = tuple(
+            (g.get('source', ''), g.get('target', ''))
+            for g in (glossary or []) if isinstance(g, dict)
+        )
+
+        if text is None:
+            # 合并核心术语表和供应商特定术语表
+            all_terms = dict(self.CORE_GLOSSARY)
+            all_terms.update(supplier_rows)
+        else:
+            match_targets = source_lang == "zh"
+            all_terms = dict(self._get_core_glossary_matcher(match_targets).match(text))
+            if supplier_rows:
+                all_terms.update(_get_supplier_glossary_matcher(supplier_rows, match_targets).match(text))
+
+        rows = [(term, translation) for term, translation in all_terms.items() if term and translation]
+        if not rows:
+            return ""
 
         lines = ["| 原文 | 译文 |", "|------|------|"]
-        for term, translation in all_terms.items():
-            if term and translation:
-                lines.append(f"| {term} | {translation} |")
+        for term, translation in rows:
+            lines.append(f"| {term} | {translation} |")
         return "\n".join(lines)
 
     def _clean_translation_output(self, translated: str, original: str, target_lang: str) -> str:
@@ -503,37 +689,44 @@ class TranslateService:
 
         return translated
 
-    def _build_translation_prompt(self, text: str, target_lang: str, source_lang: str = None,
-                                   glossary: List[Dict] = None, use_think: bool = True,
-                                   is_short_text: bool = False, is_long_text: bool = False) -> str:
-        """构建优化后的翻译 prompt（基于邮件样本分析优化）
+    def _build_translation_messages(self, text: str, target_lang: str, source_lang: str = None,
+                                    glossary: List[Dict] = None, use_think: bool = True,
+                                    is_short_text: bool = False, is_long_text: bool = False,
+                                    context: str = None) -> List[Dict]:
+        """构建优化后的翻译消息列表（基于邮件样本分析优化）
+
+        完整版 prompt 拆为固定的 system 消息 + 可变的 user 消息；
+        短文本、长文本提示词本身很短，仍为单条 user 消息。
 
         Args:
             use_think: 是否使用 /think 模式（vLLM 不支持，始终禁用）
             is_short_text: 是否是短文本（如邮件主题），需要更严格的限制
             is_long_text: 是否是长文本（>8000字符），使用简洁提示防止摘要
+            context: 上文片段（分段翻译时传入前一段末尾），仅供理解语境，不翻译
         """
-        lang_names = {
-            "zh": "中文",
-            "en": "英文",
-            "ja": "日文",
-            "ko": "韩文"
-        }
+        target_name = self.LANG_NAMES.get(target_lang, target_lang)
+        source_name = self.LANG_NAMES.get(source_lang, "原文") if source_lang else "原文"
+
+        # 上文片段（分段翻译时保持语境连贯）
+        context_section = ""
+        if context:
+            context_section = f"""## 上文（仅供理解语境，不要翻译，不要输出）
 
-        target_name = lang_names.get(target_lang, target_lang)
-        source_name = lang_names.get(source_lang, "原文") if source_lang else "原文"
+{context}
+
+"""
 
         # 短文本使用简化的严格 prompt（不使用格式标签，避免模型输出原文）
         if is_short_text:
-            return f"""翻译任务：将以下内容翻译为{target_name}。
+            return [{"role": "user", "content": f"""翻译任务：将以下内容翻译为{target_name}。
 
 要求：只输出译文，不输出原文，不添加任何标签或前缀。
 
-{text}"""
+{text}"""}]
 
         # 长文本使用简洁明确的提示词，防止模型做摘要（不使用 --- 分隔线）
         if is_long_text:
-            return f"""你是专业翻译。将下面的{source_name}文本完整翻译为{target_name}。
+            return [{"role": "user", "content": f"""你是专业翻译。将下面的{source_name}文本完整翻译为{target_name}。
 
 关键要求：
 1. 必须完整翻译每一句话，绝对不能省略或概括
@@ -541,131 +734,189 @@ class TranslateService:
 3. 人名、公司名、产品型号、编号保持原样
 4. 只输出译文，不要输出原文，不要任何解释或前缀
 
-## 待翻译内容
+{context_section}## 待翻译内容
 
 {text}
 
 ## 输出
-只输出上述内容的{target_name}翻译："""
+只输出上述内容的{target_name}翻译："""}]
 
-        # 术语表（核心术语 + 供应商特定术语）
-        glossary_table = self._format_glossary_table(glossary)
+        # 术语表（核心术语 + 供应商特定术语，只注入正文中出现的术语）
+        glossary_table = self._format_glossary_table(glossary, text=text, source_lang=source_lang)
+        glossary_section = f"## 术语表\n{glossary_table}\n\n" if glossary_table else ""
 
         # /think 前缀（vLLM 不支持）
         think_prefix = "/think\n" if use_think else ""
 
-        # 完整版提示词（采购行业深度优化）
-        prompt = f"""{think_prefix}你是精密机械行业的资深商务翻译专家，专门翻译采购部门与海外供应商的往来邮件。你精通英语、日语、韩语与中文的互译，熟悉精密机械、汽车零部件、品质管理等领域的专业术语。
-
-## 任务
-将以下{source_name}邮件翻译为{target_name}。**只输出译文，不要输出任何解释、思考过程或额外说明。**
-
-## 格式要求（最重要！）
-1. **逐行翻译**：原文每一行对应译文的一行，保持原文的换行结构
-2. **保持空行**：原文有空行的地方，译文也要有空行；原文没有空行，译文也不要加空行
-3. **不要合并段落**：即使原文是短句，也不要把多行合并成一行
-4. **不要添加内容**：不要添加原文没有的空行、分隔线、编号、标点等
-5. **保持列表格式**：如果原文有编号列表（1. 2. 3.）或符号列表（- * •），保持相同格式
-6. **表格保持对齐**：如果原文是表格数据，保持列对齐格式
-
-## 保持原样不翻译的内容（非常重要！）
-- 人名（如 John Smith, Karen, Noel, 田中太郎）
-- 公司名（如 Toyota, Bosch, ACP, Jingzhicheng）
-- **产品型号和零件编号**（如 2J1041, 2J1030, Blue Ring, MM, ABC-12345）— 这些是型号代码，不是普通单词！
-- 单号/编号（如 ACP-NCV25-011, Part No. 678, Invoice No.）
-- 邮箱地址（如 xxx@company.com）
-- 电话号码和传真号码
-- 物理地址和邮编
-- 日期格式保持原样（如 2024/12/08, Dec 8, 2024）
-- 金额和货币符号保持原格式（如 USD37,098.34, $100, ¥5000）
-- 网址和链接
-
-## 翻译风格要求
-- 使用正式的商务语言，保持专业性
-- 避免过度意译，保持原文的信息完整性
-- 技术术语使用行业通用译法
-- 日语敬语翻译时保持礼貌程度
-
-## 常见邮件结构处理
-- 问候语：保持原文的礼貌程度（Dear Mr. → 尊敬的...先生）
-- 签名块：保持原格式，人名公司名不翻译
-- 附件说明：如"Please find attached"翻译为"请查收附件"
-- 邮件引用：带 > 的引用内容也需翻译
-
-## 采购邮件易错翻译（字面意思≠行业含义）
-- "treatment" = "处理方式"（不是"治疗"！）
-- "shaft" = "轴类零件"（机械行业术语）
-- "For Schedule" = "待排期/待安排"（不是"对于时间表"）
-- "Pick up" = "提货/取货"
-- "Defect" = "缺陷"
-- "Remarks" = "备注"
-- "Plating peel-off" = "电镀脱落"
-- "Collapsed boxes" = "箱体塌陷"
-- "Detached strap" = "捆扎带脱落"
+        user_prompt = self.TRANSLATION_USER_TEMPLATE.format(
+            think_prefix=think_prefix,
+            source_name=source_name,
+            target_name=target_name,
+            glossary_section=glossary_section,
+            context_section=context_section,
+            text=text,
+        )
+        return [
+            {"role": "system", "content": self.TRANSLATION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
 
-## NCR 缺陷术语翻译（非常重要！常见于品质不良邮件主题）
-- "Dirt on Shaft" = "轴污/轴脏污"（不是"轴上的泥土"！）
-- "Scratch on Shaft" = "轴划痕"
-- "Rust on Shaft" = "轴锈蚀"
-- "Dent on Shaft" = "轴凹痕"
-- "Dirt on Surface" = "表面脏污"
-- "Scratch on Surface" = "表面划痕"
-- "Plating Defect" = "电镀缺陷"
-- "Surface Defect" = "表面缺陷"
-- "Dimension Out of Spec" = "尺寸超差"
-- "Out of Tolerance" = "超差"
+    # ============ vLLM Translation (OpenAI 兼容 API) ============
+    def _build_vllm_payload(self, text: str, target_lang: str, source_lang: str = None,
+                            glossary: List[Dict] = None, context: str = None) -> Dict:
+        """构建 /v1/chat/completions 请求体（同步、流式调用共用）"""
+        text_len = len(text)
+        # 短文本（<100字符且无换行）使用简化的严格 prompt，防止 LLM 过度扩展
+        is_short_text = text_len < 100 and '\n' not in text
+        # 长文本判断
+        is_long_text = text_len > 8000
 
-## 日语特殊处理
-- 「お世話になっております」→「承蒙关照」（商务标准译法）
-- 「よろしくお願いします」→「请多关照」
-- 「ご確認ください」→「请确认」
-- 「ご検討ください」→「请评估/请考虑」
-- 敬语保持相应的礼貌程度
+        # vLLM 不支持 think 模式，始终禁用
+        use_think = False
 
-## 核心术语表
-{glossary_table}
+        messages = self._build_translation_messages(text, target_lang, source_lang, glossary,
+                                                    use_think=use_think,
+                                                    is_short_text=is_short_text,
+                                                    is_long_text=is_long_text,
+                                                    context=context)
 
-## 翻译示例
+        # 动态计算 max_tokens：翻译到中文通常输出比英文短（约 0.6-0.8 倍）
+        # 但我们给足够的空间，防止截断
+        # 估算：1 个英文字符约 0.3 token，中文约 0.5 token
+        estimated_tokens = max(4096, int(text_len * 0.8))
+        # 限制最大值防止内存爆炸
+        max_tokens = min(estimated_tokens, 16384)
 
-### 示例1：简单确认邮件
-原文：
-Thank you for your email.
-The shipment has been confirmed.
+        return {
+            "model": self.vllm_model,
+            "messages": messages,
+            "temperature": 0.3,
+            "max_tokens": max_tokens
+        }
 
-译文：
-谢谢您的邮件。
-发货已确认。
+    def _build_pair_payload(self, subject: str, body: str, target_lang: str,
+                            source_lang: str = None, glossary: List[Dict] = None) -> Dict:
+        """构建标题+正文合并翻译的请求体（system 消息与单独翻译相同，可复用前缀缓存）"""
+        target_name = self.LANG_NAMES.get(target_lang, target_lang)
+        source_name = self.LANG_NAMES.get(source_lang, "原文") if source_lang else "原文"
+
+        glossary_table = self._format_glossary_table(glossary, text=f"{subject}\n{body}",
+                                                     source_lang=source_lang)
+        glossary_section = f"## 术语表\n{glossary_table}\n\n" if glossary_table else ""
+
+        user_prompt = self.TRANSLATION_PAIR_TEMPLATE.format(
+            think_prefix="",
+            source_name=source_name,
+            target_name=target_name,
+            glossary_section=glossary_section,
+            payload=json.dumps({"subject": subject, "body": body}, ensure_ascii=False, indent=2),
+        )
+        payload = {
+            "model": self.vllm_model,
+            "messages": [
+                {"role": "system", "content": self.TRANSLATION_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.3,
+            "max_tokens": min(max(4096, int((len(subject) + len(body)) * 0.8)), 16384)
+        }
+        if COMBINED_JSON_MODE:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
 
-### 示例2：带产品型号的邮件
-原文：
-Please check the treatment for 2J1041 shaft.
-Container: 40ft Blue Ring
+    def _parse_pair_output(self, content: str, subject: str, body: str,
+                           target_lang: str) -> Optional[Tuple[str, str]]:
+        """
+        解析并校验合并翻译的 JSON 输出
 
-译文：
-请确认 2J1041 轴类零件的处理方式。
-集装箱：40尺柜 Blue Ring
+        Returns:
+            (标题译文, 正文译文)；不是合法 JSON、缺少字段或译文为空时返回 None
+        """
+        content = (content or "").strip()
+        # 兼容模型输出的 ```json 代码块或前后多余文字
+        start, end = content.find("{"), content.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(content[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        subject_translated = data.get("subject")
+        body_translated = data.get("body")
+        if not isinstance(subject_translated, str) or not isinstance(body_translated, str):
+            return None
+        subject_translated = subject_translated.strip()
+        body_translated = body_translated.strip()
+        if not subject_translated or not body_translated:
+            return None
+
+        return (
+            self._clean_translation_output(subject_translated, subject, target_lang),
+            self._clean_translation_output(body_translated, body, target_lang),
+        )
 
-### 示例3：日语邮件
-原文：
-お世話になっております。
-納期の件、ご確認ください。
+    def _can_translate_pair(self, subject: str, body: str) -> bool:
+        return bool(subject and subject.strip() and body and body.strip()) and len(body) <= COMBINED_MAX_CHARS
 
-译文：
-承蒙关照。
-关于交期事宜，请确认。
+    def translate_subject_and_body(self, subject: str, body: str, target_lang: str = "zh",
+                                   source_lang: str = None,
+                                   glossary: List[Dict] = None) -> Optional[Tuple[str, str]]:
+        """
+        一次请求同时翻译标题和正文（模型输出 {"subject", "body"} JSON）
 
-## 待翻译邮件
+        Args:
+            subject: 邮件标题
+            body: 邮件正文（超过 COMBINED_MAX_CHARS 时不合并）
+            target_lang: 目标语言
+            source_lang: 源语言
+            glossary: 术语表
 
-{text}
+        Returns:
+            (标题译文, 正文译文)；不适用合并、请求失败或输出校验不通过时返回 None，
+            调用方应回退为分别翻译
+        """
+        if not self._can_translate_pair(subject, body):
+            return None
 
-## 输出要求
-只输出上述邮件的{target_name}翻译，不要包含原文，不要添加任何前缀或标签："""
-        return prompt
+        payload = self._build_pair_payload(subject, body, target_lang, source_lang, glossary)
+        try:
+            response = self.vllm_client.post(
+                f"{self.vllm_base_url}/v1/chat/completions",
+                headers=self.vllm_headers,
+                json=payload,
+                timeout=self.vllm_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+        except Exception as e:
+            print(f"[vLLM/{self.vllm_model}] Combined subject+body request failed, falling back: {e}")
+            return None
+
+        pair = self._parse_pair_output(content, subject, body, target_lang)
+        if pair is None:
+            print(f"[vLLM/{self.vllm_model}] Combined subject+body output invalid, falling back")
+            return None
+        print(f"[vLLM/{self.vllm_model}] Translated subject+body to {target_lang} ({self._format_usage(result)})")
+        return pair
+
+    def _format_usage(self, result: Dict) -> str:
+        """日志用：prompt 版本 + vLLM 返回的 token 用量（cached 需 vLLM 开启 --enable-prompt-tokens-details）"""
+        summary = f"prompt={self.PROMPT_VERSION}"
+        usage = result.get("usage") or {}
+        if usage.get("prompt_tokens") is not None:
+            summary += f", prompt_tokens={usage['prompt_tokens']}"
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            if cached is not None:
+                summary += f", cached={cached}"
+        return summary
 
-    # ============ vLLM Translation (OpenAI 兼容 API) ============
     def translate_with_vllm(self, text: str, target_lang: str = "zh",
                              source_lang: str = None, glossary: List[Dict] = None,
-                             complexity_score: int = None) -> str:
+                             complexity_score: int = None, context: str = None) -> str:
         """
         Translate text using local vLLM model (OpenAI compatible API)
 
@@ -675,42 +926,21 @@ Container: 40ft Blue Ring
             source_lang: Source language (auto-detect if None)
             glossary: List of term mappings for context
             complexity_score: Optional complexity score (0-100) from smart routing
+            context: Preceding text for context only (not translated)
         """
         # 空文本检查
         if not text:
             return ""
-        text_len = len(text)
-        # 短文本（<100字符且无换行）使用简化的严格 prompt，防止 LLM 过度扩展
-        is_short_text = text_len < 100 and '\n' not in text
-        # 长文本判断
-        is_long_text = text_len > 8000
 
-        # vLLM 不支持 think 模式，始终禁用
-        use_think = False
-
-        prompt = self._build_translation_prompt(text, target_lang, source_lang, glossary,
-                                                 use_think=use_think,
-                                                 is_short_text=is_short_text,
-                                                 is_long_text=is_long_text)
-
-        # 动态计算 max_tokens：翻译到中文通常输出比英文短（约 0.6-0.8 倍）
-        # 但我们给足够的空间，防止截断
-        # 估算：1 个英文字符约 0.3 token，中文约 0.5 token
-        estimated_tokens = max(4096, int(text_len * 0.8))
-        # 限制最大值防止内存爆炸
-        max_tokens = min(estimated_tokens, 16384)
+        payload = self._build_vllm_payload(text, target_lang, source_lang, glossary, context=context)
 
         try:
-            # 使用专用的 vLLM 客户端（超时更长）
-            client = getattr(self, 'vllm_client', self.http_client)
-            response = client.post(
+            # 使用共享连接池（超时更长）
+            response = self.vllm_client.post(
                 f"{self.vllm_base_url}/v1/chat/completions",
-                json={
-                    "model": self.vllm_model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.3,
-                    "max_tokens": max_tokens
-                }
+                headers=self.vllm_headers,
+                json=payload,
+                timeout=self.vllm_timeout
             )
             response.raise_for_status()
 
@@ -720,7 +950,7 @@ Container: 40ft Blue Ring
             # 去除可能的原文重复（模型有时会输出原文+译文）
             translated = self._clean_translation_output(translated, text, target_lang)
 
-            print(f"[vLLM/{self.vllm_model}] Translated to {target_lang}")
+            print(f"[vLLM/{self.vllm_model}] Translated to {target_lang} ({self._format_usage(result)})")
             return translated
 
         except httpx.HTTPStatusError as e:
@@ -730,6 +960,82 @@ Container: 40ft Blue Ring
             print(f"vLLM translation error: {e}")
             raise
 
+    async def translate_with_vllm_stream(self, text: str, target_lang: str = "zh",
+                                         source_lang: str = None, glossary: List[Dict] = None,
+                                         on_delta: Callable[[str], Awaitable[None]] = None,
+                                         context: str = None) -> str:
+        """
+        流式翻译：stream=True 调用 vLLM，每收到一段增量文本就回调 on_delta
+
+        增量文本是模型原始输出；完整结果仍经过 _clean_translation_output 清理后返回，
+        调用方应以返回值为准持久化。
+
+        Args:
+            text: 待翻译文本
+            target_lang: 目标语言
+            source_lang: 源语言
+            glossary: 术语表
+            on_delta: 异步回调，参数为增量文本
+            context: 上文片段（不翻译）
+
+        Returns:
+            清理后的完整译文
+        """
+        if not text:
+            return ""
+
+        from services.vllm_client import get_vllm_client
+
+        payload = self._build_vllm_payload(text, target_lang, source_lang, glossary, context=context)
+        payload["stream"] = True
+
+        vllm = get_vllm_client()
+        parts = []
+        try:
+            async with vllm.async_limiter, vllm.async_client.stream(
+                "POST",
+                f"{self.vllm_base_url}/v1/chat/completions",
+                headers=self.vllm_headers,
+                json=payload,
+                timeout=self.vllm_timeout
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                response.raise_for_status()
+
+                # Server-Sent Events：每行 "data: {...}"，以 "data: [DONE]" 结束
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if not delta:
+                        continue
+                    parts.append(delta)
+                    if on_delta:
+                        await on_delta(delta)
+
+        except httpx.HTTPStatusError as e:
+            print(f"vLLM API error: {e.response.status_code} - {e.response.text}")
+            raise
+        except Exception as e:
+            print(f"vLLM streaming translation error: {e}")
+            raise
+
+        translated = "".join(parts).strip()
+        translated = self._clean_translation_output(translated, text, target_lang)
+        print(f"[vLLM/{self.vllm_model}] Streamed translation to {target_lang} (prompt={self.PROMPT_VERSION})")
+        return translated
+
     # ============ Main Translation Method ============
     def translate_text(self, text: str, target_lang: str = "zh",
                        glossary: List[Dict] = None, context: str = None,
@@ -741,7 +1047,7 @@ Container: 40ft Blue Ring
             text: Text to translate
             target_lang: Target language (zh, en, ja)
             glossary: List of term mappings
-            context: Previous conversation context
+            context: Preceding text for context only (e.g. tail of the previous chunk)
             source_lang: Source language hint
 
         Returns:
@@ -749,7 +1055,7 @@ Container: 40ft Blue Ring
         """
         if not text:
             return ""
-        return self.translate_with_vllm(text, target_lang, source_lang, glossary)
+        return self.translate_with_vllm(text, target_lang, source_lang, glossary, context=context)
 
     def translate_with_smart_routing(self, text: str, subject: str = "",
                                       target_lang: str = "zh",
@@ -788,20 +1094,81 @@ Container: 40ft Blue Ring
             complexity = ComplexityLevel.MEDIUM
             score = 50
 
-        # 统一使用 vLLM 翻译
+        # 统一使用 vLLM 翻译：标题和正文优先合并为一次请求，失败时分别翻译
+        subject_translated = None
+        pair = None
+        if translate_subject and subject:
+            pair = self.translate_subject_and_body(subject, text, target_lang, source_lang, glossary)
+
+        if pair:
+            subject_translated, body_translated = pair
+        else:
+            # 翻译正文
+            body_translated = self.translate_with_vllm(
+                text, target_lang, source_lang, glossary,
+                complexity_score=score
+            )
+
+            # 翻译标题
+            if translate_subject and subject:
+                subject_translated = self.translate_with_vllm(
+                    subject, target_lang, source_lang, glossary,
+                    complexity_score=score
+                )
+
+        result = {
+            "translated_text": body_translated,
+            "provider_used": "vllm",
+            "complexity": {"level": complexity.value, "score": score},
+            "fallback_reason": None
+        }
+        if subject_translated:
+            result["subject_translated"] = subject_translated
+
+        return result
+
+    async def translate_with_smart_routing_stream(self, text: str, subject: str = "",
+                                                  target_lang: str = "zh",
+                                                  glossary: List[Dict] = None,
+                                                  source_lang: str = None,
+                                                  translate_subject: bool = True,
+                                                  on_delta: Callable[[str, str], Awaitable[None]] = None) -> Dict:
+        """
+        流式翻译邮件（交互式翻译使用），返回结构与 translate_with_smart_routing 相同
+
+        先流式翻译正文，再流式翻译标题，增量文本通过 on_delta(delta, field) 推送，
+        field 为 "body" 或 "subject"。
+
+        Args:
+            text: 邮件正文
+            subject: 邮件标题
+            target_lang: 目标语言
+            glossary: 术语表
+            source_lang: 源语言
+            translate_subject: 是否同时翻译标题
+            on_delta: 异步回调 (delta, field)
+        """
+        complexity, score = await self._check_complexity_async(text, subject)
+
+        def field_callback(field: str) -> Optional[Callable[[str], Awaitable[None]]]:
+            if on_delta is None:
+                return None
+
+            async def _cb(delta: str):
+                await on_delta(delta, field)
+            return _cb
+
         subject_translated = None
 
-        # 翻译正文
-        body_translated = self.translate_with_vllm(
+        body_translated = await self.translate_with_vllm_stream(
             text, target_lang, source_lang, glossary,
-            complexity_score=score
+            on_delta=field_callback("body")
         )
 
-        # 翻译标题
         if translate_subject and subject:
-            subject_translated = self.translate_with_vllm(
+            subject_translated = await self.translate_with_vllm_stream(
                 subject, target_lang, source_lang, glossary,
-                complexity_score=score
+                on_delta=field_callback("subject")
             )
 
         result = {
@@ -815,6 +1182,21 @@ Container: 40ft Blue Ring
 
         return result
 
+    async def _check_complexity_async(self, text: str, subject: str = ""):
+        """评估复杂度（仅用于日志，同步分析器放到线程池避免阻塞事件循环）"""
+        import asyncio
+        from services.email_analyzer import get_email_analyzer, ComplexityLevel
+
+        try:
+            analyzer = get_email_analyzer(self.vllm_base_url, self.vllm_model)
+            complexity, score = await asyncio.to_thread(analyzer.quick_complexity_check, text, subject)
+            print(f"[Translate] Complexity: {complexity.value} (score={score})")
+        except Exception as e:
+            print(f"[Translate] Complexity check failed: {e}, defaulting to MEDIUM")
+            complexity = ComplexityLevel.MEDIUM
+            score = 50
+        return complexity, score
+
     def translate_email_reply(self, chinese_text: str, target_lang: str,
                               conversation_history: List[Dict] = None,
                               glossary: List[Dict] = None) -> str:
@@ -874,7 +1256,24 @@ Container: 40ft Blue Ring
         if not quoted or not quoted.strip():
             return ""
 
-        # 去除 > 前缀，保存每行是否有前缀
+        clean_text, line_prefixes = self._strip_quote_prefixes(quoted)
+
+        # 跳过太短或空的内容
+        if len(clean_text.strip()) < 10:
+            return quoted  # 内容太少，保持原样
+
+        # 翻译
+        try:
+            translated = self.translate_text(clean_text, target_lang, source_lang=source_lang)
+        except Exception as e:
+            print(f"[TranslateQuoted] Failed to translate quoted content: {e}")
+            return quoted  # 翻译失败，返回原文
+
+        return self._restore_quote_prefixes(translated, line_prefixes)
+
+    @staticmethod
+    def _strip_quote_prefixes(quoted: str) -> Tuple[str, List[str]]:
+        """去除 > 前缀，返回 (纯文本, 每行的前缀)"""
         lines = quoted.split('\n')
         clean_lines = []
         line_prefixes = []  # 记录每行的前缀
@@ -890,21 +1289,11 @@ Container: 40ft Blue Ring
             line_prefixes.append(prefix)
             clean_lines.append(stripped)
 
-        # 合并纯文本进行翻译
-        clean_text = '\n'.join(clean_lines)
-
-        # 跳过太短或空的内容
-        if len(clean_text.strip()) < 10:
-            return quoted  # 内容太少，保持原样
-
-        # 翻译
-        try:
-            translated = self.translate_text(clean_text, target_lang, source_lang=source_lang)
-        except Exception as e:
-            print(f"[TranslateQuoted] Failed to translate quoted content: {e}")
-            return quoted  # 翻译失败，返回原文
+        return '\n'.join(clean_lines), line_prefixes
 
-        # 重新添加 > 前缀
+    @staticmethod
+    def _restore_quote_prefixes(translated: str, line_prefixes: List[str]) -> str:
+        """按原始行重新添加 > 前缀"""
         translated_lines = translated.split('\n')
         result_lines = []
 
@@ -922,5 +1311,174 @@ Container: 40ft Blue Ring
         return '\n'.join(result_lines)
 
     def close(self):
-        """Close HTTP client"""
-        self.http_client.close()
+        """连接池由 VLLMClient 进程级共享，这里不关闭（保留接口兼容）"""
+        pass
+
+
+class AsyncTranslateService(TranslateService):
+    """异步翻译服务（FastAPI 路由等 async 上下文使用）
+
+    TranslateService 使用同步 httpx.Client（超时 600 秒），在 async 路由中直接调用
+    会阻塞整个 uvicorn worker 的事件循环。本类复用同样的 prompt 构建和输出清理，
+    HTTP 请求改走进程共享的 httpx.AsyncClient，并受 VLLMClient.async_limiter 限流。
+
+    与父类同名的翻译方法在这里都是协程，调用时需要 await。
+    Celery 任务等同步上下文继续使用 TranslateService。
+    """
+
+    async def translate_with_vllm(self, text: str, target_lang: str = "zh",
+                                  source_lang: str = None, glossary: List[Dict] = None,
+                                  complexity_score: int = None, context: str = None) -> str:
+        """
+        异步调用 vLLM 翻译（参数同 TranslateService.translate_with_vllm）
+        """
+        if not text:
+            return ""
+
+        from services.vllm_client import get_vllm_client
+
+        payload = self._build_vllm_payload(text, target_lang, source_lang, glossary, context=context)
+        vllm = get_vllm_client()
+
+        try:
+            async with vllm.async_limiter:
+                response = await vllm.async_client.post(
+                    f"{self.vllm_base_url}/v1/chat/completions",
+                    headers=self.vllm_headers,
+                    json=payload,
+                    timeout=self.vllm_timeout
+                )
+            response.raise_for_status()
+
+            result = response.json()
+            translated = result["choices"][0]["message"]["content"].strip()
+
+            # 去除可能的原文重复（模型有时会输出原文+译文）
+            translated = self._clean_translation_output(translated, text, target_lang)
+
+            print(f"[vLLM/{self.vllm_model}] Translated to {target_lang} (async, {self._format_usage(result)})")
+            return translated
+
+        except httpx.HTTPStatusError as e:
+            print(f"vLLM API error: {e.response.status_code} - {e.response.text}")
+            raise
+        except Exception as e:
+            print(f"vLLM translation error: {e}")
+            raise
+
+    async def translate_subject_and_body(self, subject: str, body: str, target_lang: str = "zh",
+                                         source_lang: str = None,
+                                         glossary: List[Dict] = None) -> Optional[Tuple[str, str]]:
+        """异步合并翻译标题和正文（参数、返回值同 TranslateService.translate_subject_and_body）"""
+        if not self._can_translate_pair(subject, body):
+            return None
+
+        from services.vllm_client import get_vllm_client
+
+        payload = self._build_pair_payload(subject, body, target_lang, source_lang, glossary)
+        vllm = get_vllm_client()
+        try:
+            async with vllm.async_limiter:
+                response = await vllm.async_client.post(
+                    f"{self.vllm_base_url}/v1/chat/completions",
+                    headers=self.vllm_headers,
+                    json=payload,
+                    timeout=self.vllm_timeout
+                )
+            response.raise_for_status()
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+        except Exception as e:
+            print(f"[vLLM/{self.vllm_model}] Combined subject+body request failed, falling back: {e}")
+            return None
+
+        pair = self._parse_pair_output(content, subject, body, target_lang)
+        if pair is None:
+            print(f"[vLLM/{self.vllm_model}] Combined subject+body output invalid, falling back")
+            return None
+        print(f"[vLLM/{self.vllm_model}] Translated subject+body to {target_lang} (async, {self._format_usage(result)})")
+        return pair
+
+    async def translate_text(self, text: str, target_lang: str = "zh",
+                             glossary: List[Dict] = None, context: str = None,
+                             source_lang: str = None, **kwargs) -> str:
+        """异步翻译文本（参数同 TranslateService.translate_text）"""
+        if not text:
+            return ""
+        return await self.translate_with_vllm(text, target_lang, source_lang, glossary, context=context)
+
+    async def translate_with_smart_routing(self, text: str, subject: str = "",
+                                           target_lang: str = "zh",
+                                           glossary: List[Dict] = None,
+                                           source_lang: str = None,
+                                           translate_subject: bool = True) -> Dict:
+        """
+        异步翻译邮件，返回结构与 TranslateService.translate_with_smart_routing 相同
+
+        标题和正文优先合并为一次请求；不适用或失败时正文和标题并发请求
+        （两者都受进程级限流约束）。
+        """
+        import asyncio
+
+        complexity, score = await self._check_complexity_async(text, subject)
+
+        pair = None
+        if translate_subject and subject:
+            pair = await self.translate_subject_and_body(subject, text, target_lang, source_lang, glossary)
+
+        if pair:
+            subject_translated, body_translated = pair
+        elif translate_subject and subject:
+            body_translated, subject_translated = await asyncio.gather(
+                self.translate_with_vllm(
+                    text, target_lang, source_lang, glossary,
+                    complexity_score=score
+                ),
+                self.translate_with_vllm(
+                    subject, target_lang, source_lang, glossary,
+                    complexity_score=score
+                )
+            )
+        else:
+            body_translated = await self.translate_with_vllm(
+                text, target_lang, source_lang, glossary,
+                complexity_score=score
+            )
+            subject_translated = None
+
+        result = {
+            "translated_text": body_translated,
+            "provider_used": "vllm",
+            "complexity": {"level": complexity.value, "score": score},
+            "fallback_reason": None
+        }
+        if subject_translated:
+            result["subject_translated"] = subject_translated
+
+        return result
+
+    async def translate_email_reply(self, chinese_text: str, target_lang: str,
+                                    conversation_history: List[Dict] = None,
+                                    glossary: List[Dict] = None) -> str:
+        """异步翻译中文回复"""
+        return await self.translate_text(chinese_text, target_lang, glossary, source_lang="zh")
+
+    async def translate_quoted_content(self, quoted: str, target_lang: str = "zh",
+                                       source_lang: str = None) -> str:
+        """异步翻译引用内容（处理流程同 TranslateService.translate_quoted_content）"""
+        if not quoted or not quoted.strip():
+            return ""
+
+        clean_text, line_prefixes = self._strip_quote_prefixes(quoted)
+
+        # 跳过太短或空的内容
+        if len(clean_text.strip()) < 10:
+            return quoted  # 内容太少，保持原样
+
+        try:
+            translated = await self.translate_text(clean_text, target_lang, source_lang=source_lang)
+        except Exception as e:
+            print(f"[TranslateQuoted] Failed to translate quoted content: {e}")
+            return quoted  # 翻译失败，返回原文
+
+        return self._restore_quote_prefixes(translated, line_prefixes)
@@ -0,0 +1,296 @@
+"""
+翻译缓存表（translation_cache）容量策略
+
+整段翻译缓存（trans:*）和分段翻译记忆（tm:*）都持久化在 translation_cache 表。
+原来只按 "30 天未更新且命中 < 3" 删除、按命中次数取前 1000 条预热，不考虑条目大小，
+每次 MySQL 命中还要单独 UPDATE 一次。这里改为：
+
+- 压缩存储：原文/译文以 zstd 压缩（database.types.CompressedText），size_bytes 记录压缩后大小
+- 命中计数批量化：命中先累加在进程内（L0/Redis/MySQL 各层命中都计入），攒够
+  HIT_BUFFER_KEYS 个键或每 HIT_PUSH_INTERVAL 秒才用一次 pipeline HINCRBY 推到 Redis 哈希，
+  由 flush_hits 定期合并为按增量分组的 UPDATE ... WHERE text_hash IN (...)
+- 准入（TinyLFU 的 doorkeeper）：小条目直接写入；超过 ADMIT_BYTES 的大条目
+  第二次出现（DOORKEEPER_TTL 内）才持久化，一次性的大段文本只留在 Redis
+- 淘汰：总大小超过 MAX_BYTES 时，按 score = 命中次数 / (1 + 距最近命中天数) / (1 + KB)
+  从低到高删除，直到降到 MAX_BYTES * EVICT_TARGET
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select, update
+
+from database.models import TranslationCache
+from shared.cache_config import get_cache_key
+from shared.tiered_cache import translation_cache
+from utils.compression import compress_text
+
+# 表容量上限（压缩后的原文+译文总字节数）
+MAX_BYTES = int(float(os.getenv("TRANSLATION_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+# 超限后淘汰到上限的比例
+EVICT_TARGET = float(os.getenv("TRANSLATION_CACHE_EVICT_TARGET", "0.9"))
+# 大于该字节数的条目需第二次出现才写入 MySQL
+ADMIT_BYTES = int(os.getenv("TRANSLATION_CACHE_ADMIT_BYTES", "4096"))
+# doorkeeper 记录的保留时间（秒）
+DOORKEEPER_TTL = int(os.getenv("TRANSLATION_CACHE_DOORKEEPER_TTL", str(24 * 3600)))
+# 预热写入 Redis 的容量上限
+WARM_MAX_BYTES = int(float(os.getenv("TRANSLATION_CACHE_WARM_MB", "32")) * 1024 * 1024)
+
+# 单批淘汰/更新的行数
+BATCH_ROWS = 1000
+# 待累加的命中计数（Redis 哈希：text_hash → 增量）
+HITS_KEY = "trans_cache:hits"
+# 旧版 flush_hits 的临时键（RENAME 后中途失败会残留），取出时一并合并
+HITS_DRAINING_KEY = "trans_cache:hits:flushing"
+
+# 原子取出并删除命中哈希（HGETALL + DEL），返回 [field, value, ...]（多个键的同一 field 可能重复）
+_DRAIN_HITS_SCRIPT = """
+local out = {}
+for _, key in ipairs(KEYS) do
+    local entries = redis.call('HGETALL', key)
+    for i = 1, #entries do
+        out[#out + 1] = entries[i]
+    end
+    redis.call('DEL', key)
+end
+return out
+"""
+# 进程内命中计数推送到 Redis 的间隔（秒）和键数阈值
+HIT_PUSH_INTERVAL = float(os.getenv("TRANSLATION_CACHE_HIT_PUSH_INTERVAL", "10"))
+HIT_BUFFER_KEYS = int(os.getenv("TRANSLATION_CACHE_HIT_BUFFER_KEYS", "500"))
+
+# 进程内尚未推送的命中计数（text_hash → 增量）
+_pending_hits: Dict[str, int] = {}
+_pending_lock = threading.Lock()
+_last_push = time.monotonic()
+
+
+def build_row(text_hash: str, source_text: str, translated_text: str,
+              source_lang: Optional[str], target_lang: str) -> Dict:
+    """构建 translation_cache 插入行（先压缩以得到存储大小）"""
+    source_blob = compress_text(source_text)
+    translated_blob = compress_text(translated_text)
+    return {
+        "text_hash": text_hash,
+        "source_text": source_blob,
+        "translated_text": translated_blob,
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "size_bytes": len(source_blob) + len(translated_blob),
+        "last_hit_at": datetime.utcnow(),
+    }
+
+
+def score_expression():
+    """淘汰/预热排序用的保留价值（越大越值得保留）"""
+    age_days = func.datediff(
+        func.now(), func.coalesce(TranslationCache.last_hit_at, TranslationCache.created_at)
+    )
+    return (
+        func.coalesce(TranslationCache.hit_count, 1)
+        / (1 + age_days)
+        / (1 + func.coalesce(TranslationCache.size_bytes, 0) / 1024.0)
+    )
+
+
+# ============ 准入 ============
+
+def _doorkeeper_key(text_hash: str) -> str:
+    return get_cache_key(f"trans_cache:door:{text_hash}")
+
+
+def _split_for_admission(rows: List[Dict]):
+    small = [r for r in rows if r["size_bytes"] <= ADMIT_BYTES]
+    large = [r for r in rows if r["size_bytes"] > ADMIT_BYTES]
+
+    def build(pipe):
+        for row in large:
+            pipe.set(_doorkeeper_key(row["text_hash"]), 1, nx=True, ex=DOORKEEPER_TTL)
+
+    return small, large, build
+
+
+def _admitted(small: List[Dict], large: List[Dict], results: Optional[list]) -> List[Dict]:
+    if results is None:
+        # Redis 不可用时不做准入限制
+        return small + large
+    # SET NX 成功表示第一次出现：只登记，不写入
+    return small + [row for row, first_seen in zip(large, results) if not first_seen]
+
+
+def admit_sync(rows: List[Dict]) -> List[Dict]:
+    """过滤出允许写入 MySQL 的行（同步版本）"""
+    small, large, build = _split_for_admission(rows)
+    if not large:
+        return small
+    return _admitted(small, large, translation_cache.pipeline_sync(build))
+
+
+async def admit(rows: List[Dict]) -> List[Dict]:
+    """过滤出允许写入 MySQL 的行"""
+    small, large, build = _split_for_admission(rows)
+    if not large:
+        return small
+    return _admitted(small, large, await translation_cache.pipeline(build))
+
+
+# ============ 命中计数 ============
+
+def _take_pending_hits(text_hashes: Iterable[str] = (), force: bool = False) -> Dict[str, int]:
+    """累加命中到进程内计数；达到推送条件（或 force）时取出全部待推送计数，否则返回空"""
+    global _last_push
+    with _pending_lock:
+        for text_hash in text_hashes:
+            _pending_hits[text_hash] = _pending_hits.get(text_hash, 0) + 1
+        if not _pending_hits:
+            return {}
+        if not force and len(_pending_hits) < HIT_BUFFER_KEYS \
+                and time.monotonic() - _last_push < HIT_PUSH_INTERVAL:
+            return {}
+        counts = dict(_pending_hits)
+        _pending_hits.clear()
+        _last_push = time.monotonic()
+    return counts
+
+
+def _hits_builder(counts: Dict[str, int]):
+    def build(pipe):
+        key = get_cache_key(HITS_KEY)
+        for text_hash, count in counts.items():
+            pipe.hincrby(key, text_hash, count)
+
+    return build
+
+
+def record_hits_sync(text_hashes: Iterable[str]):
+    """登记命中（进程内累加，按批推送到 Redis；Redis 不可用时丢弃，计数只是近似值）"""
+    counts = _take_pending_hits(text_hashes)
+    if counts:
+        translation_cache.pipeline_sync(_hits_builder(counts))
+
+
+async def record_hits(text_hashes: Iterable[str]):
+    """登记命中（异步版本）"""
+    counts = _take_pending_hits(text_hashes)
+    if counts:
+        await translation_cache.pipeline(_hits_builder(counts))
+
+
+def push_hits_sync():
+    """立即推送进程内累计的命中计数（维护任务和进程退出时调用）"""
+    counts = _take_pending_hits(force=True)
+    if counts:
+        translation_cache.pipeline_sync(_hits_builder(counts))
+
+
+async def push_hits():
+    """立即推送进程内累计的命中计数（异步版本）"""
+    counts = _take_pending_hits(force=True)
+    if counts:
+        await translation_cache.pipeline(_hits_builder(counts))
+
+
+# ============ 维护任务（Celery，同步 Session） ============
+
+def flush_hits(db) -> int:
+    """
+    把 Redis 中累计的命中次数批量写入 MySQL
+
+    先推送本进程累计的计数；再用 Lua 脚本原子地取出并删除命中哈希，之后的新命中累加到新哈希，
+    不会丢失，多个 flush 并发时也不会重复计入。其他进程的计数由各自按 HIT_PUSH_INTERVAL 推送，
+    最多晚一个周期写回。
+
+    Returns:
+        更新的行数
+    """
+    push_hits_sync()
+
+    def drain(pipe):
+        pipe.eval(_DRAIN_HITS_SCRIPT, 2, get_cache_key(HITS_KEY), get_cache_key(HITS_DRAINING_KEY))
+
+    results = translation_cache.pipeline_sync(drain)
+    if not results or not results[0]:
+        return 0
+    entries = results[0]
+    pending: Dict[str, int] = {}
+    for text_hash, count in zip(entries[0::2], entries[1::2]):
+        pending[text_hash] = pending.get(text_hash, 0) + int(count)
+
+    # 按增量分组，每组一条 UPDATE ... IN (...)
+    groups: Dict[int, List[str]] = {}
+    for text_hash, count in pending.items():
+        groups.setdefault(count, []).append(text_hash)
+
+    now = datetime.utcnow()
+    updated = 0
+    for count, hashes in groups.items():
+        for i in range(0, len(hashes), BATCH_ROWS):
+            result = db.execute(
+                update(TranslationCache)
+                .where(TranslationCache.text_hash.in_(hashes[i:i + BATCH_ROWS]))
+                .values(hit_count=TranslationCache.hit_count + count, last_hit_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount or 0
+    db.commit()
+    return updated
+
+
+def evict(db) -> Dict:
+    """
+    总大小超过 MAX_BYTES 时按保留价值从低到高淘汰
+
+    只排序一次：按 score 升序流式读取 (id, size_bytes)，累计到需要释放的字节数即停止，
+    再按 id 分批删除
+
+    Returns:
+        {"total_bytes", "evicted_rows", "evicted_bytes"}
+    """
+    total = db.execute(select(func.coalesce(func.sum(TranslationCache.size_bytes), 0))).scalar() or 0
+    stats = {"total_bytes": int(total), "evicted_rows": 0, "evicted_bytes": 0}
+    if total <= MAX_BYTES:
+        return stats
+
+    to_free = total - int(MAX_BYTES * EVICT_TARGET)
+    ids = []
+    result = db.execute(
+        select(TranslationCache.id, TranslationCache.size_bytes)
+        .order_by(score_expression().asc(), TranslationCache.id.asc())
+        .execution_options(yield_per=BATCH_ROWS)
+    )
+    try:
+        for row_id, size in result:
+            ids.append(row_id)
+            stats["evicted_bytes"] += size or 0
+            if stats["evicted_bytes"] >= to_free:
+                break
+    finally:
+        result.close()
+
+    for i in range(0, len(ids), BATCH_ROWS):
+        db.execute(
+            delete(TranslationCache)
+            .where(TranslationCache.id.in_(ids[i:i + BATCH_ROWS]))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    stats["evicted_rows"] = len(ids)
+    stats["total_bytes"] = int(total - stats["evicted_bytes"])
+    return stats
+
+
+def select_for_warmup(db, min_hits: int = 5, max_rows: int = 5000) -> List[TranslationCache]:
+    """按保留价值从高到低选取预热条目，总大小不超过 WARM_MAX_BYTES"""
+    rows = db.query(TranslationCache).filter(
+        TranslationCache.hit_count > min_hits
+    ).order_by(score_expression().desc()).limit(max_rows).all()
+
+    selected, used = [], 0
+    for row in rows:
+        used += row.size_bytes or 0
+        if used > WARM_MAX_BYTES:
+            break
+        selected.append(row)
+    return selected
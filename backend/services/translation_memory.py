@@ -0,0 +1,395 @@
+"""
+分段翻译记忆（Translation Memory）
+
+整段文本做缓存键时，任何一个字符不同都会未命中；而供应商邮件里大量重复的是
+问候语、签名、NCR 模板段落和免责声明。这里按段落（超长段落再按句子边界，
+规则见 utils.text_split）切分文本，逐段查缓存：
+
+1. 切分：每段记录原文前后的空白，翻译后按原样拼回
+2. 批量查找：进程内 L0 → Redis MGET（shared.tiered_cache）→ MySQL IN 查询
+   （translation_cache 表，键空间与整段缓存分开）
+3. 未命中的连续段合并成一次请求交给 vLLM（段间用空行分隔，附上一段原文作为上文），
+   译文段数与原文一致时逐段写回缓存；不一致时整块使用，不写缓存
+4. 按原顺序组装译文
+
+纯数字、符号、链接、邮箱地址等无需翻译的段直接保留原文。
+"""
+import asyncio
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from database import crud
+from database.models import TranslationCache
+from services import translation_cache_policy
+from shared.tiered_cache import translation_cache
+from utils.text_split import split_text_at_boundaries
+
+# 单段最大长度（超过则按句子边界继续切分）
+SEGMENT_MAX_CHARS = int(os.getenv("TM_SEGMENT_MAX_CHARS", "1500"))
+# 合并后单次请求的最大长度
+RUN_MAX_CHARS = int(os.getenv("TM_RUN_MAX_CHARS", "8000"))
+# Redis 中段译文的过期时间（秒），MySQL 中永久保存
+REDIS_TTL = int(os.getenv("TM_REDIS_TTL", str(7 * 24 * 3600)))
+# 作为上文传给模型的前一段原文长度
+CONTEXT_CHARS = 300
+
+_PARAGRAPH_SPLIT = re.compile(r'(\n[ \t]*\n\s*)')
+_INLINE_SPACE = re.compile(r'[ \t\u00a0]+')
+_LETTER = re.compile(r'[^\W\d_]')
+_PASSTHROUGH = re.compile(r'^(?:https?://\S+|www\.\S+|[\w.+-]+@[\w-]+(?:\.[\w-]+)+)$', re.IGNORECASE)
+
+
+class Segment(NamedTuple):
+    """切分后的一段：lead + text + tail 即原文"""
+    text: str
+    lead: str
+    tail: str
+    key: Optional[str]  # 无需翻译的段为 None
+
+
+def glossary_hash(glossary: List[Dict] = None) -> str:
+    """术语表摘要（术语表不同的翻译互不复用）"""
+    if not glossary:
+        return ""
+    terms = sorted(f"{t.get('source', '')}:{t.get('target', '')}" for t in glossary)
+    return hashlib.sha256("|".join(terms).encode("utf-8")).hexdigest()[:16]
+
+
+def segment_key(text: str, target_lang: str, glossary_digest: str = "") -> str:
+    """段缓存键：归一化行内空白后取 SHA256（源语言不参与，相同原文译文相同）"""
+    normalized = _INLINE_SPACE.sub(" ", text.strip())
+    content = f"tm|{target_lang}|{glossary_digest}|{normalized}"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def needs_translation(text: str) -> bool:
+    """不含文字（纯数字/符号）或只是链接、邮箱地址的段不翻译"""
+    stripped = text.strip()
+    if not stripped or not _LETTER.search(stripped):
+        return False
+    return not _PASSTHROUGH.match(stripped)
+
+
+def split_segments(text: str, target_lang: str, glossary: List[Dict] = None) -> List[Segment]:
+    """
+    按段落切分文本，超长段落再按句子边界切分
+
+    Args:
+        text: 原文
+        target_lang: 目标语言（参与缓存键）
+        glossary: 术语表（参与缓存键）
+
+    Returns:
+        段列表，依次拼接 lead + text + tail 可还原原文
+    """
+    digest = glossary_hash(glossary)
+    parts = _PARAGRAPH_SPLIT.split(text)
+    segments = []
+    # re.split 带捕获组：偶数位为段落，奇数位为段落间的分隔空白
+    for i in range(0, len(parts), 2):
+        paragraph = parts[i]
+        separator = parts[i + 1] if i + 1 < len(parts) else ""
+        pieces = split_text_at_boundaries(paragraph, SEGMENT_MAX_CHARS) if paragraph else [""]
+        for j, piece in enumerate(pieces):
+            core = piece.strip()
+            start = piece.find(core) if core else len(piece)
+            lead = piece[:start]
+            tail = piece[start + len(core):]
+            if j == len(pieces) - 1:
+                tail += separator
+            key = segment_key(core, target_lang, digest) if needs_translation(core) else None
+            segments.append(Segment(core, lead, tail, key))
+    return segments
+
+
+def plan_runs(segments: List[Segment], found: Dict[str, str]) -> List[List[int]]:
+    """把相邻的未命中段合并成请求批次（不超过 RUN_MAX_CHARS）"""
+    runs, current, size = [], [], 0
+    for index, seg in enumerate(segments):
+        if seg.key is None:
+            # 无需翻译的空段不打断批次（例如段落间的空行）
+            if seg.text:
+                if current:
+                    runs.append(current)
+                current, size = [], 0
+            continue
+        if seg.key in found:
+            if current:
+                runs.append(current)
+            current, size = [], 0
+            continue
+        if current and size + len(seg.text) > RUN_MAX_CHARS:
+            runs.append(current)
+            current, size = [], 0
+        current.append(index)
+        size += len(seg.text) + 2
+    if current:
+        runs.append(current)
+    return runs
+
+
+def run_source(segments: List[Segment], run: List[int]) -> Tuple[str, Optional[str]]:
+    """批次的待翻译文本和上文"""
+    source = "\n\n".join(segments[i].text for i in run)
+    context = None
+    first = run[0]
+    for i in range(first - 1, -1, -1):
+        if segments[i].text:
+            context = segments[i].text[-CONTEXT_CHARS:]
+            break
+    return source, context
+
+
+def align_run(segments: List[Segment], run: List[int], translated: str) -> Optional[Dict[str, str]]:
+    """按空行拆回各段译文；段数对不上时返回 None"""
+    translated = (translated or "").strip()
+    if len(run) == 1:
+        return {segments[run[0]].key: translated} if translated else None
+    parts = [p.strip() for p in _PARAGRAPH_SPLIT.split(translated)[::2]]
+    if len(parts) != len(run) or not all(parts):
+        return None
+    return {segments[i].key: part for i, part in zip(run, parts)}
+
+
+def assemble(segments: List[Segment], found: Dict[str, str], blocks: Dict[int, Tuple[int, str]]) -> str:
+    """
+    按原顺序组装译文
+
+    Args:
+        segments: 段列表
+        found: 缓存键 → 段译文
+        blocks: 未能逐段对齐的批次，首段下标 → (末段下标, 整块译文)
+    """
+    out = []
+    index = 0
+    while index < len(segments):
+        seg = segments[index]
+        if index in blocks:
+            last, block = blocks[index]
+            out.append(seg.lead + block + segments[last].tail)
+            index = last + 1
+            continue
+        if seg.key is None:
+            out.append(seg.lead + seg.text + seg.tail)
+        else:
+            out.append(seg.lead + found.get(seg.key, seg.text) + seg.tail)
+        index += 1
+    return "".join(out).strip()
+
+
+# ============ 缓存读写 ============
+
+def _cache_keys(keys: List[str]) -> List[str]:
+    return [f"tm:{k}" for k in keys]
+
+
+def _strip_prefix(found: Dict[str, str]) -> Dict[str, str]:
+    return {k[3:]: v for k, v in found.items()}
+
+
+def _cache_rows(entries: Dict[str, Tuple[str, str]], source_lang: str, target_lang: str) -> List[Dict]:
+    return [
+        translation_cache_policy.build_row(key, source, translated, source_lang, target_lang)
+        for key, (source, translated) in entries.items()
+    ]
+
+
+def _upsert_statement(rows: List[Dict]):
+    stmt = mysql_insert(TranslationCache).values(rows)
+    return stmt.on_duplicate_key_update(
+        translated_text=stmt.inserted.translated_text,
+        size_bytes=stmt.inserted.size_bytes,
+    )
+
+
+def _lookup_sync(db, keys: List[str]) -> Dict[str, str]:
+    """批量查找段译文：L0/Redis → MySQL（MySQL 命中回填 Redis，各层命中都登记命中次数）"""
+    found = _strip_prefix(translation_cache.get_many_sync(_cache_keys(keys)))
+    missing = [k for k in keys if k not in found]
+    if missing:
+        rows = db.execute(
+            select(TranslationCache.text_hash, TranslationCache.translated_text)
+            .where(TranslationCache.text_hash.in_(missing))
+        ).all()
+        db_hits = {row[0]: row[1] for row in rows}
+        if db_hits:
+            translation_cache.set_many_sync({f"tm:{k}": v for k, v in db_hits.items()}, REDIS_TTL)
+            found.update(db_hits)
+    translation_cache_policy.record_hits_sync(found)
+    return found
+
+
+def _store_sync(db, entries: Dict[str, Tuple[str, str]], source_lang: str, target_lang: str):
+    if not entries:
+        return
+    rows = translation_cache_policy.admit_sync(_cache_rows(entries, source_lang, target_lang))
+    if rows:
+        db.execute(_upsert_statement(rows))
+    translation_cache.set_many_sync({f"tm:{k}": v[1] for k, v in entries.items()}, REDIS_TTL)
+
+
+def _log(segments: List[Segment], hits: int, misses: int, blocks: int):
+    translatable = sum(1 for s in segments if s.key)
+    print(f"[TM] {translatable} segments: {hits} hit, {misses} translated"
+          + (f", {blocks} unaligned runs" if blocks else ""))
+
+
+# ============ 对外接口 ============
+
+def translate_segments(db, text: str, target_lang: str,
+                       translate_fn: Callable[[str, Optional[str]], str],
+                       source_lang: str = None, glossary: List[Dict] = None,
+                       max_workers: int = 4) -> str:
+    """
+    分段翻译（同步版本，Celery 任务使用）
+
+    Args:
+        db: 同步 Session（调用方负责提交）
+        text: 原文
+        target_lang: 目标语言
+        translate_fn: 翻译函数 (待翻译文本, 上文) -> 译文
+        source_lang: 源语言（仅记录）
+        glossary: 术语表（参与缓存键）
+        max_workers: 未命中批次的并发翻译数
+
+    Returns:
+        组装后的完整译文
+    """
+    if not text or not text.strip():
+        return ""
+    segments = split_segments(text, target_lang, glossary)
+    keys = list({s.key for s in segments if s.key})
+
+    found = _lookup_sync(db, keys)
+    hits = len(found)
+
+    runs = plan_runs(segments, found)
+    blocks: Dict[int, Tuple[int, str]] = {}
+    new_entries: Dict[str, Tuple[str, str]] = {}
+    if runs:
+        sources = [run_source(segments, run) for run in runs]
+        # 单段也在线程中执行：Celery 软超时（SoftTimeLimitExceeded）只在主线程的等待处抛出，
+        # 不会被 translate_fn 内部的重试捕获；不使用 with 语句，超时时不等待剩余请求完成
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(runs))))
+        try:
+            outputs = list(executor.map(lambda src: translate_fn(*src), sources))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for run, output in zip(runs, outputs):
+            aligned = align_run(segments, run, output)
+            if aligned is None:
+                blocks[run[0]] = (run[-1], (output or "").strip())
+                continue
+            found.update(aligned)
+            for i in run:
+                new_entries[segments[i].key] = (segments[i].text, aligned[segments[i].key])
+
+    _store_sync(db, new_entries, source_lang, target_lang)
+
+    _log(segments, hits, sum(len(r) for r in runs), len(blocks))
+    return assemble(segments, found, blocks)
+
+
+async def translate_segments_async(db, text: str, target_lang: str,
+                                   translate_fn: Callable[[str, Optional[str]], Awaitable[str]],
+                                   source_lang: str = None, glossary: List[Dict] = None) -> str:
+    """
+    分段翻译（异步版本，API 路由使用）
+
+    Args:
+        db: AsyncSession（调用方负责提交）
+        text: 原文
+        target_lang: 目标语言
+        translate_fn: 异步翻译函数 (待翻译文本, 上文) -> 译文，并发由 vLLM 客户端限流
+        source_lang: 源语言（仅记录）
+        glossary: 术语表（参与缓存键）
+
+    Returns:
+        组装后的完整译文
+    """
+    if not text or not text.strip():
+        return ""
+    segments = split_segments(text, target_lang, glossary)
+    keys = list({s.key for s in segments if s.key})
+
+    found = _strip_prefix(await translation_cache.get_many(_cache_keys(keys)))
+    missing = [k for k in keys if k not in found]
+    if missing:
+        db_hits = await crud.get_translation_cache_entries(db, missing)
+        if db_hits:
+            await translation_cache.set_many({f"tm:{k}": v for k, v in db_hits.items()}, REDIS_TTL)
+            found.update(db_hits)
+    await translation_cache_policy.record_hits(found)
+    hits = len(found)
+
+    runs = plan_runs(segments, found)
+    blocks: Dict[int, Tuple[int, str]] = {}
+    new_entries: Dict[str, Tuple[str, str]] = {}
+    if runs:
+        outputs = await asyncio.gather(*(translate_fn(*run_source(segments, run)) for run in runs))
+        for run, output in zip(runs, outputs):
+            aligned = align_run(segments, run, output)
+            if aligned is None:
+                blocks[run[0]] = (run[-1], (output or "").strip())
+                continue
+            found.update(aligned)
+            for i in run:
+                new_entries[segments[i].key] = (segments[i].text, aligned[segments[i].key])
+
+    if new_entries:
+        rows = await translation_cache_policy.admit(_cache_rows(new_entries, source_lang, target_lang))
+        if rows:
+            await db.execute(_upsert_statement(rows))
+        await translation_cache.set_many({f"tm:{k}": v[1] for k, v in new_entries.items()}, REDIS_TTL)
+
+    _log(segments, hits, sum(len(r) for r in runs), len(blocks))
+    return assemble(segments, found, blocks)
+
+
+def lookup_translation(db, text: str, target_lang: str, glossary: List[Dict] = None) -> Optional[str]:
+    """
+    只查缓存不翻译（同步版本）
+
+    Returns:
+        所有需翻译的段都命中时返回组装后的译文，否则返回 None
+    """
+    if not text or not text.strip():
+        return ""
+    segments = split_segments(text, target_lang, glossary)
+    keys = list({s.key for s in segments if s.key})
+    found = _lookup_sync(db, keys) if keys else {}
+    if len(found) < len(keys):
+        return None
+    _log(segments, len(found), 0, 0)
+    return assemble(segments, found, {})
+
+
+def remember_translation(db, text: str, translated: str, target_lang: str,
+                         source_lang: str = None, glossary: List[Dict] = None) -> int:
+    """
+    把在记忆之外得到的整段译文（如标题+正文合并翻译）按段写入缓存（同步版本）
+
+    原文各段与译文按空行逐一对齐，段数不一致时不写入。
+
+    Returns:
+        写入的段数
+    """
+    if not text or not text.strip() or not translated:
+        return 0
+    segments = split_segments(text, target_lang, glossary)
+    run = [i for i, seg in enumerate(segments) if seg.text]
+    parts = [p.strip() for p in _PARAGRAPH_SPLIT.split(translated.strip())[::2]]
+    if len(parts) != len(run) or not all(parts):
+        return 0
+    entries = {
+        segments[i].key: (segments[i].text, part)
+        for i, part in zip(run, parts) if segments[i].key
+    }
+    _store_sync(db, entries, source_lang, target_lang)
+    return len(entries)
@@ -5,15 +5,33 @@
 1. 统一的 API Key 认证
 2. 统一的超时和重试策略
 3. 统一的错误处理
+4. 进程级共享的 keep-alive 连接池（避免每次调用重新建立 TCP/TLS 连接）
+
+连接池：
+- sync_client: 同步 httpx.Client，fork 后（Celery prefork 子进程）自动重建
+- async_client: 异步 httpx.AsyncClient，按事件循环分别创建（Celery 任务中的 asyncio.run() 每次都是新循环）
+- async_limiter: 与 async_client 同粒度的信号量，限制进程内并发的异步 vLLM 请求数
+- 安装 h2 包时启用 HTTP/2（仅对 https 网关生效）
+- 超时按调用指定，连接池本身不绑定固定超时
 """
 
+import asyncio
+import os
+import threading
+import weakref
 import httpx
-import requests
 from typing import Optional, Dict, Any, List
 from config import get_settings
 
 settings = get_settings()
 
+# HTTP/2 需要可选依赖 h2（pip install httpx[http2]）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class VLLMClient:
     """vLLM API 客户端（单例模式）"""
@@ -36,6 +54,18 @@ class VLLMClient:
         self.api_key = settings.vllm_api_key
         self.default_timeout = 120  # 秒
 
+        # 连接池配置
+        self.max_connections = settings.vllm_max_connections
+        self.max_keepalive_connections = settings.vllm_max_keepalive_connections
+        self.http2 = settings.vllm_http2 and HTTP2_AVAILABLE
+
+        self._lock = threading.Lock()
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_client_pid: Optional[int] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self.async_concurrency = max(1, settings.vllm_async_concurrency)
+        self._async_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
     def _get_headers(self) -> Dict[str, str]:
         """获取请求头（包含认证）"""
         headers = {"Content-Type": "application/json"}
@@ -43,13 +73,93 @@ class VLLMClient:
             headers["Authorization"] = f"Bearer {self.api_key}"
         return headers
 
+    def _get_limits(self) -> httpx.Limits:
+        """连接池限制"""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=60.0
+        )
+
+    # ============ 连接池 ============
+    @property
+    def sync_client(self) -> httpx.Client:
+        """
+        进程级共享的同步连接池
+
+        fork 出的子进程不能复用父进程的 socket，检测到 pid 变化时重建。
+        """
+        pid = os.getpid()
+        if self._sync_client is None or self._sync_client_pid != pid:
+            with self._lock:
+                if self._sync_client is None or self._sync_client_pid != pid:
+                    self._sync_client = httpx.Client(
+                        headers=self._get_headers(),
+                        limits=self._get_limits(),
+                        http2=self.http2,
+                        timeout=self.default_timeout
+                    )
+                    self._sync_client_pid = pid
+        return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """
+        当前事件循环共享的异步连接池
+
+        AsyncClient 的连接绑定创建时的事件循环，因此每个循环各自持有一个实例，
+        循环被回收后对应的客户端随之释放。必须在事件循环内访问。
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                headers=self._get_headers(),
+                limits=self._get_limits(),
+                http2=self.http2,
+                timeout=self.default_timeout
+            )
+            self._async_clients[loop] = client
+        return client
+
+    @property
+    def async_limiter(self) -> asyncio.Semaphore:
+        """
+        当前事件循环共享的并发信号量
+
+        慢请求只占用一个名额，不会拖住同进程的其他请求；
+        超过 vllm_async_concurrency 的调用在此排队。必须在事件循环内访问。
+        """
+        loop = asyncio.get_running_loop()
+        limiter = self._async_limiters.get(loop)
+        if limiter is None:
+            limiter = asyncio.Semaphore(self.async_concurrency)
+            self._async_limiters[loop] = limiter
+        return limiter
+
+    def close(self):
+        """关闭同步连接池"""
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+                self._sync_client_pid = None
+
+    async def aclose(self):
+        """关闭当前事件循环的异步连接池"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    # ============ Chat Completion ============
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: Optional[str] = None,
         temperature: float = 0.3,
         max_tokens: int = 2000,
-        timeout: Optional[int] = None
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         同步调用 vLLM chat completion API
@@ -65,11 +175,10 @@ class VLLMClient:
             API 响应 JSON
 
         Raises:
-            requests.HTTPError: API 调用失败
+            httpx.HTTPStatusError: API 调用失败
         """
-        response = requests.post(
+        response = self.sync_client.post(
             f"{self.base_url}/v1/chat/completions",
-            headers=self._get_headers(),
             json={
                 "model": model or self.model,
                 "messages": messages,
@@ -87,7 +196,7 @@ class VLLMClient:
         model: Optional[str] = None,
         temperature: float = 0.3,
         max_tokens: int = 2000,
-        timeout: Optional[int] = None
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         异步调用 vLLM chat completion API
@@ -105,19 +214,19 @@ class VLLMClient:
         Raises:
             httpx.HTTPStatusError: API 调用失败
         """
-        async with httpx.AsyncClient(timeout=timeout or self.default_timeout) as client:
-            response = await client.post(
+        async with self.async_limiter:
+            response = await self.async_client.post(
                 f"{self.base_url}/v1/chat/completions",
-                headers=self._get_headers(),
                 json={
                     "model": model or self.model,
                     "messages": messages,
                     "temperature": temperature,
                     "max_tokens": max_tokens
-                }
+                },
+                timeout=timeout or self.default_timeout
             )
-            response.raise_for_status()
-            return response.json()
+        response.raise_for_status()
+        return response.json()
 
     def get_response_text(self, response: Dict[str, Any]) -> str:
         """从 API 响应中提取文本内容"""
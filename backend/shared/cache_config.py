@@ -7,7 +7,7 @@ import os
 import json
 from datetime import timedelta
 from functools import wraps
-from typing import Any, Optional, Callable
+from typing import Any, Optional, Callable, Dict, List
 
 # 尝试导入Redis
 try:
@@ -117,6 +117,64 @@ def cache_set(key: str, value: Any, ttl: int = None) -> bool:
         return False
 
 
+def cache_get_many(keys: List[str]) -> Dict[str, Any]:
+    """
+    批量获取缓存（单次 MGET 往返）
+
+    Args:
+        keys: 缓存键列表
+
+    Returns:
+        {键: 值}，不存在的键不出现在结果中
+    """
+    if not keys or not cache_config.is_available():
+        return {}
+
+    try:
+        values = cache_config.client.mget([get_cache_key(k) for k in keys])
+    except Exception as e:
+        print(f"缓存批量读取错误: {e}")
+        return {}
+
+    result = {}
+    for key, value in zip(keys, values):
+        if value:
+            try:
+                result[key] = json.loads(value)
+            except (ValueError, TypeError):
+                continue
+    return result
+
+
+def cache_set_many(mapping: Dict[str, Any], ttl: int = None) -> bool:
+    """
+    批量设置缓存（pipeline 单次往返）
+
+    Args:
+        mapping: {键: 值}
+        ttl: 过期时间（秒），默认使用全局配置
+
+    Returns:
+        是否成功
+    """
+    if not mapping:
+        return True
+    if not cache_config.is_available():
+        return False
+
+    try:
+        if ttl is None:
+            ttl = cache_config.default_ttl
+        pipe = cache_config.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.setex(get_cache_key(key), ttl, json.dumps(value, ensure_ascii=False, default=str))
+        pipe.execute()
+        return True
+    except Exception as e:
+        print(f"缓存批量写入错误: {e}")
+        return False
+
+
 def cache_delete(key: str) -> bool:
     """
     删除缓存
@@ -0,0 +1,183 @@
+# shared/single_flight.py
+"""
+跨进程 single-flight：相同内容的翻译只做一次
+
+同一封供应商邮件抄送给多位同事时，每个账户各有一行 Email，各自的翻译任务会同时
+查不到共享翻译、同时把相同的文本交给 vLLM。这里按内容哈希加 Redis 锁：
+
+- 抢到锁的调用方（leader）执行翻译，把结果写入结果键（短 TTL）并在结果频道 PUBLISH
+- 其他调用方（follower）订阅结果频道等待，收到通知或轮询到结果键后直接使用结果
+- 锁带较短的 TTL，leader 执行期间由后台线程续期；worker 崩溃后续期停止，
+  锁在 TTL 内自动过期，等待中的 follower 发现锁已释放且没有结果时自己接手
+- leader 执行失败时释放锁并通知，follower 随即重新抢锁执行
+- Redis 不可用或等待超时时直接执行，不影响翻译本身
+
+结果必须可 JSON 序列化。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Tuple
+
+from shared.cache_config import cache_config, get_cache_key
+
+# 锁的存活时间（秒），leader 每 LOCK_TTL/3 续期一次
+LOCK_TTL = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "30"))
+# follower 最长等待时间（秒），超时后自己执行
+WAIT_TIMEOUT = int(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "300"))
+# 结果键保留时间（秒），覆盖稍晚到达的重复请求
+RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "300"))
+
+# 仅当锁仍属于自己时续期 / 释放
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_DONE = "done"
+_FAILED = "failed"
+
+
+class _LockRenewer(threading.Thread):
+    """leader 执行期间定期续期锁"""
+
+    def __init__(self, client, lock_key: str, token: str, ttl: int):
+        super().__init__(daemon=True)
+        self._client = client
+        self._lock_key = lock_key
+        self._token = token
+        self._ttl = ttl
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(max(1, self._ttl // 3)):
+            try:
+                if not self._client.eval(_RENEW_SCRIPT, 1, self._lock_key, self._token, self._ttl):
+                    return  # 锁已丢失（过期被他人接手），停止续期
+            except Exception as e:
+                print(f"[SingleFlight] Lock renew failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+class SingleFlight:
+    """
+    按键去重的跨进程执行器（同步版本，Celery worker 使用）
+
+    Args:
+        namespace: 键名空间（锁、结果、频道共用）
+        lock_ttl: 锁 TTL（秒）
+        wait_timeout: follower 最长等待时间（秒）
+        result_ttl: 结果保留时间（秒）
+    """
+
+    def __init__(self, namespace: str, lock_ttl: int = LOCK_TTL,
+                 wait_timeout: int = WAIT_TIMEOUT, result_ttl: int = RESULT_TTL):
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+
+    def _keys(self, key: str) -> Tuple[str, str, str]:
+        base = get_cache_key(f"sf:{self.namespace}:{key}")
+        return f"{base}:lock", f"{base}:result", f"{base}:channel"
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或等待同键的执行结果
+
+        Args:
+            key: 去重键（内容哈希）
+            fn: 实际执行函数，返回值须可 JSON 序列化
+
+        Returns:
+            (结果, 是否复用了其他调用方的结果)
+
+        Raises:
+            fn 自身抛出的异常（仅 leader 或降级直接执行时）
+        """
+        client = cache_config.client
+        if client is None:
+            return fn(), False
+
+        from redis.exceptions import RedisError
+
+        lock_key, result_key, channel = self._keys(key)
+        deadline = time.monotonic() + self.wait_timeout
+        pubsub = None
+        try:
+            while True:
+                token = uuid.uuid4().hex
+                try:
+                    cached = client.get(result_key)
+                    if cached is not None:
+                        return json.loads(cached), True
+
+                    acquired = client.set(lock_key, token, nx=True, ex=self.lock_ttl)
+                    if not acquired and pubsub is None:
+                        # 先订阅再检查结果，避免错过在两者之间发布的通知
+                        pubsub = client.pubsub(ignore_subscribe_messages=True)
+                        pubsub.subscribe(channel)
+                        continue
+                except RedisError as e:
+                    print(f"[SingleFlight] Redis error, running directly: {e}")
+                    return fn(), False
+
+                if acquired:
+                    return self._lead(client, lock_key, result_key, channel, token, fn), False
+
+                if time.monotonic() >= deadline:
+                    print(f"[SingleFlight] Wait timeout for {self.namespace}:{key[:12]}, running directly")
+                    return fn(), False
+
+                # 等待 leader 通知；每秒醒来一次检查结果键和锁（覆盖 leader 崩溃的情况）
+                try:
+                    pubsub.get_message(timeout=1.0)
+                except RedisError:
+                    time.sleep(1.0)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def _lead(self, client, lock_key: str, result_key: str, channel: str,
+              token: str, fn: Callable[[], Any]) -> Any:
+        renewer = _LockRenewer(client, lock_key, token, self.lock_ttl)
+        renewer.start()
+        status = _FAILED
+        try:
+            result = fn()
+            try:
+                client.setex(result_key, self.result_ttl, json.dumps(result, ensure_ascii=False))
+                status = _DONE
+            except Exception as e:
+                # 结果无法序列化或 Redis 写入失败：follower 收到 failed 后自己执行
+                print(f"[SingleFlight] Failed to store result: {e}")
+            return result
+        finally:
+            renewer.stop()
+            try:
+                client.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                print(f"[SingleFlight] Release failed, lock expires in {self.lock_ttl}s: {e}")
+            try:
+                client.publish(channel, status)
+            except Exception as e:
+                print(f"[SingleFlight] Publish failed: {e}")
+
+
+# 邮件翻译去重（键为标题+正文+语言的内容哈希）
+translation_single_flight = SingleFlight("translate")
@@ -0,0 +1,504 @@
+# shared/tiered_cache.py
+"""
+分层翻译缓存
+
+cache_get/cache_set 使用同步 redis 客户端（socket 超时 5 秒），在 async 路由中调用会
+阻塞事件循环；Redis 宕机时每次调用都重新连接，每个请求都要卡 5 秒。
+
+这里在 Redis 前加一层进程内 LRU，并把 Redis 访问换成 redis.asyncio：
+
+    L0 进程内 LRU（按条数和字节数限容，带 TTL）→ L1 Redis（异步，短超时 + 熔断）
+
+- 熔断：连续失败 CACHE_BREAKER_FAILURES 次后打开，CACHE_BREAKER_RESET 秒内直接跳过
+  Redis；到期后放行一次探测，成功即恢复
+- 统计：每层分别记录命中/未命中/错误次数和耗时，见 TieredCache.stats()
+- 值的序列化格式与 cache_get/cache_set 相同（JSON），新旧代码可读写同一批键
+- 同步版本（*_sync）供 Celery 任务使用：共用 L0 和熔断器，Redis 走同步客户端
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from shared.cache_config import cache_config, get_cache_key
+
+# redis.asyncio 需要 redis-py >= 4.2
+try:
+    import redis.asyncio as aioredis
+    AIOREDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    AIOREDIS_AVAILABLE = False
+
+
+class TierStats:
+    """单层缓存的计数器"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, started: float, hits: int = 0, misses: int = 0):
+        elapsed = (time.perf_counter() - started) * 1000
+        self.calls += 1
+        self.total_ms += elapsed
+        self.max_ms = max(self.max_ms, elapsed)
+        self.hits += hits
+        self.misses += misses
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "calls": self.calls,
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class LRUCache:
+    """
+    进程内 LRU 缓存（线程安全）
+
+    Args:
+        max_entries: 最大条数
+        max_bytes: 最大容量（按键和值的字符数估算）
+        ttl: 条目存活时间（秒）
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(key: str, value: Any) -> int:
+        return len(key) + (len(value) if isinstance(value, str) else len(json.dumps(value, ensure_ascii=False, default=str)))
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._data[key] = (value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CircuitBreaker:
+    """
+    简单熔断器：closed → (连续失败) → open → (超时) → half-open → (成功) → closed
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """是否允许访问 Redis（half-open 时只放行一个探测请求）"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        with self._lock:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    self.trips += 1
+                    print(f"[TieredCache] Redis circuit opened after {self.failures} failures, "
+                          f"skipping Redis for {self.reset_timeout}s")
+                self.opened_at = time.monotonic()
+
+
+class TieredCache:
+    """
+    L0 进程内 LRU + L1 Redis 分层缓存
+
+    Args:
+        l0_max_entries: L0 最大条数（0 表示不启用 L0）
+        l0_max_bytes: L0 最大容量
+        l0_ttl: L0 条目存活时间（秒）
+        redis_timeout: Redis 读写超时（秒）
+        breaker_failures: 熔断阈值（连续失败次数）
+        breaker_reset: 熔断持续时间（秒）
+    """
+
+    def __init__(self, l0_max_entries: int, l0_max_bytes: int, l0_ttl: int,
+                 redis_timeout: float, breaker_failures: int, breaker_reset: float):
+        self.l0 = LRUCache(l0_max_entries, l0_max_bytes, l0_ttl)
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.redis_timeout = redis_timeout
+        self.l0_stats = TierStats()
+        self.redis_stats = TierStats()
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    # ============ Redis 客户端 ============
+    def _async_client(self):
+        """当前事件循环的 redis.asyncio 客户端（连接绑定创建时的事件循环）"""
+        if not AIOREDIS_AVAILABLE:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = aioredis.from_url(
+                cache_config.redis_url,
+                decode_responses=True,
+                socket_timeout=self.redis_timeout,
+                socket_connect_timeout=self.redis_timeout
+            )
+            self._async_clients[loop] = client
+        return client
+
+    # ============ L0 ============
+    def _l0_get_many(self, keys: List[str]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        found = {}
+        for key in keys:
+            value = self.l0.get(key)
+            if value is not None:
+                found[key] = value
+        self.l0_stats.record(started, hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    @staticmethod
+    def _decode(keys: List[str], values: Iterable) -> Dict[str, Any]:
+        found = {}
+        for key, raw in zip(keys, values):
+            if raw:
+                try:
+                    found[key] = json.loads(raw)
+                except (ValueError, TypeError):
+                    continue
+        return found
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    # ============ 异步接口 ============
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        批量读取（L0 → Redis），Redis 命中的值回填 L0
+
+        Args:
+            keys: 逻辑键（不含全局前缀）
+
+        Returns:
+            {键: 值}，未命中的键不出现
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = self._l0_get_many(keys)
+        missing = [k for k in keys if k not in found]
+        if not missing or not self.breaker.allow():
+            return found
+
+        client = self._async_client()
+        if client is None:
+            return found
+        started = time.perf_counter()
+        try:
+            values = await client.mget([get_cache_key(k) for k in missing])
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis MGET failed: {e}")
+            return found
+        self.breaker.success()
+        from_redis = self._decode(missing, values)
+        self.redis_stats.record(started, hits=len(from_redis), misses=len(missing) - len(from_redis))
+        for key, value in from_redis.items():
+            self.l0.set(key, value)
+        found.update(from_redis)
+        return found
+
+    async def get(self, key: str) -> Optional[Any]:
+        """读取单个键"""
+        return (await self.get_many([key])).get(key)
+
+    async def set_many(self, entries: Dict[str, Any], ttl: int = None):
+        """
+        批量写入（L0 + Redis pipeline）
+
+        Args:
+            entries: {逻辑键: 值}
+            ttl: Redis 过期时间（秒），默认使用全局配置
+        """
+        if not entries:
+            return
+        for key, value in entries.items():
+            self.l0.set(key, value)
+        if not self.breaker.allow():
+            return
+        client = self._async_client()
+        if client is None:
+            return
+        ttl = ttl or cache_config.default_ttl
+        started = time.perf_counter()
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in entries.items():
+                pipe.setex(get_cache_key(key), ttl, self._encode(value))
+            await pipe.execute()
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis write failed: {e}")
+            return
+        self.breaker.success()
+        self.redis_stats.record(started)
+
+    async def set(self, key: str, value: Any, ttl: int = None):
+        """写入单个键"""
+        await self.set_many({key: value}, ttl)
+
+    async def delete(self, key: str):
+        """删除键（L0 + Redis）"""
+        self.l0.delete(key)
+        if not self.breaker.allow():
+            return
+        client = self._async_client()
+        if client is None:
+            return
+        try:
+            await client.delete(get_cache_key(key))
+            self.breaker.success()
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis delete failed: {e}")
+
+    async def pipeline(self, build: Callable[[Any], None]) -> Optional[list]:
+        """
+        在 Redis pipeline 上执行自定义命令（不经过 L0，受熔断保护）
+
+        Args:
+            build: 向 pipeline 添加命令的回调，键需自行加全局前缀（get_cache_key）
+
+        Returns:
+            各命令结果；Redis 不可用、熔断或出错时返回 None
+        """
+        if not self.breaker.allow():
+            return None
+        client = self._async_client()
+        if client is None:
+            return None
+        try:
+            pipe = client.pipeline(transaction=False)
+            build(pipe)
+            results = await pipe.execute()
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis pipeline failed: {e}")
+            return None
+        self.breaker.success()
+        return results
+
+    # ============ 同步接口（Celery 任务） ============
+    def get_many_sync(self, keys: List[str]) -> Dict[str, Any]:
+        """批量读取（同步版本）"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = self._l0_get_many(keys)
+        missing = [k for k in keys if k not in found]
+        if not missing or not self.breaker.allow():
+            return found
+
+        client = cache_config.client
+        if client is None:
+            self.breaker.failure()
+            return found
+        started = time.perf_counter()
+        try:
+            values = client.mget([get_cache_key(k) for k in missing])
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis MGET failed: {e}")
+            return found
+        self.breaker.success()
+        from_redis = self._decode(missing, values)
+        self.redis_stats.record(started, hits=len(from_redis), misses=len(missing) - len(from_redis))
+        for key, value in from_redis.items():
+            self.l0.set(key, value)
+        found.update(from_redis)
+        return found
+
+    def set_many_sync(self, entries: Dict[str, Any], ttl: int = None):
+        """批量写入（同步版本）"""
+        if not entries:
+            return
+        for key, value in entries.items():
+            self.l0.set(key, value)
+        if not self.breaker.allow():
+            return
+        client = cache_config.client
+        if client is None:
+            self.breaker.failure()
+            return
+        ttl = ttl or cache_config.default_ttl
+        started = time.perf_counter()
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in entries.items():
+                pipe.setex(get_cache_key(key), ttl, self._encode(value))
+            pipe.execute()
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis write failed: {e}")
+            return
+        self.breaker.success()
+        self.redis_stats.record(started)
+
+    def delete_sync(self, key: str):
+        """删除键（同步版本）"""
+        self.l0.delete(key)
+        if not self.breaker.allow():
+            return
+        client = cache_config.client
+        if client is None:
+            self.breaker.failure()
+            return
+        try:
+            client.delete(get_cache_key(key))
+            self.breaker.success()
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis delete failed: {e}")
+
+    def pipeline_sync(self, build: Callable[[Any], None]) -> Optional[list]:
+        """在 Redis pipeline 上执行自定义命令（同步版本）"""
+        if not self.breaker.allow():
+            return None
+        client = cache_config.client
+        if client is None:
+            self.breaker.failure()
+            return None
+        try:
+            pipe = client.pipeline(transaction=False)
+            build(pipe)
+            results = pipe.execute()
+        except Exception as e:
+            self.redis_stats.errors += 1
+            self.breaker.failure()
+            print(f"[TieredCache] Redis pipeline failed: {e}")
+            return None
+        self.breaker.success()
+        return results
+
+    # ============ 统计 ============
+    def stats(self) -> Dict[str, Any]:
+        """各层命中率、耗时及熔断状态"""
+        return {
+            "l0": {
+                **self.l0_stats.to_dict(),
+                "entries": len(self.l0),
+                "bytes": self.l0.bytes,
+                "evictions": self.l0.evictions,
+            },
+            "redis": {
+                **self.redis_stats.to_dict(),
+                "breaker": self.breaker.state,
+                "breaker_trips": self.breaker.trips,
+            },
+        }
+
+
+# 翻译缓存（整段缓存 trans:* 与分段翻译记忆 tm:* 共用）
+translation_cache = TieredCache(
+    l0_max_entries=int(os.getenv("TRANSLATION_L0_MAX_ENTRIES", "20000")),
+    l0_max_bytes=int(os.getenv("TRANSLATION_L0_MAX_MB", "32")) * 1024 * 1024,
+    l0_ttl=int(os.getenv("TRANSLATION_L0_TTL", "600")),
+    redis_timeout=float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5")),
+    breaker_failures=int(os.getenv("CACHE_BREAKER_FAILURES", "3")),
+    breaker_reset=float(os.getenv("CACHE_BREAKER_RESET", "30")),
+)
+
+# 跨进程共享的业务缓存（供应商统计、邮件总数等）：不启用 L0，
+# 失效可能发生在其他进程（Celery 任务），进程内副本会读到旧值
+shared_cache = TieredCache(
+    l0_max_entries=0,
+    l0_max_bytes=0,
+    l0_ttl=0,
+    redis_timeout=float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5")),
+    breaker_failures=int(os.getenv("CACHE_BREAKER_FAILURES", "3")),
+    breaker_reset=float(os.getenv("CACHE_BREAKER_RESET", "30")),
+)
@@ -0,0 +1,364 @@
+# shared/translation_scheduler.py
+"""
+翻译任务调度：优先级通道 + 按账户公平分配
+
+原来所有翻译任务直接投递到同一个 translate 队列，collect_and_translate_pending
+一次投递 500 个任务后，用户点击"翻译"要排在整批积压之后；单个账户的批量翻译也会占满 worker。
+这里分三个通道：
+
+- interactive: 用户在界面上主动触发的翻译，直接投递 Celery（最高优先级），不经过调度
+- new_mail:    拉取新邮件后的自动翻译
+- backfill:    定时收集的历史未翻译邮件、用户提交的批量翻译
+
+new_mail / backfill 先进入 Redis 中按 通道 + 账户 划分的队列，由 dispatch() 按以下规则投递：
+
+1. 同时在途的批量翻译任务不超过 BULK_SLOTS（小于 worker 并发数），
+   剩余的 worker 进程留给 interactive，交互翻译的等待时间与积压量无关
+2. new_mail 优先于 backfill
+3. 同一通道内按账户轮转，每个账户每轮投递一封，单个账户的积压不会挤占其他账户
+
+dispatch() 在入队后、每个翻译任务结束后以及定时任务中调用，取队列 + 占用名额在 Lua 脚本中原子完成，
+多个进程同时调用也不会超发。Redis 不可用时退化为直接投递（与原行为一致）。
+
+各通道的排队等待时间（入队 → 任务开始执行）记录在 Redis，见 lane_stats()。
+用户提交的批量翻译在 Redis 记录进度（start_batch / finish_batch_item），不占用 worker 轮询。
+"""
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shared.cache_config import cache_config, get_cache_key
+
+LANE_INTERACTIVE = "interactive"
+LANE_NEW_MAIL = "new_mail"
+LANE_BACKFILL = "backfill"
+LANES = (LANE_INTERACTIVE, LANE_NEW_MAIL, LANE_BACKFILL)
+# 经过调度的通道（按优先级排列）
+SCHEDULED_LANES = (LANE_NEW_MAIL, LANE_BACKFILL)
+
+# Celery 消息优先级（Redis broker：数值越小越优先，见 celery_app.broker_transport_options）
+LANE_PRIORITY = {LANE_INTERACTIVE: 0, LANE_NEW_MAIL: 3, LANE_BACKFILL: 6}
+
+# 同时在途的批量翻译任务数（应小于翻译 worker 的总并发数）
+BULK_SLOTS = int(os.getenv("TRANSLATE_BULK_SLOTS", "3"))
+# 在途记录的最长保留时间（秒）：超过后视为任务已丢失，释放名额
+INFLIGHT_TTL = int(os.getenv("TRANSLATE_INFLIGHT_TTL", "1200"))
+# 每个通道保留的最近等待时间样本数（计算分位数）
+WAIT_SAMPLES = 500
+# 批量翻译进度记录的保留时间（秒）
+BATCH_TTL = 24 * 3600
+
+TRANSLATE_TASK = "tasks.translate_tasks.translate_email_task"
+
+# 入队：去重（已在队列或在途的邮件跳过），按账户追加，新账户加入轮转环
+# tracked 中排队未投递的邮件分数为 1e15（永不过期），投递后改为投递时间
+_ENQUEUE_SCRIPT = """
+local prefix, lane, now, stale_before = ARGV[1], ARGV[2], ARGV[3], tonumber(ARGV[4])
+local tracked = prefix .. 'tracked'
+local ring = prefix .. lane .. ':ring'
+local accounts = prefix .. lane .. ':accounts'
+local added = 0
+for i = 5, #ARGV, 2 do
+    local email_id, account = ARGV[i], ARGV[i + 1]
+    local seen = redis.call('zscore', tracked, email_id)
+    if not seen or tonumber(seen) < stale_before then
+        redis.call('zadd', tracked, '1e15', email_id)
+        redis.call('rpush', prefix .. lane .. ':q:' .. account, email_id .. '|' .. now)
+        if redis.call('sadd', accounts, account) == 1 then
+            redis.call('rpush', ring, account)
+        end
+        redis.call('incr', prefix .. lane .. ':size')
+        added = added + 1
+    end
+end
+return added
+"""
+
+# 投递：清理超时的在途记录，按通道优先级、账户轮转取出不超过空闲名额的任务
+_DISPATCH_SCRIPT = """
+local prefix, now, slots, stale_before = ARGV[1], ARGV[2], tonumber(ARGV[3]), ARGV[4]
+local inflight = prefix .. 'inflight'
+local tracked = prefix .. 'tracked'
+redis.call('zremrangebyscore', inflight, '-inf', '(' .. stale_before)
+redis.call('zremrangebyscore', tracked, '-inf', '(' .. stale_before)
+local free = slots - redis.call('zcard', inflight)
+local out = {}
+for i = 5, #ARGV do
+    local lane = ARGV[i]
+    local ring = prefix .. lane .. ':ring'
+    while free > 0 and redis.call('llen', ring) > 0 do
+        local account = redis.call('rpoplpush', ring, ring)
+        local item = redis.call('lpop', prefix .. lane .. ':q:' .. account)
+        if item then
+            local email_id = string.match(item, '^([^|]+)')
+            redis.call('zadd', inflight, now, email_id)
+            redis.call('zadd', tracked, now, email_id)
+            redis.call('decr', prefix .. lane .. ':size')
+            table.insert(out, lane .. '|' .. account .. '|' .. item)
+            free = free - 1
+        else
+            redis.call('lrem', ring, 0, account)
+            redis.call('srem', prefix .. lane .. ':accounts', account)
+        end
+    end
+end
+return out
+"""
+
+# 批量翻译中的一封邮件结束：计数，全部结束时删除进度记录
+_FINISH_BATCH_SCRIPT = """
+local prefix, email_id, field = ARGV[1], ARGV[2], ARGV[3]
+local item_key = prefix .. 'batch_of:' .. email_id
+local batch_id = redis.call('get', item_key)
+if not batch_id then
+    return nil
+end
+redis.call('del', item_key)
+local key = prefix .. 'batch:' .. batch_id
+if redis.call('exists', key) == 0 then
+    return nil
+end
+redis.call('hincrby', key, field, 1)
+local fields = redis.call('hmget', key, 'account_id', 'total', 'completed', 'failed')
+local completed, failed = tonumber(fields[3]) or 0, tonumber(fields[4]) or 0
+local done = 0
+if completed + failed >= tonumber(fields[2]) then
+    redis.call('del', key)
+    done = 1
+end
+return {batch_id, fields[1], fields[2], completed, failed, done}
+"""
+
+
+def _prefix() -> str:
+    return get_cache_key("tsched:")
+
+
+def _send(email_id: int, account_id: int, lane: str, enqueued_at: float, force: bool = False):
+    """投递 Celery 翻译任务（按任务名发送，避免与 tasks 模块循环导入）"""
+    from celery_app import celery_app
+
+    celery_app.send_task(
+        TRANSLATE_TASK,
+        args=[email_id, account_id, force],
+        kwargs={"lane": lane, "enqueued_at": enqueued_at},
+        priority=LANE_PRIORITY[lane],
+    )
+
+
+def submit_interactive(email_id: int, account_id: int, force: bool = False):
+    """用户主动触发的翻译：直接以最高优先级投递，不占用批量名额"""
+    from celery_app import celery_app
+
+    return celery_app.send_task(
+        TRANSLATE_TASK,
+        args=[email_id, account_id, force],
+        kwargs={"lane": LANE_INTERACTIVE, "enqueued_at": time.time()},
+        priority=LANE_PRIORITY[LANE_INTERACTIVE],
+    )
+
+
+def enqueue(items: Iterable[Tuple[int, int]], lane: str) -> int:
+    """
+    批量翻译入队
+
+    Args:
+        items: [(email_id, account_id), ...]
+        lane: new_mail 或 backfill
+
+    Returns:
+        新入队的邮件数（已在队列或在途的邮件不重复入队）
+    """
+    items = list(items)
+    if not items:
+        return 0
+
+    client = cache_config.client
+    if client is None:
+        now = time.time()
+        for email_id, account_id in items:
+            _send(email_id, account_id, lane, now)
+        return len(items)
+
+    from redis.exceptions import RedisError
+
+    now = time.time()
+    args = [_prefix(), lane, now, now - INFLIGHT_TTL]
+    for email_id, account_id in items:
+        args.extend((email_id, account_id))
+    try:
+        added = client.eval(_ENQUEUE_SCRIPT, 0, *args)
+    except RedisError as e:
+        print(f"[TranslateScheduler] Enqueue failed, sending directly: {e}")
+        for email_id, account_id in items:
+            _send(email_id, account_id, lane, now)
+        return len(items)
+
+    if added:
+        dispatch()
+    return added
+
+
+def dispatch() -> int:
+    """
+    按空闲名额投递排队中的翻译任务
+
+    Returns:
+        本次投递的任务数
+    """
+    client = cache_config.client
+    if client is None:
+        return 0
+
+    from redis.exceptions import RedisError
+
+    now = time.time()
+    try:
+        picked = client.eval(
+            _DISPATCH_SCRIPT, 0, _prefix(), now, BULK_SLOTS, now - INFLIGHT_TTL, *SCHEDULED_LANES
+        )
+    except RedisError as e:
+        print(f"[TranslateScheduler] Dispatch failed: {e}")
+        return 0
+
+    for entry in picked:
+        lane, account_id, email_id, enqueued_at = entry.split("|")
+        try:
+            _send(int(email_id), int(account_id), lane, float(enqueued_at))
+        except Exception as e:
+            # 投递失败：释放名额和去重记录，下次收集时重新入队
+            print(f"[TranslateScheduler] Failed to send email_id={email_id}: {e}")
+            release(int(email_id))
+    if picked:
+        print(f"[TranslateScheduler] Dispatched {len(picked)} translations")
+    return len(picked)
+
+
+def release(email_id: int):
+    """批量翻译任务结束（成功或最终失败）：释放名额和去重记录"""
+    client = cache_config.client
+    if client is None:
+        return
+    prefix = _prefix()
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zrem(f"{prefix}inflight", email_id)
+        pipe.zrem(f"{prefix}tracked", email_id)
+        pipe.execute()
+    except Exception as e:
+        print(f"[TranslateScheduler] Release failed for email_id={email_id}: {e}")
+
+
+def start_batch(account_id: int, email_ids: List[int]) -> Optional[str]:
+    """
+    登记批量翻译（每封邮件结束时由 finish_batch_item 计数）
+
+    Returns:
+        批次 ID；Redis 不可用时返回 None（不推送完成通知）
+    """
+    client = cache_config.client
+    if client is None or not email_ids:
+        return None
+    batch_id = uuid.uuid4().hex[:12]
+    prefix = _prefix()
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.hset(f"{prefix}batch:{batch_id}", mapping={
+            "account_id": account_id, "total": len(email_ids), "completed": 0, "failed": 0,
+        })
+        pipe.expire(f"{prefix}batch:{batch_id}", BATCH_TTL)
+        for email_id in email_ids:
+            pipe.set(f"{prefix}batch_of:{email_id}", batch_id, ex=BATCH_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"[TranslateScheduler] Failed to register batch: {e}")
+        return None
+    return batch_id
+
+
+def finish_batch_item(email_id: int, success: bool) -> Optional[Dict]:
+    """
+    批量翻译中的一封邮件结束
+
+    Returns:
+        所属批次的进度 {batch_id, account_id, total, completed, failed, done}；不属于任何批次时返回 None
+    """
+    client = cache_config.client
+    if client is None:
+        return None
+    try:
+        result = client.eval(
+            _FINISH_BATCH_SCRIPT, 0, _prefix(), email_id, "completed" if success else "failed"
+        )
+    except Exception as e:
+        print(f"[TranslateScheduler] Failed to update batch progress: {e}")
+        return None
+    if not result:
+        return None
+    batch_id, account_id, total, completed, failed, done = result
+    return {
+        "batch_id": batch_id,
+        "account_id": int(account_id),
+        "total": int(total),
+        "completed": int(completed),
+        "failed": int(failed),
+        "done": bool(done),
+    }
+
+
+def record_wait(lane: str, enqueued_at: float):
+    """记录排队等待时间（任务开始执行时调用）"""
+    client = cache_config.client
+    if client is None or lane not in LANES or not enqueued_at:
+        return
+    wait = max(0.0, time.time() - enqueued_at)
+    key = f"{_prefix()}wait:{lane}"
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.lpush(f"{key}:samples", round(wait, 3))
+        pipe.ltrim(f"{key}:samples", 0, WAIT_SAMPLES - 1)
+        pipe.hincrby(key, "count", 1)
+        pipe.hincrbyfloat(key, "total", wait)
+        pipe.execute()
+    except Exception as e:
+        print(f"[TranslateScheduler] Failed to record wait: {e}")
+
+
+def _percentile(values: List[float], ratio: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def lane_stats() -> Dict:
+    """各通道排队长度、在途数和等待时间（秒）"""
+    client = cache_config.client
+    if client is None:
+        return {"available": False}
+
+    prefix = _prefix()
+    pipe = client.pipeline(transaction=False)
+    pipe.zcard(f"{prefix}inflight")
+    for lane in LANES:
+        pipe.get(f"{prefix}{lane}:size")
+        pipe.scard(f"{prefix}{lane}:accounts")
+        pipe.hgetall(f"{prefix}wait:{lane}")
+        pipe.lrange(f"{prefix}wait:{lane}:samples", 0, -1)
+    results = pipe.execute()
+
+    stats = {"available": True, "bulk_slots": BULK_SLOTS, "bulk_inflight": results[0], "lanes": {}}
+    for i, lane in enumerate(LANES):
+        size, accounts, totals, samples = results[1 + i * 4: 5 + i * 4]
+        waits = sorted(float(s) for s in samples)
+        count = int(totals.get("count", 0))
+        stats["lanes"][lane] = {
+            "queued": max(0, int(size or 0)) if lane in SCHEDULED_LANES else None,
+            "accounts": accounts if lane in SCHEDULED_LANES else None,
+            "started": count,
+            "wait_avg": round(float(totals.get("total", 0)) / count, 3) if count else None,
+            "wait_p50": _percentile(waits, 0.5),
+            "wait_p95": _percentile(waits, 0.95),
+            "wait_max_recent": waits[-1] if waits else None,
+        }
+    return stats
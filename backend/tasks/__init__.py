@@ -11,6 +11,7 @@ from tasks.translate_tasks import (
     translate_email_task,
     batch_translate_task,
     collect_and_translate_pending,
+    dispatch_pending_translations,
 )
 from tasks.email_tasks import (
     fetch_emails_task,
@@ -23,6 +24,8 @@ from tasks.ai_tasks import (
 from tasks.maintenance_tasks import (
     warm_translation_cache,
     cleanup_old_translations,
+    sync_search_index,
+    reconcile_email_counters,
     cleanup_temp_files,
     rebuild_contacts_index,
     reset_monthly_quota,
@@ -33,6 +36,7 @@ __all__ = [
     "translate_email_task",
     "batch_translate_task",
     "collect_and_translate_pending",
+    "dispatch_pending_translations",
     # 邮件任务
     "fetch_emails_task",
     "send_email_task",
@@ -42,6 +46,8 @@ __all__ = [
     # 维护任务
     "warm_translation_cache",
     "cleanup_old_translations",
+    "sync_search_index",
+    "reconcile_email_counters",
     "cleanup_temp_files",
     "rebuild_contacts_index",
     "reset_monthly_quota",
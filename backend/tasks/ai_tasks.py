@@ -5,7 +5,6 @@ AI 相关 Celery 任务
 - extract_email_info_task: AI 提取邮件信息
 """
 import asyncio
-import os
 from datetime import datetime
 from celery import shared_task
 from celery.exceptions import SoftTimeLimitExceeded
@@ -15,25 +14,19 @@ from celery_app import celery_app
 
 
 def get_db_session():
-    """获取同步数据库会话"""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-
-    db_url = f"mysql+pymysql://{os.getenv('MYSQL_USER', 'root')}:{os.getenv('MYSQL_PASSWORD', '')}@{os.getenv('MYSQL_HOST', 'localhost')}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DATABASE', 'email_translate')}?charset=utf8mb4"
-    engine = create_engine(db_url, pool_pre_ping=True)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
+    """获取同步数据库会话（复用 worker 进程级连接池）"""
+    from database.sync_database import get_sync_session
+    return get_sync_session()
 
 
 def notify_completion(account_id: int, event_type: str, data: dict):
-    """发送任务完成通知"""
-    try:
-        from services.notification_service import notification_manager
-        asyncio.get_event_loop().run_until_complete(
-            notification_manager.broadcast(account_id, event_type, data)
-        )
-    except Exception as e:
-        print(f"[Notify] Failed to send notification: {e}")
+    """
+    发送任务完成通知
+
+    worker 进程不持有 WebSocket 连接，经 Redis 发布后由 API 进程投递
+    """
+    from services.notification_bridge import publish_notification
+    publish_notification(account_id, event_type, data)
 
 
 @celery_app.task(bind=True, max_retries=2, soft_time_limit=60, time_limit=90)
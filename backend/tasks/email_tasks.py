@@ -7,7 +7,6 @@
 - export_emails_task: 导出邮件
 - check_scheduled_emails: 检查并发送定时邮件
 """
-import asyncio
 import os
 import uuid
 from datetime import datetime, timedelta
@@ -20,25 +19,19 @@ from celery_app import celery_app
 
 
 def get_db_session():
-    """获取同步数据库会话"""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-
-    db_url = f"mysql+pymysql://{os.getenv('MYSQL_USER', 'root')}:{os.getenv('MYSQL_PASSWORD', '')}@{os.getenv('MYSQL_HOST', 'localhost')}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DATABASE', 'email_translate')}?charset=utf8mb4"
-    engine = create_engine(db_url, pool_pre_ping=True)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
+    """获取同步数据库会话（复用 worker 进程级连接池）"""
+    from database.sync_database import get_sync_session
+    return get_sync_session()
 
 
 def notify_completion(account_id: int, event_type: str, data: dict):
-    """发送任务完成通知"""
-    try:
-        from services.notification_service import notification_manager
-        asyncio.get_event_loop().run_until_complete(
-            notification_manager.broadcast(account_id, event_type, data)
-        )
-    except Exception as e:
-        print(f"[Notify] Failed to send notification: {e}")
+    """
+    发送任务完成通知
+
+    worker 进程不持有 WebSocket 连接，经 Redis 发布后由 API 进程投递
+    """
+    from services.notification_bridge import publish_notification
+    publish_notification(account_id, event_type, data)
 
 
 @celery_app.task(bind=True, max_retries=3, soft_time_limit=120, time_limit=150)
@@ -53,8 +46,7 @@ def fetch_emails_task(self, account_id: int, since_days: int = 30):
     Returns:
         dict: 拉取结果 {success, new_count, total_count}
     """
-    from database.models import EmailAccount, Email
-    from services.email_service import EmailService
+    from database.models import EmailAccount, Email, ImapSyncState
 
     db = get_db_session()
 
@@ -70,92 +62,124 @@ def fetch_emails_task(self, account_id: int, since_days: int = 30):
             "since_days": since_days
         })
 
-        # 创建邮件服务（使用 context manager 确保连接清理）
+        # 读取 INBOX 的 UID 同步检查点
+        folder = "INBOX"
+        sync_state = db.query(ImapSyncState).filter(
+            ImapSyncState.account_id == account_id,
+            ImapSyncState.folder == folder
+        ).first()
+
+        def known_message_ids(message_ids):
+            """只查询本批候选邮件中已入库的 message_id（不加载全部历史）"""
+            rows = db.query(Email.message_id).filter(Email.message_id.in_(message_ids)).all()
+            return {row[0] for row in rows}
+
+        # 从进程级会话池借用 IMAP 连接（复用已登录会话，避免每次拉取都重新 LOGIN）
         from utils.crypto import decrypt_password
-        service = EmailService(
+        from services.imap_pool import get_imap_session_pool
+        with get_imap_session_pool().lease(
+            account_id,
             imap_server=account.imap_server,
             smtp_server=account.smtp_server,
             email_address=account.email,
             password=decrypt_password(account.password),
             imap_port=account.imap_port,
             smtp_port=account.smtp_port
-        )
-
-        try:
-            # 计算起始日期
+        ) as service:
+            # 无检查点或 UIDVALIDITY 变化时按日期重新同步
             since_date = datetime.utcnow() - timedelta(days=since_days)
 
-            # 获取已存在的 message_ids（用于 IMAP 层预过滤，避免重复下载附件）
-            existing_message_ids = set(
-                row[0] for row in db.query(Email.message_id).filter(
-                    Email.account_id == account_id
-                ).all() if row[0]
-            )
-            print(f"[FetchTask] Found {len(existing_message_ids)} existing emails for pre-filter")
-
-            # 拉取邮件（传入 existing_message_ids 实现增量同步）
-            emails = service.fetch_emails(
+            # 邮件边下载边入库（生成器逐封产出），不在内存中积累整批邮件
+            sync_result = {}
+            emails = service.iter_emails_incremental(
+                folder=folder,
+                uidvalidity=sync_state.uidvalidity if sync_state else None,
+                last_uid=sync_state.last_uid if sync_state else 0,
+                highest_modseq=sync_state.highest_modseq if sync_state else None,
                 since_date=since_date,
-                existing_message_ids=existing_message_ids
+                known_message_ids=known_message_ids,
+                state=sync_result
             )
-        finally:
-            # 确保 IMAP 连接被关闭
-            service.disconnect_imap()
-
-        new_count = 0
-        total_count = len(emails)
-        progress = 0
-
-        for i, email_data in enumerate(emails):
-            # 检查是否已存在
-            existing = db.query(Email).filter(
-                Email.message_id == email_data.get("message_id")
-            ).first()
-
-            if not existing:
-                # 创建新邮件
-                new_email = Email(
-                    account_id=account_id,
-                    message_id=email_data.get("message_id"),
-                    subject_original=email_data.get("subject"),
-                    body_original=email_data.get("body"),
-                    from_email=email_data.get("from_email"),
-                    to_email=email_data.get("to_email"),
-                    cc_email=email_data.get("cc_email"),
-                    received_at=email_data.get("date"),
-                    language_detected=email_data.get("language"),
-                    has_attachments=bool(email_data.get("attachments")),
-                    is_read=False,
-                    is_flagged=False,
-                    is_translated=False
-                )
-                db.add(new_email)
-                new_count += 1
-
-            # 发送进度更新（每10封或最后一封）
-            new_progress = int((i + 1) / total_count * 100)
-            if new_progress - progress >= 10 or i == total_count - 1:
-                progress = new_progress
-                notify_completion(account_id, "fetch_progress", {
-                    "current": i + 1,
-                    "total": total_count,
-                    "progress": progress,
-                    "new_count": new_count
-                })
+
+            new_count = 0
+            total_count = 0
+            progress = 0
+
+            for i, email_data in enumerate(emails):
+                total_count = i + 1
+
+                # 检查是否已存在
+                existing = db.query(Email).filter(
+                    Email.message_id == email_data.get("message_id")
+                ).first()
+
+                if not existing:
+                    # 创建新邮件
+                    new_email = Email(
+                        account_id=account_id,
+                        message_id=email_data.get("message_id"),
+                        subject_original=email_data.get("subject"),
+                        body_original=email_data.get("body"),
+                        from_email=email_data.get("from_email"),
+                        to_email=email_data.get("to_email"),
+                        cc_email=email_data.get("cc_email"),
+                        received_at=email_data.get("date"),
+                        language_detected=email_data.get("language"),
+                        has_attachments=bool(email_data.get("attachments")),
+                        is_read=False,
+                        is_flagged=False,
+                        is_translated=False
+                    )
+                    db.add(new_email)
+                    new_count += 1
+
+                # 发送进度更新（每10%一次；总数为待下载邮件数，解析失败的邮件不会产出）
+                expected = max(sync_result.get("total") or 0, i + 1)
+                new_progress = int((i + 1) / expected * 100)
+                if new_progress - progress >= 10:
+                    progress = new_progress
+                    notify_completion(account_id, "fetch_progress", {
+                        "current": i + 1,
+                        "total": expected,
+                        "progress": progress,
+                        "new_count": new_count
+                    })
+
+        # 邮件与检查点在同一事务中提交，避免检查点前进但邮件未入库
+        if sync_result.get("uidvalidity") is not None:
+            if sync_state is None:
+                sync_state = ImapSyncState(account_id=account_id, folder=folder)
+                db.add(sync_state)
+            sync_state.uidvalidity = sync_result["uidvalidity"]
+            sync_state.last_uid = sync_result["last_uid"]
+            sync_state.highest_modseq = sync_result["highest_modseq"]
+            sync_state.last_synced_at = datetime.utcnow()
 
         db.commit()
+        if new_count:
+            from utils.supplier_stats import invalidate_domain_stats_sync
+            invalidate_domain_stats_sync(account_id)
+
+        # 增量积压超过单次上限：检查点已提交，立即排队拉取剩余部分，直到追平
+        has_more = bool(sync_result.get("truncated"))
+        if has_more:
+            fetch_emails_task.delay(account_id, since_days)
+            print(f"[FetchEmails] Account {account_id}: backlog remaining after UID "
+                  f"{sync_result['last_uid']}, fetch re-queued")
 
         # 发送完成通知
         notify_completion(account_id, "fetch_complete", {
             "success": True,
             "new_count": new_count,
-            "total_count": total_count
+            "total_count": total_count,
+            "has_more": has_more
         })
 
         return {
             "success": True,
             "new_count": new_count,
-            "total_count": total_count
+            "total_count": total_count,
+            "has_more": has_more
         }
 
     except SoftTimeLimitExceeded:
@@ -524,7 +548,7 @@ def auto_fetch_all_emails(self, since_days: int = 1):
     Returns:
         dict: 拉取结果汇总
     """
-    from database.models import EmailAccount
+    from database.models import EmailAccount, ImapSyncState
 
     db = get_db_session()
     results = []
@@ -537,7 +561,25 @@ def auto_fetch_all_emails(self, since_days: int = 1):
 
         print(f"[AutoFetch] Starting auto fetch for {len(accounts)} accounts")
 
+        from services.imap_pool import WATCHED_FALLBACK_SECONDS, is_account_watched
+
+        last_synced = dict(db.query(ImapSyncState.account_id, ImapSyncState.last_synced_at).filter(
+            ImapSyncState.folder == "INBOX"
+        ).all())
+        fallback_before = datetime.utcnow() - timedelta(seconds=WATCHED_FALLBACK_SECONDS)
+
         for account in accounts:
+            # 有 IDLE 监听的账户由 imap_watcher 在新邮件到达时触发拉取，
+            # 只在超过 WATCHED_FALLBACK_SECONDS 未同步时兜底拉取一次
+            synced_at = last_synced.get(account.id)
+            if is_account_watched(account.id) and synced_at and synced_at > fallback_before:
+                results.append({
+                    "account_id": account.id,
+                    "email": account.email,
+                    "status": "watched"
+                })
+                continue
+
             try:
                 # 异步触发每个账户的拉取任务
                 task = fetch_emails_task.delay(account.id, since_days)
@@ -3,7 +3,10 @@
 
 包含：
 - warm_translation_cache: 缓存预热
-- cleanup_old_translations: 清理过期翻译缓存
+- cleanup_old_translations: 翻译缓存超出容量时淘汰低价值条目
+- flush_translation_cache_hits: 批量写回翻译缓存命中次数
+- sync_search_index: 补齐邮件全文索引中遗漏的行
+- reconcile_email_counters: 按实际数据校正账户邮件计数
 - cleanup_temp_files: 清理临时文件
 - rebuild_contacts_index: 重建联系人索引
 - reset_monthly_quota: 每月重置用量统计
@@ -21,14 +24,9 @@ from celery_app import celery_app
 
 
 def get_db_session():
-    """获取同步数据库会话"""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-
-    db_url = f"mysql+pymysql://{os.getenv('MYSQL_USER', 'root')}:{os.getenv('MYSQL_PASSWORD', '')}@{os.getenv('MYSQL_HOST', 'localhost')}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DATABASE', 'email_translate')}?charset=utf8mb4"
-    engine = create_engine(db_url, pool_pre_ping=True)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
+    """获取同步数据库会话（复用 worker 进程级连接池）"""
+    from database.sync_database import get_sync_session
+    return get_sync_session()
 
 
 @celery_app.task(bind=True)
@@ -36,27 +34,40 @@ def warm_translation_cache(self):
     """
     预热翻译缓存
 
-    从 MySQL 翻译缓存表加载高频翻译到 Redis
+    从 MySQL 翻译缓存表按保留价值（频率/最近命中/大小）加载高频翻译到 Redis，
+    总大小受 TRANSLATION_CACHE_WARM_MB 限制（单次 pipeline 批量写入）
+
+    翻译缓存表同时存放整段翻译（Redis 键前缀 trans:）和分段翻译记忆（tm:），
+    按 text_hash 能否由原文重新算出判断归属；带术语表的条目无法判断，两个前缀都写入。
     """
-    from database.models import TranslationCache
-    from shared.cache_config import cache_set
+    import hashlib
+    from shared.cache_config import cache_set_many
+    from services.translation_memory import segment_key
+    from services.translation_cache_policy import select_for_warmup
 
     db = get_db_session()
 
     try:
-        # 获取高频翻译（命中次数 > 5）
-        high_freq_translations = db.query(TranslationCache).filter(
-            TranslationCache.hit_count > 5
-        ).order_by(TranslationCache.hit_count.desc()).limit(1000).all()
+        # 获取高频翻译（命中次数 > 5，按保留价值排序并限制总大小）
+        high_freq_translations = select_for_warmup(db, min_hits=5)
 
-        warmed_count = 0
+        entries = {}
         for trans in high_freq_translations:
-            try:
-                cache_key = f"trans:{trans.text_hash}"
-                cache_set(cache_key, trans.translated_text, ttl=7200)  # 2小时TTL
-                warmed_count += 1
-            except Exception as e:
-                print(f"[CacheWarm] Failed to warm {trans.text_hash}: {e}")
+            source_text = trans.source_text or ""
+            if segment_key(source_text, trans.target_lang) == trans.text_hash:
+                prefixes = ("tm",)
+            else:
+                content = f"{source_text}|{trans.source_lang or 'auto'}|{trans.target_lang}"
+                if hashlib.sha256(content.encode('utf-8')).hexdigest() == trans.text_hash:
+                    prefixes = ("trans",)
+                else:
+                    prefixes = ("trans", "tm")
+            for prefix in prefixes:
+                entries[f"{prefix}:{trans.text_hash}"] = trans.translated_text
+
+        warmed_count = 0
+        if entries and cache_set_many(entries, ttl=7200):  # 2小时TTL
+            warmed_count = len(high_freq_translations)
 
         print(f"[CacheWarm] Warmed {warmed_count} translations")
         return {
@@ -75,32 +86,28 @@ def warm_translation_cache(self):
 @celery_app.task(bind=True)
 def cleanup_old_translations(self):
     """
-    清理过期翻译缓存
+    翻译缓存容量淘汰
 
-    删除30天未使用且命中次数低的翻译缓存
+    压缩后的总大小超过 TRANSLATION_CACHE_MAX_MB 时，按 命中次数 / 距最近命中天数 / 大小
+    从低到高删除，直到降到上限的 TRANSLATION_CACHE_EVICT_TARGET
     """
-    from database.models import TranslationCache
-    from sqlalchemy import and_
+    from services.translation_cache_policy import evict, flush_hits
 
     db = get_db_session()
 
     try:
-        cutoff = datetime.utcnow() - timedelta(days=30)
+        # 先写回累计的命中次数，避免刚命中的条目被淘汰
+        flush_hits(db)
+        stats = evict(db)
 
-        # 删除30天未更新且命中次数 < 3 的缓存
-        deleted = db.query(TranslationCache).filter(
-            and_(
-                TranslationCache.updated_at < cutoff,
-                TranslationCache.hit_count < 3
-            )
-        ).delete(synchronize_session=False)
-
-        db.commit()
-
-        print(f"[CacheCleanup] Deleted {deleted} old translations")
+        print(f"[CacheCleanup] Evicted {stats['evicted_rows']} translations "
+              f"({stats['evicted_bytes'] / 1024 / 1024:.1f} MB), "
+              f"now {stats['total_bytes'] / 1024 / 1024:.1f} MB")
         return {
             "success": True,
-            "deleted_count": deleted,
+            "deleted_count": stats["evicted_rows"],
+            "evicted_bytes": stats["evicted_bytes"],
+            "total_bytes": stats["total_bytes"],
             "timestamp": datetime.utcnow().isoformat()
         }
 
@@ -112,6 +119,118 @@ def cleanup_old_translations(self):
         db.close()
 
 
+@celery_app.task(bind=True)
+def flush_translation_cache_hits(self):
+    """
+    批量写回翻译缓存命中次数
+
+    命中时只在 Redis 哈希上累加，这里按增量分组合并为少量 UPDATE
+    """
+    from services.translation_cache_policy import flush_hits
+
+    db = get_db_session()
+
+    try:
+        updated = flush_hits(db)
+        if updated:
+            print(f"[CacheHits] Flushed hit counts for {updated} translations")
+        return {"success": True, "updated_count": updated}
+
+    except Exception as e:
+        db.rollback()
+        print(f"[CacheHits] Error: {e}")
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+# 对账只检查最近这么多封邮件（主键范围扫描；更早的数据由迁移脚本回填）
+SEARCH_SYNC_WINDOW = int(os.getenv("SEARCH_SYNC_WINDOW", "20000"))
+SEARCH_SYNC_BATCH = 500
+
+
+@celery_app.task(bind=True)
+def sync_search_index(self):
+    """
+    补齐邮件全文索引
+
+    索引行正常由 ORM 事件在写入邮件时同步，这里兜底处理绕过 ORM 的写入：
+    最近的邮件中缺少索引行、或已有译文但索引行还没有译文的，重新建索引
+    """
+    from sqlalchemy import select, func, and_, or_
+    from database.models import Email, EmailSearchIndex
+    from database.search_index import reindex_emails_sync
+
+    db = get_db_session()
+
+    try:
+        max_id = db.execute(select(func.max(Email.id))).scalar() or 0
+        email_ids = db.execute(
+            select(Email.id)
+            .outerjoin(EmailSearchIndex, EmailSearchIndex.email_id == Email.id)
+            .where(
+                Email.id > max_id - SEARCH_SYNC_WINDOW,
+                or_(
+                    EmailSearchIndex.email_id.is_(None),
+                    and_(Email.body_translated.isnot(None), EmailSearchIndex.has_translation.is_(False))
+                )
+            )
+            .limit(SEARCH_SYNC_BATCH)
+        ).scalars().all()
+
+        indexed = reindex_emails_sync(db, email_ids)
+        db.commit()
+        if indexed:
+            print(f"[SearchIndex] Reindexed {indexed} emails")
+        return {"success": True, "indexed_count": indexed}
+
+    except Exception as e:
+        db.rollback()
+        print(f"[SearchIndex] Error: {e}")
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def reconcile_email_counters(self):
+    """
+    校正账户邮件计数
+
+    计数正常由 emails 表上的触发器维护（见 database.email_counters），
+    这里逐个账户按实际数据重算，修复触发器缺失或手工改数据造成的偏差
+    """
+    from sqlalchemy import select
+    from database.models import EmailAccount
+    from database.email_counters import reconcile_account_sync
+
+    db = get_db_session()
+
+    try:
+        account_ids = db.execute(select(EmailAccount.id)).scalars().all()
+        drifted = 0
+        for account_id in account_ids:
+            try:
+                drift = reconcile_account_sync(db, account_id)
+                db.commit()  # 每个账户单独提交，尽快释放计数行锁
+            except Exception as e:
+                db.rollback()
+                print(f"[EmailCounters] Failed to reconcile account {account_id}: {e}")
+                continue
+            if drift:
+                drifted += 1
+                print(f"[EmailCounters] Account {account_id} drift: {drift}")
+
+        return {"success": True, "account_count": len(account_ids), "drifted_count": drifted}
+
+    except Exception as e:
+        db.rollback()
+        print(f"[EmailCounters] Error: {e}")
+        return {"success": False, "error": str(e)}
+    finally:
+        db.close()
+
+
 @celery_app.task(bind=True)
 def cleanup_temp_files(self):
     """
@@ -106,12 +106,9 @@ async def send_reminder(event, manager):
         "minutes_until": minutes_until,
     }
 
-    # 通过 WebSocket 推送到对应账户
-    await manager.broadcast(
-        account_id=event.account_id,
-        event_type="calendar_reminder",
-        data=reminder_data
-    )
+    # 经 Redis 发布，由 API 进程推送到对应账户的 WebSocket 连接
+    from services.notification_bridge import publish_notification
+    publish_notification(event.account_id, "calendar_reminder", reminder_data)
 
     print(f"[ReminderTask] Sent reminder for event {event.id} ({event.title}) to account {event.account_id}")
 
@@ -131,8 +128,6 @@ def send_test_reminder(account_id: int, event_id: int = None):
 
 async def _send_test_reminder_async(account_id: int, event_id: int = None):
     """异步发送测试提醒"""
-    from websocket import manager
-
     test_data = {
         "event_id": event_id or 0,
         "title": "测试提醒",
@@ -146,10 +141,7 @@ async def _send_test_reminder_async(account_id: int, event_id: int = None):
         "minutes_until": 15,
     }
 
-    await manager.broadcast(
-        account_id=account_id,
-        event_type="calendar_reminder",
-        data=test_data
-    )
+    from services.notification_bridge import publish_notification
+    publish_notification(account_id, "calendar_reminder", test_data)
 
     return {"success": True, "account_id": account_id}
@@ -10,7 +10,7 @@ Portal 项目管理系统导入时直接读取，实现秒级响应
 """
 import json
 import re
-import requests
+import httpx
 from datetime import datetime
 from celery.exceptions import SoftTimeLimitExceeded
 
@@ -96,26 +96,16 @@ def call_vllm_extract(subject: str, body: str, settings) -> dict:
         body=body or "(无正文)"
     )
 
-    # 构建请求头（包含 API Key 认证）
-    headers = {"Content-Type": "application/json"}
-    if settings.vllm_api_key:
-        headers["Authorization"] = f"Bearer {settings.vllm_api_key}"
-
     try:
-        response = requests.post(
-            f"{settings.vllm_base_url}/v1/chat/completions",
-            headers=headers,
-            json={
-                "model": settings.vllm_model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.3,
-                "max_tokens": 3000
-            },
+        # 复用进程级 vLLM keep-alive 连接池
+        from services.vllm_client import get_vllm_client
+        result = get_vllm_client().chat_completion(
+            messages=[{"role": "user", "content": prompt}],
+            model=settings.vllm_model,
+            temperature=0.3,
+            max_tokens=3000,
             timeout=300  # 5分钟超时
         )
-        response.raise_for_status()
-
-        result = response.json()
         response_text = result["choices"][0]["message"]["content"].strip()
 
         # 尝试解析 JSON
@@ -134,9 +124,9 @@ def call_vllm_extract(subject: str, body: str, settings) -> dict:
                 "raw_response": response_text[:500]
             }
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return {"success": False, "error": "vLLM 请求超时"}
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         return {"success": False, "error": "无法连接到 vLLM 服务"}
     except json.JSONDecodeError as e:
         return {"success": False, "error": f"JSON 解析失败: {e}"}
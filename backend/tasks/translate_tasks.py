@@ -2,141 +2,81 @@
 翻译相关 Celery 任务
 
 包含：
-- translate_email_task: 翻译单封邮件（支持超长邮件分段翻译）
-- batch_translate_task: 批量翻译邮件
-- collect_and_translate_pending: 收集并翻译待处理邮件
+- translate_email_task: 翻译单封邮件（标题+正文合并为一次请求，分段翻译记忆，超长邮件分批并发翻译）
+- batch_translate_task: 批量翻译邮件（backfill 通道，按账户公平调度）
+- collect_and_translate_pending: 收集并翻译待处理邮件（backfill 通道）
+- dispatch_pending_translations: 按空闲名额投递排队中的翻译（见 shared.translation_scheduler）
 
 所有翻译任务使用本地 vLLM 大模型，零 API 成本。
 """
-import asyncio
-import re
+import hashlib
+import os
+import time
 from celery import shared_task
 from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import task_prerun, task_postrun
 from datetime import datetime
-from typing import Optional, List, Tuple
+from typing import Optional, Tuple
 
 from celery_app import celery_app
 
 # 超长邮件阈值（字节）
 LONG_EMAIL_THRESHOLD = 25000  # 25KB
-# 每段最大长度（字符）
-CHUNK_MAX_SIZE = 8000
+# 分段并发翻译数（vLLM 对并发请求做连续批处理，并发比串行快得多）
+CHUNK_CONCURRENCY = int(os.getenv("TRANSLATE_CHUNK_CONCURRENCY", "4"))
+# 单段失败后的重试次数（只重试失败的段，不重翻整封邮件）
+CHUNK_MAX_RETRIES = 2
 
 
 def get_db_session():
-    """获取同步数据库会话（Celery worker 使用）"""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-    import os
+    """获取同步数据库会话（Celery worker 使用）（复用 worker 进程级连接池）"""
+    from database.sync_database import get_sync_session
+    return get_sync_session()
 
-    db_url = f"mysql+pymysql://{os.getenv('MYSQL_USER', 'root')}:{os.getenv('MYSQL_PASSWORD', '')}@{os.getenv('MYSQL_HOST', 'localhost')}:{os.getenv('MYSQL_PORT', '3306')}/{os.getenv('MYSQL_DATABASE', 'email_translate')}?charset=utf8mb4"
-    engine = create_engine(db_url, pool_pre_ping=True)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
 
-
-def split_email_into_chunks(text: str, max_chunk_size: int = CHUNK_MAX_SIZE) -> List[str]:
+def translate_chunk_with_retry(service, chunk: str, target_lang: str, source_lang: str,
+                               glossary=None, context: str = None,
+                               max_retries: int = CHUNK_MAX_RETRIES) -> str:
     """
-    将长邮件文本分割成多个片段，在段落或句子边界处分割
+    翻译单个片段，失败时只重试该片段（指数退避：2s, 4s）
 
-    Args:
-        text: 原始文本
-        max_chunk_size: 每个片段的最大长度
+    在 translate_segments 的线程池中执行，SoftTimeLimitExceeded 只会在任务主线程抛出，这里无需处理
 
-    Returns:
-        List[str]: 分割后的文本片段列表
-    """
-    if len(text) <= max_chunk_size:
-        return [text]
-
-    chunks = []
-    current_pos = 0
-
-    while current_pos < len(text):
-        # 如果剩余内容不超过限制，直接添加
-        if current_pos + max_chunk_size >= len(text):
-            chunks.append(text[current_pos:])
-            break
-
-        # 找到合适的分割点（优先级：段落 > 换行 > 句号 > 空格）
-        end_pos = current_pos + max_chunk_size
-        chunk_text = text[current_pos:end_pos]
-
-        # 从后向前查找最佳分割点
-        split_patterns = [
-            r'\n\n',  # 段落分隔
-            r'\n',    # 换行
-            r'[.。！!?？](?=\s|$)',  # 句末标点
-            r'[,，;；](?=\s)',  # 子句分隔
-            r'\s',    # 空格
-        ]
-
-        best_split = len(chunk_text)
-
-        for pattern in split_patterns:
-            # 在后半部分查找分割点
-            search_start = max(0, len(chunk_text) // 2)
-            matches = list(re.finditer(pattern, chunk_text[search_start:]))
-            if matches:
-                # 取最后一个匹配
-                last_match = matches[-1]
-                split_pos = search_start + last_match.end()
-                if split_pos > search_start:
-                    best_split = split_pos
-                    break
-
-        # 添加片段
-        chunks.append(text[current_pos:current_pos + best_split])
-        current_pos += best_split
-
-    return chunks
-
-
-def translate_long_email(service, text: str, target_lang: str, source_lang: str, glossary=None) -> str:
+    Raises:
+        最后一次失败的异常
     """
-    翻译超长邮件，自动分段处理
+    last_error = None
+    for attempt in range(max_retries + 1):
+        try:
+            print(f"[TranslateTask] Translating chunk ({len(chunk)} chars, attempt {attempt+1})")
+            return service.translate_text(
+                text=chunk,
+                target_lang=target_lang,
+                source_lang=source_lang,
+                glossary=glossary,
+                context=context
+            )
+        except Exception as e:
+            last_error = e
+            print(f"[TranslateTask] Chunk ({len(chunk)} chars) failed: {e}")
+            if attempt < max_retries:
+                time.sleep(2 ** (attempt + 1))
+    raise last_error
 
-    Args:
-        service: TranslateService 实例
-        text: 原始文本
-        target_lang: 目标语言
-        source_lang: 源语言
-        glossary: 术语表
 
-    Returns:
-        str: 完整翻译结果
+def notify_completion(account_id: int, event_type: str, data: dict):
     """
-    chunks = split_email_into_chunks(text)
-    print(f"[TranslateTask] Long email split into {len(chunks)} chunks")
-
-    translated_chunks = []
-    for i, chunk in enumerate(chunks):
-        print(f"[TranslateTask] Translating chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-        translated = service.translate_text(
-            text=chunk,
-            target_lang=target_lang,
-            source_lang=source_lang,
-            glossary=glossary
-        )
-        translated_chunks.append(translated)
+    发送任务完成通知
 
-    return "\n".join(translated_chunks)
-
-
-def notify_completion(account_id: int, event_type: str, data: dict):
-    """发送任务完成通知"""
-    try:
-        from services.notification_service import notification_manager
-        # 使用 asyncio.run() 替代 get_event_loop() 以兼容 Python 3.10+
-        asyncio.run(
-            notification_manager.broadcast(account_id, event_type, data)
-        )
-    except Exception as e:
-        print(f"[Notify] Failed to send notification: {e}")
+    worker 进程不持有 WebSocket 连接，经 Redis 发布后由 API 进程投递
+    """
+    from services.notification_bridge import publish_notification
+    publish_notification(account_id, event_type, data)
 
 
 @celery_app.task(bind=True, max_retries=3, soft_time_limit=600, time_limit=900)
-def translate_email_task(self, email_id: int, account_id: int, force: bool = False):
+def translate_email_task(self, email_id: int, account_id: int, force: bool = False,
+                         lane: str = None, enqueued_at: float = None):
     """
     异步翻译单封邮件
 
@@ -144,12 +84,16 @@ def translate_email_task(self, email_id: int, account_id: int, force: bool = Fal
         email_id: 邮件ID
         account_id: 账户ID（用于通知）
         force: 是否强制重新翻译
+        lane: 调度通道（interactive/new_mail/backfill，由 shared.translation_scheduler 填写）
+        enqueued_at: 入队时间戳（统计排队等待时间）
 
     Returns:
         dict: 翻译结果 {success, email_id, provider}
     """
     from database.models import Email, SharedEmailTranslation, EmailAccount
-    from services.translate_service import TranslateService
+    from services.translate_service import TranslateService, COMBINED_MAX_CHARS
+    from services.translation_memory import translate_segments, lookup_translation, remember_translation
+    from shared.single_flight import translation_single_flight
     from config import get_settings
     from sqlalchemy import and_
 
@@ -185,7 +129,6 @@ def translate_email_task(self, email_id: int, account_id: int, force: bool = Fal
         # 翻译锁：使用数据库原子更新防止并发翻译
         # 只有状态为 none/pending/failed/NULL 的邮件才能开始翻译
         from sqlalchemy import update, or_
-        from datetime import datetime
         result = db.execute(
             update(Email)
             .where(and_(
@@ -222,7 +165,6 @@ def translate_email_task(self, email_id: int, account_id: int, force: bool = Fal
         )
 
         # 执行翻译（统一使用 vLLM）
-        provider_used = "vllm"
         body_original = email.body_original or ""
         body_len = len(body_original)
         is_long_email = body_len > LONG_EMAIL_THRESHOLD
@@ -231,76 +173,114 @@ def translate_email_task(self, email_id: int, account_id: int, force: bool = Fal
         latest_content, quoted_content = service.extract_latest_email(body_original)
         print(f"[TranslateTask] Email {email_id}: latest={len(latest_content)} chars, quoted={len(quoted_content)} chars")
 
-        if is_long_email:
-            # 超长邮件：使用分段翻译（仅翻译最新内容）
-            print(f"[TranslateTask] Long email detected ({body_len} bytes), using chunked translation")
-            body_translated = translate_long_email(
-                service=service,
-                text=latest_content,
-                target_lang="zh",
-                source_lang=email.language_detected,
-                glossary=None
+        def translate_run(text: str, context: str = None) -> str:
+            return translate_chunk_with_retry(
+                service, text, "zh", email.language_detected, context=context
             )
-            provider_used = "vllm+chunked"
-        elif latest_content:
-            # 智能路由翻译最新内容
-            result = service.translate_with_smart_routing(
-                text=latest_content,
-                target_lang="zh",
-                source_lang=email.language_detected,
-                glossary=None,  # TODO: 加载术语表
-                subject=email.subject_original
-            )
-            body_translated = result.get("translated_text", "")
-            provider_used = result.get("provider_used", "vllm")
-        else:
-            # 空正文
-            body_translated = ""
-
-        # 处理引用内容
-        if quoted_content and body_translated:
-            quoted_translated = None
-
-            # 优先查找历史翻译（通过 in_reply_to）
-            if email.in_reply_to:
-                # 查找被引用邮件的翻译
-                original_email = db.query(Email).filter(
-                    Email.message_id == email.in_reply_to,
-                    Email.is_translated == True
-                ).first()
-                if original_email and original_email.body_translated:
-                    quoted_translated = original_email.body_translated
-                    print(f"[TranslateTask] Found historical translation for quoted content")
-                else:
-                    # 查找共享翻译
-                    shared_translation = db.query(SharedEmailTranslation).filter(
-                        SharedEmailTranslation.message_id == email.in_reply_to
+
+        subject_original = email.subject_original
+
+        def translate_content() -> dict:
+            """翻译标题和正文（含引用），结果可 JSON 序列化，供 single-flight 共享"""
+            provider_used = "vllm"
+            # 标题+正文合并翻译：两者都未命中翻译记忆且正文不长时，一次请求（JSON 输出）拿到两份译文
+            subject_translated = None
+            body_translated = None
+            if subject_original and latest_content and len(latest_content) <= COMBINED_MAX_CHARS:
+                subject_translated = lookup_translation(db, subject_original, "zh")
+                body_translated = lookup_translation(db, latest_content, "zh")
+                if subject_translated is None and body_translated is None:
+                    pair = service.translate_subject_and_body(
+                        subject_original, latest_content, "zh", source_lang=email.language_detected
+                    )
+                    if pair:
+                        subject_translated, body_translated = pair
+                        # 译文按段写回翻译记忆，后续邮件中的相同段落可直接复用
+                        remember_translation(db, subject_original, subject_translated, "zh",
+                                             source_lang=email.language_detected)
+                        remember_translation(db, latest_content, body_translated, "zh",
+                                             source_lang=email.language_detected)
+                        provider_used = "vllm+combined"
+
+            if body_translated is None and latest_content:
+                # 分段翻译记忆：按段落/句子查缓存，只有未命中的段交给 vLLM（超长邮件的各批次并发翻译）
+                if is_long_email:
+                    print(f"[TranslateTask] Long email detected ({body_len} bytes), translating by segments")
+                body_translated = translate_segments(
+                    db, latest_content, "zh", translate_run,
+                    source_lang=email.language_detected,
+                    glossary=None,  # TODO: 加载术语表
+                    max_workers=CHUNK_CONCURRENCY
+                )
+                provider_used = "vllm+tm"
+            elif body_translated is None:
+                # 空正文
+                body_translated = ""
+
+            # 处理引用内容
+            if quoted_content and body_translated:
+                quoted_translated = None
+
+                # 优先查找历史翻译（通过 in_reply_to）
+                if email.in_reply_to:
+                    # 查找被引用邮件的翻译
+                    original_email = db.query(Email).filter(
+                        Email.message_id == email.in_reply_to,
+                        Email.is_translated == True
                     ).first()
-                    if shared_translation and shared_translation.body_translated:
-                        quoted_translated = shared_translation.body_translated
-                        print(f"[TranslateTask] Found shared translation for quoted content")
-
-            # 如果没有找到历史翻译，单独翻译引用内容
-            if not quoted_translated:
-                print(f"[TranslateTask] No historical translation found, translating quoted content")
-                quoted_translated = service.translate_quoted_content(
-                    quoted_content,
-                    target_lang="zh",
+                    if original_email and original_email.body_translated:
+                        quoted_translated = original_email.body_translated
+                        print(f"[TranslateTask] Found historical translation for quoted content")
+                    else:
+                        # 查找共享翻译
+                        shared_translation = db.query(SharedEmailTranslation).filter(
+                            SharedEmailTranslation.message_id == email.in_reply_to
+                        ).first()
+                        if shared_translation and shared_translation.body_translated:
+                            quoted_translated = shared_translation.body_translated
+                            print(f"[TranslateTask] Found shared translation for quoted content")
+
+                # 如果没有找到历史翻译，单独翻译引用内容
+                if not quoted_translated:
+                    print(f"[TranslateTask] No historical translation found, translating quoted content")
+                    quoted_translated = service.translate_quoted_content(
+                        quoted_content,
+                        target_lang="zh",
+                        source_lang=email.language_detected
+                    )
+
+                # 合并翻译结果
+                if quoted_translated:
+                    body_translated = f"{body_translated}\n\n--- 以下为引用内容（已翻译）---\n{quoted_translated}"
+
+            # 翻译主题（合并翻译未覆盖时单独走翻译记忆）
+            if subject_translated is None and subject_original:
+                subject_translated = translate_segments(
+                    db, subject_original, "zh", translate_run,
                     source_lang=email.language_detected
                 )
 
-            # 合并翻译结果
-            if quoted_translated:
-                body_translated = f"{body_translated}\n\n--- 以下为引用内容（已翻译）---\n{quoted_translated}"
-
-        # 翻译主题
-        subject_translated = None
-        if email.subject_original:
-            subject_translated = service.translate_text(
-                text=email.subject_original,
-                target_lang="zh",
-                source_lang=email.language_detected
-            )
+            return {
+                "subject_translated": subject_translated,
+                "body_translated": body_translated,
+                "provider": provider_used,
+            }
+
+        if force:
+            # 强制重新翻译不复用其他任务的结果
+            outcome, reused = translate_content(), False
+        else:
+            # 相同内容（群发/抄送给多位同事的同一封邮件）跨 worker 只翻译一次
+            content_key = hashlib.sha256(
+                f"{email.language_detected}|{subject_original or ''}|{body_original}".encode("utf-8")
+            ).hexdigest()
+            outcome, reused = translation_single_flight.run(content_key, translate_content)
+
+        subject_translated = outcome["subject_translated"]
+        body_translated = outcome["body_translated"]
+        provider_used = "single_flight" if reused else outcome["provider"]
+        if reused:
+            print(f"[TranslateTask] Email {email_id} reused in-flight translation of identical content")
 
         # 更新邮件
         email.subject_translated = subject_translated
@@ -391,107 +371,86 @@ def translate_email_task(self, email_id: int, account_id: int, force: bool = Fal
         db.close()
 
 
-@celery_app.task(bind=True, max_retries=2, soft_time_limit=600, time_limit=660)
-def batch_translate_task(self, email_ids: list, account_id: int, batch_size: int = 20):
-    """
-    批量翻译邮件（分批处理，避免队列爆炸）
+@task_prerun.connect(sender=translate_email_task)
+def on_translate_prerun(task=None, kwargs=None, **_):
+    """记录排队等待时间（重试不重复记录）"""
+    from shared.translation_scheduler import record_wait
 
-    Args:
-        email_ids: 邮件ID列表
-        account_id: 账户ID
-        batch_size: 每批处理的邮件数量（默认500，防止内存溢出）
-
-    Returns:
-        dict: 批量翻译结果
-    """
-    from celery import group
-    import time
+    kwargs = kwargs or {}
+    if not task.request.retries:
+        record_wait(kwargs.get("lane"), kwargs.get("enqueued_at"))
 
-    total = len(email_ids)
-    completed = 0
-    failed = 0
 
-    print(f"[BatchTranslate] Starting batch translation: {total} emails, batch_size={batch_size}")
+@task_postrun.connect(sender=translate_email_task)
+def on_translate_postrun(args=None, kwargs=None, retval=None, state=None, **_):
+    """任务结束（非重试）：释放批量通道名额并补投下一封，更新所属批量翻译的进度"""
+    from shared.translation_scheduler import SCHEDULED_LANES, dispatch, finish_batch_item, release
 
-    # 分批处理
-    for batch_start in range(0, total, batch_size):
-        batch_end = min(batch_start + batch_size, total)
-        batch_ids = email_ids[batch_start:batch_end]
-        batch_num = batch_start // batch_size + 1
-        total_batches = (total + batch_size - 1) // batch_size
+    if state == "RETRY" or not args:
+        return
+    email_id = args[0]
+    if (kwargs or {}).get("lane") in SCHEDULED_LANES:
+        release(email_id)
+        dispatch()
 
-        print(f"[BatchTranslate] Processing batch {batch_num}/{total_batches} ({len(batch_ids)} emails)")
-
-        # 创建当前批次的子任务组
-        tasks = group(
-            translate_email_task.s(email_id, account_id)
-            for email_id in batch_ids
-        )
+    success = state == "SUCCESS" and isinstance(retval, dict) and retval.get("success")
+    batch = finish_batch_item(email_id, bool(success))
+    if batch and batch["done"]:
+        notify_completion(batch["account_id"], "batch_translation_complete", {
+            "total": batch["total"],
+            "completed": batch["completed"],
+            "failed": batch["failed"]
+        })
+        print(f"[BatchTranslate] Completed: {batch['completed']}/{batch['total']} success, {batch['failed']} failed")
 
-        # 执行当前批次
-        result = tasks.apply_async()
 
-        try:
-            # 等待当前批次完成（每批最长等待3分钟）
-            batch_results = result.get(timeout=180)
+@celery_app.task(bind=True)
+def batch_translate_task(self, email_ids: list, account_id: int):
+    """
+    批量翻译邮件
 
-            for r in batch_results:
-                if r.get("success"):
-                    completed += 1
-                else:
-                    failed += 1
+    邮件进入 backfill 通道按账户公平调度（不会占满 worker，也不影响其他账户），
+    全部结束后由 on_translate_postrun 推送 batch_translation_complete 通知。
 
-        except Exception as e:
-            print(f"[BatchTranslate] Batch {batch_num} error: {e}")
-            # 当前批次失败，记录失败数量
-            failed += len(batch_ids) - (completed - (batch_start - failed))
-
-        # 批次间短暂休息，避免过度占用资源
-        if batch_end < total:
-            time.sleep(1)
-
-        # 发送进度通知（每批完成后）
-        notify_completion(account_id, "batch_translation_progress", {
-            "total": total,
-            "processed": batch_end,
-            "completed": completed,
-            "failed": failed,
-            "progress": int(batch_end / total * 100)
-        })
+    Args:
+        email_ids: 邮件ID列表
+        account_id: 账户ID
 
-    # 发送最终完成通知
-    notify_completion(account_id, "batch_translation_complete", {
-        "total": total,
-        "completed": completed,
-        "failed": failed
-    })
+    Returns:
+        dict: {success, batch_id, total, queued}
+    """
+    from shared.translation_scheduler import LANE_BACKFILL, enqueue, start_batch
 
-    print(f"[BatchTranslate] Completed: {completed}/{total} success, {failed} failed")
+    email_ids = list(dict.fromkeys(email_ids))
+    batch_id = start_batch(account_id, email_ids)
+    queued = enqueue(((email_id, account_id) for email_id in email_ids), LANE_BACKFILL)
+    print(f"[BatchTranslate] Batch {batch_id}: queued {queued}/{len(email_ids)} emails for account {account_id}")
 
     return {
         "success": True,
-        "total": total,
-        "completed": completed,
-        "failed": failed
+        "batch_id": batch_id,
+        "total": len(email_ids),
+        "queued": queued
     }
 
 
 @celery_app.task(bind=True)
 def collect_and_translate_pending(self, limit: int = 500):
     """
-    收集未翻译邮件并使用 vLLM 翻译
+    收集未翻译邮件放入 backfill 通道
 
-    定时任务，自动收集 is_translated=0 的邮件，
-    调用 translate_email_task 进行翻译（使用配置的翻译引擎，默认 vLLM）。
+    定时任务，自动收集 is_translated=0 的邮件，按账户公平调度后由
+    translate_email_task 翻译（使用配置的翻译引擎，默认 vLLM）。
+    已在队列或翻译中的邮件不会重复入队。
 
     Args:
-        limit: 每次最多处理的邮件数量（默认500，避免队列积压）
+        limit: 每次最多收集的邮件数量（默认500）
 
     Returns:
         dict: 处理结果
     """
     from database.models import Email
-    from celery import group
+    from shared.translation_scheduler import LANE_BACKFILL, enqueue
 
     db = get_db_session()
 
@@ -500,7 +459,7 @@ def collect_and_translate_pending(self, limit: int = 500):
         # 'pending' 状态是由 cleanup_stuck_translations 重置的邮件
         # 排除中文邮件（language_detected = 'zh'），因为中文无需翻译
         from sqlalchemy import or_
-        pending_emails = db.query(Email).filter(
+        pending_emails = db.query(Email.id, Email.account_id).filter(
             Email.is_translated == False,
             or_(
                 Email.translation_status.in_(['none', 'pending']),
@@ -513,24 +472,16 @@ def collect_and_translate_pending(self, limit: int = 500):
         if not pending_emails:
             return {"message": "No pending emails", "count": 0}
 
-        email_ids = [(e.id, e.account_id) for e in pending_emails]
+        email_ids = [(email_id, account_id) for email_id, account_id in pending_emails]
         print(f"[CollectTranslate] Found {len(email_ids)} pending emails")
 
         # 不在这里标记状态，让 translate_email_task 自己处理锁定
         # 这样可以避免状态冲突
-
-        # 创建翻译任务组
-        tasks = group(
-            translate_email_task.s(email_id, account_id)
-            for email_id, account_id in email_ids
-        )
-
-        # 异步执行（不等待结果）
-        tasks.apply_async()
+        queued = enqueue(email_ids, LANE_BACKFILL)
 
         return {
-            "message": f"Queued {len(email_ids)} emails for translation",
-            "count": len(email_ids),
+            "message": f"Queued {queued} emails for translation",
+            "count": queued,
             "email_ids": [e[0] for e in email_ids]
         }
 
@@ -540,3 +491,15 @@ def collect_and_translate_pending(self, limit: int = 500):
         return {"error": str(e)}
     finally:
         db.close()
+
+
+@celery_app.task(bind=True)
+def dispatch_pending_translations(self):
+    """
+    按空闲名额投递排队中的翻译
+
+    翻译任务结束时会立即补投，这里作为兜底（名额因 worker 崩溃等原因超时释放后继续投递）
+    """
+    from shared.translation_scheduler import dispatch
+
+    return {"dispatched": dispatch()}
@@ -0,0 +1,10 @@
+"""
+pytest 公共配置：将 backend 目录加入 sys.path，测试中按运行时的方式导入模块
+（services.* / utils.* / database.*）
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
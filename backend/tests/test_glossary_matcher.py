@@ -0,0 +1,53 @@
+"""
+术语表匹配单元测试（utils.glossary_matcher）
+
+运行：cd backend && python -m pytest -q tests/test_glossary_matcher.py
+"""
+from utils.glossary_matcher import AhoCorasick, GlossaryMatcher
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    matches = {(end, automaton.patterns[pid]) for end, pid in automaton.iter_matches("ushers")}
+    assert matches == {(4, "she"), (4, "he"), (6, "hers")}
+
+
+def test_word_boundaries_for_ascii_terms():
+    matcher = GlossaryMatcher({"SA": "供应商审核", "PO": "采购订单", "NCR": "不合格报告"})
+    assert matcher.match("Check the usage of the port") == []
+    assert matcher.match("Porter sent the NCRs") == []
+    assert matcher.match("Please send the PO.") == [("PO", "采购订单")]
+    assert matcher.match("SA/PO attached (NCR-12)") == [
+        ("SA", "供应商审核"), ("PO", "采购订单"), ("NCR", "不合格报告")
+    ]
+
+
+def test_multi_word_and_symbol_edged_terms():
+    matcher = GlossaryMatcher({"lead time": "交期", "C++": "C++ 语言", "8D": "8D 报告"})
+    assert matcher.match("The lead time is 4 weeks") == [("lead time", "交期")]
+    assert matcher.match("The leadtime is 4 weeks") == []
+    # 以符号结尾的术语只检查开头的词边界
+    assert matcher.match("Written in C++11") == [("C++", "C++ 语言")]
+    assert matcher.match("ABC++") == []
+    assert matcher.match("Submit the 8D by Friday") == [("8D", "8D 报告")]
+    assert matcher.match("Submit 18D") == []
+
+
+def test_cjk_terms_match_as_substrings():
+    matcher = GlossaryMatcher({"来料检验": "IQC", "不良": "defect"})
+    assert matcher.match("请安排来料检验，不良品隔离") == [("来料检验", "IQC"), ("不良", "defect")]
+
+
+def test_normalization_case_and_width():
+    matcher = GlossaryMatcher({"NCR": "不合格报告"})
+    assert matcher.match("ｎｃｒ attached") == [("NCR", "不合格报告")]
+    assert matcher.match("ncr attached") == [("NCR", "不合格报告")]
+
+
+def test_match_targets_and_order():
+    matcher = GlossaryMatcher({"purchase order": "采购订单", "invoice": "发票"}, match_targets=True)
+    assert len(matcher) == 2
+    # 结果按术语表顺序返回，与出现顺序无关
+    assert matcher.match("请核对发票和采购订单") == [("purchase order", "采购订单"), ("invoice", "发票")]
+    assert GlossaryMatcher({"invoice": "发票"}).match("请核对发票") == []
+    assert matcher.match("") == []
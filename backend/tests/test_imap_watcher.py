@@ -0,0 +1,291 @@
+"""
+ImapIdleWatcher 单元测试
+
+用进程内的脚本化 IMAP 服务器（本地套接字 + 线程）代替真实邮箱，覆盖：
+- IDLE 期间收到 "* n EXISTS" 触发拉取
+- 服务器不支持 IDLE 时退化为 NOOP 轮询
+- 登录失败 / 断线后按指数退避重连
+- EXISTS 与 "+ idling" 同包到达（已在 imaplib 读缓冲中，select 感知不到）
+
+运行：cd backend && python -m pytest -q tests/test_imap_watcher.py
+"""
+import socket
+import threading
+import time
+
+import pytest
+
+from services import imap_pool
+from services.email_service import EmailService
+from services.imap_pool import ImapIdleWatcher
+
+
+class FakeImapServer:
+    """
+    最小 IMAP 服务器：只实现监听线程用到的命令
+
+    LOGIN / CAPABILITY / EXAMINE / NOOP / IDLE / LOGOUT，按 RFC 3501 / RFC 2177 的格式应答。
+    deliver() 模拟新邮件到达：IDLE 中的连接立即收到 EXISTS，其余连接在下次 NOOP 时收到。
+    """
+
+    def __init__(self, idle: bool = True, reject_logins: int = 0, exists_with_continuation: bool = False):
+        self.idle = idle
+        self.reject_logins = reject_logins
+        # 下一次 IDLE 时把 EXISTS 和 "+ idling" 放在同一次 send 中
+        self.exists_with_continuation = exists_with_continuation
+        self.exists = 3
+        self.connect_times = []
+        self.commands = []
+        self._idling = set()
+        self._clients = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(8)
+        self._listener.settimeout(0.1)
+        self.port = self._listener.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    def deliver(self, count: int = 1):
+        """新邮件到达"""
+        with self._lock:
+            self.exists += count
+            for client in list(self._idling):
+                self._send(client, f"* {self.exists} EXISTS")
+
+    def drop_clients(self):
+        """模拟服务器断开所有连接"""
+        with self._lock:
+            clients, self._clients = self._clients, []
+            self._idling.clear()
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(timeout=2)
+        self._listener.close()
+        self.drop_clients()
+
+    @staticmethod
+    def _send(client: socket.socket, *lines: str):
+        try:
+            client.sendall("".join(line + "\r\n" for line in lines).encode())
+        except OSError:
+            pass
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            client.settimeout(None)
+            with self._lock:
+                self.connect_times.append(time.monotonic())
+                self._clients.append(client)
+            threading.Thread(target=self._handle, args=(client,), daemon=True).start()
+
+    def _handle(self, client: socket.socket):
+        reader = client.makefile("rb")
+        self._send(client, "* OK fake IMAP ready")
+        reported = self.exists
+        try:
+            while True:
+                line = reader.readline()
+                if not line:
+                    return
+                tag, _, rest = line.decode().strip().partition(" ")
+                command = rest.split(" ")[0].upper()
+                self.commands.append(command)
+
+                if command == "CAPABILITY":
+                    caps = "IMAP4rev1 IDLE" if self.idle else "IMAP4rev1"
+                    self._send(client, f"* CAPABILITY {caps}", f"{tag} OK CAPABILITY completed")
+                elif command == "LOGIN":
+                    with self._lock:
+                        reject = self.reject_logins > 0
+                        if reject:
+                            self.reject_logins -= 1
+                    if reject:
+                        self._send(client, f"{tag} NO [AUTHENTICATIONFAILED] invalid credentials")
+                    else:
+                        self._send(client, f"{tag} OK LOGIN completed")
+                elif command in ("SELECT", "EXAMINE"):
+                    reported = self.exists
+                    self._send(client, f"* {reported} EXISTS", "* FLAGS (\\Seen)",
+                               f"{tag} OK [READ-ONLY] {command} completed")
+                elif command == "NOOP":
+                    lines = []
+                    if self.exists != reported:
+                        reported = self.exists
+                        lines.append(f"* {reported} EXISTS")
+                    self._send(client, *lines, f"{tag} OK NOOP completed")
+                elif command == "IDLE":
+                    with self._lock:
+                        if self.exists_with_continuation:
+                            self.exists_with_continuation = False
+                            self.exists += 1
+                            self._send(client, "+ idling", f"* {self.exists} EXISTS")
+                        else:
+                            self._send(client, "+ idling")
+                        self._idling.add(client)
+                    done = reader.readline()
+                    with self._lock:
+                        self._idling.discard(client)
+                    if not done:
+                        return
+                    reported = self.exists
+                    self._send(client, f"{tag} OK IDLE terminated")
+                elif command == "LOGOUT":
+                    self._send(client, "* BYE logging out", f"{tag} OK LOGOUT completed")
+                    return
+                else:
+                    self._send(client, f"{tag} BAD unknown command")
+        except OSError:
+            return
+        finally:
+            reader.close()
+
+
+class MailRecorder:
+    """记录 on_new_mail 回调"""
+
+    def __init__(self):
+        self.calls = []
+        self._cond = threading.Condition()
+
+    def __call__(self, account_id: int):
+        with self._cond:
+            self.calls.append((account_id, time.monotonic()))
+            self._cond.notify_all()
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.calls) >= count, timeout=timeout)
+
+
+@pytest.fixture(autouse=True)
+def fast_watcher(monkeypatch):
+    """缩短轮询 / 退避间隔，心跳不写 Redis"""
+    monkeypatch.setattr(imap_pool, "IDLE_CHECK_SECONDS", 0.2)
+    monkeypatch.setattr(imap_pool, "IDLE_RENEW_SECONDS", 60)
+    monkeypatch.setattr(imap_pool, "NOOP_POLL_SECONDS", 0.1)
+    monkeypatch.setattr(imap_pool, "RECONNECT_BASE_DELAY", 0.05)
+    monkeypatch.setattr(imap_pool, "RECONNECT_MAX_DELAY", 1)
+    monkeypatch.setattr(ImapIdleWatcher, "_heartbeat", lambda self: None)
+    monkeypatch.setattr(ImapIdleWatcher, "_clear_heartbeat", lambda self: None)
+    # connect_imap 会修改进程级默认超时，测试结束后恢复
+    default_timeout = socket.getdefaulttimeout()
+    yield
+    socket.setdefaulttimeout(default_timeout)
+
+
+@pytest.fixture
+def start_watcher():
+    started = []
+
+    def start(server: FakeImapServer):
+        recorder = MailRecorder()
+        watcher = ImapIdleWatcher(
+            1,
+            service_factory=lambda: EmailService(
+                imap_server="127.0.0.1", smtp_server="127.0.0.1",
+                email_address="user@example.com", password="secret",
+                imap_port=server.port, use_ssl=False
+            ),
+            on_new_mail=recorder
+        )
+        watcher.start()
+        started.append((watcher, server))
+        return watcher, recorder
+
+    yield start
+
+    for watcher, server in started:
+        watcher.stop()
+        server.close()
+        watcher.join(timeout=5)
+        assert not watcher.is_alive()
+
+
+def test_idle_exists_triggers_fetch(start_watcher):
+    server = FakeImapServer(idle=True)
+    watcher, recorder = start_watcher(server)
+
+    # 连接成功后先补一次拉取
+    assert recorder.wait_for(1, timeout=5)
+    assert watcher.mode == "idle"
+    deadline = time.monotonic() + 5
+    while not server._idling and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    server.deliver()
+    assert recorder.wait_for(2, timeout=5)
+    assert recorder.calls[-1][0] == 1
+    assert "IDLE" in server.commands
+    assert "NOOP" not in server.commands
+
+
+def test_idle_ignores_unchanged_exists(start_watcher):
+    server = FakeImapServer(idle=True)
+    watcher, recorder = start_watcher(server)
+    assert recorder.wait_for(1, timeout=5)
+
+    # EXPUNGE 后 EXISTS 变小，不触发拉取
+    server.deliver(count=-1)
+    assert not recorder.wait_for(2, timeout=0.5)
+
+
+def test_noop_fallback_when_idle_unsupported(start_watcher):
+    server = FakeImapServer(idle=False)
+    watcher, recorder = start_watcher(server)
+
+    assert recorder.wait_for(1, timeout=5)
+    assert watcher.mode == "noop"
+    # 没有新邮件时 NOOP 不触发拉取
+    assert not recorder.wait_for(2, timeout=0.5)
+
+    server.deliver()
+    assert recorder.wait_for(2, timeout=5)
+    assert "NOOP" in server.commands
+    assert "IDLE" not in server.commands
+
+
+def test_reconnect_backs_off_exponentially(start_watcher):
+    server = FakeImapServer(idle=True, reject_logins=3)
+    watcher, recorder = start_watcher(server)
+
+    assert recorder.wait_for(1, timeout=10)
+    assert len(server.connect_times) == 4
+    gaps = [b - a for a, b in zip(server.connect_times, server.connect_times[1:])]
+    expected = [imap_pool.RECONNECT_BASE_DELAY * 2 ** failures for failures in (1, 2, 3)]
+    for gap, delay in zip(gaps, expected):
+        assert gap >= delay * 0.9
+    assert gaps[2] > gaps[0]
+
+    # 断线后重连，并补一次拉取
+    server.drop_clients()
+    assert recorder.wait_for(2, timeout=5)
+    assert len(server.connect_times) == 5
+
+
+def test_exists_buffered_with_idle_continuation(monkeypatch, start_watcher):
+    # select 超时设得很长：EXISTS 已被 imaplib 读入缓冲，只有先检查读缓冲才能及时发现
+    monkeypatch.setattr(imap_pool, "IDLE_CHECK_SECONDS", 5)
+    server = FakeImapServer(idle=True, exists_with_continuation=True)
+    watcher, recorder = start_watcher(server)
+
+    assert recorder.wait_for(1, timeout=5)
+    started = recorder.calls[0][1]
+    assert recorder.wait_for(2, timeout=2)
+    assert recorder.calls[1][1] - started < 1
@@ -0,0 +1,104 @@
+"""
+游标分页单元测试（utils.pagination）
+
+keyset_condition 在内存 SQLite 上执行：SQLite 与 MySQL 一样把 NULL 视为最小值，
+逐页翻完的结果应与一次性 ORDER BY 的结果完全一致（含 received_at 为 NULL 的邮件）。
+
+运行：cd backend && python -m pytest -q tests/test_pagination.py
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, select
+
+from utils.pagination import decode_cursor, encode_cursor, keyset_condition
+
+metadata = MetaData()
+emails = Table(
+    "emails", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("received_at", DateTime, nullable=True),
+)
+
+ROWS = [
+    (1, datetime(2024, 1, 1, 9, 0)),
+    (2, None),
+    (3, datetime(2024, 1, 2, 9, 0)),
+    (4, datetime(2024, 1, 1, 9, 0)),
+    (5, None),
+    (6, datetime(2024, 1, 3, 9, 0)),
+    (7, None),
+    (8, datetime(2024, 1, 2, 9, 0)),
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(emails.insert(), [{"id": i, "received_at": r} for i, r in ROWS])
+    return engine
+
+
+def _order(descending: bool):
+    if descending:
+        return emails.c.received_at.desc(), emails.c.id.desc()
+    return emails.c.received_at.asc(), emails.c.id.asc()
+
+
+def _paginate(engine, sort_by: str, descending: bool, limit: int):
+    ids = []
+    cursor = None
+    with engine.connect() as conn:
+        while True:
+            query = select(emails.c.id, emails.c.received_at).order_by(*_order(descending)).limit(limit)
+            if cursor:
+                received_at, email_id = decode_cursor(cursor, sort_by)
+                query = query.where(keyset_condition(
+                    emails.c.received_at, emails.c.id, received_at, email_id, descending
+                ))
+            page = conn.execute(query).all()
+            ids.extend(row.id for row in page)
+            if len(page) < limit:
+                return ids
+            cursor = encode_cursor(sort_by, page[-1].received_at, page[-1].id)
+
+
+@pytest.mark.parametrize("sort_by,descending", [("date_desc", True), ("date_asc", False)])
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_pages_match_full_ordering(engine, sort_by, descending, limit):
+    with engine.connect() as conn:
+        expected = [row.id for row in conn.execute(select(emails.c.id).order_by(*_order(descending)))]
+    assert _paginate(engine, sort_by, descending, limit) == expected
+
+
+def test_null_cursor_descending_stays_in_null_tail(engine):
+    # 降序时 NULL 在最后：NULL 游标之后只剩 id 更小的 NULL 行
+    with engine.connect() as conn:
+        query = select(emails.c.id).order_by(*_order(True)).where(
+            keyset_condition(emails.c.received_at, emails.c.id, None, 7, True)
+        )
+        assert [row.id for row in conn.execute(query)] == [5, 2]
+
+
+def test_null_cursor_ascending_continues_into_dated_rows(engine):
+    # 升序时 NULL 在最前：NULL 游标之后是剩余 NULL 行，再是全部有日期的行
+    with engine.connect() as conn:
+        query = select(emails.c.id).order_by(*_order(False)).where(
+            keyset_condition(emails.c.received_at, emails.c.id, None, 5, False)
+        )
+        assert [row.id for row in conn.execute(query)] == [7, 1, 4, 3, 8, 6]
+
+
+def test_cursor_round_trip_and_validation():
+    cursor = encode_cursor("date_desc", None, 42)
+    assert decode_cursor(cursor, "date_desc") == (None, 42)
+
+    cursor = encode_cursor("date_asc", datetime(2024, 1, 2, 9, 0), 8)
+    assert decode_cursor(cursor, "date_asc") == (datetime(2024, 1, 2, 9, 0), 8)
+
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "date_desc")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "date_asc")
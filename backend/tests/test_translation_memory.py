@@ -0,0 +1,190 @@
+"""
+分段翻译记忆单元测试（utils.text_split / services.translation_memory）
+
+只测切分、批次规划、对齐和组装，缓存读写用字典代替（不需要 Redis / MySQL）。
+
+运行：cd backend && python -m pytest -q tests/test_translation_memory.py
+"""
+import pytest
+
+from services import translation_memory as tm
+from utils.text_split import split_text_at_boundaries
+
+EMAIL = "Dear John,\n\nPlease check the NCR for lot 42.\n\nBest regards\n"
+
+
+def _original(segments):
+    return "".join(seg.lead + seg.text + seg.tail for seg in segments)
+
+
+# ============ utils.text_split ============
+
+def test_split_short_text_is_single_chunk():
+    assert split_text_at_boundaries("Hello world.", 100) == ["Hello world."]
+
+
+def test_split_prefers_paragraph_boundary():
+    text = "First sentence. Second sentence.\n\nThird paragraph here."
+    chunks = split_text_at_boundaries(text, 40)
+    assert chunks[0] == "First sentence. Second sentence.\n\n"
+    assert "".join(chunks) == text
+
+
+def test_split_falls_back_to_sentence_then_hard_cut():
+    text = "Alpha beta gamma. Delta epsilon zeta. Eta theta iota."
+    chunks = split_text_at_boundaries(text, 25)
+    assert chunks[0] == "Alpha beta gamma."
+    assert all(len(c) <= 25 for c in chunks)
+    assert "".join(chunks) == text
+
+    # 没有任何边界时硬切
+    assert split_text_at_boundaries("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+# ============ 切分 ============
+
+def test_split_segments_round_trip():
+    segments = tm.split_segments(EMAIL, "zh")
+    assert [s.text for s in segments] == ["Dear John,", "Please check the NCR for lot 42.", "Best regards"]
+    assert _original(segments) == EMAIL
+    assert all(s.key for s in segments)
+
+
+@pytest.mark.parametrize("text", [
+    "  Hello there  \n \n\n\tSecond paragraph\t\n\n\n",
+    "\n\nOnly one paragraph",
+    "Line one\nline two in same paragraph\n\nNext",
+    "Tabs\tand spaces   inside\n\n   \n\nafter blank lines",
+])
+def test_whitespace_and_paragraphs_round_trip(text):
+    segments = tm.split_segments(text, "zh")
+    assert _original(segments) == text
+    # 每段都命中缓存且译文即原文时，组装结果就是去掉首尾空白的原文
+    found = {s.key: s.text for s in segments if s.key}
+    assert tm.assemble(segments, found, {}) == text.strip()
+
+
+def test_long_paragraph_split_at_sentence_boundaries(monkeypatch):
+    monkeypatch.setattr(tm, "SEGMENT_MAX_CHARS", 40)
+    text = "The first sentence is here. The second one follows. And a third closes it."
+    segments = tm.split_segments(text, "zh")
+    assert len(segments) > 1
+    assert all(len(s.text) <= 40 for s in segments)
+    assert _original(segments) == text
+
+
+def test_segment_key_normalizes_inline_whitespace():
+    assert tm.segment_key("Best  regards", "zh") == tm.segment_key("Best\tregards ", "zh")
+    assert tm.segment_key("Best regards", "zh") != tm.segment_key("Best regards", "en")
+    glossary = [{"source": "NCR", "target": "不合格报告"}]
+    assert tm.segment_key("NCR", "zh", tm.glossary_hash(glossary)) != tm.segment_key("NCR", "zh")
+
+
+def test_passthrough_segments_are_not_translated():
+    segments = tm.split_segments("Hello\n\n12345\n\nhttps://example.com/a\n\nsales@example.com", "zh")
+    assert [bool(s.key) for s in segments] == [True, False, False, False]
+
+
+# ============ 批次规划 / 对齐 / 组装 ============
+
+def test_aligned_run():
+    segments = tm.split_segments(EMAIL, "zh")
+    runs = tm.plan_runs(segments, {})
+    assert runs == [[0, 1, 2]]
+
+    source, context = tm.run_source(segments, runs[0])
+    assert source == "Dear John,\n\nPlease check the NCR for lot 42.\n\nBest regards"
+    assert context is None
+
+    aligned = tm.align_run(segments, runs[0], "亲爱的约翰：\n\n请检查 42 批次的 NCR。\n \n此致\n")
+    assert aligned == {
+        segments[0].key: "亲爱的约翰：",
+        segments[1].key: "请检查 42 批次的 NCR。",
+        segments[2].key: "此致",
+    }
+    assert tm.assemble(segments, aligned, {}) == "亲爱的约翰：\n\n请检查 42 批次的 NCR。\n\n此致"
+
+
+def test_misaligned_run_falls_back_to_block():
+    segments = tm.split_segments(EMAIL, "zh")
+    run = tm.plan_runs(segments, {})[0]
+
+    # 模型把三段合成了两段：无法逐段对应
+    translated = "亲爱的约翰，请检查 42 批次的 NCR。\n\n此致"
+    assert tm.align_run(segments, run, translated) is None
+    # 空译文同样视为未对齐
+    assert tm.align_run(segments, run, "") is None
+
+    blocks = {run[0]: (run[-1], translated)}
+    assert tm.assemble(segments, {}, blocks) == translated
+
+
+def test_mixed_cached_and_uncached_segments():
+    text = "Dear John,\n\nPlease check the NCR.\n\nSee https://example.com/ncr\n\nhttps://example.com/ncr\n\nBest regards"
+    segments = tm.split_segments(text, "zh")
+    found = {segments[0].key: "亲爱的约翰：", segments[4].key: "此致"}
+
+    # 命中段和需原样保留的非空段都会打断批次
+    runs = tm.plan_runs(segments, found)
+    assert runs == [[1, 2]]
+    source, context = tm.run_source(segments, runs[0])
+    assert source == "Please check the NCR.\n\nSee https://example.com/ncr"
+    assert context == "Dear John,"
+
+    found.update(tm.align_run(segments, runs[0], "请检查 NCR。\n\n见 https://example.com/ncr"))
+    assert tm.assemble(segments, found, {}) == (
+        "亲爱的约翰：\n\n请检查 NCR。\n\n见 https://example.com/ncr\n\nhttps://example.com/ncr\n\n此致"
+    )
+
+
+def test_runs_respect_max_chars(monkeypatch):
+    monkeypatch.setattr(tm, "RUN_MAX_CHARS", 30)
+    text = "\n\n".join(f"Paragraph number {i}" for i in range(4))
+    segments = tm.split_segments(text, "zh")
+    runs = tm.plan_runs(segments, {})
+    assert [i for run in runs for i in run] == [0, 1, 2, 3]
+    assert all(len(tm.run_source(segments, run)[0]) <= 30 for run in runs)
+
+
+# ============ translate_segments（缓存层用字典代替） ============
+
+def test_translate_segments_reuses_cache_and_stores_aligned(monkeypatch):
+    cache = {}
+    stored = {}
+
+    def lookup(db, keys):
+        return {k: cache[k] for k in keys if k in cache}
+
+    def store(db, entries, source_lang, target_lang):
+        stored.update(entries)
+        cache.update({k: v[1] for k, v in entries.items()})
+
+    monkeypatch.setattr(tm, "_lookup_sync", lookup)
+    monkeypatch.setattr(tm, "_store_sync", store)
+
+    requests = []
+
+    def translate(source, context):
+        requests.append(source)
+        return "\n\n".join(f"<{p}>" for p in source.split("\n\n"))
+
+    first = tm.translate_segments(None, EMAIL, "zh", translate)
+    assert first == "<Dear John,>\n\n<Please check the NCR for lot 42.>\n\n<Best regards>"
+    assert len(requests) == 1
+    assert len(stored) == 3
+
+    # 第二封邮件只有中间段不同：只翻译这一段
+    requests.clear()
+    second = tm.translate_segments(None, EMAIL.replace("lot 42", "lot 43"), "zh", translate)
+    assert requests == ["Please check the NCR for lot 43."]
+    assert second == "<Dear John,>\n\n<Please check the NCR for lot 43.>\n\n<Best regards>"
+
+
+def test_translate_segments_unaligned_output_is_not_cached(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(tm, "_lookup_sync", lambda db, keys: {})
+    monkeypatch.setattr(tm, "_store_sync", lambda db, entries, s, t: stored.update(entries))
+
+    result = tm.translate_segments(None, EMAIL, "zh", lambda source, context: "整封邮件合成一段")
+    assert result == "整封邮件合成一段"
+    assert stored == {}
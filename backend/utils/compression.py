@@ -0,0 +1,184 @@
+"""
+文本压缩存储
+
+数据库中的大文本列（翻译缓存原文/译文等）以压缩字节存储：
+
+- 安装 zstandard 时使用 zstd（压缩比和速度都优于 zlib），否则退回标准库 zlib
+- 压缩数据以 0xFF + 编码标识开头；0xFF 不会出现在 UTF-8 文本中，
+  因此未压缩的短文本和迁移前的历史数据（原样的 UTF-8 字节）可以与压缩数据混存
+- 短文本压缩收益为负，低于 COMPRESS_MIN_BYTES 时原样存储
+- 可按列指定 zstd 训练字典（scripts/train_compression_dict.py 生成，放在 COMPRESSION_DICT_DIR）。
+  zstd 帧头记录了字典 ID，解压时按 ID 选择字典，因此字典可以更新换代，
+  但旧字典文件必须保留，直到用它压缩的数据全部重写
+"""
+import glob
+import os
+import threading
+import zlib
+from typing import Dict, Optional, Union
+
+# zstandard 为可选依赖
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# 低于该字节数不压缩
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "64"))
+# zstd 压缩级别（1-22，3 为速度/压缩比折中）
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# 训练字典目录，文件名为 {字典名}-{字典 ID}.zdict
+DICT_DIR = os.getenv("COMPRESSION_DICT_DIR", "data/compression_dicts")
+
+_MARKER = 0xFF
+_CODEC_ZSTD = b"\xffz"
+_CODEC_ZLIB = b"\xffd"
+
+# zstd 压缩/解压上下文不是线程安全的，按线程各建一份
+_local = threading.local()
+
+
+class _DictionaryStore:
+    """训练字典（首次使用时加载，同名字典取最新的文件用于压缩）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.by_id: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self.active: Dict[str, "zstandard.ZstdCompressionDict"] = {}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            latest: Dict[str, float] = {}
+            for path in glob.glob(os.path.join(DICT_DIR, "*.zdict")):
+                name = os.path.basename(path).rsplit("-", 1)[0]
+                try:
+                    with open(path, "rb") as f:
+                        zdict = zstandard.ZstdCompressionDict(f.read())
+                    zdict.precompute_compress(level=ZSTD_LEVEL)
+                except (OSError, zstandard.ZstdError) as e:
+                    print(f"[Compression] Failed to load dictionary {path}: {e}")
+                    continue
+                self.by_id[zdict.dict_id()] = zdict
+                mtime = os.path.getmtime(path)
+                if mtime >= latest.get(name, 0):
+                    latest[name] = mtime
+                    self.active[name] = zdict
+            if self.by_id:
+                print(f"[Compression] Loaded {len(self.by_id)} dictionaries: {sorted(self.active)}")
+            self._loaded = True
+
+    def get_active(self, name: str):
+        self._ensure_loaded()
+        return self.active.get(name)
+
+    def get_by_id(self, dict_id: int):
+        self._ensure_loaded()
+        return self.by_id.get(dict_id)
+
+    def reload(self):
+        with self._lock:
+            self.by_id, self.active, self._loaded = {}, {}, False
+
+
+_dictionaries = _DictionaryStore()
+
+
+def save_dictionary(name: str, dict_data: bytes) -> str:
+    """
+    保存训练好的字典（新文件成为该名称的当前字典）
+
+    Returns:
+        字典文件路径
+    """
+    zdict = zstandard.ZstdCompressionDict(dict_data)
+    os.makedirs(DICT_DIR, exist_ok=True)
+    path = os.path.join(DICT_DIR, f"{name}-{zdict.dict_id()}.zdict")
+    with open(path, "wb") as f:
+        f.write(dict_data)
+    _dictionaries.reload()
+    return path
+
+
+def _zstd_compressor(dictionary: Optional[str] = None):
+    zdict = _dictionaries.get_active(dictionary) if dictionary else None
+    cache_key = zdict.dict_id() if zdict is not None else 0
+    compressors = getattr(_local, "compressors", None)
+    if compressors is None:
+        compressors = _local.compressors = {}
+    compressor = compressors.get(cache_key)
+    if compressor is None:
+        compressor = compressors[cache_key] = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=zdict)
+    return compressor
+
+
+def _zstd_decompressor(payload: bytes):
+    dict_id = zstandard.get_frame_parameters(payload).dict_id
+    decompressors = getattr(_local, "decompressors", None)
+    if decompressors is None:
+        decompressors = _local.decompressors = {}
+    decompressor = decompressors.get(dict_id)
+    if decompressor is None:
+        zdict = _dictionaries.get_by_id(dict_id) if dict_id else None
+        if dict_id and zdict is None:
+            raise RuntimeError(f"缺少 zstd 字典 {dict_id}（{DICT_DIR}）")
+        decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=zdict)
+    return decompressor
+
+
+def compress_text(text: Optional[str], dictionary: Optional[str] = None) -> Optional[bytes]:
+    """
+    压缩文本
+
+    Args:
+        text: 原文（None 原样返回）
+        dictionary: zstd 字典名（未训练该字典或未安装 zstandard 时不使用字典）
+
+    Returns:
+        存储用字节：短文本为 UTF-8 原文，其余为 标识 + 压缩数据
+    """
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return raw
+    if ZSTD_AVAILABLE:
+        packed = _CODEC_ZSTD + _zstd_compressor(dictionary).compress(raw)
+    else:
+        packed = _CODEC_ZLIB + zlib.compress(raw, 6)
+    # 压缩后反而更大（已是高熵内容）时原样存储
+    return packed if len(packed) < len(raw) else raw
+
+
+def is_compressed(data: Union[bytes, bytearray, memoryview, str, None]) -> bool:
+    """是否为 compress_text 压缩过的数据（迁移时用于跳过已处理的行）"""
+    return isinstance(data, (bytes, bytearray, memoryview)) and len(data) > 1 and data[0] == _MARKER
+
+
+def decompress_text(data: Union[bytes, bytearray, memoryview, str, None]) -> Optional[str]:
+    """
+    解压 compress_text 的结果（兼容未压缩的 UTF-8 字节和 str）
+
+    Raises:
+        RuntimeError: 数据为 zstd 压缩但未安装 zstandard，或缺少压缩时使用的字典
+    """
+    if data is None or isinstance(data, str):
+        return data
+    data = bytes(data)
+    if not data or data[0] != _MARKER:
+        return data.decode("utf-8")
+    codec, payload = data[:2], data[2:]
+    if codec == _CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("数据使用 zstd 压缩，请安装 zstandard")
+        return _zstd_decompressor(payload).decompress(payload).decode("utf-8")
+    if codec == _CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    raise ValueError(f"未知的压缩格式: {codec!r}")
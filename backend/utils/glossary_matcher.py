@@ -0,0 +1,144 @@
+"""
+术语表多模式匹配
+
+翻译 prompt 只注入正文中实际出现的术语。术语表预编译为 Aho-Corasick 自动机，
+一次扫描正文即可找出全部命中的术语（与术语条数无关）。
+
+匹配规则：
+- 术语和正文统一做 NFKC 归一化 + 小写（全角字母、半角片假名与常规写法视为相同）
+- 以字母数字开头/结尾的术语要求词边界，避免 "SA" 命中 "usage"、"PO" 命中 "port"
+- 中日韩术语没有词边界，按子串匹配
+"""
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+def normalize_term(text: str) -> str:
+    """匹配用归一化：NFKC + 小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class AhoCorasick:
+    """Aho-Corasick 自动机（模式串在构建时已归一化）"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build_fail_links()
+
+    def _add(self, pattern: str):
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern_id)
+
+    def _build_fail_links(self):
+        # BFS：失败指针指向最长的真后缀状态，输出合并后缀状态的输出
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        扫描文本
+
+        Yields:
+            (结束位置（不含）, 模式编号)
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern_id in output[state]:
+                yield i + 1, pattern_id
+
+
+class GlossaryMatcher:
+    """
+    预编译术语表
+
+    Args:
+        terms: {原文术语: 译文}，保持插入顺序
+        match_targets: 是否同时按译文匹配（中文原文反向翻译时使用）
+    """
+
+    def __init__(self, terms: Dict[str, str], match_targets: bool = False):
+        self.rows: List[Tuple[str, str]] = [
+            (source, target) for source, target in terms.items() if source and target
+        ]
+        keys: Dict[str, List[int]] = {}
+        for row_id, (source, target) in enumerate(self.rows):
+            sides = (source, target) if match_targets else (source,)
+            for side in sides:
+                key = normalize_term(side).strip()
+                if key:
+                    keys.setdefault(key, []).append(row_id)
+
+        self._pattern_rows = list(keys.values())
+        self._automaton = AhoCorasick(keys.keys())
+        # 词边界要求在构建时算好
+        self._bounded = [
+            (_is_word_char(p[0]), _is_word_char(p[-1])) for p in self._automaton.patterns
+        ]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def match(self, text: str) -> List[Tuple[str, str]]:
+        """
+        返回正文中出现的术语行（按术语表原顺序）
+
+        Args:
+            text: 待翻译正文
+
+        Returns:
+            [(原文术语, 译文), ...]
+        """
+        if not text or not self.rows:
+            return []
+
+        normalized = normalize_term(text)
+        length = len(normalized)
+        hit_rows = set()
+        for end, pattern_id in self._automaton.iter_matches(normalized):
+            start = end - len(self._automaton.patterns[pattern_id])
+            check_start, check_end = self._bounded[pattern_id]
+            if check_start and start > 0 and _is_word_char(normalized[start - 1]):
+                continue
+            if check_end and end < length and _is_word_char(normalized[end]):
+                continue
+            hit_rows.update(self._pattern_rows[pattern_id])
+
+        return [self.rows[i] for i in sorted(hit_rows)]
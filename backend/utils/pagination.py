@@ -0,0 +1,117 @@
+"""
+邮件列表分页
+
+- 游标分页（keyset）：按 (received_at, id) 定位下一页，与 idx_email_account_received
+  （InnoDB 二级索引隐含主键 id）的顺序一致，翻到第几页都只扫描 limit 行
+- 游标对客户端不透明：base64url 编码的 JSON，只在按日期排序时可用
+- 总数缓存：同一账户 + 筛选条件的 COUNT 结果缓存在 Redis（shared.tiered_cache.shared_cache，
+  异步客户端 + 熔断，Redis 不可用时直接 COUNT），过期后先返回旧值，
+  由后台任务惰性刷新，翻页不再重复 COUNT
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_, tuple_
+
+from shared.cache_config import get_cache_key
+from shared.tiered_cache import shared_cache
+
+# 支持游标分页的排序方式 → 是否降序
+CURSOR_SORTS = {"date_desc": True, "date_asc": False}
+
+# 总数缓存超过该秒数后在后台刷新（期间继续返回旧值）
+COUNT_REFRESH_AFTER = int(os.getenv("EMAIL_COUNT_REFRESH_AFTER", "30"))
+# 总数缓存的最长保留时间（秒）
+COUNT_TTL = int(os.getenv("EMAIL_COUNT_TTL", "600"))
+
+# ============ 游标 ============
+
+def encode_cursor(sort_by: str, received_at: Optional[datetime], email_id: int) -> str:
+    """生成下一页游标
+
+    Args:
+        sort_by: 排序方式（CURSOR_SORTS 之一）
+        received_at: 本页最后一封邮件的接收时间
+        email_id: 本页最后一封邮件的 ID
+
+    Returns:
+        不透明的游标字符串
+    """
+    payload = {"s": sort_by, "r": received_at.isoformat() if received_at else None, "i": email_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str) -> Tuple[Optional[datetime], int]:
+    """解析游标
+
+    Returns:
+        (received_at, email_id)
+
+    Raises:
+        ValueError: 游标格式错误或与当前排序方式不符
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        received_at = datetime.fromisoformat(payload["r"]) if payload["r"] else None
+        email_id = int(payload["i"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("无效的分页游标") from e
+    if payload.get("s") != sort_by:
+        raise ValueError("分页游标与排序方式不符")
+    return received_at, email_id
+
+
+def keyset_condition(received_col, id_col, received_at: Optional[datetime], email_id: int, descending: bool):
+    """游标之后的行的筛选条件
+
+    MySQL 中 NULL 小于任何值：降序时 received_at 为 NULL 的邮件排在最后，升序时排在最前
+    """
+    if descending:
+        if received_at is None:
+            return and_(received_col.is_(None), id_col < email_id)
+        return or_(tuple_(received_col, id_col) < (received_at, email_id), received_col.is_(None))
+    if received_at is None:
+        return or_(and_(received_col.is_(None), id_col > email_id), received_col.isnot(None))
+    return tuple_(received_col, id_col) > (received_at, email_id)
+
+
+# ============ 总数缓存 ============
+
+def count_cache_key(account_id: int, filters: Dict) -> str:
+    """按账户和筛选条件生成总数缓存键"""
+    digest = hashlib.md5(
+        json.dumps(filters, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"{account_id}:{digest}"
+
+
+async def get_cached_count(key: str) -> Tuple[Optional[int], bool]:
+    """读取缓存的总数
+
+    Returns:
+        (total, needs_refresh)：未缓存时 total 为 None
+    """
+    cached = await shared_cache.get(f"email_count:{key}")
+    if not cached:
+        return None, True
+    return cached["total"], time.time() - cached["at"] >= COUNT_REFRESH_AFTER
+
+
+async def set_cached_count(key: str, total: int):
+    await shared_cache.set(f"email_count:{key}", {"total": total, "at": time.time()}, COUNT_TTL)
+
+
+async def claim_refresh(key: str) -> bool:
+    """抢占后台刷新（同一个键同时只刷新一次）"""
+    def build(pipe):
+        pipe.set(get_cache_key(f"email_count:refreshing:{key}"), "1", nx=True, ex=COUNT_REFRESH_AFTER)
+
+    results = await shared_cache.pipeline(build)
+    return bool(results and results[0])
@@ -0,0 +1,103 @@
+"""
+供应商邮件统计
+
+按域名聚合账户邮件（发件人域名 emails.sender_domain、收件人域名 email_recipient_domains，
+见 database.email_domains），两条 GROUP BY 得到所有域名的统计，供应商按自己的域名取值：
+
+- 结果按账户缓存在 Redis（shared.tiered_cache.shared_cache，异步客户端 + 熔断），
+  与供应商列表无关，增删改供应商不需要失效
+- 新邮件入库后调用 invalidate_domain_stats()（Celery 任务用 invalidate_domain_stats_sync()）；
+  已读/翻译状态变化和最近 7/30 天的滑动窗口在缓存过期（SUPPLIER_STATS_TTL）后更新
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import case, func, select
+
+from database.models import Email, EmailRecipientDomain
+from shared.tiered_cache import shared_cache
+
+# 域名统计缓存时间（秒）
+SUPPLIER_STATS_TTL = int(os.getenv("SUPPLIER_STATS_TTL", "300"))
+
+
+def _cache_key(account_id: int) -> str:
+    return f"supplier_stats:{account_id}"
+
+
+EMPTY_DOMAIN_STATS = {
+    "received": 0, "sent": 0, "unread": 0, "translated": 0,
+    "last_email_date": None, "last_7_days": 0, "last_30_days": 0,
+}
+
+
+async def _compute_domain_stats(db, account_id: int) -> Dict[str, dict]:
+    now = datetime.utcnow()
+    seven_days_ago = now - timedelta(days=7)
+    thirty_days_ago = now - timedelta(days=30)
+
+    # 收到的邮件：按发件人域名
+    received_rows = await db.execute(
+        select(
+            Email.sender_domain,
+            func.count(Email.id).label("received"),
+            func.sum(case((Email.is_read == False, 1), else_=0)).label("unread"),
+            func.sum(case((Email.body_translated.isnot(None), 1), else_=0)).label("translated"),
+            func.max(Email.received_at).label("last_email_date"),
+            func.sum(case((Email.received_at >= seven_days_ago, 1), else_=0)).label("last_7_days"),
+            func.sum(case((Email.received_at >= thirty_days_ago, 1), else_=0)).label("last_30_days"),
+        )
+        .where(Email.account_id == account_id, Email.sender_domain.isnot(None))
+        .group_by(Email.sender_domain)
+    )
+    stats = {}
+    for row in received_rows.all():
+        stats[row.sender_domain] = {
+            **EMPTY_DOMAIN_STATS,
+            "received": row.received,
+            "unread": int(row.unread or 0),
+            "translated": int(row.translated or 0),
+            "last_email_date": row.last_email_date.isoformat() if row.last_email_date else None,
+            "last_7_days": int(row.last_7_days or 0),
+            "last_30_days": int(row.last_30_days or 0),
+        }
+
+    # 发出/抄送到该域名的邮件：按收件人域名
+    sent_rows = await db.execute(
+        select(EmailRecipientDomain.domain, func.count().label("sent"))
+        .where(EmailRecipientDomain.account_id == account_id)
+        .group_by(EmailRecipientDomain.domain)
+    )
+    for domain, sent in sent_rows.all():
+        stats.setdefault(domain, dict(EMPTY_DOMAIN_STATS))["sent"] = sent
+
+    return stats
+
+
+async def get_domain_stats(db, account_id: int) -> Dict[str, dict]:
+    """账户所有往来域名的邮件统计
+
+    Args:
+        db: 异步数据库会话
+        account_id: 账户 ID
+
+    Returns:
+        {域名: {received, sent, unread, translated, last_email_date(ISO 字符串), last_7_days, last_30_days}}
+    """
+    cached = await shared_cache.get(_cache_key(account_id))
+    if cached is not None:
+        return cached
+    stats = await _compute_domain_stats(db, account_id)
+    await shared_cache.set(_cache_key(account_id), stats, SUPPLIER_STATS_TTL)
+    return stats
+
+
+async def invalidate_domain_stats(account_id: int):
+    """新邮件入库后清除账户的域名统计缓存"""
+    await shared_cache.delete(_cache_key(account_id))
+
+
+def invalidate_domain_stats_sync(account_id: int):
+    """清除账户的域名统计缓存（同步版本，供 Celery 任务使用）"""
+    shared_cache.delete_sync(_cache_key(account_id))
@@ -0,0 +1,69 @@
+"""
+文本分割工具
+
+分段翻译记忆（services.translation_memory）切分超长段落时使用，
+边界规则沿用原超长邮件分段翻译：优先在段落处分割，其次换行、句末标点、
+子句标点，最后空格。
+"""
+import re
+from typing import List
+
+# 分割点优先级（从高到低）
+SPLIT_PATTERNS = [
+    r'\n\n',  # 段落分隔
+    r'\n',    # 换行
+    r'[.。！!?？](?=\s|$)',  # 句末标点
+    r'[,，;；](?=\s)',  # 子句分隔
+    r'\s',    # 空格
+]
+
+
+def find_split_point(chunk_text: str) -> int:
+    """
+    在片段后半部分查找最佳分割点
+
+    Args:
+        chunk_text: 候选片段
+
+    Returns:
+        分割位置（找不到边界时返回片段长度，即硬切）
+    """
+    search_start = max(0, len(chunk_text) // 2)
+    for pattern in SPLIT_PATTERNS:
+        matches = list(re.finditer(pattern, chunk_text[search_start:]))
+        if matches:
+            # 取最后一个匹配
+            split_pos = search_start + matches[-1].end()
+            if split_pos > search_start:
+                return split_pos
+    return len(chunk_text)
+
+
+def split_text_at_boundaries(text: str, max_size: int) -> List[str]:
+    """
+    将文本分割成不超过 max_size 的连续片段（片段直接拼接即为原文）
+
+    Args:
+        text: 原始文本
+        max_size: 每个片段的最大长度
+
+    Returns:
+        List[str]: 分割后的文本片段列表
+    """
+    if len(text) <= max_size:
+        return [text]
+
+    chunks = []
+    current_pos = 0
+
+    while current_pos < len(text):
+        # 如果剩余内容不超过限制，直接添加
+        if current_pos + max_size >= len(text):
+            chunks.append(text[current_pos:])
+            break
+
+        best_split = find_split_point(text[current_pos:current_pos + max_size])
+        chunks.append(text[current_pos:current_pos + best_split])
+        current_pos += best_split
+
+    return chunks
@@ -108,6 +108,9 @@ class ConnectionManager:
                 self.active_connections[account_id] = []
             self.active_connections[account_id].append(websocket)
             print(f"[WebSocket] Account {account_id} connected. Total: {len(self.active_connections[account_id])}")
+            # 登记跨进程在线状态（流式翻译据此决定是否推送增量）
+            from services.notification_bridge import notification_bridge
+            await notification_bridge.mark_online(account_id)
         else:
             self.global_connections.append(websocket)
             print(f"[WebSocket] Global connection added. Total: {len(self.global_connections)}")
@@ -66,6 +66,29 @@ module.exports = {
       merge_logs: true
     },
 
+    // IMAP IDLE 监听 - 新邮件到达时触发拉取（只运行一个实例）
+    {
+      name: 'imap-watcher',
+      cwd: '/www/email-translate/backend',
+      script: './venv/bin/python',
+      args: 'imap_watcher.py',
+      interpreter: 'none',
+      env: {
+        PYTHONUNBUFFERED: '1',
+        LOG_LEVEL: 'INFO',
+        LOG_DIR: '/www/email-translate/logs'
+      },
+      instances: 1,
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '300M',
+
+      error_file: '/www/email-translate/logs/imap-watcher-error.log',
+      out_file: '/www/email-translate/logs/imap-watcher.log',
+      log_date_format: 'YYYY-MM-DD HH:mm:ss',
+      merge_logs: true
+    },
+
     // Celery Beat - 定时任务调度
     {
       name: 'celery-beat',